@@ -10,6 +10,10 @@ db = SQLAlchemy()
 class ParkingSensor(db.Model):
     """Real-time parking sensor data model"""
     __tablename__ = 'parking_sensors'
+    __table_args__ = (
+        # Covers the /live candidate scan, so only the rows of the returned page are read
+        db.Index('idx_sensor_geohash', 'geohash', 'latitude', 'longitude', 'status_description', 'last_updated'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     kerbside_id = db.Column(db.String(50), unique=True, nullable=False)
@@ -17,6 +21,8 @@ class ParkingSensor(db.Model):
     status_description = db.Column(db.String(50), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
+    # Computed at ingest (GeohashUtils) so radius and box queries become prefix range scans
+    geohash = db.Column(db.String(12), nullable=True)
     status_timestamp = db.Column(db.DateTime, nullable=False)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -38,6 +44,95 @@ class ParkingSensor(db.Model):
         return f'<ParkingSensor {self.kerbside_id}: {self.status_description}>'
 
 
+class ParkingStatusHistory(db.Model):
+    """Status transition log, one row per change of a sensor's status"""
+    __tablename__ = 'parking_status_history'
+    __table_args__ = (
+        db.Index('idx_history_sensor_time', 'kerbside_id', 'status_timestamp'),
+        db.Index('idx_history_time', 'status_timestamp'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kerbside_id = db.Column(db.String(50), nullable=False)
+    zone_number = db.Column(db.String(20), nullable=True)
+    status_description = db.Column(db.String(50), nullable=False)
+    status_timestamp = db.Column(db.DateTime, nullable=False)
+    recorded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert model to dictionary for JSON serialization"""
+        return {
+            'kerbside_id': self.kerbside_id,
+            'zone_number': self.zone_number,
+            'status': self.status_description,
+            'status_timestamp': self.status_timestamp.isoformat() if self.status_timestamp else None,
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None
+        }
+
+    def __repr__(self):
+        return f'<ParkingStatusHistory {self.kerbside_id}: {self.status_description} @ {self.status_timestamp}>'
+
+
+class WebhookSubscription(db.Model):
+    """Partner callback notified when bays in a zone or bounding box change status"""
+    __tablename__ = 'webhook_subscriptions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    callback_url = db.Column(db.String(500), nullable=False)
+    zone_number = db.Column(db.String(20), nullable=True)
+    lat_min = db.Column(db.Float, nullable=True)
+    lng_min = db.Column(db.Float, nullable=True)
+    lat_max = db.Column(db.Float, nullable=True)
+    lng_max = db.Column(db.Float, nullable=True)
+    statuses = db.Column(db.String(100), nullable=True)  # Comma-separated; empty means every status
+    secret = db.Column(db.String(100), nullable=True)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert model to dictionary for JSON serialization (the secret is never returned)"""
+        return {
+            'id': self.id,
+            'callback_url': self.callback_url,
+            'zone_number': self.zone_number,
+            'bbox': [self.lat_min, self.lng_min, self.lat_max, self.lng_max] if self.lat_min is not None else None,
+            'statuses': self.statuses.split(',') if self.statuses else [],
+            'signed': bool(self.secret),
+            'active': self.active,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<WebhookSubscription {self.id}: {self.callback_url}>'
+
+
+class WebhookDeadLetter(db.Model):
+    """A webhook batch that could not be delivered, kept for inspection and replay"""
+    __tablename__ = 'webhook_dead_letters'
+
+    id = db.Column(db.Integer, primary_key=True)
+    subscription_id = db.Column(db.Integer, nullable=False, index=True)
+    batch_id = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert model to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'subscription_id': self.subscription_id,
+            'batch_id': self.batch_id,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<WebhookDeadLetter {self.batch_id} for subscription {self.subscription_id}>'
+
+
 class ParkingLot(db.Model):
     """Parking lot data model"""
     __tablename__ = 'parking_lots'
@@ -53,7 +148,8 @@ class ParkingLot(db.Model):
     opening_hours = db.Column(db.String(100), nullable=False)
     area_type = db.Column(db.String(50), nullable=False)
     facilities = db.Column(db.Text)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped by every ORM update, so other workers' lot indexes pick the change up
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def to_dict(self):
         """Convert model to dictionary for JSON serialization"""
@@ -100,3 +196,40 @@ class UserPreference(db.Model):
 
     def __repr__(self):
         return f'<UserPreference {self.session_id}: {self.preferred_area}>'
+
+
+class SavedArea(db.Model):
+    """Circle a user watches, with availability counts kept current by each ingest"""
+    __tablename__ = 'saved_areas'
+
+    id = db.Column(db.Integer, primary_key=True)
+    preference_id = db.Column(db.Integer, db.ForeignKey('user_preferences.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    radius_km = db.Column(db.Float, nullable=False)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    available_count = db.Column(db.Integer, nullable=False, default=0)
+    occupied_count = db.Column(db.Integer, nullable=False, default=0)
+    # Snapshot version the counts are exact for; NULL until the first evaluation
+    counts_version = db.Column(db.BigInteger)
+    counts_updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert model to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'center': [self.latitude, self.longitude],
+            'radius_km': self.radius_km,
+            'total': self.total_count,
+            'available': self.available_count,
+            'occupied': self.occupied_count,
+            'occupancy_rate': round(self.occupied_count / self.total_count * 100, 2) if self.total_count else 0,
+            'counts_updated_at': self.counts_updated_at.isoformat() if self.counts_updated_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<SavedArea {self.id}: {self.name}>'
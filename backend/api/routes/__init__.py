@@ -6,6 +6,9 @@ from flask import Blueprint
 from .parking_routes import parking_bp
 from .stats_routes import stats_bp
 from .health_routes import health_bp
+from .webhook_routes import webhooks_bp
+from .dashboard_routes import dashboard_bp
+from .area_routes import areas_bp
 
 def register_routes(app):
     """
@@ -23,4 +26,13 @@ def register_routes(app):
     # Register stats routes
     app.register_blueprint(stats_bp, url_prefix='/api/stats')
 
-__all__ = ['parking_bp', 'stats_bp', 'health_bp', 'register_routes']
+    # Register webhook subscription routes
+    app.register_blueprint(webhooks_bp, url_prefix='/api/webhooks')
+
+    # Register the map view's combined sensors and statistics endpoint
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+
+    # Register saved area routes
+    app.register_blueprint(areas_bp, url_prefix='/api/areas')
+
+__all__ = ['parking_bp', 'stats_bp', 'health_bp', 'webhooks_bp', 'dashboard_bp', 'areas_bp', 'register_routes']
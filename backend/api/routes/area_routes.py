@@ -0,0 +1,194 @@
+"""
+Saved Area Routes for Melbourne Parking API
+"""
+
+from flask import Blueprint, jsonify, request
+from datetime import datetime
+from ..models import SavedArea, UserPreference, db
+from ..services import SavedAreaService
+
+# Create saved area routes blueprint
+areas_bp = Blueprint('areas', __name__)
+
+@areas_bp.route('/', methods=['POST'], strict_slashes=False)
+def create_saved_area():
+    """
+    Save an area to watch; its availability counts are kept current by every ingest
+
+    JSON Body:
+        session_id (str): Session the area belongs to
+        lat (float): Centre latitude
+        lng (float): Centre longitude
+        radius_km (float): Radius (default: the session's preferred_radius, max 5)
+        name (str): Label (default: the session's preferred_area, or "Area N")
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        session_id = (body.get('session_id') or '').strip()
+
+        if not session_id:
+            return jsonify({
+                'success': False,
+                'error': '"session_id" is required'
+            }), 400
+
+        try:
+            lat = float(body['lat'])
+            lng = float(body['lng'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': '"lat" and "lng" are required numbers'
+            }), 400
+
+        preference = UserPreference.query.filter_by(session_id=session_id).first()
+        if preference is None:
+            preference = UserPreference(session_id=session_id)
+            db.session.add(preference)
+            db.session.flush()
+
+        try:
+            radius_km = float(body.get('radius_km') or preference.preferred_radius or 2.0)
+        except (TypeError, ValueError):
+            radius_km = -1.0
+        if not 0 < radius_km <= SavedAreaService.MAX_RADIUS_KM:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': f'"radius_km" must be greater than 0 and at most {SavedAreaService.MAX_RADIUS_KM:g}'
+            }), 400
+
+        existing = SavedArea.query.filter_by(preference_id=preference.id).count()
+        if existing >= SavedAreaService.MAX_AREAS_PER_SESSION:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': f'A session can save at most {SavedAreaService.MAX_AREAS_PER_SESSION} areas'
+            }), 409
+
+        area = SavedArea(
+            preference_id=preference.id,
+            name=(body.get('name') or preference.preferred_area or f'Area {existing + 1}')[:100],
+            latitude=lat,
+            longitude=lng,
+            radius_km=radius_km,
+            created_at=datetime.utcnow()
+        )
+        SavedAreaService.evaluate(area)
+        db.session.add(area)
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'area': area.to_dict()
+        }), 201
+
+    except Exception as e:
+        print(f"Error creating saved area: {e}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@areas_bp.route('/', methods=['GET'], strict_slashes=False)
+def list_saved_areas():
+    """
+    A session's saved areas with their current counts
+
+    Query Parameters:
+        session_id (str): Session whose areas to list
+    """
+    try:
+        session_id = request.args.get('session_id', '').strip()
+        if not session_id:
+            return jsonify({
+                'success': False,
+                'error': '"session_id" is required'
+            }), 400
+
+        # Counts are stored on the rows, so this is one indexed read however many areas exist
+        areas = SavedArea.query.join(UserPreference, UserPreference.id == SavedArea.preference_id) \
+            .filter(UserPreference.session_id == session_id).order_by(SavedArea.id).all()
+
+        return jsonify({
+            'success': True,
+            'count': len(areas),
+            'areas': [area.to_dict() for area in areas],
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error listing saved areas: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'areas': []
+        }), 500
+
+@areas_bp.route('/<int:area_id>', methods=['DELETE'])
+def delete_saved_area(area_id):
+    """
+    Remove a saved area
+
+    Query Parameters:
+        session_id (str): Session that owns the area
+    """
+    try:
+        session_id = request.args.get('session_id', '').strip()
+        area = SavedArea.query.join(UserPreference, UserPreference.id == SavedArea.preference_id) \
+            .filter(SavedArea.id == area_id, UserPreference.session_id == session_id).first()
+        if area is None:
+            return jsonify({
+                'success': False,
+                'error': f'Saved area {area_id} not found'
+            }), 404
+
+        db.session.delete(area)
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'message': f'Saved area {area_id} deleted'
+        })
+
+    except Exception as e:
+        print(f"Error deleting saved area: {e}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@areas_bp.route('/recount', methods=['POST'])
+def recount_saved_areas():
+    """
+    Recompute every saved area's counts from the current snapshot
+    """
+    try:
+        result = SavedAreaService.recount()
+
+        return jsonify({
+            'success': True,
+            'recounted': result['areas'],
+            'snapshot_version': result['snapshot_version']
+        })
+
+    except Exception as e:
+        print(f"Error recounting saved areas: {e}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@areas_bp.route('/stats', methods=['GET'])
+def get_saved_area_stats():
+    """
+    Cell index size and apply counters for this worker
+    """
+    return jsonify({
+        'success': True,
+        'stats': SavedAreaService.stats(),
+        'timestamp': datetime.utcnow().isoformat()
+    })
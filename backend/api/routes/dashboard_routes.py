@@ -0,0 +1,87 @@
+"""
+Dashboard Routes for Melbourne Parking API
+"""
+
+from flask import Blueprint, jsonify, request
+from datetime import datetime
+from ..services import DashboardService, ResponseCacheService
+
+# Create dashboard routes blueprint
+dashboard_bp = Blueprint('dashboard', __name__)
+
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+
+@dashboard_bp.route('/', methods=['GET'], strict_slashes=False)
+@ResponseCacheService.cached
+def get_dashboard():
+    """
+    Sensors for the map viewport, overview stats and zone stats in one response
+
+    Every part is computed from the same sensor snapshot, so the counts always
+    agree with the markers, and the whole bundle is cached as one unit.
+
+    Query Parameters:
+        bbox (str): lat_min,lng_min,lat_max,lng_max of the viewport (default: every sensor)
+        zoom (int): Map zoom level; busy viewports below the detail zoom return clusters
+        status (str): Filter viewport sensors by status ('all', 'available', 'occupied')
+        limit (int): Maximum viewport sensors (default: 1000, max: 5000)
+    """
+    try:
+        bbox_arg = request.args.get('bbox')
+        zoom = request.args.get('zoom', type=int)
+        status_filter = request.args.get('status', default='all')
+        limit = max(1, min(request.args.get('limit', default=DashboardService.DEFAULT_SENSOR_LIMIT, type=int),
+                           DashboardService.MAX_SENSOR_LIMIT))
+
+        bbox = None
+        if bbox_arg:
+            try:
+                bbox = tuple(float(value) for value in bbox_arg.split(','))
+            except ValueError:
+                bbox = ()
+            if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                return jsonify({
+                    'success': False,
+                    'error': '"bbox" must be lat_min,lng_min,lat_max,lng_max'
+                }), 400
+
+        if zoom is not None and not MIN_ZOOM <= zoom <= MAX_ZOOM:
+            return jsonify({
+                'success': False,
+                'error': f'"zoom" must be between {MIN_ZOOM} and {MAX_ZOOM}'
+            }), 400
+
+        if status_filter not in DashboardService.STATUS_FILTERS:
+            return jsonify({
+                'success': False,
+                'error': f'"status" must be one of {", ".join(DashboardService.STATUS_FILTERS)}'
+            }), 400
+
+        dashboard = DashboardService.build(bbox, zoom, status_filter, limit)
+
+        return jsonify({
+            'success': True,
+            'snapshot_version': dashboard['snapshot_version'],
+            'count': dashboard['count'],
+            'truncated': dashboard['truncated'],
+            'data': dashboard['sensors'],
+            'clusters': dashboard['clusters'],
+            'stats': dashboard['stats'],
+            'zone_statistics': dashboard['zone_statistics'],
+            'filters': {
+                'status': status_filter,
+                'bbox': list(bbox) if bbox else None,
+                'zoom': zoom
+            },
+            'limit': limit,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error getting dashboard: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'data': []
+        }), 500
@@ -5,6 +5,7 @@ Health Check Routes for Melbourne Parking API
 from flask import Blueprint, jsonify
 from datetime import datetime
 from ..models import ParkingSensor, db
+from ..services import AdmissionControlService, SQLiteService, WebhookService
 
 # Create health routes blueprint
 health_bp = Blueprint('health', __name__)
@@ -67,7 +68,10 @@ def detailed_health_check():
             'api': {
                 'status': 'healthy',
                 'melbourne_gov_api': 'reachable'
-            }
+            },
+            'admission': AdmissionControlService.stats(),
+            'webhooks': WebhookService.stats(),
+            'sqlite': SQLiteService.stats()
         }
 
         # Determine overall status
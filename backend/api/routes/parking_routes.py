@@ -2,15 +2,84 @@
 Parking Routes for Melbourne Parking API
 """
 
-from flask import Blueprint, jsonify, request
+import math
+import numpy as np
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
 from ..models import ParkingSensor, db
-from ..services import MelbourneParkingService
+from ..services import (
+    MelbourneParkingService, SpatialIndexService, ForecastService, SnapshotService, ExportService,
+    ResponseCacheService, HistoryService, ReferenceDataService, ParkingLotService, CheckpointService
+)
+from ..services.lot_service import LOT_SORTS
+from ..services.sensor_table import SensorTable
+from ..services.spatial_service import KM_PER_DEGREE
+from ..utils import TimeUtils, PaginationUtils, GeohashUtils
 
 # Create parking routes blueprint
 parking_bp = Blueprint('parking', __name__)
 
+# Keyset page sizes for /live and /search
+DEFAULT_LIVE_LIMIT = 200
+DEFAULT_SEARCH_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+# Types of the position keys a page cursor carries
+CURSOR_FIELD_TYPES = {'k': str, 'd': (int, float), 'i': int}
+
+# Rows fetched per round when geohash candidates are refined in Python
+REFINE_BATCH_SIZE = 500
+
+# Limits for the nearest-bay endpoints
+MAX_NEAREST_K = 100
+MAX_NEAREST_KM = 50.0
+MAX_BATCH_ORIGINS = 1000
+
+# Limits for the batch multi-location endpoint
+MAX_BATCH_QUERIES = 500
+MAX_BATCH_LIMIT = 1000
+# Radii of one batch added up; bounds the (query, sensor) pairs a request can ask for
+MAX_BATCH_TOTAL_RADIUS_KM = 200.0
+BATCH_STATUSES = ('all', 'available', 'occupied')
+
+# Result sizes for the parking lot search
+DEFAULT_LOT_LIMIT = 20
+MAX_LOT_LIMIT = 100
+
+# Status history window and page size
+DEFAULT_HISTORY_HOURS = 24
+DEFAULT_HISTORY_LIMIT = 1000
+MAX_HISTORY_LIMIT = 10000
+
+# Streaming export formats: (mimetype, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv')
+}
+
+def _live_cache_vary():
+    """
+    Extra cache key for /live: with include=restrictions the body also depends on the
+    reference datasets and, without at, on the minute the sign plates are evaluated in
+    """
+    if request.args.get('include') != 'restrictions':
+        return None
+    minute = None if request.args.get('at') else datetime.utcnow().replace(second=0, microsecond=0)
+    return ReferenceDataService.view_version(), minute
+
+def _updated_since():
+    """
+    Cutoff for /zones?updated_within=, floored to the minute. It moves with the clock
+    between ingests, so it also keys the cached body, which stays valid for that minute
+    """
+    updated_within = request.args.get('updated_within', type=float)
+    if updated_within is None:
+        return None
+    return (datetime.utcnow() - timedelta(hours=updated_within)).replace(second=0, microsecond=0)
+
 @parking_bp.route('/live', methods=['GET'])
+@ResponseCacheService.cached(vary=_live_cache_vary)
 def get_live_parking():
     """
     Get live parking data from sensors
@@ -20,6 +89,18 @@ def get_live_parking():
         lng (float): Longitude for location-based filtering
         radius (float): Search radius in km (default: 2.0)
         status (str): Filter by status ('all', 'available', 'occupied')
+        zone (str): Only these zone numbers (comma-separated)
+        limit (int): Page size (default: 200, max: 1000)
+        cursor (str): Opaque cursor from a previous page's next_cursor
+        include (str): 'restrictions' adds each bay's road segment and active sign plate
+        at (str): ISO 8601 timestamp; answer from the sensors as they stood then
+
+    Pages are ordered by kerbside_id, or by distance then id when a location is
+    given. They are read from the sensor snapshot: status, zone and freshness
+    filters are bitsets combined with AND, so a page costs about the same at any
+    table size. Cursors are only valid for the snapshot version they were issued for.
+    With at, the snapshot is rebuilt from the newest checkpoint before it plus the
+    status transitions since, and "last 7 days" counts back from at.
     """
     try:
         # Get query parameters
@@ -27,67 +108,97 @@ def get_live_parking():
         lng = request.args.get('lng', type=float)
         radius = request.args.get('radius', default=2.0, type=float)
         status_filter = request.args.get('status', default='all')
+        zones = _zone_list(request.args.get('zone'))
+        limit = max(1, min(request.args.get('limit', default=DEFAULT_LIVE_LIMIT, type=int), MAX_PAGE_LIMIT))
+        cursor_param = request.args.get('cursor')
+        at_param = request.args.get('at')
 
-        query = ParkingSensor.query
-
-        # Filter by status if specified
-        if status_filter != 'all':
-            if status_filter.lower() == 'available':
-                query = query.filter(ParkingSensor.status_description == 'Unoccupied')
-            elif status_filter.lower() == 'occupied':
-                query = query.filter(ParkingSensor.status_description == 'Occupied')
+        now = datetime.utcnow()
+        if at_param:
+            at = TimeUtils.parse_iso_timestamp(at_param)
+            if at is None or at > now:
+                return jsonify({
+                    'success': False,
+                    'error': 'Query parameter "at" must be an ISO 8601 timestamp in the past'
+                }), 400
+            snapshot = CheckpointService.snapshot_at(at)
+            if snapshot is None:
+                return jsonify({
+                    'success': False,
+                    'error': f'No checkpoint at or before {at.isoformat()}'
+                }), 404
+            now = at
+        else:
+            at = None
+            snapshot = SpatialIndexService.get_snapshot()
 
-        # If location provided, filter by radius (simplified distance calculation)
-        if lat and lng:
-            lat_range = radius / 111.0  # Rough conversion: 1 degree ≈ 111 km
-            lng_range = radius / (111.0 * abs(lat / 90.0))  # Adjust for latitude
+        query_parts = ['live', status_filter, lat, lng, radius, zones] + ([at.isoformat()] if at else [])
+        query_fingerprint = PaginationUtils.fingerprint(*query_parts)
+        version = snapshot.version
+        page_fields = ('d', 'i') if lat and lng else ('k',)
+        cursor, error_response = _read_cursor(cursor_param, query_fingerprint, version,
+                                              {'recent': page_fields, 'all': ('k',)})
+        if error_response:
+            return error_response
 
-            query = query.filter(
-                ParkingSensor.latitude.between(lat - lat_range, lat + lat_range),
-                ParkingSensor.longitude.between(lng - lng_range, lng + lng_range)
-            )
+        index = snapshot.bitmaps()
+        matches = index.match(status_filter, zones=zones)
 
         # Get recent data (last 7 days instead of 24 hours to ensure we have data)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        query = query.filter(ParkingSensor.last_updated >= week_ago)
+        week_ago = now - timedelta(days=7)
+        mode = cursor['m'] if cursor else 'recent'
+        positions = np.zeros(0, dtype=np.int64)
 
-        sensors = query.limit(200).all()
-
-        # Debug: Print database status
-        total_sensors = ParkingSensor.query.count()
-        print(f"🔍 Database status: {total_sensors} total sensors in database")
-        print(f"🔍 Recent sensors (7 days): {len(sensors)} sensors found")
+        if mode == 'recent':
+            recent = matches & index.fresh(week_ago)
+            recent_count = index.count(recent)
+            print(f"🔍 Snapshot status: {len(snapshot)} total sensors, {recent_count} matching in the last 7 days")
+            if lat and lng:
+                positions, next_key = _radius_page(snapshot, recent, lat, lng, radius, cursor, limit)
+            elif recent_count:
+                positions, next_key = _bitmap_page(index, recent, cursor, limit)
 
         # If no recent data, get any available data
-        if not sensors:
-            print("⚠️ No recent data found, getting all available data...")
-            query = ParkingSensor.query
-            if status_filter != 'all':
-                if status_filter.lower() == 'available':
-                    query = query.filter(ParkingSensor.status_description == 'Unoccupied')
-                elif status_filter.lower() == 'occupied':
-                    query = query.filter(ParkingSensor.status_description == 'Occupied')
-            sensors = query.limit(200).all()
-            print(f"🔍 Fallback query returned: {len(sensors)} sensors")
-
-        # Debug: Print sample data
-        if sensors:
-            sample = sensors[0]
-            print(f"🔍 Sample sensor: ID={sample.kerbside_id}, Status={sample.status_description}, Updated={sample.last_updated}")
-        else:
+        if mode == 'all' or (not len(positions) and not cursor):
+            if mode == 'recent':
+                print("⚠️ No recent data found, getting all available data...")
+                mode = 'all'
+            # The fallback has never applied the location filter, so it pages by kerbside_id
+            positions, next_key = _bitmap_page(index, matches, cursor, limit)
+            print(f"🔍 Fallback returned: {len(positions)} sensors")
+
+        next_cursor = None
+        if next_key:
+            next_key.update({'v': version, 'q': query_fingerprint, 'm': mode})
+            next_cursor = PaginationUtils.encode_cursor(next_key)
+
+        data = snapshot.to_dicts(positions)
+        if not data:
             print("❌ No sensors found in database!")
+        if request.args.get('include') == 'restrictions':
+            _attach_restrictions(data, now)
 
-        return jsonify({
+        response = {
             'success': True,
-            'count': len(sensors),
-            'data': [sensor.to_dict() for sensor in sensors],
+            'count': len(data),
+            'data': data,
             'filters': {
                 'status': status_filter,
+                'zone': zones,
                 'location': [lat, lng] if lat and lng else None,
                 'radius': radius
             },
+            'limit': limit,
+            'has_more': next_cursor is not None,
+            'next_cursor': next_cursor,
+            'snapshot_version': version,
             'last_updated': datetime.utcnow().isoformat()
-        })
+        }
+        if at:
+            response['at'] = at.isoformat()
+            response['checkpoint'] = snapshot.checkpoint_at.isoformat()
+            response['replayed_transitions'] = snapshot.replayed
+        return jsonify(response)
 
     except Exception as e:
         print(f"Error getting live parking data: {e}")
@@ -98,7 +209,499 @@ def get_live_parking():
             'data': []
         }), 500
 
+def _zone_list(zone_param: str):
+    """Zone numbers of a comma-separated zone parameter, or None when it is absent"""
+    if zone_param is None:
+        return None
+    return [zone.strip() for zone in zone_param.split(',') if zone.strip()]
+
+def _bitmap_page(index, bits, after: dict, limit: int):
+    """
+    One kerbside_id-ordered page of a bitset, after the cursor position
+
+    Returns:
+        (snapshot positions, next cursor key or None)
+    """
+    start = index.rank_after(after['k']) if after else 0
+    ranks = index.ranks(bits, start, limit + 1)
+    positions = index.order[ranks]
+    next_key = {'k': index.sorted_kerbside_ids[ranks[limit - 1]]} if len(ranks) > limit else None
+    return positions[:limit], next_key
+
+def _radius_page(snapshot, bits, lat: float, lng: float, radius_km: float, after: dict, limit: int):
+    """
+    One page of the sensors of a bitset within a radius, nearest first
+
+    Distances are squared equirectangular degrees (latitude difference, plus longitude
+    difference scaled by cos(lat)), and ties are broken by id. The radius's bounding
+    box is planned as geohash prefix ranges, as /search plans its box, but scanned
+    over the snapshot's geohash-sorted positions; the candidates are then ANDed with
+    the filter bitsets and refined exactly by distance.
+
+    Returns:
+        (snapshot positions, next cursor key or None)
+    """
+    lat_range = radius_km / KM_PER_DEGREE
+    lng_range = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    ranges = GeohashUtils.cover_code_ranges(lat - lat_range, lng - lng_range, lat + lat_range, lng + lng_range)
+    candidates = snapshot.geohash_ranges(ranges)
+    candidates = candidates[snapshot.bitmaps().contains(bits, candidates)]
+
+    lng_scale = math.cos(math.radians(lat)) ** 2
+    d_lat = snapshot.lat[candidates] - lat
+    d_lng = snapshot.lng[candidates] - lng
+    distances = d_lat * d_lat + d_lng * d_lng * lng_scale
+    ids = snapshot.ids[candidates]
+    keep = distances <= (radius_km / KM_PER_DEGREE) ** 2
+    if after:
+        keep &= (distances > after['d']) | ((distances == after['d']) & (ids > after['i']))
+    candidates, distances, ids = candidates[keep], distances[keep], ids[keep]
+
+    page = np.lexsort((ids, distances))[:limit + 1]
+    next_key = {'d': float(distances[page[limit - 1]]), 'i': int(ids[page[limit - 1]])} if len(page) > limit else None
+    return candidates[page[:limit]], next_key
+
+def _attach_restrictions(data: list, now: datetime):
+    """Add road segment and the sign plate in force at now, joined in memory by kerbside_id"""
+    details = ReferenceDataService.sensor_details()
+    for item in data:
+        entry = details.get(item['kerbside_id'])
+        item['restrictions'] = ReferenceDataService.describe(entry, now, full=False) if entry else None
+
+def _apply_status_filter(query, status_filter: str):
+    """Restrict a sensor query to the 'available' or 'occupied' status filter"""
+    if status_filter != 'all':
+        if status_filter.lower() == 'available':
+            query = query.filter(ParkingSensor.status_description == 'Unoccupied')
+        elif status_filter.lower() == 'occupied':
+            query = query.filter(ParkingSensor.status_description == 'Occupied')
+    return query
+
+def _geohash_box_filter(lat_min: float, lng_min: float, lat_max: float, lng_max: float):
+    """
+    SQL filter for the geohash key ranges covering a box
+
+    Each range is a plain comparison on the indexed geohash column, so every
+    backend plans it as a few index range scans instead of two range predicates
+    of which only one can use a B-tree. The cover is larger than the box.
+    """
+    clauses = []
+    for low, high in GeohashUtils.cover_ranges(lat_min, lng_min, lat_max, lng_max):
+        clause = ParkingSensor.geohash >= low
+        if high is not None:
+            clause = and_(clause, ParkingSensor.geohash < high)
+        clauses.append(clause)
+    return or_(*clauses)
+
+def _within_box(lat_min: float, lng_min: float, lat_max: float, lng_max: float):
+    """Exact bounding-box check"""
+    def keep(sensor) -> bool:
+        return lat_min <= sensor.latitude <= lat_max and lng_min <= sensor.longitude <= lng_max
+    return keep
+
+def _keyset_page(query, after: dict, limit: int, keep=None):
+    """
+    Fetch one kerbside_id-ordered page after the cursor position without OFFSET
+
+    Args:
+        query: Filtered sensor query
+        after: Decoded cursor, or None for the first page
+        limit: Page size
+        keep: Exact check for rows the geohash filter over-selects
+
+    Returns:
+        (sensor rows in SensorTable.COLUMNS order, next cursor key or None)
+
+    Rows are plain column tuples, never ORM objects.
+    """
+    query = query.with_entities(*SensorTable.COLUMNS)
+    if after:
+        query = query.filter(ParkingSensor.kerbside_id > after['k'])
+    if keep is None:
+        sensors = query.order_by(ParkingSensor.kerbside_id).limit(limit + 1).all()
+    else:
+        # Refine candidates batch by batch until the page (plus one) is full
+        sensors = []
+        last_key = None
+        while len(sensors) <= limit:
+            batch_query = query if last_key is None else query.filter(ParkingSensor.kerbside_id > last_key)
+            batch = batch_query.order_by(ParkingSensor.kerbside_id).limit(REFINE_BATCH_SIZE).all()
+            sensors.extend(sensor for sensor in batch if keep(sensor))
+            if len(batch) < REFINE_BATCH_SIZE:
+                break
+            last_key = batch[-1].kerbside_id
+    next_key = {'k': sensors[limit - 1].kerbside_id} if len(sensors) > limit else None
+    return sensors[:limit], next_key
+
+def _read_cursor(cursor_param: str, query_fingerprint: str, version: int, fields: dict):
+    """
+    Decode and validate a cursor query parameter
+
+    Args:
+        cursor_param: Raw cursor parameter
+        query_fingerprint: Fingerprint of the current query's filters
+        version: Current snapshot version
+        fields: Position keys a cursor must carry, per page mode ('m'; None when the
+            query has no modes)
+
+    Returns:
+        (cursor or None, error response or None)
+    """
+    if not cursor_param:
+        return None, None
+
+    cursor = PaginationUtils.decode_cursor(cursor_param)
+    # Cursors are unsigned, so a tampered one must fail here rather than in the pager
+    required = fields.get(cursor.get('m')) if cursor else None
+    if not cursor or cursor.get('q') != query_fingerprint or required is None or \
+            not all(isinstance(cursor.get(key), CURSOR_FIELD_TYPES[key]) for key in required):
+        return None, (jsonify({
+            'success': False,
+            'error': 'Invalid cursor for these query parameters',
+            'count': 0,
+            'data': []
+        }), 400)
+
+    if cursor.get('v') != version:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Parking data has been updated since this cursor was issued; start again from the first page',
+            'code': 'cursor_expired',
+            'count': 0,
+            'data': []
+        }), 409)
+
+    return cursor, None
+
+@parking_bp.route('/nearest', methods=['GET'])
+def get_nearest_parking():
+    """
+    Get the k nearest available parking bays to a location, nearest first
+
+    Query Parameters:
+        lat (float): Latitude of the origin (required)
+        lng (float): Longitude of the origin (required)
+        k (int): Number of bays to return (default: 10, max: 100)
+        max_km (float): Only return bays within this distance in km (default: 2.0, max: 50)
+    """
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        k = request.args.get('k', default=10, type=int)
+        max_km = request.args.get('max_km', default=2.0, type=float)
+
+        if lat is None or lng is None:
+            return jsonify({
+                'success': False,
+                'error': 'Query parameters "lat" and "lng" are required',
+                'count': 0,
+                'data': []
+            }), 400
+
+        k = max(1, min(k, MAX_NEAREST_K))
+        max_km = max(0.0, min(max_km, MAX_NEAREST_KM))
+
+        result = SpatialIndexService.nearest_available(lat, lng, k, max_km)
+
+        return jsonify({
+            'success': True,
+            'count': len(result['data']),
+            'data': result['data'],
+            'origin': [lat, lng],
+            'k': k,
+            'max_km': max_km,
+            'snapshot_version': result['snapshot_version'],
+            'last_updated': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error getting nearest parking: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'count': 0,
+            'data': []
+        }), 500
+
+@parking_bp.route('/nearest/batch', methods=['POST'])
+def get_nearest_parking_batch():
+    """
+    Get the k nearest available parking bays for many origins in one call
+
+    JSON Body:
+        origins (list): [lat, lng] pairs or {"lat": ..., "lng": ...} objects (max 1000)
+        k (int): Number of bays per origin (default: 10, max: 100)
+        max_km (float): Only return bays within this distance in km (default: 2.0, max: 50)
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        raw_origins = body.get('origins')
+
+        if not isinstance(raw_origins, list) or not raw_origins:
+            return jsonify({
+                'success': False,
+                'error': 'JSON body must contain a non-empty "origins" list',
+                'results': []
+            }), 400
+
+        if len(raw_origins) > MAX_BATCH_ORIGINS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BATCH_ORIGINS} origins are allowed per request',
+                'results': []
+            }), 400
+
+        try:
+            origins = [
+                (float(o['lat']), float(o['lng'])) if isinstance(o, dict) else (float(o[0]), float(o[1]))
+                for o in raw_origins
+            ]
+            k = max(1, min(int(body.get('k', 10)), MAX_NEAREST_K))
+            max_km = max(0.0, min(float(body.get('max_km', 2.0)), MAX_NEAREST_KM))
+        except (KeyError, IndexError, TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'Each origin must be [lat, lng] or {"lat": ..., "lng": ...}',
+                'results': []
+            }), 400
+
+        result = SpatialIndexService.nearest_available_batch(origins, k, max_km)
+
+        return jsonify({
+            'success': True,
+            'count': len(origins),
+            'results': [
+                {'origin': [lat, lng], 'count': len(data), 'data': data}
+                for (lat, lng), data in zip(origins, result['results'])
+            ],
+            'k': k,
+            'max_km': max_km,
+            'snapshot_version': result['snapshot_version'],
+            'last_updated': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error getting nearest parking batch: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'results': []
+        }), 500
+
+@parking_bp.route('/batch', methods=['POST'])
+def batch_parking_query():
+    """
+    Answer many location queries in one call
+
+    JSON Body:
+        queries (list): Up to 500 objects with
+            lat (float), lng (float): Query centre (required)
+            radius (float): Search radius in km (default: 2.0, max: 50)
+            status (str): 'all', 'available' or 'occupied' (default: 'all')
+            limit (int): Maximum sensors returned (default: 200, max: 1000)
+        The radii of all queries may add up to at most 200 km.
+
+    Each result lists sensors nearest first as rows in the order given by "fields".
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        raw_queries = body.get('queries')
+
+        if not isinstance(raw_queries, list) or not raw_queries:
+            return jsonify({
+                'success': False,
+                'error': 'JSON body must contain a non-empty "queries" list',
+                'results': []
+            }), 400
+
+        if len(raw_queries) > MAX_BATCH_QUERIES:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BATCH_QUERIES} queries are allowed per request',
+                'results': []
+            }), 400
+
+        queries = []
+        for i, raw in enumerate(raw_queries):
+            try:
+                status = str(raw.get('status', 'all')).lower()
+                if status not in BATCH_STATUSES:
+                    raise ValueError(f'status must be one of {", ".join(BATCH_STATUSES)}')
+                queries.append({
+                    'lat': float(raw['lat']),
+                    'lng': float(raw['lng']),
+                    'radius': max(0.0, min(float(raw.get('radius', 2.0)), MAX_NEAREST_KM)),
+                    'status': status,
+                    'limit': max(1, min(int(raw.get('limit', 200)), MAX_BATCH_LIMIT))
+                })
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'Invalid query at index {i}: {e}',
+                    'results': []
+                }), 400
+
+        total_radius = sum(query['radius'] for query in queries)
+        if total_radius > MAX_BATCH_TOTAL_RADIUS_KM:
+            return jsonify({
+                'success': False,
+                'error': f'Query radii add up to {total_radius:g} km; at most {MAX_BATCH_TOTAL_RADIUS_KM:g} km '
+                         f'are allowed per request',
+                'results': []
+            }), 400
+
+        result = SpatialIndexService.query_batch(queries)
+
+        return jsonify({
+            'success': True,
+            'count': len(queries),
+            'fields': result['fields'],
+            'results': result['results'],
+            'snapshot_version': result['snapshot_version'],
+            'last_updated': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error answering batch parking query: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'results': []
+        }), 500
+
+@parking_bp.route('/forecast', methods=['GET'])
+def get_parking_forecast():
+    """
+    Forecast the probability that bays will be free at a given time
+
+    Query Parameters:
+        zone (str): Zone number to forecast (this or kerbside_id is required)
+        kerbside_id (str): Single bay to forecast
+        at (str): ISO 8601 target time (default: now; naive values are UTC)
+    """
+    try:
+        zone = request.args.get('zone', '').strip()
+        kerbside_id = request.args.get('kerbside_id', '').strip()
+        at_param = request.args.get('at')
+
+        if not zone and not kerbside_id:
+            return jsonify({
+                'success': False,
+                'error': 'Query parameter "zone" or "kerbside_id" is required'
+            }), 400
+
+        at = TimeUtils.parse_iso_timestamp(at_param) if at_param else datetime.utcnow()
+        if at is None:
+            return jsonify({
+                'success': False,
+                'error': 'Query parameter "at" must be an ISO 8601 timestamp'
+            }), 400
+
+        if kerbside_id:
+            forecast = ForecastService.forecast_bay(kerbside_id, at)
+        else:
+            forecast = ForecastService.forecast_zone(zone, at)
+
+        if forecast is None:
+            return jsonify({
+                'success': False,
+                'error': f'No occupancy history for {"bay " + kerbside_id if kerbside_id else "zone " + zone}'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'at': at.isoformat(),
+            'forecast': forecast,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error getting parking forecast: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@parking_bp.route('/restrictions', methods=['GET'])
+def get_parking_restrictions():
+    """
+    Get the bay details and sign-plate restrictions for a bay or a zone
+
+    Query Parameters:
+        kerbside_id (str): Bay to describe (this or zone is required)
+        zone (str): Zone whose restrictions to list
+        at (str): ISO 8601 time used to pick the active restriction (default: now)
+    """
+    try:
+        kerbside_id = request.args.get('kerbside_id', '').strip()
+        zone = request.args.get('zone', '').strip()
+        at_param = request.args.get('at')
+
+        if not kerbside_id and not zone:
+            return jsonify({
+                'success': False,
+                'error': 'Query parameter "kerbside_id" or "zone" is required'
+            }), 400
+
+        at = TimeUtils.parse_iso_timestamp(at_param) if at_param else datetime.utcnow()
+        if at is None:
+            return jsonify({
+                'success': False,
+                'error': 'Query parameter "at" must be an ISO 8601 timestamp'
+            }), 400
+
+        if kerbside_id:
+            entry = ReferenceDataService.sensor_details().get(kerbside_id)
+            if entry is None:
+                return jsonify({
+                    'success': False,
+                    'error': f'Unknown bay {kerbside_id}'
+                }), 404
+            result = {'kerbside_id': kerbside_id, 'zone_number': entry['zone_number']}
+            result.update(ReferenceDataService.describe(entry, at))
+        else:
+            restrictions = ReferenceDataService.get_view().zone_restrictions.get(zone, [])
+            result = {'zone_number': zone}
+            result.update(ReferenceDataService.describe_restrictions(restrictions, at))
+
+        return jsonify({
+            'success': True,
+            'at': at.isoformat(),
+            'data': result,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error getting parking restrictions: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@parking_bp.route('/reference/refresh', methods=['POST'])
+def refresh_reference_data():
+    """
+    Re-download the bay and sign-plate datasets now, regardless of their refresh interval
+    """
+    try:
+        outcomes = ReferenceDataService.refresh(MelbourneParkingService.api_root(), force=True)
+        failed = [name for name, outcome in outcomes.items() if outcome == 'failed']
+
+        return jsonify({
+            'success': not failed,
+            'datasets': outcomes,
+            'timestamp': datetime.utcnow().isoformat()
+        }), 502 if failed else 200
+
+    except Exception as e:
+        print(f"Error refreshing reference data: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @parking_bp.route('/search', methods=['GET'])
+@ResponseCacheService.cached
 def search_parking():
     """
     Search parking by postcode or suburb name
@@ -106,10 +709,14 @@ def search_parking():
     Query Parameters:
         q (str): Search query (postcode or suburb name)
         status (str): Filter by status ('all', 'available', 'occupied')
+        limit (int): Page size (default: 100, max: 1000)
+        cursor (str): Opaque cursor from a previous page's next_cursor
     """
     try:
         query_text = request.args.get('q', '').strip()
         status_filter = request.args.get('status', default='all')
+        limit = max(1, min(request.args.get('limit', default=DEFAULT_SEARCH_LIMIT, type=int), MAX_PAGE_LIMIT))
+        cursor_param = request.args.get('cursor')
 
         if not query_text:
             return jsonify({
@@ -119,6 +726,12 @@ def search_parking():
                 'data': []
             }), 400
 
+        query_fingerprint = PaginationUtils.fingerprint('search', query_text, status_filter)
+        version = SnapshotService.current_version()
+        cursor, error_response = _read_cursor(cursor_param, query_fingerprint, version, {None: ('k',)})
+        if error_response:
+            return error_response
+
         # For MVP, return parking data near Melbourne CBD
         # In full implementation, you'd geocode the search term first
         cbd_lat, cbd_lng = -37.8136, 144.9631
@@ -127,28 +740,31 @@ def search_parking():
         lat_range = 0.05  # Roughly 5km radius
         lng_range = 0.05
 
-        query = ParkingSensor.query.filter(
-            ParkingSensor.latitude.between(cbd_lat - lat_range, cbd_lat + lat_range),
-            ParkingSensor.longitude.between(cbd_lng - lng_range, cbd_lng + lng_range)
-        )
+        box = (cbd_lat - lat_range, cbd_lng - lng_range, cbd_lat + lat_range, cbd_lng + lng_range)
+        query = ParkingSensor.query.filter(_geohash_box_filter(*box))
 
         # Apply status filter
-        if status_filter != 'all':
-            if status_filter.lower() == 'available':
-                query = query.filter(ParkingSensor.status_description == 'Unoccupied')
-            elif status_filter.lower() == 'occupied':
-                query = query.filter(ParkingSensor.status_description == 'Occupied')
+        query = _apply_status_filter(query, status_filter)
 
-        sensors = query.limit(100).all()
+        sensors, next_key = _keyset_page(query, cursor, limit, _within_box(*box))
+
+        next_cursor = None
+        if next_key:
+            next_key.update({'v': version, 'q': query_fingerprint})
+            next_cursor = PaginationUtils.encode_cursor(next_key)
 
         return jsonify({
             'success': True,
             'query': query_text,
             'count': len(sensors),
-            'data': [sensor.to_dict() for sensor in sensors],
+            'data': SensorTable(sensors).to_dicts(),
             'center': [cbd_lat, cbd_lng],
             'search_area': 'Melbourne CBD (5km radius)',
-            'status_filter': status_filter
+            'status_filter': status_filter,
+            'limit': limit,
+            'has_more': next_cursor is not None,
+            'next_cursor': next_cursor,
+            'snapshot_version': version
         })
 
     except Exception as e:
@@ -191,42 +807,148 @@ def update_parking_data():
             'message': 'Unexpected error during data update'
         }), 500
 
+@parking_bp.route('/history', methods=['GET'])
+def get_parking_history():
+    """
+    Get status transitions in a time window from the live table and day archives
+
+    Query Parameters:
+        start (str): ISO 8601 start, inclusive (default: 24 hours before end)
+        end (str): ISO 8601 end, exclusive (default: now)
+        kerbside_id (str): Only transitions of this bay
+        zone (str): Only transitions in this zone
+        limit (int): Maximum transitions (default: 1000, max: 10000)
+    """
+    try:
+        end_param = request.args.get('end')
+        start_param = request.args.get('start')
+        end = TimeUtils.parse_iso_timestamp(end_param) if end_param else datetime.utcnow()
+        start = TimeUtils.parse_iso_timestamp(start_param) if start_param else None
+        if end is None or (start_param and start is None):
+            return jsonify({
+                'success': False,
+                'error': 'Query parameters "start" and "end" must be ISO 8601 timestamps'
+            }), 400
+        if start is None:
+            start = end - timedelta(hours=DEFAULT_HISTORY_HOURS)
+        if start >= end:
+            return jsonify({
+                'success': False,
+                'error': '"start" must be before "end"'
+            }), 400
+
+        limit = min(max(request.args.get('limit', DEFAULT_HISTORY_LIMIT, type=int), 1), MAX_HISTORY_LIMIT)
+        kerbside_id = request.args.get('kerbside_id', '').strip() or None
+        zone = request.args.get('zone', '').strip() or None
+
+        result = HistoryService.query(start, end, kerbside_id=kerbside_id, zone=zone, limit=limit)
+
+        return jsonify({
+            'success': True,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'count': len(result['transitions']),
+            'truncated': result['truncated'],
+            'archived_days': result['archived_days'],
+            'data': result['transitions'],
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error getting parking history: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'count': 0,
+            'data': []
+        }), 500
+
+@parking_bp.route('/history/compact', methods=['POST'])
+def compact_parking_history():
+    """
+    Move status transitions older than the retention window into day archives
+
+    JSON Body (optional):
+        retention_days (int): Days of history to keep in the database (default: HISTORY_RETENTION_DAYS)
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        retention_days = payload.get('retention_days')
+        if retention_days is not None and (not isinstance(retention_days, int) or retention_days < 0):
+            return jsonify({
+                'success': False,
+                'error': '"retention_days" must be a non-negative integer'
+            }), 400
+
+        summary = HistoryService.compact(retention_days=retention_days)
+
+        return jsonify({
+            'success': True,
+            'message': f"Archived {summary['rows_archived']} transitions across {len(summary['days'])} days",
+            **summary,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error compacting parking history: {e}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @parking_bp.route('/zones', methods=['GET'])
+@ResponseCacheService.cached(vary=_updated_since)
 def get_parking_zones():
     """
     Get list of all parking zones with basic statistics
+
+    Query Parameters:
+        status (str): Only count sensors with this status ('all', 'available', 'occupied')
+        zone (str): Only these zone numbers (comma-separated)
+        updated_within (float): Only count sensors updated in the last this many hours
+            (the cutoff is taken to the whole minute)
+
+    Filters are bitsets of the snapshot combined with AND; zones with no matching
+    sensors are left out.
     """
     try:
+        status_filter = request.args.get('status', default='all')
+        zones = _zone_list(request.args.get('zone'))
+        updated_since = _updated_since()
+
+        snapshot = SpatialIndexService.get_snapshot()
+        names, groups = snapshot.zone_groups()
+        if status_filter == 'all' and zones is None and updated_since is None:
+            positions = np.arange(len(snapshot))
+        else:
+            index = snapshot.bitmaps()
+            # Gathered in kerbside_id order; sorting restores id order
+            positions = np.sort(index.positions(index.match(status_filter, updated_since, zones)))
+
+        groups = groups[positions]
+        totals = np.bincount(groups, minlength=len(names)).tolist()
+        available = np.bincount(groups, weights=snapshot.available[positions], minlength=len(names)).astype(int).tolist()
+        occupied = np.bincount(groups, weights=snapshot.occupied[positions], minlength=len(names)).astype(int).tolist()
+
+        # Sensors of each zone as contiguous runs of a stable sort, so they stay in id order
+        order = positions[np.argsort(groups, kind='stable')]
+        bounds = np.searchsorted(np.sort(groups, kind='stable'), np.arange(len(names) + 1)).tolist()
+        kerbside_ids = snapshot.kerbside_ids
+
         zones_data = {}
-        sensors = ParkingSensor.query.all()
-
-        for sensor in sensors:
-            zone = sensor.zone_number or 'Unknown'
-            if zone not in zones_data:
-                zones_data[zone] = {
-                    'zone_number': zone,
-                    'total_spaces': 0,
-                    'available': 0,
-                    'occupied': 0,
-                    'sensors': []
-                }
-
-            zones_data[zone]['total_spaces'] += 1
-            zones_data[zone]['sensors'].append(sensor.kerbside_id)
-
-            if sensor.status_description == 'Unoccupied':
-                zones_data[zone]['available'] += 1
-            elif sensor.status_description == 'Occupied':
-                zones_data[zone]['occupied'] += 1
-
-        # Calculate occupancy rates
-        for zone_data in zones_data.values():
-            if zone_data['total_spaces'] > 0:
-                zone_data['occupancy_rate'] = round(
-                    (zone_data['occupied'] / zone_data['total_spaces'] * 100), 2
-                )
-            else:
-                zone_data['occupancy_rate'] = 0
+        for group, zone in enumerate(names):
+            if not totals[group]:
+                continue
+            zones_data[zone] = {
+                'zone_number': zone,
+                'total_spaces': totals[group],
+                'available': available[group],
+                'occupied': occupied[group],
+                'sensors': [kerbside_ids[i] for i in order[bounds[group]:bounds[group + 1]].tolist()],
+                # Calculate occupancy rates
+                'occupancy_rate': round((occupied[group] / totals[group] * 100), 2) if totals[group] > 0 else 0
+            }
 
         return jsonify({
             'success': True,
@@ -244,6 +966,195 @@ def get_parking_zones():
             'total_zones': 0
         }), 500
 
+@parking_bp.route('/lots/search', methods=['GET'])
+def search_parking_lots():
+    """
+    Search off-street parking lots by location, price, facilities and free capacity
+
+    Query Parameters:
+        lat (float): Latitude of a radius filter (with lng)
+        lng (float): Longitude of a radius filter (with lat)
+        radius (float): Search radius in km (default: 2.0, max: 50)
+        facilities (str): Facilities every lot must offer (comma-separated, any case)
+        max_price (float): Highest price per hour
+        min_available (int): Fewest free spaces
+        area_type (str): Exact area type, e.g. 'CBD'
+        sort (str): 'distance' (default with a location), 'price' (default otherwise) or 'available'
+        limit (int): Number of lots to return (default: 20, max: 100)
+    """
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        radius = max(0.0, min(request.args.get('radius', default=2.0, type=float), MAX_NEAREST_KM))
+        facilities = [name for name in request.args.get('facilities', '').split(',') if name.strip()]
+        max_price = request.args.get('max_price', type=float)
+        min_available = max(0, request.args.get('min_available', default=0, type=int))
+        area_type = request.args.get('area_type') or None
+        has_location = lat is not None and lng is not None
+        sort = request.args.get('sort', default='distance' if has_location else 'price').lower()
+        limit = max(1, min(request.args.get('limit', default=DEFAULT_LOT_LIMIT, type=int), MAX_LOT_LIMIT))
+
+        if (lat is None) != (lng is None):
+            return jsonify({
+                'success': False,
+                'error': 'Query parameters "lat" and "lng" must be given together',
+                'lots': []
+            }), 400
+
+        if sort not in LOT_SORTS or (sort == 'distance' and not has_location):
+            return jsonify({
+                'success': False,
+                'error': f'sort must be one of {", ".join(LOT_SORTS)}; "distance" needs lat and lng',
+                'lots': []
+            }), 400
+
+        result = ParkingLotService.search(
+            limit=limit, lat=lat, lng=lng, radius_km=radius, facilities=facilities, max_price=max_price,
+            min_available=min_available, area_type=area_type, sort=sort
+        )
+
+        return jsonify({
+            'success': True,
+            'count': len(result['lots']),
+            'total_matches': result['total_matches'],
+            'lots': result['lots'],
+            'filters': {
+                'location': [lat, lng] if has_location else None,
+                'radius': radius if has_location else None,
+                'facilities': facilities,
+                'max_price': max_price,
+                'min_available': min_available,
+                'area_type': area_type
+            },
+            'sort': sort,
+            'last_updated': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error searching parking lots: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'lots': []
+        }), 500
+
+@parking_bp.route('/lots/capacity', methods=['POST'])
+def update_parking_lot_capacity():
+    """
+    Set the free (and optionally total) spaces of many parking lots at once
+
+    JSON Body:
+        updates (list): Objects with id, available_spaces and optionally total_spaces
+
+    All updates are written in one statement, and the search index takes the new
+    values in place instead of being rebuilt.
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        raw_updates = body.get('updates')
+
+        if not isinstance(raw_updates, list) or not raw_updates:
+            return jsonify({
+                'success': False,
+                'error': 'JSON body must contain a non-empty "updates" list'
+            }), 400
+
+        if len(raw_updates) > ParkingLotService.MAX_CAPACITY_UPDATES:
+            return jsonify({
+                'success': False,
+                'error': f'At most {ParkingLotService.MAX_CAPACITY_UPDATES} updates are allowed per request'
+            }), 400
+
+        updates = []
+        for i, raw in enumerate(raw_updates):
+            try:
+                update = {'id': int(raw['id']), 'available_spaces': int(raw['available_spaces'])}
+                if raw.get('total_spaces') is not None:
+                    update['total_spaces'] = int(raw['total_spaces'])
+                updates.append(update)
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'Invalid update at index {i}: {e}'
+                }), 400
+
+        try:
+            result = ParkingLotService.update_capacity(updates)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        return jsonify({
+            'success': True,
+            'updated': result['updated'],
+            'lots': result['lots'],
+            'last_updated': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error updating parking lot capacity: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@parking_bp.route('/export', methods=['GET'])
+def export_parking_data():
+    """
+    Stream the whole sensor table as NDJSON or CSV
+
+    Query Parameters:
+        format (str): 'ndjson' (default) or 'csv'
+        dataset (str): Dataset to export (default: 'sensors')
+        gzip (bool): Gzip the response body (Content-Encoding: gzip)
+
+    Rows are read through a server-side cursor in fixed-size batches and
+    written out as they arrive, so memory stays flat for any table size.
+    """
+    try:
+        export_format = request.args.get('format', default='ndjson').lower()
+        dataset = request.args.get('dataset', default='sensors').lower()
+        use_gzip = request.args.get('gzip', default='false').lower() in ('1', 'true', 'yes')
+
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported format "{export_format}"; use one of: {", ".join(EXPORT_FORMATS)}'
+            }), 400
+
+        if dataset != 'sensors':
+            return jsonify({
+                'success': False,
+                'error': f'Unknown dataset "{dataset}"; available datasets: sensors'
+            }), 400
+
+        batches = ExportService.iter_sensor_batches()
+        if export_format == 'csv':
+            chunks = ExportService.csv_chunks(batches, ExportService.SENSOR_FIELDS)
+        else:
+            chunks = ExportService.ndjson_chunks(batches)
+
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        headers = {
+            'Content-Disposition': f'attachment; filename=parking_{dataset}_{datetime.utcnow():%Y%m%d%H%M}.{extension}',
+            'X-Snapshot-Version': str(SnapshotService.current_version())
+        }
+        if use_gzip:
+            chunks = ExportService.gzip_chunks(chunks)
+            headers['Content-Encoding'] = 'gzip'
+
+        print(f"📤 Streaming {dataset} export as {export_format}{' (gzip)' if use_gzip else ''}")
+        return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+    except Exception as e:
+        print(f"Error exporting parking data: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @parking_bp.route('/debug', methods=['GET'])
 def debug_parking_data():
     """
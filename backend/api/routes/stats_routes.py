@@ -2,15 +2,23 @@
 Statistics Routes for Melbourne Parking API
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from datetime import datetime
-from ..services import StatsService
+from ..services import StatsService, ResponseCacheService, TurnoverService
 
 # Create stats routes blueprint
 stats_bp = Blueprint('stats', __name__)
 
+DEFAULT_HEATMAP_CELL_M = 100.0
+MIN_HEATMAP_CELL_M = 10.0
+MAX_HEATMAP_CELL_M = 5000.0
+MAX_HEATMAP_SMOOTH = 5.0
+# Roughly the whole city at 10 m; larger windows should use a coarser cell
+MAX_HEATMAP_CELLS = 1000000
+
 @stats_bp.route('/', methods=['GET'])
 @stats_bp.route('/overview', methods=['GET'])
+@ResponseCacheService.cached
 def get_stats_overview():
     """
     Get overall parking statistics and overview
@@ -33,6 +41,7 @@ def get_stats_overview():
         }), 500
 
 @stats_bp.route('/zones', methods=['GET'])
+@ResponseCacheService.cached
 def get_zone_stats():
     """
     Get parking statistics by zone
@@ -54,6 +63,107 @@ def get_zone_stats():
             'zone_statistics': {}
         }), 500
 
+@stats_bp.route('/zones/<zone>/turnover', methods=['GET'])
+def get_zone_turnover(zone):
+    """
+    Dwell-time and turnover statistics of a zone, maintained at ingest
+
+    Query Parameters:
+        limit_minutes (float): Also report the share of stays longer than this
+        bays (bool): Include per-bay stays, mean dwell and overstays (default: false)
+    """
+    try:
+        limit_minutes = request.args.get('limit_minutes', type=float)
+        include_bays = request.args.get('bays', 'false').lower() in ('1', 'true', 'yes')
+
+        if 'limit_minutes' in request.args and (limit_minutes is None or limit_minutes <= 0):
+            return jsonify({
+                'success': False,
+                'error': '"limit_minutes" must be a positive number'
+            }), 400
+
+        turnover = TurnoverService.zone_turnover(zone, limit_minutes, include_bays)
+        if turnover is None:
+            return jsonify({
+                'success': False,
+                'error': f'No status transitions recorded for zone {zone}'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'turnover': turnover,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error getting zone turnover: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'turnover': {}
+        }), 500
+
+@stats_bp.route('/heatmap', methods=['GET'])
+@ResponseCacheService.cached
+def get_occupancy_heatmap():
+    """
+    Occupancy binned onto a square grid
+
+    Query Parameters:
+        bbox (str): lat_min,lng_min,lat_max,lng_max (default: every sensor)
+        cell_m (float): Cell edge in metres (default: 100, 10-5000)
+        smooth (float): Gaussian smoothing sigma in cells (default: 0, max 5)
+    """
+    try:
+        cell_m = request.args.get('cell_m', default=DEFAULT_HEATMAP_CELL_M, type=float)
+        smooth = request.args.get('smooth', default=0.0, type=float)
+        bbox_arg = request.args.get('bbox')
+
+        if cell_m is None or not MIN_HEATMAP_CELL_M <= cell_m <= MAX_HEATMAP_CELL_M:
+            return jsonify({
+                'success': False,
+                'error': f'"cell_m" must be between {MIN_HEATMAP_CELL_M:g} and {MAX_HEATMAP_CELL_M:g}'
+            }), 400
+
+        if smooth is None or not 0 <= smooth <= MAX_HEATMAP_SMOOTH:
+            return jsonify({
+                'success': False,
+                'error': f'"smooth" must be between 0 and {MAX_HEATMAP_SMOOTH:g}'
+            }), 400
+
+        bbox = None
+        if bbox_arg:
+            try:
+                bbox = tuple(float(value) for value in bbox_arg.split(','))
+            except ValueError:
+                bbox = ()
+            if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                return jsonify({
+                    'success': False,
+                    'error': '"bbox" must be lat_min,lng_min,lat_max,lng_max'
+                }), 400
+
+        heatmap = StatsService.get_heatmap(bbox, cell_m, smooth, max_cells=MAX_HEATMAP_CELLS)
+        if heatmap is None:
+            return jsonify({
+                'success': False,
+                'error': f'Window has more than {MAX_HEATMAP_CELLS} cells; use a larger "cell_m" or a smaller "bbox"'
+            }), 400
+
+        return jsonify({
+            'success': True,
+            'heatmap': heatmap,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        print(f"Error getting occupancy heatmap: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'heatmap': {}
+        }), 500
+
 @stats_bp.route('/parking-lots', methods=['GET'])
 def get_parking_lots_stats():
     """
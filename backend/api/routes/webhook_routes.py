@@ -0,0 +1,229 @@
+"""
+Webhook Routes for Melbourne Parking API
+"""
+
+from flask import Blueprint, jsonify, request
+from datetime import datetime
+from ..models import WebhookDeadLetter, WebhookSubscription, db
+from ..services import WebhookService
+
+# Create webhook routes blueprint
+webhooks_bp = Blueprint('webhooks', __name__)
+
+DEFAULT_DEAD_LETTER_LIMIT = 100
+MAX_DEAD_LETTER_LIMIT = 1000
+
+@webhooks_bp.route('/subscriptions', methods=['POST'])
+def create_subscription():
+    """
+    Subscribe a callback URL to status changes in a zone or bounding box
+
+    JSON Body:
+        callback_url (str): http(s) URL that receives POSTed event batches; its host must
+            resolve to public addresses unless WEBHOOK_ALLOW_PRIVATE_URLS=1
+        zone_number (str): Zone to watch, or
+        bbox (list): [lat_min, lng_min, lat_max, lng_max] to watch
+        statuses (list): Only these statuses ('available', 'occupied' or feed values); default all
+        secret (str): Optional key; batches are then signed in X-Parking-Signature (HMAC-SHA256)
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        callback_url = (body.get('callback_url') or '').strip()
+        zone_number = body.get('zone_number')
+        bbox = body.get('bbox')
+
+        refused = WebhookService.check_callback_url(callback_url)
+        if refused:
+            return jsonify({
+                'success': False,
+                'error': refused
+            }), 400
+
+        if (zone_number is None) == (bbox is None):
+            return jsonify({
+                'success': False,
+                'error': 'Exactly one of "zone_number" or "bbox" is required'
+            }), 400
+
+        if bbox is not None:
+            try:
+                lat_min, lng_min, lat_max, lng_max = (float(value) for value in bbox)
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': '"bbox" must be [lat_min, lng_min, lat_max, lng_max]'
+                }), 400
+            if lat_min > lat_max or lng_min > lng_max:
+                return jsonify({
+                    'success': False,
+                    'error': '"bbox" minimums must not exceed its maximums'
+                }), 400
+        else:
+            lat_min = lng_min = lat_max = lng_max = None
+
+        statuses = WebhookService.normalize_statuses(body.get('statuses') or [])
+
+        subscription = WebhookSubscription(
+            callback_url=callback_url,
+            zone_number=str(zone_number) if zone_number is not None else None,
+            lat_min=lat_min,
+            lng_min=lng_min,
+            lat_max=lat_max,
+            lng_max=lng_max,
+            statuses=','.join(statuses) or None,
+            secret=body.get('secret') or None,
+            active=True,
+            created_at=datetime.utcnow()
+        )
+        db.session.add(subscription)
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'subscription': subscription.to_dict()
+        }), 201
+
+    except Exception as e:
+        print(f"Error creating webhook subscription: {e}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@webhooks_bp.route('/subscriptions', methods=['GET'])
+def list_subscriptions():
+    """
+    List active webhook subscriptions
+    """
+    try:
+        subscriptions = WebhookSubscription.query.filter_by(active=True).order_by(WebhookSubscription.id).all()
+
+        return jsonify({
+            'success': True,
+            'count': len(subscriptions),
+            'subscriptions': [subscription.to_dict() for subscription in subscriptions]
+        })
+
+    except Exception as e:
+        print(f"Error listing webhook subscriptions: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'subscriptions': []
+        }), 500
+
+@webhooks_bp.route('/subscriptions/<int:subscription_id>', methods=['DELETE'])
+def delete_subscription(subscription_id):
+    """
+    Deactivate a subscription; batches already queued are still delivered
+    """
+    try:
+        subscription = db.session.get(WebhookSubscription, subscription_id)
+        if subscription is None or not subscription.active:
+            return jsonify({
+                'success': False,
+                'error': f'Subscription {subscription_id} not found'
+            }), 404
+
+        subscription.active = False
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'subscription': subscription.to_dict()
+        })
+
+    except Exception as e:
+        print(f"Error deleting webhook subscription: {e}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@webhooks_bp.route('/dead-letters', methods=['GET'])
+def list_dead_letters():
+    """
+    Batches that exhausted their retries, newest first
+
+    Query Parameters:
+        subscription_id (int): Only this subscription's batches
+        limit (int): Maximum rows (default: 100, max: 1000)
+    """
+    try:
+        subscription_id = request.args.get('subscription_id', type=int)
+        limit = max(1, min(request.args.get('limit', default=DEFAULT_DEAD_LETTER_LIMIT, type=int),
+                           MAX_DEAD_LETTER_LIMIT))
+
+        query = WebhookDeadLetter.query
+        if subscription_id is not None:
+            query = query.filter_by(subscription_id=subscription_id)
+        letters = query.order_by(WebhookDeadLetter.id.desc()).limit(limit).all()
+
+        return jsonify({
+            'success': True,
+            'count': len(letters),
+            'dead_letters': [letter.to_dict() for letter in letters]
+        })
+
+    except Exception as e:
+        print(f"Error listing webhook dead letters: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'dead_letters': []
+        }), 500
+
+@webhooks_bp.route('/dead-letters/<int:letter_id>/replay', methods=['POST'])
+def replay_dead_letter(letter_id):
+    """
+    Queue a dead-lettered batch for delivery again
+    """
+    try:
+        letter = db.session.get(WebhookDeadLetter, letter_id)
+        if letter is None:
+            return jsonify({
+                'success': False,
+                'error': f'Dead letter {letter_id} not found'
+            }), 404
+
+        subscription = db.session.get(WebhookSubscription, letter.subscription_id)
+        refused = WebhookService.check_callback_url(subscription.callback_url) if subscription else None
+        if refused:
+            return jsonify({
+                'success': False,
+                'error': refused
+            }), 400
+
+        batch_id = letter.batch_id
+        if not WebhookService.replay_dead_letter(letter):
+            return jsonify({
+                'success': False,
+                'error': f'Subscription {letter.subscription_id} is no longer active'
+            }), 409
+
+        return jsonify({
+            'success': True,
+            'batch_id': batch_id,
+            'message': 'Batch queued for delivery'
+        }), 202
+
+    except Exception as e:
+        print(f"Error replaying webhook dead letter: {e}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@webhooks_bp.route('/stats', methods=['GET'])
+def get_webhook_stats():
+    """
+    Delivery counters for this worker
+    """
+    return jsonify({
+        'success': True,
+        'stats': WebhookService.stats(),
+        'timestamp': datetime.utcnow().isoformat()
+    })
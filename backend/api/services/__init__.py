@@ -4,5 +4,25 @@ Services Module for Melbourne Parking API
 
 from .parking_service import MelbourneParkingService
 from .stats_service import StatsService
+from .snapshot_service import SnapshotService
+from .spatial_service import SpatialIndexService
+from .forecast_service import ForecastService
+from .turnover_service import TurnoverService
+from .export_service import ExportService
+from .response_cache import ResponseCacheService
+from .history_service import HistoryService
+from .admission_service import AdmissionControlService
+from .reference_service import ReferenceDataService
+from .webhook_service import WebhookService
+from .dashboard_service import DashboardService
+from .saved_area_service import SavedAreaService
+from .sqlite_service import SQLiteService
+from .lot_service import ParkingLotService
+from .checkpoint_service import CheckpointService
 
-__all__ = ['MelbourneParkingService', 'StatsService']
+__all__ = ['MelbourneParkingService', 'StatsService', 'SnapshotService', 'SpatialIndexService',
+           'ForecastService', 'TurnoverService', 'ExportService',
+           'ResponseCacheService', 'HistoryService',
+           'AdmissionControlService', 'ReferenceDataService', 'WebhookService',
+           'DashboardService', 'SavedAreaService', 'SQLiteService', 'ParkingLotService',
+           'CheckpointService']
@@ -0,0 +1,285 @@
+"""
+Admission Control Service for Melbourne Parking System
+Per-endpoint concurrency limits, token-bucket rate limits and load shedding on DB pool pressure
+"""
+
+import fnmatch
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from flask import Flask, current_app, g, jsonify, request
+
+from ..models import db
+
+_admission_lock = threading.Lock()
+
+# Endpoint classes, cheapest first. Expensive work is shed at a much lower pool wait
+# than cheap reads, and expensive endpoints share a small concurrency budget so
+# they can never take every pooled connection away from /live.
+DEFAULT_CONFIG = {
+    'enabled': True,
+    'default_class': 'cheap',
+    'retry_after_s': 2,
+    'pool_wait_half_life_s': 2.0,
+    'classes': {
+        'critical': {'shed_pool_wait_ms': None, 'max_concurrent': None},
+        'cheap': {'shed_pool_wait_ms': 500, 'max_concurrent': None},
+        'expensive': {'shed_pool_wait_ms': 50, 'max_concurrent': 4}
+    },
+    'endpoints': {
+        'health.*': {'class': 'critical'},
+        'parking.update_parking_data': {'class': 'expensive', 'max_concurrent': 1, 'rate_per_s': 0.2, 'burst': 2},
+        'parking.debug_parking_data': {'class': 'expensive', 'max_concurrent': 1, 'rate_per_s': 1, 'burst': 3},
+        'parking.get_parking_zones': {'class': 'expensive', 'max_concurrent': 2, 'rate_per_s': 20, 'burst': 40},
+        'parking.export_parking_data': {'class': 'expensive', 'max_concurrent': 2},
+        'parking.compact_parking_history': {'class': 'expensive', 'max_concurrent': 1},
+        'parking.refresh_reference_data': {'class': 'expensive', 'max_concurrent': 1, 'rate_per_s': 0.1, 'burst': 1},
+        'parking.batch_parking_query': {'class': 'expensive', 'max_concurrent': 4},
+        'parking.get_nearest_parking_batch': {'class': 'expensive', 'max_concurrent': 4},
+        'areas.recount_saved_areas': {'class': 'expensive', 'max_concurrent': 1, 'rate_per_s': 0.1, 'burst': 1}
+    }
+}
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> Tuple[bool, float]:
+        """
+        Take one token
+
+        Returns:
+            (admitted, seconds until a token is available)
+        """
+        # The bucket may be created after the request's timestamp was taken; a negative
+        # interval would start it below burst and reject the first call at burst 1
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class AdmissionControlService:
+    """
+    Service deciding, before a view runs, whether a request is admitted, limited or shed
+
+    All state lives in the app, so rates, bursts and concurrency slots apply per worker
+    process: N gunicorn workers admit up to N times the configured rate and slots.
+    """
+
+    @staticmethod
+    def load_config() -> Dict:
+        """
+        Read ADMISSION_CONFIG (inline JSON or a path to a JSON file) over the defaults
+
+        Classes are merged key by key; endpoint entries replace the default entry for
+        the same pattern. ADMISSION_CONTROL=0 disables admission control entirely.
+        """
+        config = json.loads(json.dumps(DEFAULT_CONFIG))
+        raw = os.getenv('ADMISSION_CONFIG', '').strip()
+        if raw:
+            try:
+                if not raw.startswith('{'):
+                    with open(raw) as f:
+                        raw = f.read()
+                overrides = json.loads(raw)
+                for name, settings in overrides.pop('classes', {}).items():
+                    config['classes'].setdefault(name, {}).update(settings)
+                config['endpoints'].update(overrides.pop('endpoints', {}))
+                config.update(overrides)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring invalid ADMISSION_CONFIG: {e}")
+        if os.getenv('ADMISSION_CONTROL', '1') == '0':
+            config['enabled'] = False
+        return config
+
+    @classmethod
+    def init_app(cls, app: Flask):
+        """Attach admission checks to every request of the app"""
+        config = cls.load_config()
+        app.extensions['parking_admission'] = {
+            'config': config,
+            'policies': {},
+            'buckets': {},
+            'in_flight': {},
+            'class_in_flight': {},
+            'rejected': {},
+            'pool_wait': {'ewma_ms': 0.0, 'updated': time.monotonic(), 'samples': 0, 'max_ms': 0.0},
+            'instrumented_pool': None
+        }
+        if config['enabled']:
+            app.before_request(cls._admit)
+            app.teardown_request(cls._release)
+
+    @staticmethod
+    def _state() -> Dict:
+        return current_app.extensions['parking_admission']
+
+    @classmethod
+    def _policy(cls, state: Dict, endpoint: str) -> Dict:
+        """Resolve the effective policy for an endpoint (exact name first, then patterns)"""
+        policy = state['policies'].get(endpoint)
+        if policy is None:
+            config = state['config']
+            settings = config['endpoints'].get(endpoint)
+            if settings is None:
+                settings = next((value for pattern, value in config['endpoints'].items()
+                                 if fnmatch.fnmatchcase(endpoint, pattern)), {})
+            class_name = settings.get('class', config['default_class'])
+            policy = {
+                'class': class_name,
+                'class_settings': config['classes'].get(class_name, {}),
+                'max_concurrent': settings.get('max_concurrent'),
+                'rate_per_s': settings.get('rate_per_s'),
+                'burst': settings.get('burst', max(1, settings.get('rate_per_s') or 1))
+            }
+            state['policies'][endpoint] = policy
+        return policy
+
+    @classmethod
+    def _instrument_pool(cls, state: Dict):
+        """Time every pool checkout of this app's engine (re-applied if the pool is replaced)"""
+        pool = db.engine.pool
+        if state['instrumented_pool'] is pool:
+            return
+        connect = pool.connect
+
+        def timed_connect():
+            start = time.monotonic()
+            try:
+                return connect()
+            finally:
+                cls.record_pool_wait(state, (time.monotonic() - start) * 1000)
+
+        pool.connect = timed_connect
+        state['instrumented_pool'] = pool
+
+    @staticmethod
+    def _decayed_wait(state: Dict, now: float) -> float:
+        wait = state['pool_wait']
+        half_life = state['config']['pool_wait_half_life_s']
+        return wait['ewma_ms'] * 0.5 ** ((now - wait['updated']) / half_life)
+
+    @classmethod
+    def record_pool_wait(cls, state: Dict, wait_ms: float):
+        """Fold one checkout wait into a time-decayed average so pressure fades once it stops"""
+        now = time.monotonic()
+        with _admission_lock:
+            current = cls._decayed_wait(state, now)
+            wait = state['pool_wait']
+            wait['ewma_ms'] = current + 0.2 * (wait_ms - current)
+            wait['updated'] = now
+            wait['samples'] += 1
+            wait['max_ms'] = max(wait['max_ms'], wait_ms)
+
+    @classmethod
+    def pool_wait_ms(cls) -> float:
+        """Current smoothed pool checkout wait in milliseconds"""
+        state = cls._state()
+        with _admission_lock:
+            return cls._decayed_wait(state, time.monotonic())
+
+    @classmethod
+    def _reject(cls, state: Dict, endpoint: str, status: int, reason: str, retry_after: float):
+        with _admission_lock:
+            counts = state['rejected'].setdefault(endpoint, {})
+            counts[reason] = counts.get(reason, 0) + 1
+        response = jsonify({
+            'success': False,
+            'error': 'Too many requests, slow down' if status == 429 else 'Service is busy, please retry shortly',
+            'reason': reason
+        })
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    @classmethod
+    def _admit(cls):
+        """before_request hook: shed, rate limit or take a concurrency slot"""
+        endpoint = request.endpoint
+        if endpoint is None:
+            return None
+
+        state = cls._state()
+        cls._instrument_pool(state)
+        policy = cls._policy(state, endpoint)
+        class_name = policy['class']
+        retry_after = state['config']['retry_after_s']
+        now = time.monotonic()
+
+        # 1. Shed early while the pool is congested, expensive classes first
+        threshold = policy['class_settings'].get('shed_pool_wait_ms')
+        if threshold is not None:
+            with _admission_lock:
+                wait = cls._decayed_wait(state, now)
+            if wait > threshold:
+                return cls._reject(state, endpoint, 503, 'pool_wait', retry_after)
+
+        rejected = None
+        with _admission_lock:
+            # 2. Token bucket per endpoint
+            if policy['rate_per_s']:
+                bucket = state['buckets'].get(endpoint)
+                if bucket is None:
+                    bucket = state['buckets'][endpoint] = TokenBucket(policy['rate_per_s'], policy['burst'])
+                admitted, wait_s = bucket.take(now)
+                if not admitted:
+                    rejected = ('rate_limit', wait_s)
+
+            # 3. Concurrency slots for the endpoint and its class
+            if rejected is None:
+                endpoint_limit = policy['max_concurrent']
+                class_limit = policy['class_settings'].get('max_concurrent')
+                endpoint_busy = endpoint_limit is not None and state['in_flight'].get(endpoint, 0) >= endpoint_limit
+                class_busy = class_limit is not None and state['class_in_flight'].get(class_name, 0) >= class_limit
+                if endpoint_busy or class_busy:
+                    rejected = ('concurrency', retry_after)
+                else:
+                    state['in_flight'][endpoint] = state['in_flight'].get(endpoint, 0) + 1
+                    state['class_in_flight'][class_name] = state['class_in_flight'].get(class_name, 0) + 1
+                    g.admission_slot = (endpoint, class_name)
+
+        if rejected is not None:
+            reason, wait_s = rejected
+            return cls._reject(state, endpoint, 429 if reason == 'rate_limit' else 503, reason, wait_s)
+        return None
+
+    @classmethod
+    def _release(cls, exc: Optional[BaseException] = None):
+        """teardown_request hook; for streamed responses this runs once the stream ends"""
+        slot = g.pop('admission_slot', None)
+        if slot is None:
+            return
+        endpoint, class_name = slot
+        state = cls._state()
+        with _admission_lock:
+            state['in_flight'][endpoint] -= 1
+            state['class_in_flight'][class_name] -= 1
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """Admission counters for this worker"""
+        state = current_app.extensions.get('parking_admission')
+        if state is None:
+            return {'enabled': False}
+        with _admission_lock:
+            return {
+                'enabled': state['config']['enabled'],
+                'pool_wait_ms': round(cls._decayed_wait(state, time.monotonic()), 2),
+                'pool_wait_max_ms': round(state['pool_wait']['max_ms'], 2),
+                'pool_checkouts': state['pool_wait']['samples'],
+                'in_flight': {k: v for k, v in state['in_flight'].items() if v},
+                'rejected': {k: dict(v) for k, v in state['rejected'].items()}
+            }
@@ -0,0 +1,215 @@
+"""
+Bitmap Index for Melbourne Parking System
+Packed bitsets over a sensor snapshot for combined status, zone and freshness filters
+"""
+
+import bisect
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .sensor_table import SensorTable
+
+# Freshness tiers with a prebuilt bitset, as (name, maximum age of last_updated)
+FRESHNESS_TIERS = (
+    ('1h', timedelta(hours=1)),
+    ('24h', timedelta(hours=24)),
+    ('7d', timedelta(days=7))
+)
+
+# Words scanned in the first round when gathering a limited number of matches; doubles every round
+GATHER_CHUNK_WORDS = 16
+
+
+def pack_bits(mask: np.ndarray, words: int) -> np.ndarray:
+    """Dense bitset of the given number of uint64 words from a boolean array"""
+    packed = np.packbits(mask, bitorder='little')
+    padded = np.zeros(words * 8, dtype=np.uint8)
+    padded[:len(packed)] = packed
+    return padded.view('<u8').astype(np.uint64)
+
+
+def _unpack(word_index: np.ndarray, words: np.ndarray) -> np.ndarray:
+    """Bit numbers set in the given words, ascending; word_index[i] is the offset of words[i]"""
+    bits = np.unpackbits(words.astype('<u8').view(np.uint8), bitorder='little').reshape(-1, 64)
+    rows, cols = np.nonzero(bits)
+    return word_index[rows] * 64 + cols
+
+
+class SensorBitmapIndex:
+    """
+    One bitset per status value, per zone and per freshness tier
+
+    Bit r stands for the sensor with the r-th smallest kerbside_id, so the set bits
+    of any combination come out in /live page order. Status and freshness bitsets
+    are dense uint64 arrays (n / 8 bytes each); a zone only has a handful of
+    sensors, so each zone keeps just its non-zero words and their offsets.
+
+    Filters combine with & and |, np.bitwise_count gives match counts, and
+    ranks() unpacks only the non-zero words it reaches, so gathering a page costs
+    about the same however many sensors the snapshot holds.
+    """
+
+    def __init__(self, table: SensorTable, now: Optional[datetime] = None):
+        """
+        Args:
+            table: Sensors to index
+            now: Reference time of the freshness tiers (default: utcnow)
+        """
+        size = len(table)
+        self.size = size
+        self.words = (size + 63) // 64
+        self.built_at = now or datetime.utcnow()
+
+        # Rank of every snapshot position in kerbside_id order, and the inverse
+        kerbside_ids = table.kerbside_ids
+        self.order = np.array(sorted(range(size), key=kerbside_ids.__getitem__), dtype=np.int64)
+        self.rank = np.empty(size, dtype=np.int64)
+        self.rank[self.order] = np.arange(size)
+        self.sorted_kerbside_ids = [kerbside_ids[i] for i in self.order.tolist()]
+
+        self.all = self._pack(np.ones(size, dtype=bool))
+        status_codes = table.status_codes[self.order]
+        self.statuses = {value: self._pack(status_codes == code) for code, value in enumerate(table.status_values)}
+
+        # last_updated sorted ascending (missing values left out); each tier is a suffix of it
+        positions = np.flatnonzero(~np.isnat(table.updated_at))
+        by_age = np.argsort(table.updated_at[positions], kind='stable')
+        self._updated_positions = positions[by_age]
+        self._updated_values = table.updated_at[self._updated_positions]
+        self.tiers = {}
+        self._tier_starts = [(0, 'any')]
+        self.tiers['any'] = self._pack_positions(self._updated_positions)
+        for name, age in FRESHNESS_TIERS:
+            start = int(np.searchsorted(self._updated_values, np.datetime64(self.built_at - age, 'us')))
+            self.tiers[name] = self._pack_positions(self._updated_positions[start:])
+            self._tier_starts.append((start, name))
+
+        # Zone bitsets as runs of (word offset, word) pairs, zone by zone
+        self.zone_names, groups = table.zone_groups()
+        self._zone_of_name = {name: group for group, name in enumerate(self.zone_names)}
+        keys = groups[self.order] * self.words + np.arange(size) // 64
+        bits = np.left_shift(np.uint64(1), (np.arange(size) % 64).astype(np.uint64))
+        by_key = np.argsort(keys, kind='stable')
+        keys, bits = keys[by_key], bits[by_key]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if size else np.zeros(0, dtype=np.int64)
+        self._zone_words = np.bitwise_or.reduceat(bits, starts) if size else np.zeros(0, dtype=np.uint64)
+        self._zone_offsets = keys[starts] % max(self.words, 1)
+        self._zone_bounds = np.searchsorted(keys[starts] // max(self.words, 1),
+                                            np.arange(len(self.zone_names) + 1))
+
+    def _pack(self, mask: np.ndarray) -> np.ndarray:
+        """Dense bitset from a boolean array in rank order"""
+        return pack_bits(mask, self.words)
+
+    def _pack_positions(self, positions: np.ndarray) -> np.ndarray:
+        """Dense bitset with the bits of the given snapshot positions set"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.rank[positions]] = True
+        return self._pack(mask)
+
+    def _flip(self, bits: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Copy of bits with the bits of the given snapshot positions toggled"""
+        bits = bits.copy()
+        ranks = self.rank[positions]
+        np.bitwise_xor.at(bits, ranks // 64, np.left_shift(np.uint64(1), (ranks % 64).astype(np.uint64)))
+        return bits
+
+    @staticmethod
+    def count(bits: np.ndarray) -> int:
+        """Number of sensors in a bitset"""
+        return int(np.bitwise_count(bits).sum())
+
+    def status(self, status_filter: str = 'all') -> np.ndarray:
+        """
+        Bitset for a /live status filter
+
+        Args:
+            status_filter: 'available' or 'occupied' (any case); anything else matches every sensor
+        """
+        value = {'available': 'Unoccupied', 'occupied': 'Occupied'}.get(status_filter.lower())
+        if value is None:
+            return self.all
+        return self.statuses.get(value, np.zeros(self.words, dtype=np.uint64))
+
+    def fresh(self, since: datetime) -> np.ndarray:
+        """
+        Bitset of sensors whose last_updated is at or after since
+
+        Starts from the prebuilt tier whose cut-off is nearest in the sorted
+        last_updated column and toggles the sensors in between, so it is exact for
+        any cut-off while the snapshot ages.
+        """
+        start = int(np.searchsorted(self._updated_values, np.datetime64(since, 'us')))
+        tier_start, name = min(self._tier_starts, key=lambda tier: abs(tier[0] - start))
+        if tier_start == start:
+            return self.tiers[name]
+        low, high = sorted((tier_start, start))
+        return self._flip(self.tiers[name], self._updated_positions[low:high])
+
+    def zones(self, names: Sequence[str]) -> np.ndarray:
+        """Bitset of the sensors in any of the named zones ('Unknown' for sensors without one)"""
+        bits = np.zeros(self.words, dtype=np.uint64)
+        for name in names:
+            group = self._zone_of_name.get(name)
+            if group is not None:
+                run = slice(self._zone_bounds[group], self._zone_bounds[group + 1])
+                bits[self._zone_offsets[run]] |= self._zone_words[run]
+        return bits
+
+    def match(self, status_filter: str = 'all', updated_since: Optional[datetime] = None,
+              zones: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Bitset of sensors passing every given filter
+
+        Args:
+            status_filter: As status()
+            updated_since: As fresh()
+            zones: As zones()
+        """
+        bits = self.status(status_filter)
+        if updated_since is not None:
+            bits = bits & self.fresh(updated_since)
+        if zones is not None:
+            bits = bits & self.zones(zones)
+        return bits
+
+    def rank_after(self, kerbside_id: str) -> int:
+        """First rank whose kerbside_id sorts after the given one"""
+        return bisect.bisect_right(self.sorted_kerbside_ids, kerbside_id)
+
+    def ranks(self, bits: np.ndarray, start: int = 0, limit: Optional[int] = None) -> np.ndarray:
+        """
+        Set bits at or after rank start, ascending
+
+        Args:
+            bits: Bitset
+            start: First rank to consider
+            limit: Stop after this many matches (default: all)
+        """
+        found: List[np.ndarray] = []
+        total = 0
+        word = start // 64
+        chunk = self.words if limit is None else GATHER_CHUNK_WORDS
+        while word < self.words and (limit is None or total < limit):
+            words = bits[word:word + chunk]
+            nonzero = np.flatnonzero(words)
+            ranks = _unpack(word + nonzero, words[nonzero])
+            if word == start // 64:
+                ranks = ranks[ranks >= start]
+            found.append(ranks)
+            total += len(ranks)
+            word += chunk
+            chunk *= 2
+        ranks = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+        return ranks if limit is None else ranks[:limit]
+
+    def positions(self, bits: np.ndarray) -> np.ndarray:
+        """Snapshot positions of every sensor in a bitset, in kerbside_id order"""
+        return self.order[self.ranks(bits)]
+
+    def contains(self, bits: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Boolean array telling which of the given snapshot positions are in bits"""
+        ranks = self.rank[positions]
+        return ((bits[ranks // 64] >> (ranks % 64).astype(np.uint64)) & np.uint64(1)) == 1
@@ -0,0 +1,334 @@
+"""
+Checkpoint Service for Melbourne Parking System
+Writes periodic full-state sensor checkpoints and reconstructs the sensor table at past times
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+
+from .history_service import HistoryService
+from .sensor_table import SensorTable
+from .snapshot_service import EPOCH, SnapshotService
+from .spatial_service import SensorSnapshot, SpatialIndexService
+
+CHECKPOINT_SUFFIX = '.npz'
+CHECKPOINT_FORMAT = '%Y%m%dT%H%M%S'
+
+_checkpoint_lock = threading.Lock()
+_cache_lock = threading.Lock()
+
+
+def _encode_missing(codes: np.ndarray, values: List) -> Tuple[np.ndarray, List[str]]:
+    """Categories as strings for npz, with None stored as code -1"""
+    values = list(values)
+    if None in values:
+        missing = values.index(None)
+        codes = codes.copy()
+        codes[codes == missing] = -1
+        values[missing] = ''
+    return codes, values
+
+
+def _decode_missing(codes: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, List[Optional[str]]]:
+    codes = codes.astype(np.int32)
+    values = values.tolist()
+    if (codes < 0).any():
+        codes[codes < 0] = len(values)
+        values.append(None)
+    return codes, values
+
+
+def write_checkpoint(path: str, table: SensorTable):
+    """Write every column of a sensor table to an npz file atomically"""
+    zone_codes, zone_values = _encode_missing(table.zone_codes, table.zone_values)
+    status_codes, status_values = _encode_missing(table.status_codes, table.status_values)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    # Compressed, since a retention window holds hundreds of these; loading one costs a few ms more
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            ids=table.ids,
+            kerbside_ids=np.array(table.kerbside_ids, dtype=str),
+            zone_codes=zone_codes,
+            zone_values=np.array(zone_values, dtype=str),
+            status_codes=status_codes,
+            status_values=np.array(status_values, dtype=str),
+            lat=table.lat,
+            lng=table.lng,
+            status_at=table.status_at,
+            updated_at=table.updated_at
+        )
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path: str) -> Dict:
+    """Columns of a checkpoint file in SensorTable.set_columns form"""
+    with np.load(path, allow_pickle=False) as state:
+        zone_codes, zone_values = _decode_missing(state['zone_codes'], state['zone_values'])
+        status_codes, status_values = _decode_missing(state['status_codes'], state['status_values'])
+        return {
+            'ids': state['ids'].astype(np.int64),
+            'kerbside_ids': state['kerbside_ids'].tolist(),
+            'zone_codes': zone_codes,
+            'zone_values': zone_values,
+            'status_codes': status_codes,
+            'status_values': status_values,
+            'lat': state['lat'],
+            'lng': state['lng'],
+            'status_at': state['status_at'].astype('datetime64[us]'),
+            'updated_at': state['updated_at'].astype('datetime64[us]')
+        }
+
+
+def _encoder(values: List):
+    """Function giving the category code of a value, appending values that are new to the list"""
+    codes = {value: code for code, value in enumerate(values)}
+
+    def code_of(value) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    return code_of
+
+
+class CheckpointService:
+    """Service for sensor checkpoints and point-in-time snapshots"""
+
+    # Ingests write a checkpoint when the newest one is at least this old
+    INTERVAL_MINUTES = float(os.getenv('CHECKPOINT_INTERVAL_MINUTES', '60'))
+
+    # Checkpoints older than this are deleted; reconstruction cannot reach further back
+    RETENTION_DAYS = float(os.getenv('CHECKPOINT_RETENTION_DAYS', '35'))
+
+    # Reconstructed snapshots kept per worker
+    CACHE_ENTRIES = int(os.getenv('POINT_IN_TIME_CACHE_ENTRIES', '8'))
+
+    # How long after its status_timestamp a transition can still reach an ingest; replays
+    # look back this far before the checkpoint for transitions it could not have held
+    LATE_ARRIVAL_MINUTES = float(os.getenv('CHECKPOINT_LATE_ARRIVAL_MINUTES', '60'))
+
+    @classmethod
+    def checkpoint_dir(cls) -> str:
+        return os.getenv('CHECKPOINT_DIR') or os.path.join(current_app.instance_path, 'checkpoints')
+
+    @classmethod
+    def checkpoint_path(cls, when: datetime) -> str:
+        return os.path.join(cls.checkpoint_dir(), when.strftime(CHECKPOINT_FORMAT) + CHECKPOINT_SUFFIX)
+
+    @classmethod
+    def checkpoint_times(cls) -> List[datetime]:
+        """Times of every checkpoint on disk, oldest first"""
+        try:
+            names = os.listdir(cls.checkpoint_dir())
+        except FileNotFoundError:
+            return []
+        times = []
+        for name in names:
+            if name.endswith(CHECKPOINT_SUFFIX):
+                try:
+                    times.append(datetime.strptime(name[:-len(CHECKPOINT_SUFFIX)], CHECKPOINT_FORMAT))
+                except ValueError:
+                    continue
+        return sorted(times)
+
+    @classmethod
+    def maybe_checkpoint(cls, now: datetime = None) -> Optional[datetime]:
+        """
+        Write a checkpoint of the current snapshot if the newest one is older than the interval
+
+        Called after an ingest commits, so the snapshot it writes is the one readers are
+        about to be served. Checkpoints past the retention window are deleted.
+
+        Args:
+            now: Time of the checkpoint (default utcnow)
+
+        Returns:
+            Time of the checkpoint written, or None if none was due
+        """
+        now = now or datetime.utcnow()
+        # Rounded up, so every last_updated the checkpoint holds is at or before its name
+        if now.microsecond:
+            now = now.replace(microsecond=0) + timedelta(seconds=1)
+        with _checkpoint_lock:
+            times = cls.checkpoint_times()
+            if times and now - times[-1] < timedelta(minutes=cls.INTERVAL_MINUTES):
+                return None
+
+            snapshot = SpatialIndexService.get_snapshot()
+            write_checkpoint(cls.checkpoint_path(now), snapshot)
+
+            cutoff = now - timedelta(days=cls.RETENTION_DAYS)
+            for when in times:
+                if when < cutoff:
+                    os.remove(cls.checkpoint_path(when))
+        print(f"📸 Wrote sensor checkpoint {now.isoformat()} ({len(snapshot)} sensors)")
+        return now
+
+    @classmethod
+    def snapshot_at(cls, at: datetime) -> Optional[SensorSnapshot]:
+        """
+        The sensor table as it stood at a past time
+
+        Starts from the newest checkpoint at or before at and replays the status
+        transitions ingested since it (see replay_transitions), so the cost is one
+        checkpoint load plus about one interval of transitions. Each sensor takes its
+        latest transition up to at, unless the checkpoint already holds a later
+        status_timestamp; last_updated becomes the later of the checkpoint's value and
+        that transition's time. Results are cached per (checkpoint, at); while at is
+        within LATE_ARRIVAL_MINUTES of now the live snapshot version is part of the
+        key, since later ingests can still add transitions up to at.
+
+        Args:
+            at: Naive UTC time
+
+        Returns:
+            SensorSnapshot whose now is at, with checkpoint_at and replayed set, or None
+            when no checkpoint is old enough
+        """
+        times = cls.checkpoint_times()
+        earlier = [when for when in times if when <= at]
+        if not earlier:
+            return None
+        checkpoint_at = earlier[-1]
+
+        settled = at < datetime.utcnow() - timedelta(minutes=cls.LATE_ARRIVAL_MINUTES)
+        key = (checkpoint_at, at, None if settled else SnapshotService.current_version())
+        cache = current_app.extensions.setdefault('parking_point_in_time', OrderedDict())
+        with _cache_lock:
+            snapshot = cache.get(key)
+            if snapshot is not None:
+                cache.move_to_end(key)
+                return snapshot
+
+        columns = read_checkpoint(cls.checkpoint_path(checkpoint_at))
+        transitions = cls.replay_transitions(checkpoint_at, at)
+        replayed = cls._replay(columns, transitions, np.datetime64(at, 'us'))
+
+        version = (at - EPOCH) // timedelta(microseconds=1)
+        snapshot = SensorSnapshot(version, [])
+        snapshot.set_columns(**columns)
+        snapshot.now = at
+        snapshot.checkpoint_at = checkpoint_at
+        snapshot.replayed = replayed
+
+        with _cache_lock:
+            cache[key] = snapshot
+            while len(cache) > cls.CACHE_ENTRIES:
+                cache.popitem(last=False)
+        print(f"🕰️  Rebuilt sensors at {at.isoformat()} from checkpoint {checkpoint_at.isoformat()} "
+              f"and {replayed} transitions")
+        return snapshot
+
+    @classmethod
+    def replay_transitions(cls, checkpoint_at: datetime, at: datetime) -> Dict:
+        """
+        Transitions a checkpoint may not hold that happened by at
+
+        Database rows are chosen by recorded_at, so a transition that reaches an ingest
+        after the checkpoint is replayed even when its status_timestamp is older, as long
+        as it is at most LATE_ARRIVAL_MINUTES older (which keeps the read on the time
+        index). The recorded_at bound starts a second early because the checkpoint's name
+        is its ingest time rounded up; rows the checkpoint already holds are harmless, as
+        _replay keeps the newer status. Archived days have no recorded_at, so all their
+        rows in the window are read.
+
+        Returns:
+            HistoryService.transition_columns result
+        """
+        # Archives keep milliseconds, so read to the next millisecond and cut at at exactly
+        return HistoryService.transition_columns(
+            checkpoint_at - timedelta(minutes=cls.LATE_ARRIVAL_MINUTES),
+            at + timedelta(milliseconds=1),
+            recorded_after=checkpoint_at - timedelta(seconds=1)
+        )
+
+    @classmethod
+    def _replay(cls, columns: Dict, transitions: Dict, at: np.datetime64) -> int:
+        """
+        Apply each sensor's last transition up to at to checkpoint columns in place
+
+        Sensors that are not in the checkpoint are taken from the current snapshot
+        (for their id and position) when it has them, and skipped otherwise.
+
+        Returns:
+            Number of transitions applied
+        """
+        timestamps = transitions['timestamps']
+        count = int(np.searchsorted(timestamps, at, side='right'))
+        if not count:
+            return 0
+
+        # Last transition per sensor: the first occurrence in reverse time order
+        kerbside_ids = transitions['kerbside_ids'][:count]
+        last = {}
+        for i in range(count - 1, -1, -1):
+            last.setdefault(kerbside_ids[i], i)
+
+        position_of = {kerbside_id: i for i, kerbside_id in enumerate(columns['kerbside_ids']) if kerbside_id in last}
+        missing = [kerbside_id for kerbside_id in last if kerbside_id not in position_of]
+        if missing:
+            cls._append_sensors(columns, missing, position_of)
+
+        picked = [(position_of[kerbside_id], i) for kerbside_id, i in last.items() if kerbside_id in position_of]
+        positions = np.array([position for position, _ in picked], dtype=np.int64)
+        rows = np.array([i for _, i in picked], dtype=np.int64)
+        times = timestamps[rows]
+        # A checkpoint status newer than the transition wins
+        newer = ~(columns['status_at'][positions] > times)
+        positions, rows, times = positions[newer], rows[newer], times[newer]
+
+        status_code, zone_code = _encoder(columns['status_values']), _encoder(columns['zone_values'])
+        columns['status_codes'][positions] = [status_code(transitions['statuses'][i]) for i in rows.tolist()]
+        columns['zone_codes'][positions] = [zone_code(transitions['zones'][i]) for i in rows.tolist()]
+        columns['status_at'][positions] = times
+        columns['updated_at'][positions] = np.fmax(columns['updated_at'][positions], times)
+        return int(len(positions))
+
+    @staticmethod
+    def _append_sensors(columns: Dict, kerbside_ids: List[str], position_of: Dict[str, int]):
+        """Add sensors first seen after the checkpoint, taking id and position from the current snapshot"""
+        current = SpatialIndexService.get_snapshot()
+        current_position = {kerbside_id: i for i, kerbside_id in enumerate(current.kerbside_ids)}
+        found = [current_position[kerbside_id] for kerbside_id in kerbside_ids if kerbside_id in current_position]
+        if not found:
+            return
+        found = np.array(found, dtype=np.int64)
+        for kerbside_id in (current.kerbside_ids[i] for i in found.tolist()):
+            position_of[kerbside_id] = len(columns['kerbside_ids'])
+            columns['kerbside_ids'].append(kerbside_id)
+
+        # Placeholders; _replay sets status, zone and times from the transition
+        columns['ids'] = np.concatenate([columns['ids'], current.ids[found]])
+        columns['lat'] = np.concatenate([columns['lat'], current.lat[found]])
+        columns['lng'] = np.concatenate([columns['lng'], current.lng[found]])
+        columns['zone_codes'] = np.concatenate([columns['zone_codes'], np.zeros(len(found), dtype=np.int32)])
+        columns['status_codes'] = np.concatenate([columns['status_codes'], np.zeros(len(found), dtype=np.int32)])
+        not_a_time = np.full(len(found), np.datetime64('NaT'), dtype='datetime64[us]')
+        columns['status_at'] = np.concatenate([columns['status_at'], not_a_time])
+        columns['updated_at'] = np.concatenate([columns['updated_at'], not_a_time])
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """Checkpoints on disk and cached reconstructions"""
+        times = cls.checkpoint_times()
+        cache = current_app.extensions.get('parking_point_in_time', {})
+        return {
+            'checkpoints': len(times),
+            'oldest': times[0].isoformat() if times else None,
+            'newest': times[-1].isoformat() if times else None,
+            'interval_minutes': cls.INTERVAL_MINUTES,
+            'cached_snapshots': len(cache)
+        }
@@ -0,0 +1,135 @@
+"""
+Dashboard Service for Melbourne Parking System
+Builds the map view's sensors and statistics together from one sensor snapshot
+"""
+
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .spatial_service import KM_PER_DEGREE, SpatialIndexService
+from .stats_service import HEATMAP_REFERENCE_LAT, StatsService
+
+
+class DashboardService:
+    """Service assembling the dashboard bundle so every part agrees on the snapshot version"""
+
+    # Sensors returned for one viewport before it is summarised as clusters instead
+    DEFAULT_SENSOR_LIMIT = 1000
+    MAX_SENSOR_LIMIT = 5000
+
+    # At this zoom and closer the map always gets individual sensors
+    DETAIL_ZOOM = int(os.getenv('DASHBOARD_DETAIL_ZOOM', '17'))
+
+    # Cluster cells are about this many screen pixels wide (256-pixel web-mercator tiles)
+    CLUSTER_CELL_PX = int(os.getenv('DASHBOARD_CLUSTER_CELL_PX', '64'))
+    METRES_PER_PIXEL_Z0 = 156543.03392
+
+    # Same window as /api/parking/live
+    RECENT_DAYS = 7
+
+    STATUS_FILTERS = ('all', 'available', 'occupied')
+
+    @staticmethod
+    def overview(snapshot) -> Dict:
+        """Same shape as StatsService.get_parking_overview, counted from the snapshot"""
+        total = len(snapshot)
+        available = int(snapshot.available.sum())
+        occupied = int(snapshot.occupied.sum())
+        return {
+            'total_sensors': total,
+            'available': available,
+            'occupied': occupied,
+            'occupancy_rate': round(occupied / total * 100, 2) if total else 0,
+            'last_updated': datetime.utcnow().isoformat()
+        }
+
+    @classmethod
+    def cluster_cell_m(cls, zoom: int) -> float:
+        """Cluster cell edge for a zoom level; one value per level keeps the grid cache small"""
+        metres_per_pixel = cls.METRES_PER_PIXEL_Z0 * math.cos(math.radians(HEATMAP_REFERENCE_LAT)) / 2 ** zoom
+        return float(min(5000, max(10, round(metres_per_pixel * cls.CLUSTER_CELL_PX))))
+
+    @staticmethod
+    def cluster_cells(snapshot, positions: np.ndarray, cell_m: float) -> Dict:
+        """
+        Sensor counts per cell for a set of snapshot positions
+
+        Cells sit on the heatmap lattice (same edge and reference latitude), so a
+        cluster lines up with the /api/stats/heatmap cell it falls in.
+
+        Returns:
+            Dictionary with cell_m, the row field names and one row per non-empty cell
+        """
+        d_lat = cell_m / (KM_PER_DEGREE * 1000.0)
+        d_lng = d_lat / math.cos(math.radians(HEATMAP_REFERENCE_LAT))
+        cells = {'cell_m': cell_m, 'fields': ['lat', 'lng', 'total', 'available', 'occupied'], 'cells': []}
+        if not len(positions):
+            return cells
+
+        rows = np.floor(snapshot.lat[positions] / d_lat).astype(np.int64)
+        cols = np.floor(snapshot.lng[positions] / d_lng).astype(np.int64)
+        row0, col0 = int(rows.min()), int(cols.min())
+        width = int(cols.max()) - col0 + 1
+        keys, cell_of = np.unique((rows - row0) * width + (cols - col0), return_inverse=True)
+        cell_rows, cell_cols = keys // width + row0, keys % width + col0
+
+        cells['cells'] = list(zip(
+            np.round((cell_rows + 0.5) * d_lat, 6).tolist(),
+            np.round((cell_cols + 0.5) * d_lng, 6).tolist(),
+            np.bincount(cell_of, minlength=len(keys)).tolist(),
+            np.bincount(cell_of, weights=snapshot.available[positions], minlength=len(keys)).astype(int).tolist(),
+            np.bincount(cell_of, weights=snapshot.occupied[positions], minlength=len(keys)).astype(int).tolist()
+        ))
+        return cells
+
+    @classmethod
+    def _view_positions(cls, snapshot, bbox: Optional[Tuple[float, float, float, float]],
+                        status_filter: str) -> np.ndarray:
+        """Snapshot positions /live would show for this viewport, ordered by kerbside_id"""
+        # Recent sensors, falling back to everything when none were updated this week
+        week_ago = datetime.utcnow() - timedelta(days=cls.RECENT_DAYS)
+        recent = snapshot.mask(status_filter, bbox, updated_since=week_ago)
+        positions = np.flatnonzero(recent if recent.any() else snapshot.mask(status_filter, bbox))
+        return np.array(sorted(positions.tolist(), key=snapshot.kerbside_ids.__getitem__), dtype=np.int64)
+
+    @classmethod
+    def build(cls, bbox: Optional[Tuple[float, float, float, float]], zoom: Optional[int] = None,
+              status_filter: str = 'all', limit: int = None) -> Dict:
+        """
+        Sensors in the viewport plus overview and zone statistics from one snapshot
+
+        Args:
+            bbox: (lat_min, lng_min, lat_max, lng_max) of the viewport, or None for all sensors
+            zoom: Map zoom level; when below DETAIL_ZOOM, busy viewports come back as clusters
+            status_filter: 'all', 'available' or 'occupied' (viewport sensors and clusters)
+            limit: Maximum sensors returned for the viewport
+
+        Returns:
+            Dictionary with the snapshot version, 'sensors' or 'clusters', 'stats'
+            (as /api/stats) and 'zone_statistics' (as /api/stats/zones)
+        """
+        limit = limit or cls.DEFAULT_SENSOR_LIMIT
+        snapshot = SpatialIndexService.get_snapshot()
+        positions = cls._view_positions(snapshot, bbox, status_filter)
+
+        sensors = None
+        clusters = None
+        if zoom is not None and zoom < cls.DETAIL_ZOOM and len(positions) > limit:
+            # Too many markers to be useful: counts per cell of the shown sensors only
+            clusters = cls.cluster_cells(snapshot, positions, cls.cluster_cell_m(zoom))
+        else:
+            sensors = snapshot.to_dicts(positions[:limit])
+
+        return {
+            'snapshot_version': snapshot.version,
+            'count': len(positions),
+            'truncated': sensors is not None and len(positions) > limit,
+            'sensors': sensors,
+            'clusters': clusters,
+            'stats': cls.overview(snapshot),
+            'zone_statistics': StatsService.get_zone_statistics(snapshot)
+        }
@@ -0,0 +1,436 @@
+"""
+Availability Forecast Service for Melbourne Parking System
+Maintains hour-of-week occupancy profiles per bay and per zone, updated online at ingest
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # No flock on Windows; development there runs a single process
+    fcntl = None
+
+try:
+    from zoneinfo import ZoneInfo
+    MELBOURNE_TZ = ZoneInfo('Australia/Melbourne')
+except Exception:
+    # Slim images may ship without tzdata; AEST is close enough for hour-of-week slots
+    MELBOURNE_TZ = timezone(timedelta(hours=10))
+
+HOURS_PER_WEEK = 168
+
+_model_lock = threading.Lock()
+
+
+def hour_of_week(when: datetime) -> int:
+    """
+    Hour-of-week slot (0 = Monday 00:00 Melbourne time) for a timestamp
+
+    Args:
+        when: Timestamp; naive values are treated as UTC like the rest of the API
+    """
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    local = when.astimezone(MELBOURNE_TZ)
+    return local.weekday() * 24 + local.hour
+
+
+class ForecastModel:
+    """Exponentially weighted free/observed counters in compact (rows x 168) float32 arrays"""
+
+    def __init__(self, decay: float):
+        self.decay = decay
+        self.sensor_keys: List[str] = []
+        self.sensor_rows: Dict[str, int] = {}
+        self.sensor_zone = np.zeros(0, dtype=np.int32)
+        self.sensor_free = np.zeros((0, HOURS_PER_WEEK), dtype=np.float32)
+        self.sensor_weight = np.zeros((0, HOURS_PER_WEEK), dtype=np.float32)
+        self.zone_keys: List[str] = []
+        self.zone_rows: Dict[str, int] = {}
+        self.zone_members: Dict[int, List[int]] = {}
+        self.zone_free = np.zeros((0, HOURS_PER_WEEK), dtype=np.float32)
+        self.zone_weight = np.zeros((0, HOURS_PER_WEEK), dtype=np.float32)
+        self.cycles = 0
+        self.last_observed: Optional[str] = None
+
+    @staticmethod
+    def _grow(array: np.ndarray, rows: int) -> np.ndarray:
+        """Grow row capacity geometrically so new sensors do not copy the arrays every cycle"""
+        if rows <= array.shape[0]:
+            return array
+        capacity = max(rows, array.shape[0] * 2, 64)
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:array.shape[0]] = array
+        return grown
+
+    def _zone_row(self, zone: str) -> int:
+        row = self.zone_rows.get(zone)
+        if row is None:
+            row = len(self.zone_keys)
+            self.zone_rows[zone] = row
+            self.zone_keys.append(zone)
+            self.zone_members[row] = []
+            self.zone_free = self._grow(self.zone_free, row + 1)
+            self.zone_weight = self._grow(self.zone_weight, row + 1)
+        return row
+
+    def _sensor_row(self, kerbside_id: str, zone_row: int) -> int:
+        row = self.sensor_rows.get(kerbside_id)
+        if row is None:
+            row = len(self.sensor_keys)
+            self.sensor_rows[kerbside_id] = row
+            self.sensor_keys.append(kerbside_id)
+            self.sensor_free = self._grow(self.sensor_free, row + 1)
+            self.sensor_weight = self._grow(self.sensor_weight, row + 1)
+            self.sensor_zone = self._grow(self.sensor_zone, row + 1)
+            self.sensor_zone[row] = zone_row
+            self.zone_members[zone_row].append(row)
+        elif self.sensor_zone[row] != zone_row:
+            # Bay moved to another zone; keep its profile but re-home it
+            self.zone_members[int(self.sensor_zone[row])].remove(row)
+            self.zone_members[zone_row].append(row)
+            self.sensor_zone[row] = zone_row
+        return row
+
+    def observe(self, observations: Iterable[Tuple[str, Optional[str], str]], when: datetime) -> int:
+        """
+        Fold one ingest cycle into the profiles
+
+        Args:
+            observations: (kerbside_id, zone_number, status_description) per sensor
+            when: Time the statuses were observed
+
+        Returns:
+            Number of sensors observed
+        """
+        slot = hour_of_week(when)
+        rows, zones, free = [], [], []
+        for kerbside_id, zone_number, status in observations:
+            zone_row = self._zone_row(zone_number or 'Unknown')
+            rows.append(self._sensor_row(kerbside_id, zone_row))
+            zones.append(zone_row)
+            free.append(1.0 if status == 'Unoccupied' else 0.0)
+
+        if not rows:
+            return 0
+
+        rows = np.asarray(rows, dtype=np.int64)
+        zones = np.asarray(zones, dtype=np.int64)
+        free = np.asarray(free, dtype=np.float32)
+
+        self.sensor_weight[rows, slot] = self.sensor_weight[rows, slot] * self.decay + 1.0
+        self.sensor_free[rows, slot] = self.sensor_free[rows, slot] * self.decay + free
+
+        zone_count = len(self.zone_keys)
+        observed = np.bincount(zones, minlength=zone_count).astype(np.float32)
+        observed_free = np.bincount(zones, weights=free, minlength=zone_count).astype(np.float32)
+        touched = np.flatnonzero(observed)
+        self.zone_weight[touched, slot] = self.zone_weight[touched, slot] * self.decay + observed[touched]
+        self.zone_free[touched, slot] = self.zone_free[touched, slot] * self.decay + observed_free[touched]
+
+        self.cycles += 1
+        self.last_observed = when.isoformat()
+        return len(rows)
+
+    def zone_probability(self, zone_row: int, slot: int) -> float:
+        """Smoothed probability that a bay in the zone is free (Laplace prior)"""
+        return float((self.zone_free[zone_row, slot] + 1.0) / (self.zone_weight[zone_row, slot] + 2.0))
+
+    def sensor_probability(self, row: int, slot: int, zone_p: float, prior_weight: float = 2.0) -> float:
+        """Bay probability shrunk towards its zone when the bay has few observations"""
+        return float((self.sensor_free[row, slot] + prior_weight * zone_p) /
+                     (self.sensor_weight[row, slot] + prior_weight))
+
+    def save(self, path: str):
+        """Write the model atomically so a crash never leaves a half-written file"""
+        n_sensors = len(self.sensor_keys)
+        n_zones = len(self.zone_keys)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                decay=np.float32(self.decay),
+                cycles=np.int64(self.cycles),
+                last_observed=np.array(self.last_observed or ''),
+                sensor_keys=np.array(self.sensor_keys, dtype=str),
+                sensor_zone=self.sensor_zone[:n_sensors],
+                sensor_free=self.sensor_free[:n_sensors],
+                sensor_weight=self.sensor_weight[:n_sensors],
+                zone_keys=np.array(self.zone_keys, dtype=str),
+                zone_free=self.zone_free[:n_zones],
+                zone_weight=self.zone_weight[:n_zones]
+            )
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def saved_cycles(path: str) -> int:
+        """Cycles folded into a saved model, read without loading its arrays"""
+        with np.load(path, allow_pickle=False) as state:
+            return int(state['cycles'])
+
+    @staticmethod
+    def write_entry(path: str, observations: List[Tuple[str, Optional[str], str]], when: datetime):
+        """Write one ingest cycle's observations as a journal entry, atomically"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            # Uncompressed: a few MB at 100k sensors, written in milliseconds
+            np.savez(
+                f,
+                when=np.array(when.isoformat()),
+                kerbside_ids=np.array([kerbside_id for kerbside_id, _, _ in observations], dtype=str),
+                zones=np.array([zone or '' for _, zone, _ in observations], dtype=str),
+                free=np.array([status == 'Unoccupied' for _, _, status in observations], dtype=bool)
+            )
+        os.replace(tmp_path, path)
+
+    def replay_entry(self, path: str) -> int:
+        """Fold a journal entry written by write_entry into the profiles"""
+        with np.load(path, allow_pickle=False) as entry:
+            when = datetime.fromisoformat(str(entry['when']))
+            observations = zip(entry['kerbside_ids'].tolist(), entry['zones'].tolist(),
+                               np.where(entry['free'], 'Unoccupied', 'Occupied').tolist())
+            return self.observe(observations, when)
+
+    @classmethod
+    def load(cls, path: str, decay: float) -> 'ForecastModel':
+        model = cls(decay)
+        with np.load(path, allow_pickle=False) as state:
+            model.cycles = int(state['cycles'])
+            model.last_observed = str(state['last_observed']) or None
+            model.sensor_keys = [str(k) for k in state['sensor_keys']]
+            model.sensor_rows = {k: i for i, k in enumerate(model.sensor_keys)}
+            model.sensor_zone = state['sensor_zone'].astype(np.int32)
+            model.sensor_free = state['sensor_free'].astype(np.float32)
+            model.sensor_weight = state['sensor_weight'].astype(np.float32)
+            model.zone_keys = [str(k) for k in state['zone_keys']]
+            model.zone_rows = {k: i for i, k in enumerate(model.zone_keys)}
+            model.zone_free = state['zone_free'].astype(np.float32)
+            model.zone_weight = state['zone_weight'].astype(np.float32)
+        model.zone_members = {row: [] for row in range(len(model.zone_keys))}
+        for row, zone_row in enumerate(model.sensor_zone.tolist()):
+            model.zone_members[zone_row].append(row)
+        return model
+
+
+class ForecastService:
+    """Service for bay and zone availability forecasts"""
+
+    # Per-observation decay; with one ingest a minute each hour-of-week slot
+    # sees ~60 observations a week, so 0.97 remembers roughly the last week
+    DECAY = float(os.getenv('FORECAST_DECAY', '0.97'))
+
+    # Seconds between full saves of the model; each ingest in between only appends a journal entry
+    SAVE_INTERVAL_SECONDS = float(os.getenv('FORECAST_SAVE_INTERVAL_SECONDS', '900'))
+
+    @classmethod
+    def state_path(cls) -> str:
+        return os.getenv('FORECAST_STATE_PATH') or os.path.join(current_app.instance_path, 'forecast_state.npz')
+
+    @classmethod
+    def journal_dir(cls) -> str:
+        """Directory of per-ingest journal entries newer than the saved model, named by cycle"""
+        return f'{cls.state_path()}.journal'
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    @contextmanager
+    def _writer_lock(cls):
+        """Serialise ingest writes to the model files across worker processes"""
+        path = f'{cls.state_path()}.lock'
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @classmethod
+    def _catch_up(cls, state: Dict) -> ForecastModel:
+        """
+        Bring this worker's model up to the saved model plus every journal entry after it
+
+        Entries are folded in cycle order, so every worker ends with the same profiles.
+        The saved model is only loaded when it is ahead of the in-memory one, or when
+        entries this worker still needs were pruned after a save. Call under _model_lock.
+        """
+        path = cls.state_path()
+        journal = cls.journal_dir()
+        for attempt in range(3):
+            mtime = cls._mtime(path)
+            model = state['model']
+            if model is None or (mtime is not None and mtime != state['mtime']
+                                 and ForecastModel.saved_cycles(path) > model.cycles):
+                model = state['model'] = ForecastModel.load(path, cls.DECAY) if mtime else ForecastModel(cls.DECAY)
+            state['mtime'] = mtime
+
+            state['journal_mtime'] = cls._mtime(journal)
+            names = sorted(name for name in os.listdir(journal) if name.endswith('.npz')) \
+                if state['journal_mtime'] is not None else []
+            pending = [int(name[:-4]) for name in names if int(name[:-4]) > model.cycles]
+            try:
+                # A gap means entries were pruned after a save this worker has not loaded yet;
+                # one that survives a reload (an entry that was never written) is skipped
+                if attempt == 0 and pending and pending[0] != model.cycles + 1:
+                    raise FileNotFoundError(pending[0])
+                for cycle in pending:
+                    model.replay_entry(os.path.join(journal, f'{cycle:012d}.npz'))
+                    model.cycles = cycle
+                return model
+            except FileNotFoundError:
+                state['model'] = None
+        raise RuntimeError('Forecast journal kept changing while it was read')
+
+    @classmethod
+    def get_model(cls) -> ForecastModel:
+        """
+        Get this worker's model, folding in what other workers have ingested since
+
+        Returns:
+            ForecastModel
+        """
+        state = current_app.extensions.setdefault('parking_forecast',
+                                                  {'model': None, 'mtime': None, 'journal_mtime': None})
+        mtime = cls._mtime(cls.state_path())
+        journal_mtime = cls._mtime(cls.journal_dir())
+        if state['model'] is None or mtime != state['mtime'] or journal_mtime != state['journal_mtime']:
+            with _model_lock:
+                if state['model'] is None or mtime != state['mtime'] or journal_mtime != state['journal_mtime']:
+                    cls._catch_up(state)
+        return state['model']
+
+    @classmethod
+    def observe(cls, observations: List[Tuple[str, Optional[str], str]], when: datetime = None) -> int:
+        """
+        Update the profiles with one ingest cycle and persist them
+
+        The cycle is written as a small journal entry; the full model is only saved
+        every SAVE_INTERVAL_SECONDS, after which older entries are removed. Writers in
+        all workers take a file lock and catch up first, so no worker's cycle is lost.
+
+        Args:
+            observations: (kerbside_id, zone_number, status_description) per sensor
+            when: Observation time (default: utcnow)
+
+        Returns:
+            Number of sensors folded into the model
+        """
+        path = cls.state_path()
+        journal = cls.journal_dir()
+        state = current_app.extensions.setdefault('parking_forecast',
+                                                  {'model': None, 'mtime': None, 'journal_mtime': None})
+        with cls._writer_lock(), _model_lock:
+            model = cls._catch_up(state)
+            when = when or datetime.utcnow()
+            count = model.observe(observations, when)
+            if not count:
+                return 0
+
+            try:
+                os.makedirs(journal, exist_ok=True)
+                ForecastModel.write_entry(os.path.join(journal, f'{model.cycles:012d}.npz'), observations, when)
+                saved = state['mtime']
+                if saved is None or time.time() - saved / 1e9 >= cls.SAVE_INTERVAL_SECONDS:
+                    model.save(path)
+                    state['mtime'] = cls._mtime(path)
+                    for name in os.listdir(journal):
+                        if name.endswith('.npz') and int(name[:-4]) <= model.cycles:
+                            os.remove(os.path.join(journal, name))
+                state['journal_mtime'] = cls._mtime(journal)
+            except Exception:
+                # The cycle is in memory only; rebuild from the files so this worker matches the others
+                state['model'] = None
+                raise
+        return count
+
+    @classmethod
+    def forecast_zone(cls, zone: str, at: datetime) -> Optional[Dict]:
+        """
+        Forecast availability for a zone and each of its bays
+
+        Args:
+            zone: Zone number
+            at: Target time
+
+        Returns:
+            Forecast dictionary, or None if the zone has never been observed
+        """
+        model = cls.get_model()
+        zone_row = model.zone_rows.get(zone)
+        if zone_row is None:
+            return None
+
+        slot = hour_of_week(at)
+        zone_p = model.zone_probability(zone_row, slot)
+        bays = [
+            {
+                'kerbside_id': model.sensor_keys[row],
+                'probability_free': round(model.sensor_probability(row, slot, zone_p), 4),
+                'observations': round(float(model.sensor_weight[row, slot]), 2)
+            }
+            for row in model.zone_members.get(zone_row, [])
+        ]
+
+        return {
+            'zone_number': zone,
+            'hour_of_week': slot,
+            'probability_free': round(zone_p, 4),
+            'expected_free_bays': round(sum(bay['probability_free'] for bay in bays), 2),
+            'total_bays': len(bays),
+            'observations': round(float(model.zone_weight[zone_row, slot]), 2),
+            'bays': bays,
+            'model_cycles': model.cycles,
+            'model_last_observed': model.last_observed
+        }
+
+    @classmethod
+    def forecast_bay(cls, kerbside_id: str, at: datetime) -> Optional[Dict]:
+        """
+        Forecast availability for a single bay
+
+        Args:
+            kerbside_id: Sensor kerbside ID
+            at: Target time
+
+        Returns:
+            Forecast dictionary, or None if the bay has never been observed
+        """
+        model = cls.get_model()
+        row = model.sensor_rows.get(kerbside_id)
+        if row is None:
+            return None
+
+        slot = hour_of_week(at)
+        zone_row = int(model.sensor_zone[row])
+        zone_p = model.zone_probability(zone_row, slot)
+        return {
+            'kerbside_id': kerbside_id,
+            'zone_number': model.zone_keys[zone_row],
+            'hour_of_week': slot,
+            'probability_free': round(model.sensor_probability(row, slot, zone_p), 4),
+            'zone_probability_free': round(zone_p, 4),
+            'observations': round(float(model.sensor_weight[row, slot]), 2),
+            'model_cycles': model.cycles,
+            'model_last_observed': model.last_observed
+        }
@@ -0,0 +1,452 @@
+"""
+Status History Service for Melbourne Parking System
+Keeps recent transitions in the database and compacts older days into memory-mapped columnar archives
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import and_, delete, func, select
+
+from ..models import ParkingStatusHistory, db
+
+ARCHIVE_MAGIC = b'PKHIST01'
+ARCHIVE_SUFFIX = '.pkh'
+ALIGNMENT = 64
+MS_PER_DAY = 86_400_000
+
+_compact_lock = threading.Lock()
+_archive_lock = threading.Lock()
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class HistoryArchive:
+    """
+    One day of status transitions stored column by column
+
+    File layout: magic, header length, JSON header, then 64-byte aligned columns.
+    Rows are sorted by (kerbside_id, timestamp) so one sensor's transitions are a
+    contiguous slice found through key_offsets. Kerbside IDs, zones and statuses are
+    dictionary-encoded and timestamps are stored as milliseconds since midnight UTC,
+    which keeps a row to ~7-9 bytes while every column stays directly mappable.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:8] != ARCHIVE_MAGIC:
+            raise ValueError(f'{path} is not a history archive')
+        header_length = struct.unpack('<Q', self._mmap[8:16])[0]
+        self.header = json.loads(self._mmap[16:16 + header_length].decode())
+
+        self.day = datetime.strptime(self.header['day'], '%Y-%m-%d')
+        self.rows = self.header['rows']
+        self.statuses: List[str] = self.header['statuses']
+        self.zones: List[Optional[str]] = self.header['zones']
+
+        # Views over the mapping: nothing is read until a column is touched
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.frombuffer(self._mmap, dtype=spec['dtype'], count=spec['count'], offset=spec['offset'])
+            for name, spec in self.header['columns'].items()
+        }
+        self.keys = self.columns['keys']
+        self.key_offsets = self.columns['key_offsets']
+        self.ms = self.columns['ms']
+        self.status = self.columns['status']
+        self.zone = self.columns['zone']
+
+    @classmethod
+    def write(cls, path: str, day: datetime, kerbside_ids: np.ndarray, zones: List[Optional[str]],
+              statuses: List[str], timestamps_ms: np.ndarray) -> int:
+        """
+        Encode and atomically write one day of transitions
+
+        Args:
+            path: Destination file
+            day: Day the transitions belong to (midnight UTC)
+            kerbside_ids: Kerbside ID per row
+            zones: Zone number per row
+            statuses: Status description per row
+            timestamps_ms: Milliseconds since midnight per row
+
+        Returns:
+            Number of rows written after de-duplication
+        """
+        keys, key_codes = np.unique(np.asarray(kerbside_ids, dtype=str), return_inverse=True)
+        zone_values = sorted({zone or '' for zone in zones})
+        zone_lookup = {zone: i for i, zone in enumerate(zone_values)}
+        status_values = sorted(set(statuses))
+        status_lookup = {status: i for i, status in enumerate(status_values)}
+
+        zone_codes = np.fromiter((zone_lookup[zone or ''] for zone in zones), dtype=np.int64, count=len(zones))
+        status_codes = np.fromiter((status_lookup[s] for s in statuses), dtype=np.int64, count=len(statuses))
+        timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64)
+
+        order = np.lexsort((status_codes, timestamps_ms, key_codes))
+        key_codes, timestamps_ms = key_codes[order], timestamps_ms[order]
+        zone_codes, status_codes = zone_codes[order], status_codes[order]
+
+        # Re-compacting a day after an interrupted run must not duplicate rows
+        if len(order):
+            keep = np.ones(len(order), dtype=bool)
+            keep[1:] = ((key_codes[1:] != key_codes[:-1]) | (timestamps_ms[1:] != timestamps_ms[:-1]) |
+                        (status_codes[1:] != status_codes[:-1]))
+            key_codes, timestamps_ms = key_codes[keep], timestamps_ms[keep]
+            zone_codes, status_codes = zone_codes[keep], status_codes[keep]
+
+        columns = {
+            'keys': np.char.encode(keys, 'utf-8') if len(keys) else np.zeros(0, dtype='S1'),
+            'key_offsets': np.searchsorted(key_codes, np.arange(len(keys) + 1)).astype('<u4'),
+            'ms': timestamps_ms.astype('<u4'),
+            'status': status_codes.astype('u1'),
+            'zone': zone_codes.astype('<u2' if len(zone_values) <= 0xFFFF else '<u4')
+        }
+
+        header = {
+            'day': day.strftime('%Y-%m-%d'),
+            'rows': int(len(timestamps_ms)),
+            'statuses': status_values,
+            'zones': [zone or None for zone in zone_values],
+            'columns': {}
+        }
+        # Offsets depend on the header length, so size the header with placeholders first
+        for name, array in columns.items():
+            header['columns'][name] = {'dtype': array.dtype.str, 'count': int(len(array)), 'offset': 0}
+        header_bytes = json.dumps(header).encode()
+        offset = _aligned(16 + len(header_bytes) + 32 * len(columns))
+        for name, array in columns.items():
+            header['columns'][name]['offset'] = offset
+            offset = _aligned(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(ARCHIVE_MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in columns.items():
+                f.seek(header['columns'][name]['offset'])
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+        return header['rows']
+
+    def sensor_slice(self, kerbside_id: str) -> slice:
+        """Row range holding one sensor's transitions (empty if the sensor has none that day)"""
+        encoded = kerbside_id.encode()
+        if not len(self.keys) or len(encoded) > self.keys.dtype.itemsize:
+            return slice(0, 0)
+        needle = np.array(encoded, dtype=self.keys.dtype)
+        i = int(np.searchsorted(self.keys, needle))
+        if i >= len(self.keys) or self.keys[i] != needle:
+            return slice(0, 0)
+        return slice(int(self.key_offsets[i]), int(self.key_offsets[i + 1]))
+
+    def select(self, start: datetime = None, end: datetime = None, kerbside_id: str = None,
+               zone: str = None) -> np.ndarray:
+        """
+        Row indices matching a time window and optional sensor or zone
+
+        Args:
+            start: Inclusive lower bound
+            end: Exclusive upper bound
+            kerbside_id: Restrict to one sensor (binary search, no scan)
+            zone: Restrict to one zone
+
+        Returns:
+            Array of row indices
+        """
+        # Integer division, since float seconds can round a bound down by a millisecond
+        start_ms = 0 if start is None else max(0, (start - self.day) // timedelta(milliseconds=1))
+        end_ms = MS_PER_DAY if end is None else min(MS_PER_DAY, (end - self.day) // timedelta(milliseconds=1))
+        if start_ms >= end_ms:
+            return np.zeros(0, dtype=np.int64)
+
+        if kerbside_id is not None:
+            rows = self.sensor_slice(kerbside_id)
+            ms = self.ms[rows]
+            lo = rows.start + int(np.searchsorted(ms, start_ms, side='left'))
+            hi = rows.start + int(np.searchsorted(ms, end_ms, side='left'))
+            indices = np.arange(lo, hi, dtype=np.int64)
+        else:
+            mask = (self.ms >= start_ms) & (self.ms < end_ms)
+            indices = np.flatnonzero(mask)
+
+        if zone is not None:
+            if zone not in self.zones:
+                return np.zeros(0, dtype=np.int64)
+            indices = indices[self.zone[indices] == self.zones.index(zone)]
+        return indices
+
+    def kerbside_ids(self) -> np.ndarray:
+        """Kerbside ID code per row, expanded from key_offsets"""
+        return np.repeat(np.arange(len(self.keys)), np.diff(self.key_offsets.astype(np.int64)))
+
+    def records(self, indices: np.ndarray) -> List[Dict]:
+        """Decode rows into the same dictionaries the database rows produce"""
+        if not len(indices):
+            return []
+        key_rows = np.searchsorted(self.key_offsets, indices, side='right') - 1
+        timestamps = np.datetime64(self.day, 'ms') + self.ms[indices].astype('timedelta64[ms]')
+        return [
+            {
+                'kerbside_id': self.keys[k].decode(),
+                'zone_number': self.zones[z],
+                'status': self.statuses[s],
+                'status_timestamp': t.item().isoformat()
+            }
+            for k, z, s, t in zip(key_rows.tolist(), self.zone[indices].tolist(),
+                                  self.status[indices].tolist(), timestamps)
+        ]
+
+    def decode(self) -> Dict[str, list]:
+        """Decode the whole day back into plain columns (used when merging late rows)"""
+        key_rows = self.kerbside_ids()
+        return {
+            'kerbside_ids': [self.keys[k].decode() for k in key_rows.tolist()],
+            'zones': [self.zones[z] for z in self.zone.tolist()],
+            'statuses': [self.statuses[s] for s in self.status.tolist()],
+            'ms': self.ms.astype(np.int64)
+        }
+
+
+class HistoryService:
+    """Service for status transition history, retention and compaction"""
+
+    # Transitions newer than this stay in the database; older days move to archives
+    RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', '7'))
+
+    @classmethod
+    def archive_dir(cls) -> str:
+        return os.getenv('HISTORY_ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'history')
+
+    @classmethod
+    def archive_path(cls, day: datetime) -> str:
+        return os.path.join(cls.archive_dir(), day.strftime('%Y-%m-%d') + ARCHIVE_SUFFIX)
+
+    @classmethod
+    def open_archive(cls, day: datetime) -> Optional[HistoryArchive]:
+        """
+        Get the mapped archive for a day, reopening it if compaction has rewritten it
+
+        Args:
+            day: Midnight UTC of the day
+
+        Returns:
+            HistoryArchive, or None if the day has not been archived
+        """
+        path = cls.archive_path(day)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        cache = current_app.extensions.setdefault('parking_history_archives', {})
+        cached = cache.get(path)
+        if cached is None or cached[0] != mtime:
+            with _archive_lock:
+                cached = cache.get(path)
+                if cached is None or cached[0] != mtime:
+                    cached = (mtime, HistoryArchive(path))
+                    cache[path] = cached
+        return cached[1]
+
+    @classmethod
+    def archives(cls, start: datetime, end: datetime) -> Iterator[HistoryArchive]:
+        """
+        Archives overlapping [start, end), one per archived day
+
+        Rollups rebuilt from history read these column views directly instead of the database.
+        """
+        day = datetime.combine(start.date(), time.min)
+        while day < end:
+            archive = cls.open_archive(day)
+            if archive is not None:
+                yield archive
+            day += timedelta(days=1)
+
+    @classmethod
+    def query(cls, start: datetime, end: datetime, kerbside_id: str = None, zone: str = None,
+              limit: int = 1000) -> Dict:
+        """
+        Status transitions in a time window from archives and the live table
+
+        Args:
+            start: Inclusive lower bound (naive UTC)
+            end: Exclusive upper bound (naive UTC)
+            kerbside_id: Optional sensor filter
+            zone: Optional zone filter
+            limit: Maximum transitions returned
+
+        Returns:
+            Dictionary with transitions sorted by time, and whether the result was truncated
+        """
+        transitions = []
+        archived_days = []
+        for archive in cls.archives(start, end):
+            indices = archive.select(start, end, kerbside_id=kerbside_id, zone=zone)
+            indices = indices[np.argsort(archive.ms[indices], kind='stable')]
+            archived_days.append(archive.header['day'])
+            transitions.extend(archive.records(indices[:limit + 1]))
+
+        query = ParkingStatusHistory.query.filter(
+            ParkingStatusHistory.status_timestamp >= start,
+            ParkingStatusHistory.status_timestamp < end
+        )
+        if kerbside_id is not None:
+            query = query.filter(ParkingStatusHistory.kerbside_id == kerbside_id)
+        if zone is not None:
+            query = query.filter(ParkingStatusHistory.zone_number == zone)
+        rows = query.order_by(ParkingStatusHistory.status_timestamp).limit(limit + 1).all()
+
+        # A compaction interrupted between writing a day and deleting it leaves rows in both places
+        seen = {(t['kerbside_id'], t['status_timestamp'], t['status']) for t in transitions}
+        for row in rows:
+            record = row.to_dict()
+            record.pop('recorded_at')
+            if (record['kerbside_id'], record['status_timestamp'], record['status']) not in seen:
+                transitions.append(record)
+
+        transitions.sort(key=lambda t: (t['status_timestamp'], t['kerbside_id']))
+        return {
+            'transitions': transitions[:limit],
+            'truncated': len(transitions) > limit,
+            'archived_days': archived_days
+        }
+
+    @classmethod
+    def transition_columns(cls, start: datetime, end: datetime, recorded_after: datetime = None) -> Dict:
+        """
+        Every status transition in a window as columns, from archives and the live table
+
+        Unlike query() there is no limit and nothing is turned into dictionaries; point-in-time
+        reconstruction replays the result. Rows are ordered by time, archived rows first
+        within a timestamp, and rows present in both places (compared at the archives'
+        millisecond precision) are kept once.
+
+        Args:
+            start: Inclusive lower bound on status_timestamp (naive UTC)
+            end: Exclusive upper bound on status_timestamp (naive UTC)
+            recorded_after: Keep only database rows recorded after this time; archives keep
+                no recording time, so all their rows in the window are returned
+
+        Returns:
+            Dictionary of kerbside_ids, zones and statuses lists and a datetime64[us] timestamps array
+        """
+        kerbside_ids, zones, statuses, timestamps = [], [], [], []
+        seen = set()
+        for archive in cls.archives(start, end):
+            indices = archive.select(start, end)
+            key_rows = np.searchsorted(archive.key_offsets, indices, side='right') - 1
+            times = (np.datetime64(archive.day, 'ms') + archive.ms[indices].astype('timedelta64[ms]')).astype(
+                'datetime64[us]')
+            for k, z, status, t in zip(key_rows.tolist(), archive.zone[indices].tolist(),
+                                       archive.status[indices].tolist(), times.tolist()):
+                kerbside_id = archive.keys[k].decode()
+                kerbside_ids.append(kerbside_id)
+                zones.append(archive.zones[z])
+                statuses.append(archive.statuses[status])
+                timestamps.append(t)
+                seen.add((kerbside_id, t, archive.statuses[status]))
+
+        table = ParkingStatusHistory.__table__
+        statement = select(
+            table.c.kerbside_id, table.c.zone_number, table.c.status_description, table.c.status_timestamp
+        ).where(table.c.status_timestamp >= start, table.c.status_timestamp < end)
+        if recorded_after is not None:
+            statement = statement.where(table.c.recorded_at > recorded_after)
+        rows = db.session.execute(statement.order_by(table.c.status_timestamp, table.c.id)).all()
+        for kerbside_id, zone, status, timestamp in rows:
+            archived_as = timestamp.replace(microsecond=timestamp.microsecond // 1000 * 1000)
+            if (kerbside_id, archived_as, status) not in seen:
+                kerbside_ids.append(kerbside_id)
+                zones.append(zone)
+                statuses.append(status)
+                timestamps.append(timestamp)
+
+        timestamps = np.array(timestamps, dtype='datetime64[us]')
+        order = np.argsort(timestamps, kind='stable')
+        return {
+            'kerbside_ids': [kerbside_ids[i] for i in order.tolist()],
+            'zones': [zones[i] for i in order.tolist()],
+            'statuses': [statuses[i] for i in order.tolist()],
+            'timestamps': timestamps[order]
+        }
+
+    @classmethod
+    def compact(cls, retention_days: int = None, now: datetime = None) -> Dict:
+        """
+        Move whole days older than the retention window from the table into archives
+
+        Each day is written (merged with any existing archive for that day) before its
+        rows are deleted, so an interrupted run never loses transitions.
+
+        Args:
+            retention_days: Days kept in the database (default RETENTION_DAYS)
+            now: Reference time (default utcnow)
+
+        Returns:
+            Summary of archived days and row counts
+        """
+        retention = cls.RETENTION_DAYS if retention_days is None else retention_days
+        cutoff = datetime.combine(((now or datetime.utcnow()) - timedelta(days=retention)).date(), time.min)
+        table = ParkingStatusHistory.__table__
+        summary = {'cutoff': cutoff.isoformat(), 'days': [], 'rows_archived': 0}
+
+        with _compact_lock:
+            oldest = db.session.query(func.min(ParkingStatusHistory.status_timestamp)).filter(
+                ParkingStatusHistory.status_timestamp < cutoff
+            ).scalar()
+
+            while oldest is not None:
+                day = datetime.combine(oldest.date(), time.min)
+                next_day = day + timedelta(days=1)
+                in_day = and_(table.c.status_timestamp >= day, table.c.status_timestamp < next_day)
+
+                rows = db.session.execute(
+                    select(table.c.kerbside_id, table.c.zone_number,
+                           table.c.status_description, table.c.status_timestamp).where(in_day)
+                ).all()
+
+                kerbside_ids = [row[0] for row in rows]
+                zones = [row[1] for row in rows]
+                statuses = [row[2] for row in rows]
+                timestamps = np.array([row[3] for row in rows], dtype='datetime64[ms]')
+                ms = (timestamps - np.datetime64(day, 'ms')).astype(np.int64)
+
+                existing = cls.open_archive(day)
+                if existing is not None:
+                    previous = existing.decode()
+                    kerbside_ids = previous['kerbside_ids'] + kerbside_ids
+                    zones = previous['zones'] + zones
+                    statuses = previous['statuses'] + statuses
+                    ms = np.concatenate([previous['ms'], ms])
+
+                written = HistoryArchive.write(cls.archive_path(day), day, kerbside_ids, zones, statuses, ms)
+                db.session.execute(delete(table).where(in_day))
+                db.session.commit()
+
+                summary['days'].append({'day': day.strftime('%Y-%m-%d'), 'rows': len(rows), 'archive_rows': written})
+                summary['rows_archived'] += len(rows)
+                print(f"🗜️  Archived {len(rows)} status transitions for {day.date()}")
+
+                oldest = db.session.query(func.min(ParkingStatusHistory.status_timestamp)).filter(
+                    ParkingStatusHistory.status_timestamp >= next_day,
+                    ParkingStatusHistory.status_timestamp < cutoff
+                ).scalar()
+
+        return summary
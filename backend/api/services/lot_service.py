@@ -0,0 +1,330 @@
+"""
+Parking Lot Service for Melbourne Parking System
+Keeps an in-memory index of off-street parking lots for search and capacity updates
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import bindparam, func, select
+
+from ..models import ParkingLot, db
+from .bitmap_index import pack_bits
+from .spatial_service import SpatialGridIndex
+
+LOT_SORTS = ('distance', 'price', 'available')
+
+_index_lock = threading.Lock()
+
+
+def _facility_key(name: str) -> str:
+    return name.strip().lower()
+
+
+class ParkingLotIndex:
+    """
+    Every parking lot as column arrays, with the structures search needs precomputed
+
+    - a SpatialGridIndex over the lot positions for radius queries
+    - one bitset per facility (matched case-insensitively)
+    - the lots in (price, id) order with their sorted prices, so a price cap is a prefix
+    - each lot's to_dict output, so facilities are split once and not on every request
+
+    Capacity is the only part that changes between rebuilds; apply() updates it in place.
+    Rows that change anything else (see moved()) need a rebuild.
+    """
+
+    CELL_KM = float(os.getenv('LOT_GRID_CELL_KM', '0.25'))
+
+    def __init__(self, rows: Sequence, signature: Tuple[int, int]):
+        """
+        Args:
+            rows: parking_lots rows ordered by id
+            signature: (count, sum of ids) of the table the rows were read from
+        """
+        self.signature = signature
+        self.ids = np.array([row.id for row in rows], dtype=np.int64)
+        self.position_of_id = {lot_id: i for i, lot_id in enumerate(self.ids.tolist())}
+        self.lat = np.array([row.latitude for row in rows], dtype=np.float64)
+        self.lng = np.array([row.longitude for row in rows], dtype=np.float64)
+        self.price = np.array([row.price_per_hour for row in rows], dtype=np.float64)
+        self.total = np.array([row.total_spaces for row in rows], dtype=np.int64)
+        self.available = np.array([row.available_spaces for row in rows], dtype=np.int64)
+        self.area_types = [row.area_type for row in rows]
+        self.facility_lists = [row.facilities for row in rows]
+        self.updated = [row.last_updated for row in rows]
+        self.dicts = [self._serialize(row) for row in rows]
+        # When the rows were read; set by the service, which re-reads recent rows from here
+        self.checked_at: Optional[datetime] = None
+
+        self.words = (len(rows) + 63) // 64
+        self.all = pack_bits(np.ones(len(rows), dtype=bool), self.words)
+        members: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            for name in (row.facilities or '').split(','):
+                if name.strip():
+                    members.setdefault(_facility_key(name), []).append(i)
+        self.facilities = {}
+        for key, positions in members.items():
+            mask = np.zeros(len(rows), dtype=bool)
+            mask[positions] = True
+            self.facilities[key] = pack_bits(mask, self.words)
+
+        self.price_order = np.lexsort((self.ids, self.price))
+        self.sorted_prices = self.price[self.price_order]
+        self.grid = SpatialGridIndex(self.lat, self.lng, np.arange(len(rows)), self.CELL_KM)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _serialize(row) -> Dict:
+        # Rows carry the model's column names, so the model's serializer applies as is
+        return ParkingLot.to_dict(row)
+
+    def stale_ids(self, stamps: Sequence) -> List[int]:
+        """Ids among (id, last_updated) pairs whose row differs from the one applied"""
+        stale = []
+        for lot_id, last_updated in stamps:
+            i = self.position_of_id.get(lot_id)
+            if i is not None and self.updated[i] != last_updated:
+                stale.append(lot_id)
+        return stale
+
+    def moved(self, rows: Sequence) -> bool:
+        """Whether any row changes a column the precomputed structures depend on"""
+        for row in rows:
+            i = self.position_of_id.get(row.id)
+            if i is None:
+                continue
+            if (row.latitude != self.lat[i] or row.longitude != self.lng[i] or row.price_per_hour != self.price[i]
+                    or row.facilities != self.facility_lists[i] or row.area_type != self.area_types[i]):
+                return True
+        return False
+
+    def apply(self, rows: Sequence) -> int:
+        """
+        Take the capacity of changed lots from their current rows
+
+        Returns:
+            Number of lots updated
+        """
+        applied = 0
+        for row in rows:
+            i = self.position_of_id.get(row.id)
+            if i is None:
+                continue
+            self.total[i] = row.total_spaces
+            self.available[i] = row.available_spaces
+            self.updated[i] = row.last_updated
+            # Replaced, not mutated, so a response being serialized keeps a consistent dict
+            self.dicts[i] = self._serialize(row)
+            applied += 1
+        return applied
+
+    def facility_bits(self, names: Sequence[str]) -> np.ndarray:
+        """Bitset of the lots offering every named facility"""
+        bits = self.all
+        for name in names:
+            bits = bits & self.facilities.get(_facility_key(name), np.zeros(self.words, dtype=np.uint64))
+        return bits
+
+    def search(self, lat: Optional[float] = None, lng: Optional[float] = None, radius_km: float = 2.0,
+               facilities: Sequence[str] = (), max_price: Optional[float] = None, min_available: int = 0,
+               area_type: Optional[str] = None, sort: str = 'price') -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Find the lots passing every filter
+
+        Args:
+            lat, lng: Centre of a radius filter (both or neither)
+            radius_km: Radius around the centre
+            facilities: Facilities a lot must all offer
+            max_price: Highest price per hour
+            min_available: Fewest free spaces
+            area_type: Exact area type
+            sort: 'distance' (needs a centre), 'price' or 'available' (most free first)
+
+        Returns:
+            (positions in sort order, distances in km aligned with them or None)
+        """
+        distances = None
+        if lat is not None and lng is not None:
+            _, positions, distances = self.grid.within_radius(np.array([lat]), np.array([lng]), np.array([radius_km]))
+            if max_price is not None:
+                keep = self.price[positions] <= max_price
+                positions, distances = positions[keep], distances[keep]
+        elif max_price is not None:
+            positions = self.price_order[:np.searchsorted(self.sorted_prices, max_price, side='right')]
+        else:
+            positions = self.price_order
+
+        if facilities:
+            bits = self.facility_bits(facilities)
+            keep = ((bits[positions // 64] >> (positions % 64).astype(np.uint64)) & np.uint64(1)) == 1
+            positions = positions[keep]
+            distances = distances[keep] if distances is not None else None
+        if min_available > 0 or area_type is not None:
+            keep = self.available[positions] >= min_available
+            if area_type is not None:
+                keep &= np.array([self.area_types[i] == area_type for i in positions.tolist()], dtype=bool)
+            positions = positions[keep]
+            distances = distances[keep] if distances is not None else None
+
+        if sort == 'distance' and distances is not None:
+            order = np.lexsort((self.ids[positions], distances))
+        elif sort == 'available':
+            order = np.lexsort((self.ids[positions], -self.available[positions]))
+        elif distances is not None:
+            order = np.lexsort((self.ids[positions], self.price[positions]))
+        else:
+            # Already in (price, id) order
+            return positions, None
+        return positions[order], distances[order] if distances is not None else None
+
+
+class ParkingLotService:
+    """Service for parking lot search and bulk capacity updates backed by ParkingLotIndex"""
+
+    # Capacity updates accepted per request
+    MAX_CAPACITY_UPDATES = int(os.getenv('LOT_MAX_CAPACITY_UPDATES', '1000'))
+
+    # last_updated is stamped by the writing worker before its commit, so a row can become
+    # visible with a time older than a check that already ran. Each check re-reads this far
+    # back; it must cover the slowest write-to-commit delay plus clock skew between workers.
+    REFRESH_OVERLAP_SECONDS = float(os.getenv('LOT_REFRESH_OVERLAP_SECONDS', '5'))
+
+    @staticmethod
+    def _state() -> Dict:
+        return current_app.extensions.setdefault('parking_lots', {
+            'index': None,
+            'rebuilds': 0,
+            'refreshed_lots': 0
+        })
+
+    @classmethod
+    def get_index(cls) -> ParkingLotIndex:
+        """
+        Get this worker's lot index, current with the database
+
+        One aggregate query is compared with the index. Lots added or removed
+        (a different count or sum of ids) rebuild it. Otherwise the (id, last_updated)
+        of rows updated since the previous check, less REFRESH_OVERLAP_SECONDS, are read,
+        and the rows whose stamp differs from the applied one are fetched and applied in
+        place, which is how capacity updates made by other workers arrive. A row that
+        changed more than capacity rebuilds.
+        """
+        state = cls._state()
+        table = ParkingLot.__table__
+        count, id_sum, latest = db.session.query(
+            func.count(ParkingLot.id), func.coalesce(func.sum(ParkingLot.id), 0), func.max(ParkingLot.last_updated)
+        ).one()
+        signature = (int(count), int(id_sum))
+        with _index_lock:
+            index = state['index']
+            checked_at = datetime.utcnow()
+            changed = None
+            if index is not None and index.signature == signature:
+                since = index.checked_at - timedelta(seconds=cls.REFRESH_OVERLAP_SECONDS)
+                changed = []
+                if latest is not None and latest > since:
+                    stamps = db.session.execute(
+                        select(table.c.id, table.c.last_updated).where(table.c.last_updated > since)
+                    ).all()
+                    ids = index.stale_ids(stamps)
+                    if ids:
+                        changed = db.session.execute(
+                            select(table).where(table.c.id.in_(ids)).order_by(table.c.id)
+                        ).all()
+
+            if changed is None or index.moved(changed):
+                rows = db.session.execute(select(table).order_by(table.c.id)).all()
+                index = state['index'] = ParkingLotIndex(rows, signature)
+                state['rebuilds'] += 1
+                print(f"🅿️  Indexed {len(index)} parking lots with {len(index.facilities)} facilities")
+            else:
+                state['refreshed_lots'] += index.apply(changed)
+            index.checked_at = checked_at
+            return index
+
+    @classmethod
+    def search(cls, limit: int = 20, **filters) -> Dict:
+        """
+        Search parking lots
+
+        Args:
+            limit: Most lots to return
+            filters: Keyword arguments of ParkingLotIndex.search
+
+        Returns:
+            Dictionary with the matching lots (distance_km added when a centre is given) and the match count
+        """
+        index = cls.get_index()
+        positions, distances = index.search(**filters)
+        lots = [index.dicts[i] for i in positions[:limit].tolist()]
+        if distances is not None:
+            lots = [dict(lot, distance_km=round(distance, 3)) for lot, distance in zip(lots, distances.tolist())]
+        return {'lots': lots, 'total_matches': int(len(positions))}
+
+    @classmethod
+    def update_capacity(cls, updates: List[Dict]) -> Dict:
+        """
+        Set the capacity of many lots in one statement and refresh the index in place
+
+        Args:
+            updates: Dictionaries with id, available_spaces and optionally total_spaces
+
+        Returns:
+            Dictionary with the updated lots
+
+        Raises:
+            ValueError: For an unknown lot or free spaces outside 0..total_spaces
+        """
+        index = cls.get_index()
+        params = []
+        for update in updates:
+            i = index.position_of_id.get(update['id'])
+            if i is None:
+                raise ValueError(f'Unknown parking lot {update["id"]}')
+            total = update.get('total_spaces', int(index.total[i]))
+            if total < 0 or not 0 <= update['available_spaces'] <= total:
+                raise ValueError(f'Parking lot {update["id"]}: available_spaces must be between 0 and total_spaces')
+            params.append({'lot_id': update['id'], 'total': total, 'available': update['available_spaces']})
+
+        table = ParkingLot.__table__
+        try:
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('lot_id')).values(
+                    total_spaces=bindparam('total'),
+                    available_spaces=bindparam('available'),
+                    last_updated=datetime.utcnow()
+                ),
+                params
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Apply the written rows now, so this response and the next search already show them
+        ids = {param['lot_id'] for param in params}
+        rows = db.session.execute(select(table).where(table.c.id.in_(ids)).order_by(table.c.id)).all()
+        with _index_lock:
+            cls._state()['refreshed_lots'] += index.apply(rows)
+        return {'updated': len(ids), 'lots': [index.dicts[index.position_of_id[lot_id]] for lot_id in sorted(ids)]}
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """Aggregate capacity and every lot, from the index"""
+        index = cls.get_index()
+        total_capacity = int(index.total.sum())
+        total_available = int(index.available.sum())
+        return {
+            'total_lots': len(index),
+            'total_capacity': total_capacity,
+            'total_available': total_available,
+            'lots': list(index.dicts)
+        }
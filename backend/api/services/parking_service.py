@@ -3,15 +3,45 @@ Melbourne Parking Data Service
 Handles communication with Melbourne Government Open Data API
 """
 
+import os
 import requests
 from datetime import datetime
-from typing import List, Dict, Optional
-from ..models import ParkingSensor, db
+from typing import List, Dict, Optional, Set
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..models import ParkingSensor, ParkingStatusHistory, db
+from ..utils import GeohashUtils
+from .snapshot_service import SnapshotService
+from .forecast_service import ForecastService
+from .turnover_service import TurnoverService
+from .reference_service import ReferenceDataService
+from .webhook_service import WebhookService
+from .saved_area_service import SavedAreaService
+from .sqlite_service import SQLiteService
+from .checkpoint_service import CheckpointService
 
 class MelbourneParkingService:
     """Service for fetching real-time parking data from Melbourne Government API"""
 
-    API_BASE_URL = "https://data.melbourne.vic.gov.au/api/explore/v2.1/catalog/datasets/on-street-parking-bay-sensors/records"
+    # Override with MELBOURNE_API_BASE_URL to point ingest at a local emulator
+    API_BASE_URL = os.getenv(
+        'MELBOURNE_API_BASE_URL',
+        "https://data.melbourne.vic.gov.au/api/explore/v2.1/catalog/datasets/on-street-parking-bay-sensors/records"
+    )
+
+    # Columns an ingest overwrites on an existing sensor
+    UPSERT_COLUMNS = ('zone_number', 'status_description', 'latitude', 'longitude', 'geohash',
+                      'status_timestamp', 'last_updated')
+
+    # kerbside_ids per IN (...) lookup, below SQLite's bound-parameter limit
+    LOOKUP_CHUNK = 500
+
+    @classmethod
+    def api_root(cls) -> str:
+        """The explore/v2.1 root the sensor dataset URL lives under"""
+        return cls.API_BASE_URL.split('/catalog/datasets/')[0]
 
     @classmethod
     def fetch_live_parking_data(cls, limit: int = 100, status_filter: str = None) -> List[Dict]:
@@ -77,76 +107,222 @@ class MelbourneParkingService:
             True if update successful, False otherwise
         """
         try:
+            # Bay and restriction datasets download in parallel with the sensor feed
+            pending_reference = ReferenceDataService.start_refresh(cls.api_root())
             parking_data = cls.fetch_live_parking_data()
+            ReferenceDataService.finish_refresh(pending_reference)
 
             if not parking_data:
                 print("No parking data received from API")
                 return False
 
-            updated_count = 0
-
-            for record in parking_data:
-                try:
-                    # Extract required fields
-                    location = record.get('location', {})
-                    if not location or 'lat' not in location or 'lon' not in location:
-                        continue
-
-                    kerbside_id = record.get('kerbsideid')
-                    if not kerbside_id:
-                        continue
-
-                    # Convert kerbside_id to string to match database field type
-                    kerbside_id = str(kerbside_id)
-
-                    # Parse timestamp
-                    timestamp_str = record.get('status_timestamp')
-                    status_timestamp = None
-                    if timestamp_str:
-                        try:
-                            status_timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                        except:
-                            status_timestamp = datetime.utcnow()
-
-                    # Convert zone_number to string to match database field type
-                    zone_num = record.get('zone_number')
-                    zone_number_str = str(zone_num) if zone_num is not None else None
-
-                    # Update or create parking sensor record
-                    sensor = ParkingSensor.query.filter_by(kerbside_id=kerbside_id).first()
-
-                    if sensor:
-                        # Update existing record
-                        sensor.status_description = record.get('status_description', 'Unknown')
-                        sensor.zone_number = zone_number_str
-                        sensor.latitude = float(location['lat'])
-                        sensor.longitude = float(location['lon'])
-                        sensor.status_timestamp = status_timestamp
-                        sensor.last_updated = datetime.utcnow()
-                    else:
-                        # Create new record
-                        sensor = ParkingSensor(
-                            kerbside_id=kerbside_id,
-                            zone_number=zone_number_str,
-                            status_description=record.get('status_description', 'Unknown'),
-                            latitude=float(location['lat']),
-                            longitude=float(location['lon']),
-                            status_timestamp=status_timestamp,
-                            last_updated=datetime.utcnow()
-                        )
-                        db.session.add(sensor)
-
-                    updated_count += 1
-
-                except Exception as e:
-                    print(f"Error processing parking record: {e}")
-                    continue
-
-            db.session.commit()
-            print(f"Successfully updated {updated_count} parking sensors in database")
-            return True
+            with SQLiteService.writer():
+                return cls._store_records(parking_data)
 
         except Exception as e:
             print(f"Error updating parking database: {e}")
             db.session.rollback()
             return False
+
+    @classmethod
+    def _store_records(cls, parking_data: List[Dict]) -> bool:
+        """Upsert one fetch of API records and record the transitions it contains"""
+        now = datetime.utcnow()
+        # Saved-area deltas apply to counts taken from the table as it stands before this upsert
+        base_version = SnapshotService.read_version()
+        sensors = {}
+        history = []
+        observations = []
+        changes = []
+
+        previous_statuses = cls._current_statuses(
+            {str(record['kerbsideid']) for record in parking_data if record.get('kerbsideid')}
+        )
+
+        for record in parking_data:
+            try:
+                # Extract required fields
+                location = record.get('location', {})
+                if not location or 'lat' not in location or 'lon' not in location:
+                    continue
+
+                kerbside_id = record.get('kerbsideid')
+                if not kerbside_id:
+                    continue
+
+                # Convert kerbside_id to string to match database field type
+                kerbside_id = str(kerbside_id)
+
+                # Parse timestamp
+                timestamp_str = record.get('status_timestamp')
+                status_timestamp = None
+                if timestamp_str:
+                    try:
+                        status_timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+                    except:
+                        status_timestamp = datetime.utcnow()
+
+                # Convert zone_number to string to match database field type
+                zone_num = record.get('zone_number')
+                zone_number_str = str(zone_num) if zone_num is not None else None
+
+                latitude = float(location['lat'])
+                longitude = float(location['lon'])
+                values = {
+                    'kerbside_id': kerbside_id,
+                    'zone_number': zone_number_str,
+                    'status_description': record.get('status_description', 'Unknown'),
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'geohash': GeohashUtils.encode(latitude, longitude),
+                    'status_timestamp': status_timestamp,
+                    'last_updated': now
+                }
+
+                # A sensor repeated within one fetch compares against its earlier reading
+                previous_status = previous_statuses.get(kerbside_id)
+                previous_statuses[kerbside_id] = values['status_description']
+                sensors[kerbside_id] = values
+                observations.append((kerbside_id, zone_number_str, values['status_description']))
+
+                # Keep a row per transition; unchanged readings add nothing to history
+                if values['status_description'] != previous_status:
+                    changes.append(WebhookService.build_event(ParkingSensor(**values), previous_status))
+                    history.append({
+                        'kerbside_id': kerbside_id,
+                        'zone_number': zone_number_str,
+                        'status_description': values['status_description'],
+                        'status_timestamp': status_timestamp or now,
+                        'recorded_at': now
+                    })
+
+            except Exception as e:
+                print(f"Error processing parking record: {e}")
+                continue
+
+        cls._upsert_sensors(list(sensors.values()))
+        if history:
+            db.session.execute(ParkingStatusHistory.__table__.insert(), history)
+        db.session.commit()
+        SnapshotService.invalidate()
+        # Read back rather than derived from now: the column may keep fewer fractional digits
+        version = SnapshotService.read_version()
+        print(f"Successfully updated {len(observations)} parking sensors in database")
+
+        # Forecast profiles are derived data; a failure here must not fail the ingest
+        try:
+            ForecastService.observe(observations)
+        except Exception as e:
+            print(f"⚠️  Failed to update forecast profiles: {e}")
+
+        # Dwell and turnover aggregates advance with this cycle's transitions only
+        try:
+            TurnoverService.observe(changes)
+        except Exception as e:
+            print(f"⚠️  Failed to update turnover statistics: {e}")
+
+        # Point-in-time reads start from these; a missed one only lengthens the next replay
+        try:
+            CheckpointService.maybe_checkpoint()
+        except Exception as e:
+            print(f"⚠️  Failed to write sensor checkpoint: {e}")
+
+        # Webhook delivery happens on a background pool; only the matching runs here
+        try:
+            WebhookService.publish(changes)
+        except Exception as e:
+            print(f"⚠️  Failed to queue webhook notifications: {e}")
+
+        # Saved areas containing changed sensors get relative count updates
+        try:
+            SavedAreaService.apply_changes(changes, base_version, version)
+        except Exception as e:
+            print(f"⚠️  Failed to update saved area counts: {e}")
+
+        return True
+
+    @classmethod
+    def _current_statuses(cls, kerbside_ids: Set[str]) -> Dict[str, str]:
+        """Stored status of each of these sensors that already exists"""
+        kerbside_ids = list(kerbside_ids)
+        statuses = {}
+        for start in range(0, len(kerbside_ids), cls.LOOKUP_CHUNK):
+            statuses.update(
+                db.session.query(ParkingSensor.kerbside_id, ParkingSensor.status_description)
+                .filter(ParkingSensor.kerbside_id.in_(kerbside_ids[start:start + cls.LOOKUP_CHUNK]))
+                .all()
+            )
+        return statuses
+
+    @classmethod
+    def _upsert_sensors(cls, rows: List[Dict]):
+        """
+        Insert new sensors and update existing ones, keyed by kerbside_id
+
+        Uses the database's own upsert (ON CONFLICT on SQLite and PostgreSQL,
+        ON DUPLICATE KEY on MySQL), so concurrent ingests cannot both insert a sensor.
+
+        Args:
+            rows: Column values per sensor, at most one row per kerbside_id
+        """
+        if not rows:
+            return
+        table = ParkingSensor.__table__
+        dialect = db.session.get_bind().dialect.name
+
+        if dialect in ('sqlite', 'postgresql'):
+            statement = (sqlite_insert if dialect == 'sqlite' else postgresql_insert)(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.kerbside_id],
+                set_={name: statement.excluded[name] for name in cls.UPSERT_COLUMNS}
+            )
+            db.session.execute(statement, rows)
+        elif dialect == 'mysql':
+            statement = mysql_insert(table)
+            statement = statement.on_duplicate_key_update(
+                {name: statement.inserted[name] for name in cls.UPSERT_COLUMNS}
+            )
+            db.session.execute(statement, rows)
+        else:
+            # No native upsert: update the sensors that exist, insert the rest
+            existing = cls._current_statuses({row['kerbside_id'] for row in rows})
+            updates = [dict(row, key=row['kerbside_id']) for row in rows if row['kerbside_id'] in existing]
+            inserts = [row for row in rows if row['kerbside_id'] not in existing]
+            if updates:
+                db.session.execute(
+                    table.update().where(table.c.kerbside_id == bindparam('key'))
+                    .values({name: bindparam(name) for name in cls.UPSERT_COLUMNS}),
+                    updates
+                )
+            if inserts:
+                db.session.execute(table.insert(), inserts)
+
+    @classmethod
+    def ensure_geohash(cls, chunk_size: int = 1000) -> int:
+        """
+        Add the geohash column and index to an older parking_sensors table and fill in missing values
+
+        Returns:
+            Number of sensors whose geohash was filled in
+        """
+        columns = {column['name'] for column in inspect(db.engine).get_columns(ParkingSensor.__tablename__)}
+        if 'geohash' not in columns:
+            print("🧭 Adding geohash column to parking_sensors...")
+            with db.engine.begin() as connection:
+                connection.execute(text('ALTER TABLE parking_sensors ADD COLUMN geohash VARCHAR(12)'))
+                connection.execute(text('CREATE INDEX idx_sensor_geohash ON parking_sensors '
+                                         '(geohash, latitude, longitude, status_description, last_updated)'))
+
+        filled = 0
+        while True:
+            sensors = ParkingSensor.query.filter(ParkingSensor.geohash.is_(None)).limit(chunk_size).all()
+            if not sensors:
+                break
+            for sensor in sensors:
+                sensor.geohash = GeohashUtils.encode(sensor.latitude, sensor.longitude)
+            db.session.commit()
+            filled += len(sensors)
+
+        if filled:
+            print(f"🧭 Filled in geohash for {filled} sensors")
+        return filled
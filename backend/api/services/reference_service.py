@@ -0,0 +1,402 @@
+"""
+Reference Data Service for Melbourne Parking System
+Fetches the bay and sign-plate restriction datasets alongside sensor ingest and joins them in memory
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from flask import current_app
+
+from .forecast_service import MELBOURNE_TZ
+from .spatial_service import SpatialIndexService
+
+# Open Data datasets joined onto the sensor feed: bays by kerbside ID, sign plates by zone
+REFERENCE_DATASETS = {
+    'bays': {
+        'dataset': 'on-street-parking-bays',
+        'select': 'kerbsideid,roadsegmentid,roadsegmentdescription,latitude,longitude'
+    },
+    'restrictions': {
+        'dataset': 'sign-plates-located-in-each-parking-zone',
+        'select': 'parkingzone,restriction_days,time_restrictions_start,time_restrictions_finish,restriction_display'
+    }
+}
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+_fetch_pool = ThreadPoolExecutor(max_workers=len(REFERENCE_DATASETS), thread_name_prefix='reference-fetch')
+_view_lock = threading.Lock()
+
+
+def parse_days(text: Optional[str]) -> List[int]:
+    """'Mon-Fri', 'Sat-Sun' or 'Mon,Wed' to weekday numbers (Monday = 0)"""
+    days = set()
+    for part in (text or '').lower().replace(' ', '').split(','):
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        if first[:3] not in WEEKDAYS:
+            continue
+        start = WEEKDAYS.index(first[:3])
+        end = WEEKDAYS.index(last[:3]) if last[:3] in WEEKDAYS else start
+        day = start
+        while True:
+            days.add(day)
+            if day == end:
+                break
+            day = (day + 1) % 7
+    return sorted(days)
+
+
+def parse_minute(text: Optional[str]) -> Optional[int]:
+    """'07:30:00' or '7:30' to minutes after midnight"""
+    match = re.match(r'^\s*(\d{1,2}):(\d{2})', text or '')
+    if not match:
+        return None
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def parse_display(display: Optional[str]) -> Dict:
+    """
+    Decode a sign-plate code such as '2P', 'MP1P', 'LZ30', 'P/10' or 'DP2P'
+
+    Returns:
+        Dictionary with duration_minutes (None when unlimited or unknown), metered,
+        loading_zone and disabled flags
+    """
+    code = (display or '').upper().replace(' ', '')
+    duration = None
+    loading = code.startswith('LZ')
+    if loading:
+        match = re.match(r'^LZ(\d+)', code)
+        duration = int(match.group(1)) if match else None
+    else:
+        match = re.search(r'P/(\d+)', code)
+        if match:
+            duration = int(match.group(1))
+        else:
+            match = re.search(r'(\d+)(?:/(\d+))?P', code)
+            if match:
+                hours = int(match.group(1)) / int(match.group(2) or 1)
+                duration = int(round(hours * 60))
+    return {
+        'duration_minutes': duration,
+        'metered': code.startswith('M'),
+        'loading_zone': loading,
+        'disabled': code.startswith('DP')
+    }
+
+
+class ReferenceView:
+    """In-memory join indexes: kerbside ID -> bay, zone -> parsed restrictions"""
+
+    def __init__(self):
+        self.bays: Dict[str, Dict] = {}
+        self.zone_restrictions: Dict[str, List[Dict]] = {}
+        self.mtimes: Dict[str, Optional[int]] = {name: None for name in REFERENCE_DATASETS}
+        self.sensors: Dict[str, Dict] = {}
+        self.sensor_key: Optional[Tuple] = None
+
+    def load_bays(self, records: List[Dict]):
+        bays = {}
+        for record in records:
+            kerbside_id = record.get('kerbsideid')
+            if kerbside_id is None:
+                continue
+            bays[str(kerbside_id)] = {
+                'road_segment_id': record.get('roadsegmentid'),
+                'road_segment': record.get('roadsegmentdescription'),
+                'latitude': record.get('latitude'),
+                'longitude': record.get('longitude')
+            }
+        self.bays = bays
+
+    def load_restrictions(self, records: List[Dict]):
+        zones: Dict[str, List[Dict]] = {}
+        for record in records:
+            zone = record.get('parkingzone')
+            if zone is None:
+                continue
+            restriction = {
+                'display': record.get('restriction_display'),
+                'days': record.get('restriction_days'),
+                'start': record.get('time_restrictions_start'),
+                'finish': record.get('time_restrictions_finish'),
+                'weekdays': parse_days(record.get('restriction_days')),
+                'start_minute': parse_minute(record.get('time_restrictions_start')),
+                'finish_minute': parse_minute(record.get('time_restrictions_finish'))
+            }
+            restriction.update(parse_display(restriction['display']))
+            zones.setdefault(str(zone), []).append(restriction)
+        for restrictions in zones.values():
+            restrictions.sort(key=lambda r: (r['weekdays'][:1], r['start_minute'] or 0))
+        self.zone_restrictions = zones
+
+    @staticmethod
+    def active_restriction(restrictions: List[Dict], at: datetime) -> Optional[Dict]:
+        """
+        The sign plate in force at a time
+
+        Args:
+            restrictions: Parsed restrictions of one zone
+            at: Naive UTC time
+
+        Returns:
+            Restriction dictionary, or None if no plate applies
+        """
+        local = at.replace(tzinfo=timezone.utc).astimezone(MELBOURNE_TZ)
+        minute = local.hour * 60 + local.minute
+        for restriction in restrictions:
+            start, finish = restriction['start_minute'], restriction['finish_minute']
+            if start is None or finish is None:
+                continue
+            if finish > start:
+                applies = local.weekday() in restriction['weekdays'] and start <= minute < finish
+            else:
+                # Overnight plates (e.g. 22:00 - 07:00) belong to the day they start on
+                yesterday = (local.weekday() - 1) % 7
+                applies = ((local.weekday() in restriction['weekdays'] and minute >= start) or
+                           (yesterday in restriction['weekdays'] and minute < finish))
+            if applies:
+                return restriction
+        return None
+
+    def refresh_sensors(self, snapshot) -> Dict[str, Dict]:
+        """
+        Denormalized static record per sensor, rebuilt only where something changed
+
+        Entries whose zone and reference data are unchanged are reused from the
+        previous build, so a new snapshot mostly costs one dictionary pass.
+        """
+        key = (snapshot.version, self.mtimes.get('bays'), self.mtimes.get('restrictions'))
+        if key == self.sensor_key:
+            return self.sensors
+
+        reuse = self.sensor_key is not None and key[1:] == self.sensor_key[1:]
+        previous = self.sensors if reuse else {}
+        sensors = {}
+        for kerbside_id, zone in zip(snapshot.kerbside_ids, snapshot.zones):
+            entry = previous.get(kerbside_id)
+            if entry is None or entry['zone_number'] != zone:
+                bay = self.bays.get(kerbside_id)
+                entry = {
+                    'zone_number': zone,
+                    'road_segment': bay['road_segment'] if bay else None,
+                    'road_segment_id': bay['road_segment_id'] if bay else None,
+                    'restrictions': self.zone_restrictions.get(zone or '', [])
+                }
+            sensors[kerbside_id] = entry
+        self.sensors = sensors
+        self.sensor_key = key
+        return sensors
+
+
+class ReferenceDataService:
+    """Service for the bay and restriction reference datasets"""
+
+    # Reference datasets change rarely; re-check each one at most this often
+    REFRESH_SECONDS = float(os.getenv('REFERENCE_REFRESH_SECONDS', '21600'))
+
+    @classmethod
+    def data_dir(cls) -> str:
+        return os.getenv('REFERENCE_DATA_DIR') or os.path.join(current_app.instance_path, 'reference')
+
+    @classmethod
+    def _paths(cls, name: str) -> Tuple[str, str]:
+        directory = cls.data_dir()
+        return os.path.join(directory, f'{name}.json'), os.path.join(directory, f'{name}.meta.json')
+
+    @classmethod
+    def _read_meta(cls, name: str) -> Dict:
+        try:
+            with open(cls._paths(name)[1]) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_json(path: str, payload):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def fetch_dataset(api_root: str, name: str, etag: Optional[str]) -> Dict:
+        """
+        Download one reference dataset through the exports endpoint (no app context needed)
+
+        Args:
+            api_root: .../api/explore/v2.1 base URL
+            name: Key in REFERENCE_DATASETS
+            etag: ETag of the stored copy, sent as If-None-Match
+
+        Returns:
+            Dictionary with status ('not_modified' or 'ok'), records, etag and digest
+        """
+        spec = REFERENCE_DATASETS[name]
+        url = f"{api_root}/catalog/datasets/{spec['dataset']}/exports/json"
+        headers = {'If-None-Match': etag} if etag else {}
+        response = requests.get(url, params={'select': spec['select']}, headers=headers, timeout=60)
+        if response.status_code == 304:
+            return {'status': 'not_modified'}
+        response.raise_for_status()
+        return {
+            'status': 'ok',
+            'records': response.json(),
+            'etag': response.headers.get('ETag'),
+            'digest': hashlib.sha256(response.content).hexdigest()
+        }
+
+    @classmethod
+    def start_refresh(cls, api_root: str, force: bool = False) -> Dict[str, Future]:
+        """
+        Start downloading every reference dataset that is due, in parallel
+
+        Called before the sensor fetch so all downloads overlap.
+
+        Args:
+            api_root: .../api/explore/v2.1 base URL
+            force: Ignore REFRESH_SECONDS
+
+        Returns:
+            Pending downloads by dataset name
+        """
+        pending = {}
+        now = time.time()
+        for name in REFERENCE_DATASETS:
+            meta = cls._read_meta(name)
+            if force or now - meta.get('checked_at', 0) >= cls.REFRESH_SECONDS:
+                pending[name] = _fetch_pool.submit(cls.fetch_dataset, api_root, name, meta.get('etag'))
+        return pending
+
+    @classmethod
+    def finish_refresh(cls, pending: Dict[str, Future], timeout: float = 120.0) -> Dict[str, str]:
+        """
+        Store finished downloads; unchanged datasets only have their check time updated
+
+        Returns:
+            Outcome per dataset: 'updated', 'unchanged' or 'failed'
+        """
+        outcomes = {}
+        for name, future in pending.items():
+            records_path, meta_path = cls._paths(name)
+            meta = cls._read_meta(name)
+            try:
+                result = future.result(timeout=timeout)
+            except Exception as e:
+                print(f"⚠️  Failed to refresh {name} reference data: {e}")
+                outcomes[name] = 'failed'
+                continue
+
+            if result['status'] == 'ok' and result['digest'] != meta.get('digest'):
+                cls._write_json(records_path, result['records'])
+                meta.update(etag=result['etag'], digest=result['digest'], records=len(result['records']),
+                            updated_at=datetime.utcnow().isoformat())
+                outcomes[name] = 'updated'
+                print(f"📚 Refreshed {name}: {len(result['records'])} records")
+            else:
+                if result['status'] == 'ok':
+                    meta['etag'] = result['etag']
+                outcomes[name] = 'unchanged'
+            meta['checked_at'] = time.time()
+            cls._write_json(meta_path, meta)
+        return outcomes
+
+    @classmethod
+    def refresh(cls, api_root: str, force: bool = False) -> Dict[str, str]:
+        """Fetch and store all due reference datasets"""
+        return cls.finish_refresh(cls.start_refresh(api_root, force=force))
+
+    @classmethod
+    def get_view(cls) -> ReferenceView:
+        """
+        Get this worker's join indexes, reloading only the datasets whose files changed
+
+        Returns:
+            ReferenceView
+        """
+        state = current_app.extensions.setdefault('parking_reference', {'view': ReferenceView()})
+        view = state['view']
+        for name in REFERENCE_DATASETS:
+            records_path = cls._paths(name)[0]
+            try:
+                mtime = os.stat(records_path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == view.mtimes[name]:
+                continue
+            with _view_lock:
+                if mtime == view.mtimes[name]:
+                    continue
+                records = []
+                if mtime is not None:
+                    with open(records_path) as f:
+                        records = json.load(f)
+                getattr(view, f'load_{name}')(records)
+                view.mtimes[name] = mtime
+        return view
+
+    @classmethod
+    def view_version(cls) -> Tuple:
+        """Modification times of the stored datasets the current view was loaded from"""
+        view = cls.get_view()
+        return tuple(view.mtimes[name] for name in REFERENCE_DATASETS)
+
+    @classmethod
+    def sensor_details(cls) -> Dict[str, Dict]:
+        """Denormalized bay and restriction record per kerbside ID for the current snapshot"""
+        view = cls.get_view()
+        snapshot = SpatialIndexService.get_snapshot()
+        with _view_lock:
+            return view.refresh_sensors(snapshot)
+
+    @classmethod
+    def describe(cls, details: Dict, at: datetime, full: bool = True) -> Dict:
+        """
+        Public shape of one sensor's joined record at a point in time
+
+        Args:
+            details: Entry from sensor_details
+            at: Naive UTC time used to pick the active sign plate
+            full: Include every plate of the zone, not just the active one
+        """
+        described = {
+            'road_segment': details['road_segment'],
+            'road_segment_id': details['road_segment_id']
+        }
+        described.update(cls.describe_restrictions(details['restrictions'], at, full=full))
+        return described
+
+    @classmethod
+    def describe_restrictions(cls, restrictions: List[Dict], at: datetime, full: bool = True) -> Dict:
+        """Active sign plate (and optionally every plate) of a zone's parsed restrictions"""
+        described = {'active_restriction': cls._public(ReferenceView.active_restriction(restrictions, at))}
+        if full:
+            described['restrictions'] = [cls._public(r) for r in restrictions]
+        return described
+
+    @staticmethod
+    def _public(restriction: Optional[Dict]) -> Optional[Dict]:
+        if restriction is None:
+            return None
+        return {
+            'display': restriction['display'],
+            'days': restriction['days'],
+            'start': restriction['start'],
+            'finish': restriction['finish'],
+            'duration_minutes': restriction['duration_minutes'],
+            'metered': restriction['metered'],
+            'loading_zone': restriction['loading_zone'],
+            'disabled': restriction['disabled']
+        }
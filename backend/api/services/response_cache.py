@@ -0,0 +1,178 @@
+"""
+Response Cache Service for Melbourne Parking System
+Renders cacheable responses once per snapshot version and serves precompressed variants
+"""
+
+import functools
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from flask import Response, current_app, make_response, request
+
+from .snapshot_service import SnapshotService
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip and identity are always available
+    brotli = None
+
+_cache_lock = threading.Lock()
+
+
+class ResponseCacheService:
+    """Service for version-keyed, precompressed response bodies with ETag revalidation"""
+
+    MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+
+    # Bodies smaller than this are not worth compressing
+    MIN_COMPRESS_BYTES = 512
+
+    @classmethod
+    def _store(cls) -> Dict:
+        return current_app.extensions.setdefault('parking_response_cache', {
+            'entries': OrderedDict(),
+            'key_locks': {},
+            'hits': 0,
+            'misses': 0
+        })
+
+    @staticmethod
+    def _render_entry(response: Response, version: int) -> Dict:
+        """Encode a rendered response once in every supported encoding"""
+        body = response.get_data()
+        digest = hashlib.sha256(body).hexdigest()[:24]
+        variants = {'identity': body}
+        if len(body) >= ResponseCacheService.MIN_COMPRESS_BYTES:
+            variants['gzip'] = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                variants['br'] = brotli.compress(body, quality=5)
+
+        return {
+            'etag': f'"{version:x}-{digest}"',
+            'mimetype': response.mimetype,
+            'variants': variants
+        }
+
+    @staticmethod
+    def choose_encoding(accept_encoding: str, available) -> str:
+        """
+        Pick the best available encoding for an Accept-Encoding header
+
+        Args:
+            accept_encoding: Raw header value
+            available: Encodings stored for the entry
+
+        Returns:
+            'br', 'gzip' or 'identity'
+        """
+        accepted = {}
+        for part in (accept_encoding or '').split(','):
+            pieces = part.strip().split(';')
+            name = pieces[0].strip().lower()
+            if not name:
+                continue
+            quality = 1.0
+            for param in pieces[1:]:
+                key, _, value = param.strip().partition('=')
+                if key == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            accepted[name] = quality
+
+        for encoding in ('br', 'gzip'):
+            quality = accepted.get(encoding, accepted.get('*', 0.0))
+            if encoding in available and quality > 0:
+                return encoding
+        return 'identity'
+
+    @staticmethod
+    def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        return etag in candidates or f'W/{etag}' in candidates
+
+    @classmethod
+    def cached(cls, view: Callable = None, vary: Callable[[], object] = None) -> Callable:
+        """
+        Decorator for GET views whose output depends only on the query string and sensor data
+
+        The first request for a (view, query string, snapshot version) renders the view
+        and stores gzip and brotli variants. Later requests get the stored bytes in the
+        encoding they accept, and If-None-Match revalidation is answered with 304.
+        Error responses are passed through uncached.
+
+        Args:
+            view: View function (when used as a plain decorator)
+            vary: Called per request for anything else the output depends on, such as
+                reference data or the time; its hashable result joins the key
+        """
+        if view is None:
+            return functools.partial(cls.cached, vary=vary)
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version = SnapshotService.current_version()
+            key = (request.endpoint, tuple(sorted(request.args.items(multi=True))), version,
+                   vary() if vary else None)
+            store = cls._store()
+
+            entry = store['entries'].get(key)
+            if entry is None:
+                with _cache_lock:
+                    key_lock = store['key_locks'].setdefault(key, threading.Lock())
+                # Only one thread renders a given key; the others wait and reuse it
+                with key_lock:
+                    entry = store['entries'].get(key)
+                    if entry is None:
+                        # Dropped however rendering ends, so failing queries leave no lock behind
+                        try:
+                            response = make_response(view(*args, **kwargs))
+                            if response.status_code != 200 or response.is_streamed:
+                                return response
+                            entry = cls._render_entry(response, version)
+                            with _cache_lock:
+                                store['entries'][key] = entry
+                                store['misses'] += 1
+                                while len(store['entries']) > cls.MAX_ENTRIES:
+                                    evicted, _ = store['entries'].popitem(last=False)
+                                    store['key_locks'].pop(evicted, None)
+                        finally:
+                            with _cache_lock:
+                                store['key_locks'].pop(key, None)
+            else:
+                with _cache_lock:
+                    store['hits'] += 1
+                    if key in store['entries']:
+                        store['entries'].move_to_end(key)
+
+            headers = {
+                'ETag': entry['etag'],
+                'Vary': 'Accept-Encoding',
+                # Clients may keep the body but must revalidate, which is a cheap 304
+                'Cache-Control': 'no-cache'
+            }
+
+            if cls._etag_matches(request.headers.get('If-None-Match'), entry['etag']):
+                return Response(status=304, headers=headers)
+
+            encoding = cls.choose_encoding(request.headers.get('Accept-Encoding', ''), entry['variants'])
+            if encoding != 'identity':
+                headers['Content-Encoding'] = encoding
+            return Response(entry['variants'][encoding], mimetype=entry['mimetype'], headers=headers)
+
+        return wrapper
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """Cache hit/miss counters for this worker"""
+        store = cls._store()
+        return {'entries': len(store['entries']), 'hits': store['hits'], 'misses': store['misses']}
@@ -0,0 +1,372 @@
+"""
+Saved Area Service for Melbourne Parking System
+Keeps per-area availability counts current by applying each ingest's status changes
+"""
+
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import bindparam, func, inspect, text
+
+from ..models import SavedArea, db
+from .spatial_service import KM_PER_DEGREE, SpatialIndexService, haversine_km
+
+# Saved-area cells sit on one fixed lattice; longitude spacing uses the CBD latitude
+SAVED_AREA_REFERENCE_LAT = -37.8136
+
+_index_lock = threading.Lock()
+
+
+class SavedAreaIndex:
+    """
+    Inverted index from grid cell to the saved areas whose circle's bounding box overlaps it
+
+    Held as two parallel arrays sorted by cell key, so the areas of any set of cells
+    are found with searchsorted rather than per-cell dictionary lookups.
+    """
+
+    CELL_KM = float(os.getenv('SAVED_AREA_CELL_KM', '0.25'))
+
+    # Columns are offset so a (row, col) pair packs into one ordered int64 key
+    COL_OFFSET = 1 << 31
+
+    def __init__(self, areas: List[Tuple[int, float, float, float]], signature: Tuple[int, int]):
+        """
+        Args:
+            areas: (id, latitude, longitude, radius_km) of every saved area
+            signature: (count, sum of ids) of the table the areas were read from
+        """
+        self.signature = signature
+        self.d_lat = self.CELL_KM / KM_PER_DEGREE
+        self.d_lng = self.d_lat / math.cos(math.radians(SAVED_AREA_REFERENCE_LAT))
+
+        geometry = np.array([area[1:] for area in areas], dtype=np.float64).reshape(-1, 3)
+        self.area_ids = np.array([area[0] for area in areas], dtype=np.int64)
+        self.lat, self.lng, self.radius_km = geometry[:, 0], geometry[:, 1], geometry[:, 2]
+
+        # Same conservative box as SpatialGridIndex.within_radius
+        lat_span = self.radius_km / KM_PER_DEGREE
+        cos_lat = np.maximum(np.cos(np.radians(np.minimum(np.abs(self.lat) + lat_span, 89.0))), 1e-6)
+        lng_span = self.radius_km / (KM_PER_DEGREE * cos_lat)
+        row_lo, col_lo = self._cells(self.lat - lat_span, self.lng - lng_span)
+        row_hi, col_hi = self._cells(self.lat + lat_span, self.lng + lng_span)
+
+        # One entry per (area, cell) in the area's box, expanded without a Python loop
+        heights = row_hi - row_lo + 1
+        widths = col_hi - col_lo + 1
+        counts = heights * widths
+        owners = np.repeat(np.arange(len(self.area_ids)), counts)
+        offsets = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = row_lo[owners] + offsets // widths[owners]
+        cols = col_lo[owners] + offsets % widths[owners]
+
+        keys = self._keys(rows, cols)
+        order = np.argsort(keys, kind='stable')
+        self.cell_keys = keys[order]
+        self.cell_areas = owners[order]
+
+    def __len__(self) -> int:
+        return len(self.area_ids)
+
+    def _cells(self, lats: np.ndarray, lngs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return np.floor(lats / self.d_lat).astype(np.int64), np.floor(lngs / self.d_lng).astype(np.int64)
+
+    def _keys(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        return (rows << 32) + (cols + self.COL_OFFSET)
+
+    def match(self, lats: np.ndarray, lngs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pair points with the saved areas that contain them
+
+        Only the areas listed under each point's cell are checked, with the same
+        haversine test the full recount uses.
+
+        Returns:
+            (point indexes, area ids) for every point inside an area
+        """
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if not len(self.cell_keys) or not len(lats):
+            return empty
+
+        keys = self._keys(*self._cells(lats, lngs))
+        starts = np.searchsorted(self.cell_keys, keys, side='left')
+        lengths = np.searchsorted(self.cell_keys, keys, side='right') - starts
+        total = int(lengths.sum())
+        if not total:
+            return empty
+
+        point_ids = np.repeat(np.arange(len(lats)), lengths)
+        flat = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+        areas = self.cell_areas[flat]
+
+        distances = haversine_km(self.lat[areas], self.lng[areas], lats[point_ids], lngs[point_ids])
+        inside = distances <= self.radius_km[areas]
+        return point_ids[inside], self.area_ids[areas[inside]]
+
+
+class SavedAreaService:
+    """Service for saved areas and their incrementally maintained availability counts"""
+
+    MAX_RADIUS_KM = float(os.getenv('SAVED_AREA_MAX_RADIUS_KM', '5'))
+    MAX_AREAS_PER_SESSION = int(os.getenv('SAVED_AREA_MAX_PER_SESSION', '50'))
+
+    # Areas recounted per statement when rebuilding every count
+    RECOUNT_CHUNK = 1000
+
+    @staticmethod
+    def _state() -> Dict:
+        return current_app.extensions.setdefault('parking_saved_areas', {
+            'index': None,
+            'stale': False,
+            'applied_changes': 0,
+            'updated_areas': 0,
+            'recounted_areas': 0,
+            'last_apply_ms': None
+        })
+
+    @staticmethod
+    def _signature() -> Tuple[int, int]:
+        count, id_sum = db.session.query(func.count(SavedArea.id), func.coalesce(func.sum(SavedArea.id), 0)).one()
+        return int(count), int(id_sum)
+
+    @classmethod
+    def get_index(cls) -> SavedAreaIndex:
+        """
+        Get this worker's cell index, rebuilding it when areas were added or removed
+
+        Areas can be created by any worker, so the index is compared with a cheap
+        (count, sum of ids) signature of the table before it is used.
+        """
+        state = cls._state()
+        signature = cls._signature()
+        with _index_lock:
+            index = state['index']
+            if index is None or index.signature != signature:
+                areas = db.session.query(SavedArea.id, SavedArea.latitude, SavedArea.longitude,
+                                         SavedArea.radius_km).all()
+                index = state['index'] = SavedAreaIndex(areas, signature)
+                print(f"🗺️  Indexed {len(areas)} saved areas over {len(index.cell_keys)} cell entries")
+            return index
+
+    @staticmethod
+    def count_areas(snapshot, lats: np.ndarray, lngs: np.ndarray, radii: np.ndarray) -> np.ndarray:
+        """
+        Count sensors inside many circles at once from a snapshot
+
+        Returns:
+            Array shaped (len(lats), 3) of total, available and occupied counts
+        """
+        query_ids, positions, _ = snapshot.grid().within_radius(lats, lngs, radii)
+        n = len(lats)
+        return np.stack([
+            np.bincount(query_ids, minlength=n),
+            np.bincount(query_ids, weights=snapshot.available[positions], minlength=n),
+            np.bincount(query_ids, weights=snapshot.occupied[positions], minlength=n)
+        ], axis=1).astype(np.int64)
+
+    @staticmethod
+    def snapshot_version(snapshot) -> int:
+        """
+        The version a snapshot's contents stand for: its newest last_updated value
+
+        Read from the arrays rather than snapshot.version, which is taken before the
+        rows are fetched and can trail an ingest that commits in between.
+        """
+        if not len(snapshot):
+            return 0
+        return int(snapshot.updated_at.max().astype(np.int64))
+
+    @classmethod
+    def evaluate(cls, area: SavedArea):
+        """Fill in a new area's counts from the current snapshot"""
+        snapshot = SpatialIndexService.get_snapshot()
+        counts = cls.count_areas(snapshot, np.array([area.latitude]), np.array([area.longitude]),
+                                 np.array([area.radius_km]))[0]
+        area.total_count, area.available_count, area.occupied_count = (int(value) for value in counts)
+        area.counts_version = cls.snapshot_version(snapshot)
+        area.counts_updated_at = datetime.utcnow()
+
+    @classmethod
+    def apply_changes(cls, events: List[Dict], base_version: int, version: int) -> Dict:
+        """
+        Adjust the counts of the saved areas that contain changed sensors
+
+        Called after an ingest commits. Each event moves one sensor from its previous
+        status to its new one (a new sensor has no previous status and adds to the
+        total), so only the areas listed under the changed sensors' cells are touched
+        and each gets one relative UPDATE.
+
+        Deltas only apply to areas whose counts are exact for base_version, the table
+        the ingest started from; every such area then moves to version. Areas created
+        while the ingest ran were evaluated on a snapshot from before or after it, so
+        they are either already at version or are recounted here, as is any area left
+        behind by an earlier ingest.
+
+        Args:
+            events: Change events built with WebhookService.build_event
+            base_version: Snapshot version before the ingest
+            version: Snapshot version the ingest committed
+
+        Returns:
+            Dictionary with the number of changes applied, areas updated and areas recounted
+        """
+        state = cls._state()
+        if state['stale']:
+            # A previous apply failed part-way; deltas would build on wrong counts
+            result = cls.recount()
+            state['stale'] = False
+            return {'changes': len(events), 'areas': result['areas'], 'recounted': result['areas']}
+
+        started = datetime.utcnow()
+        index = cls.get_index()
+        touched, totals = cls._deltas(index, events)
+        changed = np.flatnonzero(totals.any(axis=1))
+
+        try:
+            table = SavedArea.__table__
+            now = datetime.utcnow()
+            if len(changed):
+                db.session.execute(
+                    table.update().where(table.c.id == bindparam('area_id'))
+                    .where(table.c.counts_version == base_version).values(
+                        total_count=table.c.total_count + bindparam('d_total'),
+                        available_count=table.c.available_count + bindparam('d_available'),
+                        occupied_count=table.c.occupied_count + bindparam('d_occupied'),
+                        counts_version=version,
+                        counts_updated_at=now
+                    ),
+                    [{'area_id': area_id, 'd_total': d_total, 'd_available': d_available, 'd_occupied': d_occupied}
+                     for area_id, (d_total, d_available, d_occupied) in
+                     zip(touched[changed].tolist(), totals[changed].tolist())]
+                )
+            # The rest of the areas at base_version saw no change, so their counts hold at version
+            db.session.execute(
+                table.update().where(table.c.counts_version == base_version)
+                .values(counts_version=version, counts_updated_at=now)
+            )
+            db.session.commit()
+
+            # Areas added after the index was read were moved along without their deltas
+            added = np.setdiff1d(cls.get_index().area_ids, index.area_ids)
+            behind = db.session.query(SavedArea.id).filter(
+                (SavedArea.counts_version.is_(None)) | (SavedArea.counts_version < version)
+            ).all()
+            recounted = cls._recount_ids(sorted(set(added.tolist()) | {area_id for area_id, in behind}))
+        except Exception:
+            db.session.rollback()
+            state['stale'] = True
+            raise
+
+        elapsed_ms = (datetime.utcnow() - started).total_seconds() * 1000
+        state['applied_changes'] += len(events)
+        state['updated_areas'] += len(changed)
+        state['recounted_areas'] += recounted
+        state['last_apply_ms'] = round(elapsed_ms, 2)
+        print(f"📍 Updated {len(changed)} saved areas from {len(events)} status changes "
+              f"({recounted} recounted) in {elapsed_ms:.1f} ms")
+        return {'changes': len(events), 'areas': int(len(changed)), 'recounted': recounted}
+
+    @staticmethod
+    def _deltas(index: SavedAreaIndex, events: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """Area ids containing changed sensors, with their summed total, available and occupied changes"""
+        if not len(index) or not events:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 3), dtype=np.int64)
+
+        lats = np.array([event['latitude'] for event in events], dtype=np.float64)
+        lngs = np.array([event['longitude'] for event in events], dtype=np.float64)
+        # Per event: change to total, available and occupied
+        deltas = np.array([
+            (event['previous_status'] is None,
+             (event['status'] == 'Unoccupied') - (event['previous_status'] == 'Unoccupied'),
+             (event['status'] == 'Occupied') - (event['previous_status'] == 'Occupied'))
+            for event in events
+        ], dtype=np.int64)
+
+        point_ids, area_ids = index.match(lats, lngs)
+        touched, inverse = np.unique(area_ids, return_inverse=True)
+        totals = np.zeros((len(touched), 3), dtype=np.int64)
+        np.add.at(totals, inverse, deltas[point_ids])
+        return touched, totals
+
+    @classmethod
+    def _recount_ids(cls, area_ids: List[int]) -> int:
+        """Recompute the counts of these areas from the current snapshot"""
+        if not area_ids:
+            return 0
+        areas = []
+        for start in range(0, len(area_ids), cls.RECOUNT_CHUNK):
+            areas.extend(db.session.query(SavedArea.id, SavedArea.latitude, SavedArea.longitude, SavedArea.radius_km)
+                         .filter(SavedArea.id.in_(area_ids[start:start + cls.RECOUNT_CHUNK])).all())
+        cls._write_counts(SpatialIndexService.get_snapshot(), areas)
+        return len(areas)
+
+    @classmethod
+    def _write_counts(cls, snapshot, areas: List[Tuple[int, float, float, float]]):
+        """Store fresh counts for (id, latitude, longitude, radius_km) rows and commit"""
+        table = SavedArea.__table__
+        version = cls.snapshot_version(snapshot)
+        now = datetime.utcnow()
+
+        for start in range(0, len(areas), cls.RECOUNT_CHUNK):
+            chunk = np.array([area[1:] for area in areas[start:start + cls.RECOUNT_CHUNK]], dtype=np.float64)
+            counts = cls.count_areas(snapshot, chunk[:, 0], chunk[:, 1], chunk[:, 2])
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('area_id')).values(
+                    total_count=bindparam('total'),
+                    available_count=bindparam('available'),
+                    occupied_count=bindparam('occupied'),
+                    counts_version=version,
+                    counts_updated_at=now
+                ),
+                [{'area_id': area[0], 'total': total, 'available': available, 'occupied': occupied}
+                 for area, (total, available, occupied) in
+                 zip(areas[start:start + cls.RECOUNT_CHUNK], counts.tolist())]
+            )
+        db.session.commit()
+
+    @classmethod
+    def recount(cls) -> Dict:
+        """
+        Recompute every saved area's counts from the current snapshot
+
+        Used to repair counts after a failed apply and to check the incremental
+        path; ingest itself only recounts areas that missed an update.
+
+        Returns:
+            Dictionary with the number of areas recounted and the snapshot version
+        """
+        snapshot = SpatialIndexService.get_snapshot()
+        areas = db.session.query(SavedArea.id, SavedArea.latitude, SavedArea.longitude, SavedArea.radius_km).all()
+        cls._write_counts(snapshot, areas)
+        print(f"📍 Recounted {len(areas)} saved areas at snapshot v{snapshot.version}")
+        return {'areas': len(areas), 'snapshot_version': snapshot.version}
+
+    @classmethod
+    def ensure_counts_version(cls):
+        """Add the counts_version column to an older saved_areas table; its areas are recounted on the next ingest"""
+        columns = {column['name'] for column in inspect(db.engine).get_columns(SavedArea.__tablename__)}
+        if 'counts_version' not in columns:
+            print("📍 Adding counts_version column to saved_areas...")
+            with db.engine.begin() as connection:
+                connection.execute(text('ALTER TABLE saved_areas ADD COLUMN counts_version BIGINT'))
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """Index size and apply counters for this worker"""
+        state = cls._state()
+        index: Optional[SavedAreaIndex] = state['index']
+        return {
+            'indexed_areas': len(index) if index else 0,
+            'cell_entries': len(index.cell_keys) if index else 0,
+            'cell_km': SavedAreaIndex.CELL_KM,
+            'stale': state['stale'],
+            'applied_changes': state['applied_changes'],
+            'updated_areas': state['updated_areas'],
+            'recounted_areas': state['recounted_areas'],
+            'last_apply_ms': state['last_apply_ms']
+        }
@@ -0,0 +1,210 @@
+"""
+Sensor Table for Melbourne Parking System
+Compact column-array form of parking sensor rows for read paths
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from ..models import ParkingSensor, db
+
+
+def _categorical(values: Sequence) -> Tuple[np.ndarray, List]:
+    """
+    Encode repeated values as small integer codes
+
+    Returns:
+        (codes, categories) with categories[codes[i]] == values[i]; each distinct
+        value is stored once however many sensors share it
+    """
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(value, len(lookup)) for value in values),
+                        dtype=np.int32, count=len(values))
+    return codes, list(lookup)
+
+
+def _isoformat(values: np.ndarray) -> List[Optional[str]]:
+    """datetime.isoformat() strings for a datetime64[us] array, None for NaT"""
+    strings = np.datetime_as_string(values, unit='us').tolist()
+    # isoformat() leaves out a zero microsecond part
+    return [None if s == 'NaT' else s[:-7] if s.endswith('.000000') else s for s in strings]
+
+
+class SensorTable:
+    """
+    Parking sensors as parallel column arrays instead of ORM objects
+
+    Coordinates are float64 arrays, timestamps datetime64[us] arrays, and zone and
+    status strings are categorical codes into a short list of distinct values.
+    Rows come from one Core SELECT of the columns below, so no identity map or
+    attribute instrumentation is involved, and filters and serialization run on
+    whole columns.
+    """
+
+    COLUMNS = tuple(ParkingSensor.__table__.c[name] for name in (
+        'id', 'kerbside_id', 'zone_number', 'status_description', 'latitude', 'longitude',
+        'status_timestamp', 'last_updated'
+    ))
+
+    # Column order of to_row, for compact responses
+    ROW_FIELDS = ['id', 'kerbside_id', 'zone_number', 'status', 'latitude', 'longitude', 'status_timestamp']
+
+    def __init__(self, rows: Sequence[Sequence]):
+        """
+        Args:
+            rows: Tuples in COLUMNS order; any further columns are ignored
+        """
+        columns = list(zip(*rows))[:len(self.COLUMNS)] or [()] * len(self.COLUMNS)
+        ids, kerbside_ids, zones, statuses, lats, lngs, status_timestamps, last_updated = columns
+
+        zone_codes, zone_values = _categorical(zones)
+        status_codes, status_values = _categorical(statuses)
+        # NaT where a timestamp is missing, so range comparisons treat it as never set
+        self.set_columns(np.array(ids, dtype=np.int64), list(kerbside_ids), zone_codes, zone_values,
+                         status_codes, status_values, np.array(lats, dtype=np.float64),
+                         np.array(lngs, dtype=np.float64), np.array(status_timestamps, dtype='datetime64[us]'),
+                         np.array(last_updated, dtype='datetime64[us]'))
+
+    def set_columns(self, ids: np.ndarray, kerbside_ids: List[str], zone_codes: np.ndarray, zone_values: List,
+                    status_codes: np.ndarray, status_values: List, lat: np.ndarray, lng: np.ndarray,
+                    status_at: np.ndarray, updated_at: np.ndarray):
+        """Take columns that are already encoded, e.g. read back from a checkpoint file"""
+        self.ids = ids
+        self.kerbside_ids = kerbside_ids
+        self.zone_codes, self.zone_values = zone_codes, zone_values
+        self.status_codes, self.status_values = status_codes, status_values
+        self.lat = lat
+        self.lng = lng
+        self.status_at = status_at
+        self.updated_at = updated_at
+        self.available = self.status_mask('Unoccupied')
+        self.occupied = self.status_mask('Occupied')
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def fetch(cls, *criteria) -> List[tuple]:
+        """Rows for the table, optionally filtered by Core criteria, ordered by id"""
+        statement = select(*cls.COLUMNS).where(*criteria).order_by(ParkingSensor.__table__.c.id)
+        return db.session.execute(statement).all()
+
+    @classmethod
+    def load(cls, *criteria) -> 'SensorTable':
+        """Load the matching sensors in one SELECT"""
+        return cls(cls.fetch(*criteria))
+
+    @property
+    def zones(self) -> List[Optional[str]]:
+        values = self.zone_values
+        return [values[code] for code in self.zone_codes.tolist()]
+
+    @property
+    def statuses(self) -> List[Optional[str]]:
+        values = self.status_values
+        return [values[code] for code in self.status_codes.tolist()]
+
+    def status_mask(self, status: str) -> np.ndarray:
+        """Boolean array of sensors whose status_description equals status"""
+        if status not in self.status_values:
+            return np.zeros(len(self), dtype=bool)
+        return self.status_codes == self.status_values.index(status)
+
+    def mask(self, status_filter: str = 'all', bbox: Optional[Tuple[float, float, float, float]] = None,
+             updated_since: Optional[datetime] = None) -> np.ndarray:
+        """
+        Boolean array of sensors passing the read-path filters
+
+        Args:
+            status_filter: 'all', 'available' or 'occupied', as /live
+            bbox: (lat_min, lng_min, lat_max, lng_max)
+            updated_since: Only sensors whose last_updated is at or after this
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if status_filter == 'available':
+            mask &= self.available
+        elif status_filter == 'occupied':
+            mask &= self.occupied
+        if bbox is not None:
+            lat_min, lng_min, lat_max, lng_max = bbox
+            mask &= (self.lat >= lat_min) & (self.lat <= lat_max) & (self.lng >= lng_min) & (self.lng <= lng_max)
+        if updated_since is not None:
+            mask &= self.updated_at >= np.datetime64(updated_since, 'us')
+        return mask
+
+    def zone_groups(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Group sensors by zone, missing zones as 'Unknown', in order of first appearance
+
+        Returns:
+            (zone names, group index of every sensor)
+        """
+        names = []
+        group_of_name = {}
+        group_of_code = np.empty(len(self.zone_values), dtype=np.int64)
+        first = np.full(len(self.zone_values), len(self), dtype=np.int64)
+        np.minimum.at(first, self.zone_codes, np.arange(len(self)))
+        for code in np.argsort(first, kind='stable').tolist():
+            name = self.zone_values[code] or 'Unknown'
+            if name not in group_of_name:
+                group_of_name[name] = len(names)
+                names.append(name)
+            group_of_code[code] = group_of_name[name]
+        return names, group_of_code[self.zone_codes]
+
+    def to_dicts(self, positions: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Same shape as ParkingSensor.to_dict for many sensors, built column by column
+
+        Args:
+            positions: Sensors to serialize, in output order (default: all)
+        """
+        if positions is None:
+            positions = np.arange(len(self))
+        positions = np.asarray(positions, dtype=np.int64)
+        index = positions.tolist()
+        zones, statuses = self.zone_values, self.status_values
+        lats = self.lat[positions].tolist()
+        lngs = self.lng[positions].tolist()
+        return [
+            {
+                'id': sensor_id,
+                'kerbside_id': self.kerbside_ids[i],
+                'zone_number': zones[zone],
+                'status': statuses[status],
+                'coordinates': [lat, lng],
+                'latitude': lat,
+                'longitude': lng,
+                'status_timestamp': status_at,
+                'last_updated': updated_at
+            }
+            for i, sensor_id, zone, status, lat, lng, status_at, updated_at in zip(
+                index, self.ids[positions].tolist(), self.zone_codes[positions].tolist(),
+                self.status_codes[positions].tolist(), lats, lngs,
+                _isoformat(self.status_at[positions]), _isoformat(self.updated_at[positions])
+            )
+        ]
+
+    def to_dict(self, i: int) -> Dict:
+        """Same shape as ParkingSensor.to_dict for the sensor at position i"""
+        return self.to_dicts(np.array([i]))[0]
+
+    def to_rows(self, positions: np.ndarray) -> List[list]:
+        """Compact list form of many sensors, in ROW_FIELDS order"""
+        positions = np.asarray(positions, dtype=np.int64)
+        zones, statuses = self.zone_values, self.status_values
+        return [
+            [sensor_id, self.kerbside_ids[i], zones[zone], statuses[status], lat, lng, status_at]
+            for i, sensor_id, zone, status, lat, lng, status_at in zip(
+                positions.tolist(), self.ids[positions].tolist(), self.zone_codes[positions].tolist(),
+                self.status_codes[positions].tolist(), self.lat[positions].tolist(),
+                self.lng[positions].tolist(), _isoformat(self.status_at[positions])
+            )
+        ]
+
+    def to_row(self, i: int) -> list:
+        """Compact list form of the sensor at position i, in ROW_FIELDS order"""
+        return self.to_rows(np.array([i]))[0]
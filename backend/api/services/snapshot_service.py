@@ -0,0 +1,64 @@
+"""
+Snapshot Versioning Service
+Identifies the current state of the sensor table so in-memory structures know when to rebuild
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from ..models import ParkingSensor, db
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class SnapshotService:
+    """Service for tracking the snapshot version of the parking sensor data"""
+
+    # Seconds a worker trusts its last version check before asking the database again
+    VERSION_TTL = float(os.getenv('SNAPSHOT_VERSION_TTL', '1.0'))
+
+    @classmethod
+    def _state(cls) -> dict:
+        return current_app.extensions.setdefault('parking_snapshot', {'version': None, 'checked_at': 0.0})
+
+    @classmethod
+    def current_version(cls) -> int:
+        """
+        Get the current snapshot version
+
+        Every ingest stamps last_updated on the rows it touches, so the newest
+        last_updated value changes exactly when the sensor table changes. The
+        value is shared by all workers because it lives in the database.
+
+        Returns:
+            Snapshot version as microseconds since the epoch (0 when the table is empty)
+        """
+        state = cls._state()
+        now = time.monotonic()
+        if state['version'] is not None and now - state['checked_at'] < cls.VERSION_TTL:
+            return state['version']
+
+        version = cls.read_version()
+        state['version'] = version
+        state['checked_at'] = now
+        return version
+
+    @classmethod
+    def read_version(cls) -> int:
+        """Read the snapshot version from the database, bypassing this worker's cached value"""
+        latest = db.session.query(func.max(ParkingSensor.last_updated)).scalar()
+        return cls.version_of(latest) if latest else 0
+
+    @staticmethod
+    def version_of(timestamp: datetime) -> int:
+        """The snapshot version a last_updated value stands for, in exact integer microseconds"""
+        return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+    @classmethod
+    def invalidate(cls):
+        """Force the next current_version call to re-read the database (called after ingest)"""
+        state = cls._state()
+        state['version'] = None
+        state['checked_at'] = 0.0
@@ -0,0 +1,507 @@
+"""
+Spatial Index Service for Melbourne Parking System
+Keeps an in-memory grid of sensor positions for nearest-bay queries
+"""
+
+import heapq
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+
+from ..utils import GeohashUtils
+from .bitmap_index import SensorBitmapIndex
+from .sensor_table import SensorTable
+from .snapshot_service import SnapshotService
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180.0
+
+_build_lock = threading.Lock()
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    Vectorized great-circle distance from one point to arrays of points
+
+    Args:
+        lat, lng: Origin in degrees (scalars, or arrays shaped to broadcast against lats/lngs)
+        lats, lngs: Target coordinates in degrees
+
+    Returns:
+        Distances in kilometres
+    """
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    d_lat = lat2 - lat1
+    d_lng = np.radians(lngs) - np.radians(lng)
+    a = np.sin(d_lat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lng / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SensorSnapshot(SensorTable):
+    """Column arrays for every sensor at one snapshot version"""
+
+    def __init__(self, version: int, rows: List[tuple]):
+        super().__init__(rows)
+        self.version = version
+        self._grids = {}
+        self._geohash = None
+        self._bitmaps = None
+        # Reference time of the freshness bitsets; None is utcnow at build
+        self.now = None
+
+    @classmethod
+    def load(cls, version: int) -> 'SensorSnapshot':
+        """Read the needed columns in one query, without hydrating ORM objects"""
+        return cls(version, cls.fetch())
+
+    def grid(self) -> 'SpatialGridIndex':
+        """Grid over every sensor, built on first use"""
+        if 'all' not in self._grids:
+            self._grids['all'] = SpatialGridIndex(self.lat, self.lng, np.arange(len(self)))
+        return self._grids['all']
+
+    def available_grid(self) -> 'SpatialGridIndex':
+        """Grid over Unoccupied sensors, built on first use"""
+        if 'available' not in self._grids:
+            self._grids['available'] = SpatialGridIndex(self.lat, self.lng, np.flatnonzero(self.available))
+        return self._grids['available']
+
+    def geohash_ranges(self, ranges: List[Tuple[int, int]]) -> np.ndarray:
+        """
+        Positions of the sensors whose geohash falls in any of the key ranges
+
+        Sensors are kept sorted by geohash (built on first use), so each range
+        of GeohashUtils.cover_code_ranges is two binary searches and a slice.
+
+        Returns:
+            Snapshot positions, range by range
+        """
+        if self._geohash is None:
+            codes = GeohashUtils.encode_codes(self.lat, self.lng)
+            order = np.argsort(codes, kind='stable')
+            self._geohash = (codes[order], order)
+        codes, order = self._geohash
+        if not ranges:
+            return np.zeros(0, dtype=np.int64)
+        lows, highs = np.array(ranges, dtype=np.int64).T
+        starts = np.searchsorted(codes, lows, side='left')
+        ends = np.searchsorted(codes, highs, side='left')
+        return np.concatenate([order[start:end] for start, end in zip(starts, ends)])
+
+    def bitmaps(self) -> SensorBitmapIndex:
+        """Status, zone and freshness bitsets, built on first use"""
+        if self._bitmaps is None:
+            self._bitmaps = SensorBitmapIndex(self, now=self.now)
+        return self._bitmaps
+
+
+class SpatialGridIndex:
+    """Uniform lat/lng grid with ring-by-ring nearest neighbour search"""
+
+    CELL_KM = float(os.getenv('SPATIAL_GRID_CELL_KM', '0.1'))
+
+    def __init__(self, lat: np.ndarray, lng: np.ndarray, positions: np.ndarray, cell_km: float = None):
+        """
+        Args:
+            lat, lng: Coordinate arrays of the whole snapshot
+            positions: Snapshot positions to index
+            cell_km: Cell edge length in kilometres
+        """
+        self.lat = lat
+        self.lng = lng
+        self.positions = positions
+        self.cell_km = cell_km or self.CELL_KM
+
+        ref_lat = float(np.mean(lat[positions])) if len(positions) else -37.8136
+        self.d_lat = self.cell_km / KM_PER_DEGREE
+        self.d_lng = self.cell_km / (KM_PER_DEGREE * max(math.cos(math.radians(ref_lat)), 1e-6))
+
+        self.cells: Dict[Tuple[int, int], np.ndarray] = {}
+        # Positions sorted by a row-major cell key, so each grid row of a query box is one contiguous range
+        self.sorted_keys = np.zeros(0, dtype=np.int64)
+        self.sorted_positions = np.zeros(0, dtype=np.int64)
+        if len(positions):
+            rows = np.floor(lat[positions] / self.d_lat).astype(np.int64)
+            cols = np.floor(lng[positions] / self.d_lng).astype(np.int64)
+            order = np.lexsort((cols, rows))
+            rows, cols, sorted_positions = rows[order], cols[order], positions[order]
+            breaks = np.flatnonzero((np.diff(rows) != 0) | (np.diff(cols) != 0)) + 1
+            for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(sorted_positions)]):
+                self.cells[(int(rows[start]), int(cols[start]))] = sorted_positions[start:end]
+            self.bounds = (int(rows.min()), int(rows.max()), int(cols.min()), int(cols.max()))
+            self.width = self.bounds[3] - self.bounds[2] + 1
+            self.sorted_keys = (rows - self.bounds[0]) * self.width + (cols - self.bounds[2])
+            self.sorted_positions = sorted_positions
+
+    def cell_of(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.d_lat)), int(math.floor(lng / self.d_lng))
+
+    def _ring_cells(self, row: int, col: int, ring: int):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+    def nearest(self, lat: float, lng: float, k: int, max_km: Optional[float] = None) -> List[Tuple[float, int]]:
+        """
+        Find the k indexed points closest to (lat, lng)
+
+        Searches outward one ring of cells at a time. After ring r every unvisited
+        point is at least r cells away, so the search stops as soon as the k-th
+        best distance is within that bound or the bound passes max_km.
+
+        Returns:
+            (distance_km, snapshot position) pairs sorted by distance
+        """
+        if not self.cells or k <= 0:
+            return []
+
+        row, col = self.cell_of(lat, lng)
+        min_row, max_row, min_col, max_col = self.bounds
+        # Beyond this ring there are no indexed cells at all
+        last_ring = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+
+        best: List[Tuple[float, int]] = []  # max-heap of (-distance, position)
+        ring = 0
+        while ring <= last_ring:
+            # Points in ring r are at least r - 1 cells away from the origin
+            if max_km is not None and (ring - 1) * self.cell_km * 0.999 > max_km:
+                break
+
+            found = [self.cells[cell] for cell in self._ring_cells(row, col, ring) if cell in self.cells]
+            if found:
+                candidates = np.concatenate(found)
+                distances = haversine_km(lat, lng, self.lat[candidates], self.lng[candidates])
+                for distance, position in zip(distances.tolist(), candidates.tolist()):
+                    if max_km is not None and distance > max_km:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, position))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, position))
+
+            # Every point outside rings 0..r is at least r cells away
+            if len(best) == k and -best[0][0] <= ring * self.cell_km * 0.999:
+                break
+            ring += 1
+
+        return sorted((-negative, position) for negative, position in best)
+
+    def within_box(self, lat_min: float, lng_min: float, lat_max: float, lng_max: float) -> np.ndarray:
+        """
+        Indexed points inside a bounding box
+
+        Returns:
+            Snapshot positions, grid row by grid row
+        """
+        if not len(self.sorted_keys):
+            return np.zeros(0, dtype=np.int64)
+
+        min_row, max_row, min_col, max_col = self.bounds
+        row_lo, col_lo = self.cell_of(lat_min, lng_min)
+        row_hi, col_hi = self.cell_of(lat_max, lng_max)
+        row_lo, row_hi = max(row_lo, min_row), min(row_hi, max_row)
+        col_lo, col_hi = max(col_lo, min_col), min(col_hi, max_col)
+        if row_lo > row_hi or col_lo > col_hi:
+            return np.zeros(0, dtype=np.int64)
+
+        base = (np.arange(row_lo, row_hi + 1) - min_row) * self.width
+        starts = np.searchsorted(self.sorted_keys, base + (col_lo - min_col), side='left')
+        ends = np.searchsorted(self.sorted_keys, base + (col_hi - min_col), side='right')
+        positions = np.concatenate([self.sorted_positions[start:end] for start, end in zip(starts, ends)])
+        lat, lng = self.lat[positions], self.lng[positions]
+        return positions[(lat >= lat_min) & (lat <= lat_max) & (lng >= lng_min) & (lng <= lng_max)]
+
+    def _row_slices(self, lats: np.ndarray, lngs: np.ndarray, radii: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Sorted-key slices covering each query's bounding box
+
+        Each query's box covers a block of grid rows; every row is one contiguous
+        slice of the sorted cell keys, located with searchsorted.
+
+        Returns:
+            (query_of_row, starts, ends), one entry per (query, grid row), grouped by query
+        """
+        min_row, max_row, min_col, max_col = self.bounds
+        lat_span = radii / KM_PER_DEGREE
+        cos_lat = np.maximum(np.cos(np.radians(np.minimum(np.abs(lats) + lat_span, 89.0))), 1e-6)
+        lng_span = radii / (KM_PER_DEGREE * cos_lat)
+
+        row_lo = np.maximum(np.floor((lats - lat_span) / self.d_lat).astype(np.int64), min_row)
+        row_hi = np.minimum(np.floor((lats + lat_span) / self.d_lat).astype(np.int64), max_row)
+        col_lo = np.maximum(np.floor((lngs - lng_span) / self.d_lng).astype(np.int64), min_col)
+        col_hi = np.minimum(np.floor((lngs + lng_span) / self.d_lng).astype(np.int64), max_col)
+
+        row_counts = np.maximum(row_hi - row_lo + 1, 0) * (col_hi >= col_lo)
+        query_of_row = np.repeat(np.arange(len(lats)), row_counts)
+        row_starts = np.cumsum(row_counts) - row_counts
+        grid_rows = row_lo[query_of_row] + (np.arange(len(query_of_row)) - row_starts[query_of_row])
+
+        base = (grid_rows - min_row) * self.width
+        starts = np.searchsorted(self.sorted_keys, base + (col_lo[query_of_row] - min_col), side='left')
+        ends = np.searchsorted(self.sorted_keys, base + (col_hi[query_of_row] - min_col), side='right')
+        return query_of_row, starts, ends
+
+    def _gather(self, query_of_row: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                lats: np.ndarray, lngs: np.ndarray, radii: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Concatenate slices into (query, position) pairs and keep those inside the radius"""
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        # Concatenate all [start, end) slices without a Python loop
+        slice_offsets = np.cumsum(lengths) - lengths
+        flat = np.repeat(starts - slice_offsets, lengths) + np.arange(total)
+        query_ids = np.repeat(query_of_row, lengths)
+        positions = self.sorted_positions[flat]
+
+        distances = haversine_km(lats[query_ids], lngs[query_ids], self.lat[positions], self.lng[positions])
+        inside = distances <= radii[query_ids]
+        return query_ids[inside], positions[inside], distances[inside]
+
+    def within_radius(self, lats: np.ndarray, lngs: np.ndarray, radii: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Find every indexed point within each query's radius, for all queries at once
+
+        The grid-row slices of every query box are gathered into flat (query, position)
+        pair arrays and exact distances are computed for all pairs in one vectorized call.
+
+        Args:
+            lats, lngs: Query centres
+            radii: Query radii in kilometres
+
+        Returns:
+            (query_ids, positions, distances_km) for the pairs inside the radius
+        """
+        if not len(self.sorted_keys) or not len(lats):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        return self._gather(*self._row_slices(lats, lngs, radii), lats, lngs, radii)
+
+    def within_radius_chunks(self, lats: np.ndarray, lngs: np.ndarray, radii: np.ndarray, max_pairs: int):
+        """
+        within_radius for consecutive groups of queries, each gathering at most max_pairs candidates
+
+        The candidate count of every query is known from its slices before anything is
+        gathered, so memory stays bounded however the boxes overlap; a single query
+        larger than the budget forms a group of its own.
+
+        Yields:
+            (query_ids, positions, distances_km) per group, in query order
+        """
+        if not len(self.sorted_keys) or not len(lats):
+            return
+        query_of_row, starts, ends = self._row_slices(lats, lngs, radii)
+        candidates = np.bincount(query_of_row, weights=ends - starts, minlength=len(lats)).astype(np.int64)
+        row_bounds = np.searchsorted(query_of_row, np.arange(len(lats) + 1))
+
+        first = 0
+        while first < len(lats):
+            cumulative = np.cumsum(candidates[first:])
+            last = first + max(1, int(np.searchsorted(cumulative, max_pairs, side='right')))
+            rows = slice(row_bounds[first], row_bounds[last])
+            yield self._gather(query_of_row[rows], starts[rows], ends[rows], lats, lngs, radii)
+            first = last
+
+
+class SpatialIndexService:
+    """Service for nearest available bay queries backed by the in-memory grid"""
+
+    # Candidate (query, sensor) pairs gathered at once by query_batch and nearest_available_batch
+    BATCH_PAIR_BUDGET = int(os.getenv('BATCH_PAIR_BUDGET', '500000'))
+
+    @classmethod
+    def get_snapshot(cls) -> SensorSnapshot:
+        """
+        Get the sensor snapshot for the current version, rebuilding it after an ingest
+
+        Returns:
+            SensorSnapshot shared by all requests in this worker
+        """
+        version = SnapshotService.current_version()
+        snapshot = current_app.extensions.get('parking_spatial_snapshot')
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with _build_lock:
+            snapshot = current_app.extensions.get('parking_spatial_snapshot')
+            if snapshot is None or snapshot.version != version:
+                snapshot = SensorSnapshot.load(version)
+                current_app.extensions['parking_spatial_snapshot'] = snapshot
+                print(f"🧭 Built sensor snapshot v{version}: {len(snapshot)} sensors")
+        return snapshot
+
+    @classmethod
+    def nearest_available(cls, lat: float, lng: float, k: int = 10, max_km: Optional[float] = 2.0) -> Dict:
+        """
+        Get the k nearest Unoccupied sensors to a point
+
+        Args:
+            lat, lng: Origin coordinates
+            k: Number of bays to return
+            max_km: Ignore bays further away than this
+
+        Returns:
+            Dictionary with the matching sensors (nearest first) and the snapshot version
+        """
+        snapshot = cls.get_snapshot()
+        matches = snapshot.available_grid().nearest(lat, lng, k, max_km)
+
+        data = snapshot.to_dicts(np.array([position for _, position in matches], dtype=np.int64))
+        for sensor, (distance, _) in zip(data, matches):
+            sensor['distance_km'] = round(distance, 4)
+
+        return {'data': data, 'snapshot_version': snapshot.version}
+
+    @classmethod
+    def nearest_available_batch(cls, origins: List[Tuple[float, float]], k: int = 10,
+                                max_km: Optional[float] = 2.0) -> Dict:
+        """
+        Answer many nearest-bay queries at once with vectorized distance computation
+
+        Every origin starts as a radius query of one grid cell on the available-bay
+        grid. Origins with fewer than k bays inside are asked again with twice the
+        radius, up to max_km; once a radius holds k bays, its k nearest are the
+        answer. Pairs are gathered BATCH_PAIR_BUDGET at a time as query_batch does,
+        so the cost follows k and the bays near the origins, not the fleet size.
+
+        Args:
+            origins: (lat, lng) pairs
+            k: Number of bays per origin
+            max_km: Ignore bays further away than this (None: no limit)
+
+        Returns:
+            Dictionary with one result list per origin and the snapshot version
+        """
+        snapshot = cls.get_snapshot()
+        grid = snapshot.available_grid()
+        if not len(grid.positions) or not origins:
+            return {'results': [[] for _ in origins], 'snapshot_version': snapshot.version}
+
+        origin_array = np.asarray(origins, dtype=np.float64)
+        lats, lngs = origin_array[:, 0], origin_array[:, 1]
+        if max_km is None:
+            # Through the centre of the bays, no bay is further from an origin than this
+            bay_lats, bay_lngs = snapshot.lat[grid.positions], snapshot.lng[grid.positions]
+            centre_lat, centre_lng = float(np.mean(bay_lats)), float(np.mean(bay_lngs))
+            reach = float(haversine_km(centre_lat, centre_lng, bay_lats, bay_lngs).max())
+            max_radii = (haversine_km(centre_lat, centre_lng, lats, lngs) + reach) * (1 + 1e-9) + 1e-9
+            # Half the circumference also bounds it, and keeps the doubling finite for odd origins
+            max_radii = np.fmin(max_radii, math.pi * EARTH_RADIUS_KM)
+        else:
+            max_radii = np.full(len(origin_array), float(max_km))
+
+        radii = np.minimum(grid.cell_km, max_radii)
+        pending = np.arange(len(origin_array))
+        kept = []
+        while len(pending):
+            counts = np.zeros(len(pending), dtype=np.int64)
+            nearest = []
+            for query_ids, positions, distances in grid.within_radius_chunks(
+                    lats[pending], lngs[pending], radii[pending], cls.BATCH_PAIR_BUDGET):
+                counts += np.bincount(query_ids, minlength=len(pending))
+                # Group pairs by origin, nearest first, and keep each origin's first k
+                order = np.lexsort((positions, distances, query_ids))
+                query_ids, positions, distances = query_ids[order], positions[order], distances[order]
+                rank = np.arange(len(query_ids)) - np.searchsorted(query_ids, query_ids)
+                within = rank < k
+                nearest.append((query_ids[within], positions[within], distances[within]))
+
+            done = (counts >= k) | (radii[pending] >= max_radii[pending])
+            for query_ids, positions, distances in nearest:
+                answered = done[query_ids]
+                kept.append((pending[query_ids[answered]], positions[answered], distances[answered]))
+            pending = pending[~done]
+            radii[pending] = np.minimum(radii[pending] * 2, max_radii[pending])
+
+        if kept:
+            query_ids, positions, distances = (np.concatenate(parts) for parts in zip(*kept))
+        else:
+            query_ids, positions, distances = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        order = np.argsort(query_ids, kind='stable')
+        query_ids, positions, distances = query_ids[order], positions[order], distances[order]
+        bounds = np.searchsorted(query_ids, np.arange(len(origins) + 1))
+
+        results = []
+        for i in range(len(origins)):
+            start, stop = int(bounds[i]), int(bounds[i + 1])
+            row = snapshot.to_dicts(positions[start:stop])
+            for sensor, distance in zip(row, distances[start:stop].tolist()):
+                sensor['distance_km'] = round(distance, 4)
+            results.append(row)
+
+        return {'results': results, 'snapshot_version': snapshot.version}
+
+    @classmethod
+    def query_batch(cls, queries: List[Dict]) -> Dict:
+        """
+        Answer many radius queries against the same snapshot in a few vectorized passes
+
+        Args:
+            queries: Dictionaries with lat, lng, radius (km), status ('all',
+                'available' or 'occupied') and limit
+
+        Returns:
+            Dictionary with one {'total', 'count', 'rows'} result per query, the
+            row field names and the snapshot version
+        """
+        snapshot = cls.get_snapshot()
+        lats = np.array([q['lat'] for q in queries], dtype=np.float64)
+        lngs = np.array([q['lng'] for q in queries], dtype=np.float64)
+        radii = np.array([q['radius'] for q in queries], dtype=np.float64)
+        limits = np.array([q['limit'] for q in queries], dtype=np.int64)
+
+        # Status filters are applied per pair through one lookup table per filter
+        status_masks = {}
+        for status, mask in (('available', snapshot.available), ('occupied', snapshot.occupied)):
+            wanted = np.array([q['status'] == status for q in queries], dtype=bool)
+            if wanted.any():
+                status_masks[status] = (wanted, mask)
+
+        # Candidates are gathered a pair budget at a time and cut to each query's limit
+        # straight away, so wide or overlapping queries never materialize every pair
+        totals = np.zeros(len(queries), dtype=np.int64)
+        kept = []
+        for query_ids, positions, distances in snapshot.grid().within_radius_chunks(
+                lats, lngs, radii, cls.BATCH_PAIR_BUDGET):
+            keep = np.ones(len(query_ids), dtype=bool)
+            for wanted, mask in status_masks.values():
+                keep &= ~wanted[query_ids] | mask[positions]
+            query_ids, positions, distances = query_ids[keep], positions[keep], distances[keep]
+            totals += np.bincount(query_ids, minlength=len(queries))
+
+            # Group pairs by query, nearest first, and keep each query's first limit
+            order = np.lexsort((distances, query_ids))
+            query_ids, positions, distances = query_ids[order], positions[order], distances[order]
+            rank = np.arange(len(query_ids)) - np.searchsorted(query_ids, query_ids)
+            within = rank < limits[query_ids]
+            kept.append((query_ids[within], positions[within], distances[within]))
+
+        if kept:
+            query_ids, positions, distances = (np.concatenate(parts) for parts in zip(*kept))
+        else:
+            query_ids, positions, distances = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        bounds = np.searchsorted(query_ids, np.arange(len(queries) + 1))
+
+        results = []
+        for i, query in enumerate(queries):
+            start, stop = int(bounds[i]), int(bounds[i + 1])
+            rows = snapshot.to_rows(positions[start:stop])
+            for row, distance in zip(rows, distances[start:stop].tolist()):
+                row.append(round(distance, 4))
+            results.append({'total': int(totals[i]), 'count': len(rows), 'rows': rows})
+
+        return {
+            'fields': SensorSnapshot.ROW_FIELDS + ['distance_km'],
+            'results': results,
+            'snapshot_version': snapshot.version
+        }
@@ -0,0 +1,176 @@
+"""
+SQLite Service for Melbourne Parking System
+Embedded single-node deployment: WAL journaling, tuned pragmas, one writer connection
+for ingest and a pool of read connections for the routes
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from flask import Flask, current_app
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from ..models import db
+
+# Serialises ingest within a process; other processes wait on busy_timeout
+_writer_lock = threading.Lock()
+
+
+class SQLiteService:
+    """
+    Service configuring SQLite as a first-class serving database
+
+    Readers use a pool of connections and, under WAL, never block on the writer or
+    on each other. All ingest writes go through one dedicated connection that opens
+    its transactions with BEGIN IMMEDIATE, so a write transaction never has to be
+    upgraded from a read lock (the case where SQLite gives up with "database is
+    locked" instead of waiting).
+    """
+
+    # Read connections kept open per process, plus overflow under bursts
+    READ_POOL_SIZE = int(os.getenv('SQLITE_READ_POOL_SIZE', '8'))
+    READ_POOL_OVERFLOW = int(os.getenv('SQLITE_READ_POOL_OVERFLOW', '8'))
+
+    # How long a connection waits for another process's write lock
+    BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+    # Applied to every connection when it is opened
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        # Durable at every checkpoint; a power loss can drop the last commits, never corrupt
+        'synchronous': 'NORMAL',
+        'busy_timeout': BUSY_TIMEOUT_MS,
+        # Negative values are KiB: 64 MiB page cache per connection
+        'cache_size': -int(os.getenv('SQLITE_CACHE_KIB', '65536')),
+        'temp_store': 'MEMORY',
+        'mmap_size': int(os.getenv('SQLITE_MMAP_BYTES', str(256 * 1024 * 1024))),
+        'wal_autocheckpoint': 1000
+    }
+
+    @staticmethod
+    def is_sqlite(database_uri: str) -> bool:
+        return bool(database_uri) and database_uri.startswith('sqlite')
+
+    @staticmethod
+    def enabled() -> bool:
+        """SQLITE_TUNING=off keeps Flask-SQLAlchemy's default SQLite setup, for comparisons"""
+        return os.getenv('SQLITE_TUNING', 'on').lower() not in ('off', '0', 'false')
+
+    @staticmethod
+    def _in_memory(database_uri: str) -> bool:
+        return make_url(database_uri).database in (None, '', ':memory:')
+
+    @classmethod
+    def engine_options(cls, database_uri: str) -> Dict:
+        """
+        SQLALCHEMY_ENGINE_OPTIONS for the read pool
+
+        Args:
+            database_uri: SQLite database URI
+
+        Returns:
+            Engine options; in-memory databases keep Flask-SQLAlchemy's single shared connection
+        """
+        if cls._in_memory(database_uri):
+            return {}
+        return {
+            'poolclass': QueuePool,
+            'pool_size': cls.READ_POOL_SIZE,
+            'max_overflow': cls.READ_POOL_OVERFLOW,
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            # Connections move between request threads; the pool hands each to one thread at a time
+            'connect_args': {'check_same_thread': False, 'timeout': cls.BUSY_TIMEOUT_MS / 1000}
+        }
+
+    @classmethod
+    def _apply_pragmas(cls, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in cls.PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+    @staticmethod
+    def _manual_transactions(dbapi_connection, connection_record):
+        # Stop pysqlite from issuing its own deferred BEGIN so _begin_immediate controls it
+        dbapi_connection.isolation_level = None
+
+    @staticmethod
+    def _begin_immediate(connection):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+    @classmethod
+    def init_app(cls, app: Flask):
+        """Apply pragmas to the app's engine and open the ingest writer (call after db.init_app)"""
+        database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+        with app.app_context():
+            read_engine = db.engine
+        event.listen(read_engine, 'connect', cls._apply_pragmas)
+
+        writer = None
+        if not cls._in_memory(database_uri):
+            # One connection for all ingest writes; _writer_lock hands it to one thread at a time
+            writer = create_engine(read_engine.url, poolclass=StaticPool,
+                                   connect_args={'check_same_thread': False,
+                                                 'timeout': cls.BUSY_TIMEOUT_MS / 1000})
+            event.listen(writer, 'connect', cls._apply_pragmas)
+            event.listen(writer, 'connect', cls._manual_transactions)
+            event.listen(writer, 'begin', cls._begin_immediate)
+
+        app.extensions['parking_sqlite'] = {'writer': writer, 'writes': 0}
+        print(f"🪶 SQLite mode: WAL, read pool of {cls.READ_POOL_SIZE}, single ingest writer")
+
+    @classmethod
+    @contextmanager
+    def writer(cls):
+        """
+        Run the block's db.session work on the ingest writer connection
+
+        Ingest code keeps using db.session and Model.query; inside this block they are
+        bound to the writer, and the caller's own session is restored afterwards.
+        Outside SQLite mode this does nothing.
+        """
+        state = current_app.extensions.get('parking_sqlite')
+        if state is None:
+            yield
+            return
+
+        with _writer_lock:
+            if state['writer'] is None:
+                # In-memory databases have a single connection anyway
+                yield
+                state['writes'] += 1
+                return
+
+            registry = db.session.registry
+            previous = registry() if registry.has() else None
+            session = Session(bind=state['writer'])
+            registry.set(session)
+            try:
+                yield
+                state['writes'] += 1
+            finally:
+                session.close()
+                if previous is not None:
+                    registry.set(previous)
+                else:
+                    registry.clear()
+
+    @staticmethod
+    def stats() -> Dict:
+        """Journal mode and write count of the current app's SQLite setup"""
+        state = current_app.extensions.get('parking_sqlite')
+        if state is None:
+            return {'enabled': False}
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+        return {
+            'enabled': True,
+            'journal_mode': journal_mode,
+            'read_pool': db.engine.pool.status(),
+            'writer': state['writer'] is not None,
+            'ingest_writes': state['writes']
+        }
@@ -3,9 +3,122 @@ Statistics Service for Melbourne Parking System
 Handles parking statistics and analytics
 """
 
-from typing import Dict, Optional
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
-from ..models import ParkingSensor, ParkingLot
+
+import numpy as np
+from flask import current_app
+
+from ..models import ParkingSensor
+from .lot_service import ParkingLotService
+from .spatial_service import KM_PER_DEGREE, SpatialIndexService
+
+# Heatmap cells sit on one fixed lattice, so they line up across bounding boxes and versions
+HEATMAP_REFERENCE_LAT = -37.8136
+HEATMAP_PERCENTILES = (10, 25, 50, 75, 90)
+
+_heatmap_lock = threading.Lock()
+
+
+class HeatmapGrid:
+    """Sensor, occupied and available counts of one snapshot binned onto square cells"""
+
+    def __init__(self, snapshot, cell_m: float, smooth: float = 0.0,
+                 bounds: Optional[Tuple[int, int, int, int]] = None):
+        """
+        Args:
+            snapshot: SensorSnapshot with lat/lng and status arrays
+            cell_m: Cell edge in metres
+            smooth: Gaussian smoothing sigma in cells (0 = raw counts)
+            bounds: (row_min, row_max, col_min, col_max) cells to bin, inclusive
+                (default: every sensor's cell); sensors outside them are left out
+        """
+        self.version = snapshot.version
+        self.cell_m = cell_m
+        self.smooth = smooth
+        self.d_lat, self.d_lng = self.cell_size(cell_m)
+
+        if bounds is None:
+            bounds = self.extent(snapshot, cell_m)
+        if bounds is None or bounds[0] > bounds[1] or bounds[2] > bounds[3]:
+            self.row0 = self.col0 = 0
+            self.total = self.occupied = self.available = np.zeros((0, 0))
+            return
+
+        rows = np.floor(snapshot.lat / self.d_lat).astype(np.int64)
+        cols = np.floor(snapshot.lng / self.d_lng).astype(np.int64)
+        # Pad by the kernel radius so smoothing near the edge is not cut off
+        pad = int(math.ceil(3 * smooth)) if smooth > 0 else 0
+        row_min, row_max, col_min, col_max = bounds
+        self.row0 = row_min - pad
+        self.col0 = col_min - pad
+        height = row_max - self.row0 + 1 + pad
+        width = col_max - self.col0 + 1 + pad
+
+        inside = (rows >= self.row0) & (rows < self.row0 + height) & (cols >= self.col0) & (cols < self.col0 + width)
+        flat = (rows[inside] - self.row0) * width + (cols[inside] - self.col0)
+        size = height * width
+        self.total = np.bincount(flat, minlength=size).reshape(height, width).astype(np.float64)
+        self.occupied = np.bincount(flat, weights=snapshot.occupied[inside], minlength=size).reshape(height, width)
+        self.available = np.bincount(flat, weights=snapshot.available[inside], minlength=size).reshape(height, width)
+
+        if smooth > 0:
+            kernel = np.exp(-0.5 * (np.arange(-pad, pad + 1) / smooth) ** 2)
+            kernel /= kernel.sum()
+            self.total, self.occupied, self.available = (
+                self._blur(grid, kernel) for grid in (self.total, self.occupied, self.available)
+            )
+
+    @staticmethod
+    def cell_size(cell_m: float) -> Tuple[float, float]:
+        """(d_lat, d_lng) in degrees of a cell on the shared lattice"""
+        d_lat = cell_m / (KM_PER_DEGREE * 1000.0)
+        return d_lat, d_lat / math.cos(math.radians(HEATMAP_REFERENCE_LAT))
+
+    @classmethod
+    def extent(cls, snapshot, cell_m: float) -> Optional[Tuple[int, int, int, int]]:
+        """(row_min, row_max, col_min, col_max) of the cells holding sensors, without binning them"""
+        if len(snapshot) == 0:
+            return None
+        d_lat, d_lng = cls.cell_size(cell_m)
+        return (int(math.floor(snapshot.lat.min() / d_lat)), int(math.floor(snapshot.lat.max() / d_lat)),
+                int(math.floor(snapshot.lng.min() / d_lng)), int(math.floor(snapshot.lng.max() / d_lng)))
+
+    @staticmethod
+    def cells(bounds: Optional[Tuple[int, int, int, int]], pad: int = 0) -> int:
+        """Number of cells in inclusive bounds, widened by pad on every side"""
+        if bounds is None:
+            return 0
+        row_min, row_max, col_min, col_max = bounds
+        return max(0, row_max - row_min + 1 + 2 * pad) * max(0, col_max - col_min + 1 + 2 * pad)
+
+    @staticmethod
+    def _blur(grid: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        """Separable convolution: one shifted, weighted sum per kernel tap and axis"""
+        radius = len(kernel) // 2
+        for axis in (0, 1):
+            padded = np.pad(grid, [(radius, radius) if a == axis else (0, 0) for a in (0, 1)])
+            length = grid.shape[axis]
+            grid = sum(weight * np.take(padded, np.arange(i, i + length), axis=axis)
+                       for i, weight in enumerate(kernel))
+        return grid
+
+    def window(self, bbox: Optional[Tuple[float, float, float, float]]) -> Tuple[slice, slice]:
+        """Array slices of the cells overlapping a (lat_min, lng_min, lat_max, lng_max) box"""
+        height, width = self.total.shape
+        if bbox is None:
+            return slice(0, height), slice(0, width)
+        lat_min, lng_min, lat_max, lng_max = bbox
+        row_start = max(0, int(math.floor(lat_min / self.d_lat)) - self.row0)
+        row_stop = min(height, int(math.floor(lat_max / self.d_lat)) - self.row0 + 1)
+        col_start = max(0, int(math.floor(lng_min / self.d_lng)) - self.col0)
+        col_stop = min(width, int(math.floor(lng_max / self.d_lng)) - self.col0 + 1)
+        return slice(row_start, max(row_start, row_stop)), slice(col_start, max(col_start, col_stop))
+
 
 class StatsService:
     """Service for generating parking statistics and analytics"""
@@ -52,40 +165,33 @@ class StatsService:
             }
 
     @classmethod
-    def get_zone_statistics(cls) -> Dict:
+    def get_zone_statistics(cls, snapshot=None) -> Dict:
         """
         Get parking statistics by zone
 
+        Args:
+            snapshot: SensorSnapshot to count (default: the current one)
+
         Returns:
             Dictionary containing zone-wise statistics
         """
         try:
+            if snapshot is None:
+                snapshot = SpatialIndexService.get_snapshot()
+            names, groups = snapshot.zone_groups()
+            totals = np.bincount(groups, minlength=len(names)).tolist()
+            available = np.bincount(groups, weights=snapshot.available, minlength=len(names)).astype(int).tolist()
+            occupied = np.bincount(groups, weights=snapshot.occupied, minlength=len(names)).astype(int).tolist()
+
             zones = {}
-            sensors = ParkingSensor.query.all()
-
-            for sensor in sensors:
-                zone = sensor.zone_number or 'Unknown'
-                if zone not in zones:
-                    zones[zone] = {
-                        'total': 0,
-                        'available': 0,
-                        'occupied': 0
-                    }
-
-                zones[zone]['total'] += 1
-                if sensor.status_description == 'Unoccupied':
-                    zones[zone]['available'] += 1
-                elif sensor.status_description == 'Occupied':
-                    zones[zone]['occupied'] += 1
-
-            # Calculate occupancy rates for each zone
-            for zone_data in zones.values():
-                if zone_data['total'] > 0:
-                    zone_data['occupancy_rate'] = round(
-                        (zone_data['occupied'] / zone_data['total'] * 100), 2
-                    )
-                else:
-                    zone_data['occupancy_rate'] = 0
+            for zone, zone_total, zone_available, zone_occupied in zip(names, totals, available, occupied):
+                zones[zone] = {
+                    'total': zone_total,
+                    'available': zone_available,
+                    'occupied': zone_occupied,
+                    # Calculate occupancy rates for each zone
+                    'occupancy_rate': round((zone_occupied / zone_total * 100), 2) if zone_total > 0 else 0
+                }
 
             return {
                 'zones': zones,
@@ -111,10 +217,11 @@ class StatsService:
             Dictionary containing parking lot statistics
         """
         try:
-            lots = ParkingLot.query.all()
+            # Lots come from the in-memory index, already serialized
+            lots = ParkingLotService.stats()
 
-            total_capacity = sum(lot.total_spaces for lot in lots)
-            total_available = sum(lot.available_spaces for lot in lots)
+            total_capacity = lots['total_capacity']
+            total_available = lots['total_available']
             total_occupied = total_capacity - total_available
 
             occupancy_rate = 0
@@ -122,12 +229,12 @@ class StatsService:
                 occupancy_rate = round((total_occupied / total_capacity * 100), 2)
 
             return {
-                'total_lots': len(lots),
+                'total_lots': lots['total_lots'],
                 'total_capacity': total_capacity,
                 'total_available': total_available,
                 'total_occupied': total_occupied,
                 'occupancy_rate': occupancy_rate,
-                'lots': [lot.to_dict() for lot in lots],
+                'lots': lots['lots'],
                 'last_updated': datetime.utcnow().isoformat()
             }
 
@@ -143,3 +250,152 @@ class StatsService:
                 'last_updated': datetime.utcnow().isoformat(),
                 'error': str(e)
             }
+
+    # Cell grids kept per worker; each is a few arrays the size of the sensor extent
+    HEATMAP_CACHE_ENTRIES = int(os.getenv('HEATMAP_CACHE_ENTRIES', '8'))
+
+    # Cells that are effectively empty after smoothing are left out of the response
+    HEATMAP_MIN_WEIGHT = 0.01
+
+    # Largest grid built over the whole sensor extent (three float64 arrays, ~48 MB at the
+    # default); beyond it, such as when one bay reports a far-off location, only the
+    # requested window is binned
+    HEATMAP_MAX_GRID_CELLS = int(os.getenv('HEATMAP_MAX_GRID_CELLS', '2000000'))
+
+    @classmethod
+    def get_heatmap_grid(cls, cell_m: float, smooth: float = 0.0, snapshot=None) -> HeatmapGrid:
+        """
+        Get the binned grid for a snapshot, cell size and smoothing
+
+        Grids are built once per (snapshot version, cell_m, smooth) and shared by
+        every bounding box requested against them.
+
+        Args:
+            cell_m: Cell edge in metres
+            smooth: Gaussian smoothing sigma in cells
+            snapshot: SensorSnapshot to bin (default: the current one)
+        """
+        if snapshot is None:
+            snapshot = SpatialIndexService.get_snapshot()
+        key = (snapshot.version, cell_m, smooth)
+        cache = current_app.extensions.setdefault('parking_heatmaps', OrderedDict())
+
+        with _heatmap_lock:
+            grid = cache.get(key)
+            if grid is not None:
+                cache.move_to_end(key)
+                return grid
+
+        grid = HeatmapGrid(snapshot, cell_m, smooth)
+        with _heatmap_lock:
+            for stale in [k for k in cache if k[0] < snapshot.version]:
+                del cache[stale]
+            cache[key] = grid
+            while len(cache) > cls.HEATMAP_CACHE_ENTRIES:
+                cache.popitem(last=False)
+        print(f"🗺️  Built {grid.total.shape[0]}x{grid.total.shape[1]} heatmap grid "
+              f"({cell_m:g} m, smooth {smooth:g}) for snapshot v{snapshot.version}")
+        return grid
+
+    @classmethod
+    def get_heatmap(cls, bbox: Optional[Tuple[float, float, float, float]], cell_m: float,
+                    smooth: float = 0.0, max_cells: Optional[int] = None) -> Dict:
+        """
+        Occupancy per grid cell inside a bounding box
+
+        Args:
+            bbox: (lat_min, lng_min, lat_max, lng_max), or None for every sensor
+            cell_m: Cell edge in metres
+            smooth: Gaussian smoothing sigma in cells (0 = raw counts)
+            max_cells: Refuse windows with more cells than this
+
+        Returns:
+            Dictionary with the grid geometry, non-empty cells as rows and percentile
+            summaries of cell occupancy; None if the window exceeds max_cells or
+            HEATMAP_MAX_GRID_CELLS
+        """
+        snapshot = SpatialIndexService.get_snapshot()
+        pad = int(math.ceil(3 * smooth)) if smooth > 0 else 0
+        extent = HeatmapGrid.extent(snapshot, cell_m)
+        if extent is not None:
+            # The cached grid spans the sensors' cells plus the smoothing pad
+            extent = (extent[0] - pad, extent[1] + pad, extent[2] - pad, extent[3] + pad)
+        window = extent
+        if bbox is not None and extent is not None:
+            d_lat, d_lng = HeatmapGrid.cell_size(cell_m)
+            lat_min, lng_min, lat_max, lng_max = bbox
+            window = (max(extent[0], int(math.floor(lat_min / d_lat))),
+                      min(extent[1], int(math.floor(lat_max / d_lat))),
+                      max(extent[2], int(math.floor(lng_min / d_lng))),
+                      min(extent[3], int(math.floor(lng_max / d_lng))))
+
+        # Sizes are checked before any grid is allocated
+        limit = cls.HEATMAP_MAX_GRID_CELLS if max_cells is None else min(max_cells, cls.HEATMAP_MAX_GRID_CELLS)
+        if HeatmapGrid.cells(window) > limit:
+            return None
+        if HeatmapGrid.cells(extent) <= cls.HEATMAP_MAX_GRID_CELLS:
+            grid = cls.get_heatmap_grid(cell_m, smooth, snapshot)
+            rows, cols = grid.window(bbox)
+        else:
+            # Too wide to bin whole: only the window (and its smoothing pad) is binned
+            grid = HeatmapGrid(snapshot, cell_m, smooth, bounds=window)
+            height, width = grid.total.shape
+            rows, cols = slice(pad, max(pad, height - pad)), slice(pad, max(pad, width - pad))
+        total = grid.total[rows, cols]
+        occupied = grid.occupied[rows, cols]
+        available = grid.available[rows, cols]
+
+        cell_rows, cell_cols = np.nonzero(total >= cls.HEATMAP_MIN_WEIGHT)
+        cell_total = total[cell_rows, cell_cols]
+        cell_occupied = occupied[cell_rows, cell_cols]
+        cell_available = available[cell_rows, cell_cols]
+        occupancy = cell_occupied / cell_total * 100 if len(cell_total) else np.zeros(0)
+
+        global_rows = cell_rows + grid.row0 + (rows.start or 0)
+        global_cols = cell_cols + grid.col0 + (cols.start or 0)
+        digits = 2 if smooth > 0 else 0
+        cells = list(zip(
+            global_rows.tolist(),
+            global_cols.tolist(),
+            np.round((global_rows + 0.5) * grid.d_lat, 6).tolist(),
+            np.round((global_cols + 0.5) * grid.d_lng, 6).tolist(),
+            np.round(cell_total, digits).tolist(),
+            np.round(cell_occupied, digits).tolist(),
+            np.round(cell_available, digits).tolist(),
+            np.round(occupancy, 2).tolist()
+        ))
+
+        sensors = float(total.sum())
+        summary = {
+            'cells': len(cells),
+            'sensors': round(sensors, digits),
+            'occupancy_rate': round(float(occupied.sum()) / sensors * 100, 2) if sensors else 0,
+            'cell_occupancy_percentiles': {
+                f'p{p}': round(float(value), 2)
+                for p, value in zip(HEATMAP_PERCENTILES,
+                                    np.percentile(occupancy, HEATMAP_PERCENTILES) if len(occupancy) else
+                                    [0.0] * len(HEATMAP_PERCENTILES))
+            },
+            'sensors_per_cell_percentiles': {
+                f'p{p}': round(float(value), 2)
+                for p, value in zip(HEATMAP_PERCENTILES,
+                                    np.percentile(cell_total, HEATMAP_PERCENTILES) if len(cell_total) else
+                                    [0.0] * len(HEATMAP_PERCENTILES))
+            }
+        }
+
+        return {
+            'grid': {
+                'cell_m': cell_m,
+                'smooth': smooth,
+                'd_lat': grid.d_lat,
+                'd_lng': grid.d_lng,
+                'shape': [int(total.shape[0]), int(total.shape[1])],
+                'bbox': list(bbox) if bbox else None
+            },
+            'fields': ['row', 'col', 'lat', 'lng', 'total', 'occupied', 'available', 'occupancy_rate'],
+            'cells': cells,
+            'summary': summary,
+            'snapshot_version': grid.version,
+            'last_updated': datetime.utcnow().isoformat()
+        }
@@ -0,0 +1,412 @@
+"""
+Turnover Service for Melbourne Parking System
+Maintains dwell-time and turnover aggregates per bay and zone, updated online from each ingest's transitions
+"""
+
+import math
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+
+from ..utils import TimeUtils
+from .forecast_service import MELBOURNE_TZ
+from .reference_service import ReferenceDataService, ReferenceView
+
+# Quantile sketch: log-spaced dwell buckets, so any reported quantile is within
+# SKETCH_ALPHA of the true value relative to it (the DDSketch construction)
+SKETCH_ALPHA = 0.01
+SKETCH_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+SKETCH_LOG_GAMMA = math.log(SKETCH_GAMMA)
+# Stays are clamped to 1 second .. 30 days for bucketing (running sums keep the exact value)
+MAX_SKETCH_DWELL_S = 30 * 86400
+SKETCH_BUCKETS = int(math.ceil(math.log(MAX_SKETCH_DWELL_S) / SKETCH_LOG_GAMMA)) + 1
+
+# Completed stays per zone are also kept per Melbourne calendar day for this many days
+TURNOVER_DAYS = 7
+
+_model_lock = threading.Lock()
+
+
+def sketch_bucket(dwell_s: np.ndarray) -> np.ndarray:
+    """Sketch bucket of each dwell time in seconds"""
+    keys = np.ceil(np.log(np.maximum(dwell_s, 1.0)) / SKETCH_LOG_GAMMA)
+    return np.minimum(keys, SKETCH_BUCKETS - 1).astype(np.int64)
+
+
+def sketch_quantile(counts: np.ndarray, q: float) -> Optional[float]:
+    """Dwell time in seconds at quantile q of one zone's sketch, None when it is empty"""
+    total = int(counts.sum())
+    if total == 0:
+        return None
+    rank = q * (total - 1)
+    key = int(np.searchsorted(np.cumsum(counts), rank, side='right'))
+    # Bucket k holds (gamma^(k-1), gamma^k]; its midpoint in relative terms
+    return 2 * SKETCH_GAMMA ** key / (SKETCH_GAMMA + 1) if key else 1.0
+
+
+def melbourne_day(at: datetime) -> int:
+    """Ordinal of the Melbourne calendar day a naive UTC time falls on"""
+    return at.replace(tzinfo=timezone.utc).astimezone(MELBOURNE_TZ).date().toordinal()
+
+
+class TurnoverModel:
+    """
+    Occupancy state per bay and completed-stay aggregates per bay and zone
+
+    A stay starts when a bay turns Occupied and completes when it leaves Occupied;
+    both ends are the status_timestamp of the transition. Zones keep exact running
+    sums (count, total, sum of squares, maximum), a dwell quantile sketch, stays
+    against the sign plate in force on arrival, and stays per day.
+    """
+
+    def __init__(self):
+        self.sensor_keys: List[str] = []
+        self.sensor_rows: Dict[str, int] = {}
+        self.sensor_zone = np.zeros(0, dtype=np.int32)
+        self.sensor_occupied = np.zeros(0, dtype=bool)
+        # Start of the bay's current status, NaT until a transition of the bay has been seen
+        self.sensor_since = np.zeros(0, dtype='datetime64[us]')
+        self.sensor_stays = np.zeros(0, dtype=np.int64)
+        self.sensor_dwell_s = np.zeros(0, dtype=np.float64)
+        self.sensor_overstays = np.zeros(0, dtype=np.int64)
+        self.zone_keys: List[str] = []
+        self.zone_rows: Dict[str, int] = {}
+        self.zone_stays = np.zeros(0, dtype=np.int64)
+        self.zone_dwell_s = np.zeros(0, dtype=np.float64)
+        self.zone_dwell_sq = np.zeros(0, dtype=np.float64)
+        self.zone_dwell_max = np.zeros(0, dtype=np.float64)
+        self.zone_restricted = np.zeros(0, dtype=np.int64)
+        self.zone_overstays = np.zeros(0, dtype=np.int64)
+        self.zone_sketch = np.zeros((0, SKETCH_BUCKETS), dtype=np.int32)
+        self.zone_daily = np.zeros((0, TURNOVER_DAYS), dtype=np.int32)
+        # Day ordinal held by each zone_daily column (day % TURNOVER_DAYS), -1 when unused
+        self.daily_days = np.full(TURNOVER_DAYS, -1, dtype=np.int64)
+        self.transitions = 0
+        self.cycles = 0
+        self.tracking_since: Optional[str] = None
+        self.last_observed: Optional[str] = None
+
+    @staticmethod
+    def _grow(array: np.ndarray, rows: int, fill=0) -> np.ndarray:
+        """Grow row capacity geometrically so new bays do not copy the arrays every cycle"""
+        if rows <= array.shape[0]:
+            return array
+        capacity = max(rows, array.shape[0] * 2, 64)
+        grown = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+        grown[:array.shape[0]] = array
+        return grown
+
+    def _zone_row(self, zone: str) -> int:
+        row = self.zone_rows.get(zone)
+        if row is None:
+            row = len(self.zone_keys)
+            self.zone_rows[zone] = row
+            self.zone_keys.append(zone)
+            for name in ('zone_stays', 'zone_dwell_s', 'zone_dwell_sq', 'zone_dwell_max', 'zone_restricted',
+                         'zone_overstays', 'zone_sketch', 'zone_daily'):
+                setattr(self, name, self._grow(getattr(self, name), row + 1))
+        return row
+
+    def _sensor_row(self, kerbside_id: str, zone_row: int, occupied: bool) -> int:
+        row = self.sensor_rows.get(kerbside_id)
+        if row is None:
+            row = len(self.sensor_keys)
+            self.sensor_rows[kerbside_id] = row
+            self.sensor_keys.append(kerbside_id)
+            for name in ('sensor_zone', 'sensor_occupied', 'sensor_stays', 'sensor_dwell_s', 'sensor_overstays'):
+                setattr(self, name, self._grow(getattr(self, name), row + 1))
+            self.sensor_since = self._grow(self.sensor_since, row + 1, fill=np.datetime64('NaT'))
+            self.sensor_occupied[row] = occupied
+        self.sensor_zone[row] = zone_row
+        return row
+
+    def observe(self, events: List[Dict], when: datetime,
+                zone_restrictions: Optional[Dict[str, List[Dict]]] = None) -> int:
+        """
+        Fold one ingest cycle's transitions into the aggregates
+
+        Args:
+            events: Change events built with WebhookService.build_event
+            when: Ingest time, used for events without a status_timestamp
+            zone_restrictions: Parsed sign plates by zone, for overstay counts
+
+        Returns:
+            Number of stays completed by these events
+        """
+        zone_restrictions = zone_restrictions or {}
+        rows, zones, dwell, limits, days = [], [], [], [], []
+        for event in events:
+            zone = event['zone_number'] or 'Unknown'
+            zone_row = self._zone_row(zone)
+            row = self._sensor_row(event['kerbside_id'], zone_row, event['previous_status'] == 'Occupied')
+            at = TimeUtils.parse_iso_timestamp(event['status_timestamp']) or when
+            occupied = event['status'] == 'Occupied'
+
+            since = self.sensor_since[row]
+            if self.sensor_occupied[row] and not occupied and not np.isnat(since):
+                arrived = since.astype(datetime)
+                seconds = (at - arrived).total_seconds()
+                # Out-of-order timestamps end the state without producing a stay
+                if seconds >= 0:
+                    rows.append(row)
+                    zones.append(zone_row)
+                    dwell.append(seconds)
+                    days.append(melbourne_day(at))
+                    restriction = ReferenceView.active_restriction(zone_restrictions.get(zone, []), arrived)
+                    minutes = restriction['duration_minutes'] if restriction else None
+                    limits.append(minutes * 60.0 if minutes else np.nan)
+
+            self.sensor_occupied[row] = occupied
+            self.sensor_since[row] = np.datetime64(at, 'us')
+
+        self.transitions += len(events)
+        self.cycles += 1
+        self.tracking_since = self.tracking_since or when.isoformat()
+        self.last_observed = when.isoformat()
+        if not rows:
+            return 0
+
+        rows = np.asarray(rows, dtype=np.int64)
+        zones = np.asarray(zones, dtype=np.int64)
+        dwell = np.asarray(dwell, dtype=np.float64)
+        limits = np.asarray(limits, dtype=np.float64)
+        restricted = ~np.isnan(limits)
+        over = restricted & (dwell > np.nan_to_num(limits, nan=np.inf))
+
+        np.add.at(self.sensor_stays, rows, 1)
+        np.add.at(self.sensor_dwell_s, rows, dwell)
+        np.add.at(self.sensor_overstays, rows, over)
+        np.add.at(self.zone_stays, zones, 1)
+        np.add.at(self.zone_dwell_s, zones, dwell)
+        np.add.at(self.zone_dwell_sq, zones, dwell ** 2)
+        np.maximum.at(self.zone_dwell_max, zones, dwell)
+        np.add.at(self.zone_restricted, zones, restricted)
+        np.add.at(self.zone_overstays, zones, over)
+        np.add.at(self.zone_sketch, (zones, sketch_bucket(dwell)), 1)
+
+        # Move the day columns forward, dropping days that fell out of the window
+        days = np.asarray(days, dtype=np.int64)
+        for day in np.unique(days).tolist():
+            slot = day % TURNOVER_DAYS
+            if day > self.daily_days[slot]:
+                self.zone_daily[:, slot] = 0
+                self.daily_days[slot] = day
+        slots = days % TURNOVER_DAYS
+        current = self.daily_days[slots] == days
+        np.add.at(self.zone_daily, (zones[current], slots[current]), 1)
+        return len(rows)
+
+    def zone_report(self, zone_row: int, today: int, limit_minutes: Optional[float] = None,
+                    include_bays: bool = False) -> Dict:
+        """
+        Dwell and turnover summary of one zone
+
+        Args:
+            zone_row: Zone index
+            today: Melbourne day ordinal the daily window ends on
+            limit_minutes: Also report the share of stays longer than this
+            include_bays: Add per-bay figures
+        """
+        n_sensors = len(self.sensor_keys)
+        members = np.flatnonzero(self.sensor_zone[:n_sensors] == zone_row)
+        stays = int(self.zone_stays[zone_row])
+        sketch = self.zone_sketch[zone_row]
+
+        dwell = None
+        if stays:
+            mean = self.zone_dwell_s[zone_row] / stays
+            variance = max(self.zone_dwell_sq[zone_row] / stays - mean ** 2, 0.0)
+            longest = self.zone_dwell_max[zone_row]
+            dwell = {
+                'mean': round(mean / 60, 2),
+                'stddev': round(math.sqrt(variance) / 60, 2),
+                'max': round(longest / 60, 2),
+                # The exact maximum also bounds the sketch's estimate of the top bucket
+                'p50': round(min(sketch_quantile(sketch, 0.50), longest) / 60, 2),
+                'p90': round(min(sketch_quantile(sketch, 0.90), longest) / 60, 2),
+                'p95': round(min(sketch_quantile(sketch, 0.95), longest) / 60, 2)
+            }
+            if limit_minutes is not None:
+                # Buckets wholly above the limit; accurate to SKETCH_ALPHA around it
+                over = sketch[sketch_bucket(np.array([limit_minutes * 60.0]))[0] + 1:].sum()
+                dwell['over_limit_share'] = round(float(over) / stays, 4)
+
+        # Days before tracking started have no data rather than zero stays
+        first_day = melbourne_day(datetime.fromisoformat(self.tracking_since)) if self.tracking_since else today
+        daily = []
+        for day in range(max(today - TURNOVER_DAYS + 1, first_day), today + 1):
+            slot = day % TURNOVER_DAYS
+            count = int(self.zone_daily[zone_row, slot]) if self.daily_days[slot] == day else 0
+            daily.append({
+                'date': datetime.fromordinal(day).date().isoformat(),
+                'stays': count,
+                'per_bay': round(count / len(members), 3) if len(members) else None
+            })
+        window_stays = sum(entry['stays'] for entry in daily)
+
+        report = {
+            'zone_number': self.zone_keys[zone_row],
+            'bays': len(members),
+            'occupied_now': int(self.sensor_occupied[members].sum()),
+            'stays': stays,
+            'dwell_minutes': dwell,
+            'turnover': {
+                'stays_per_bay_per_day': round(window_stays / (len(members) * len(daily)), 3)
+                if len(members) and daily else None,
+                'daily': daily
+            },
+            'overstays': {
+                'restricted_stays': int(self.zone_restricted[zone_row]),
+                'overstays': int(self.zone_overstays[zone_row]),
+                'share': round(int(self.zone_overstays[zone_row]) / int(self.zone_restricted[zone_row]), 4)
+                if self.zone_restricted[zone_row] else None
+            },
+            'sketch_relative_accuracy': SKETCH_ALPHA,
+            'tracking_since': self.tracking_since,
+            'last_observed': self.last_observed
+        }
+        if include_bays:
+            report['bay_stats'] = [
+                {
+                    'kerbside_id': self.sensor_keys[row],
+                    'status': 'Occupied' if self.sensor_occupied[row] else 'Unoccupied',
+                    'since': None if np.isnat(self.sensor_since[row]) else self.sensor_since[row].astype(datetime).isoformat(),
+                    'stays': int(self.sensor_stays[row]),
+                    'mean_dwell_minutes': round(self.sensor_dwell_s[row] / self.sensor_stays[row] / 60, 2)
+                    if self.sensor_stays[row] else None,
+                    'overstays': int(self.sensor_overstays[row])
+                }
+                for row in members.tolist()
+            ]
+        return report
+
+    def save(self, path: str):
+        """Write the model atomically so a crash never leaves a half-written file"""
+        n_sensors = len(self.sensor_keys)
+        n_zones = len(self.zone_keys)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                transitions=np.int64(self.transitions),
+                cycles=np.int64(self.cycles),
+                tracking_since=np.array(self.tracking_since or ''),
+                last_observed=np.array(self.last_observed or ''),
+                sensor_keys=np.array(self.sensor_keys, dtype=str),
+                sensor_zone=self.sensor_zone[:n_sensors],
+                sensor_occupied=self.sensor_occupied[:n_sensors],
+                sensor_since=self.sensor_since[:n_sensors],
+                sensor_stays=self.sensor_stays[:n_sensors],
+                sensor_dwell_s=self.sensor_dwell_s[:n_sensors],
+                sensor_overstays=self.sensor_overstays[:n_sensors],
+                zone_keys=np.array(self.zone_keys, dtype=str),
+                zone_stays=self.zone_stays[:n_zones],
+                zone_dwell_s=self.zone_dwell_s[:n_zones],
+                zone_dwell_sq=self.zone_dwell_sq[:n_zones],
+                zone_dwell_max=self.zone_dwell_max[:n_zones],
+                zone_restricted=self.zone_restricted[:n_zones],
+                zone_overstays=self.zone_overstays[:n_zones],
+                zone_sketch=self.zone_sketch[:n_zones],
+                zone_daily=self.zone_daily[:n_zones],
+                daily_days=self.daily_days
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'TurnoverModel':
+        model = cls()
+        with np.load(path, allow_pickle=False) as state:
+            model.transitions = int(state['transitions'])
+            model.cycles = int(state['cycles'])
+            model.tracking_since = str(state['tracking_since']) or None
+            model.last_observed = str(state['last_observed']) or None
+            model.sensor_keys = [str(k) for k in state['sensor_keys']]
+            model.sensor_rows = {k: i for i, k in enumerate(model.sensor_keys)}
+            model.zone_keys = [str(k) for k in state['zone_keys']]
+            model.zone_rows = {k: i for i, k in enumerate(model.zone_keys)}
+            for name in ('sensor_zone', 'sensor_occupied', 'sensor_since', 'sensor_stays', 'sensor_dwell_s',
+                         'sensor_overstays', 'zone_stays', 'zone_dwell_s', 'zone_dwell_sq', 'zone_dwell_max',
+                         'zone_restricted', 'zone_overstays', 'zone_sketch', 'zone_daily', 'daily_days'):
+                setattr(model, name, state[name].copy())
+        return model
+
+
+class TurnoverService:
+    """Service for dwell-time and turnover statistics per zone"""
+
+    @classmethod
+    def state_path(cls) -> str:
+        return os.getenv('TURNOVER_STATE_PATH') or os.path.join(current_app.instance_path, 'turnover_state.npz')
+
+    @classmethod
+    def get_model(cls) -> TurnoverModel:
+        """
+        Get this worker's model, reloading it when another worker has saved a newer one
+
+        Returns:
+            TurnoverModel
+        """
+        path = cls.state_path()
+        state = current_app.extensions.setdefault('parking_turnover', {'model': None, 'mtime': None})
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if state['model'] is None or (mtime is not None and mtime != state['mtime']):
+            with _model_lock:
+                if state['model'] is None or (mtime is not None and mtime != state['mtime']):
+                    state['model'] = TurnoverModel.load(path) if mtime else TurnoverModel()
+                    state['mtime'] = mtime
+        return state['model']
+
+    @classmethod
+    def observe(cls, events: List[Dict], when: datetime = None) -> int:
+        """
+        Update the aggregates with one ingest cycle's transitions and persist them
+
+        Args:
+            events: Change events built with WebhookService.build_event
+            when: Ingest time (default: utcnow)
+
+        Returns:
+            Number of stays completed in this cycle
+        """
+        if not events:
+            return 0
+        restrictions = ReferenceDataService.get_view().zone_restrictions
+        model = cls.get_model()
+        with _model_lock:
+            completed = model.observe(events, when or datetime.utcnow(), restrictions)
+            path = cls.state_path()
+            model.save(path)
+            current_app.extensions['parking_turnover']['mtime'] = os.stat(path).st_mtime_ns
+        return completed
+
+    @classmethod
+    def zone_turnover(cls, zone: str, limit_minutes: Optional[float] = None,
+                      include_bays: bool = False) -> Optional[Dict]:
+        """
+        Dwell-time and turnover summary of a zone
+
+        Args:
+            zone: Zone number
+            limit_minutes: Also report the share of stays longer than this many minutes
+            include_bays: Add per-bay stays, mean dwell and overstays
+
+        Returns:
+            Summary dictionary, or None if no transition in the zone has been seen
+        """
+        model = cls.get_model()
+        zone_row = model.zone_rows.get(zone)
+        if zone_row is None:
+            return None
+        with _model_lock:
+            return model.zone_report(zone_row, melbourne_day(datetime.utcnow()), limit_minutes, include_bays)
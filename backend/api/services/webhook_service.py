@@ -0,0 +1,373 @@
+"""
+Webhook Service for Melbourne Parking System
+Fans status change events out to partner subscriptions with batched background delivery
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, urlunparse
+
+import requests
+from flask import Flask, current_app
+from requests.adapters import HTTPAdapter
+
+from ..models import WebhookDeadLetter, WebhookSubscription, db
+
+# Deliveries never run on the ingest thread; this pool bounds how many are in flight at once
+_delivery_pool = ThreadPoolExecutor(max_workers=int(os.getenv('WEBHOOK_WORKERS', '4')),
+                                    thread_name_prefix='webhook-delivery')
+_stats_lock = threading.Lock()
+
+
+class PinnedAddressAdapter(HTTPAdapter):
+    """
+    Transport adapter that connects to one address that was already checked
+
+    The URL's host is swapped for the address, while the Host header, TLS SNI and
+    certificate check keep the original hostname, so no second DNS lookup happens
+    between the check and the connection.
+    """
+
+    def __init__(self, hostname: str, address: str):
+        self.hostname = hostname
+        self.address = address
+        super().__init__()
+
+    def init_poolmanager(self, *args, **kwargs):
+        # urllib3 drops these for plain http pools
+        kwargs['server_hostname'] = self.hostname
+        kwargs['assert_hostname'] = self.hostname
+        super().init_poolmanager(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        parsed = urlparse(request.url)
+        host = f'[{self.address}]' if ':' in self.address else self.address
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        request.headers['Host'] = parsed.netloc.rpartition('@')[2]
+        request.url = urlunparse(parsed._replace(netloc=f'{host}:{port}'))
+        return super().send(request, **kwargs)
+
+
+class WebhookService:
+    """Service matching change events to subscriptions and delivering them with retries"""
+
+    BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '500'))
+    MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '5'))
+    BACKOFF_SECONDS = float(os.getenv('WEBHOOK_BACKOFF_SECONDS', '1.0'))
+    MAX_BACKOFF_SECONDS = float(os.getenv('WEBHOOK_MAX_BACKOFF_SECONDS', '60'))
+    TIMEOUT_SECONDS = float(os.getenv('WEBHOOK_TIMEOUT_SECONDS', '5'))
+    # Batches queued or waiting for a retry in this worker; beyond this they go straight to the dead-letter table
+    MAX_PENDING = int(os.getenv('WEBHOOK_MAX_PENDING', '1000'))
+
+    # Callback hosts must resolve to public addresses unless this is set (local sinks and tests)
+    ALLOW_PRIVATE_URLS = os.getenv('WEBHOOK_ALLOW_PRIVATE_URLS', '0') == '1'
+
+    STATUS_ALIASES = {'available': 'Unoccupied', 'occupied': 'Occupied'}
+
+    @staticmethod
+    def _state() -> Dict:
+        return current_app.extensions.setdefault('parking_webhooks', {
+            'pending': 0,
+            'published_events': 0,
+            'batches': 0,
+            'delivered': 0,
+            'retried': 0,
+            'dead_lettered': 0,
+            'last_error': None
+        })
+
+    @classmethod
+    def normalize_statuses(cls, statuses: List[str]) -> List[str]:
+        """Accept feed statuses or the API's 'available'/'occupied' filter names"""
+        return [cls.STATUS_ALIASES.get(status.lower(), status) for status in statuses if status]
+
+    @classmethod
+    def check_callback_url(cls, url: str) -> Optional[str]:
+        """
+        Why a callback URL must not be called, or None if it may be
+
+        The host is resolved and every address it resolves to must be public: private,
+        loopback, link-local (including cloud metadata endpoints), multicast and reserved
+        addresses are refused, so a subscription cannot make the server POST into its own
+        network. Deliveries check again before every attempt, since DNS can change after
+        the subscription was created.
+        """
+        return cls.resolve_callback_url(url)[0]
+
+    @classmethod
+    def resolve_callback_url(cls, url: str) -> Tuple[Optional[str], List[str]]:
+        """
+        Resolve a callback URL's host and check its addresses
+
+        Returns:
+            (reason the URL is refused or None, the public addresses it resolved to);
+            no addresses are resolved when WEBHOOK_ALLOW_PRIVATE_URLS is set
+        """
+        parsed = urlparse(url)
+        try:
+            port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        except ValueError:
+            port = None
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname or port is None:
+            return '"callback_url" must be an http or https URL', []
+        if cls.ALLOW_PRIVATE_URLS:
+            return None, []
+
+        try:
+            addresses = list(dict.fromkeys(
+                info[4][0] for info in socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+            ))
+        except (socket.gaierror, UnicodeError) as e:
+            return f'"callback_url" host {parsed.hostname} does not resolve: {e}', []
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split('%')[0])
+            if not ip.is_global or ip.is_multicast:
+                return f'"callback_url" host {parsed.hostname} resolves to non-public address {ip}', []
+        return None, addresses
+
+    @staticmethod
+    def build_event(sensor, previous_status: Optional[str]) -> Dict:
+        """Change event for a sensor whose status differs from the previous ingest"""
+        return {
+            'kerbside_id': sensor.kerbside_id,
+            'zone_number': sensor.zone_number,
+            'status': sensor.status_description,
+            'previous_status': previous_status,
+            'status_timestamp': sensor.status_timestamp.isoformat() if sensor.status_timestamp else None,
+            'latitude': sensor.latitude,
+            'longitude': sensor.longitude
+        }
+
+    @staticmethod
+    def match(subscriptions: List[WebhookSubscription], events: List[Dict]) -> Dict[int, List[Dict]]:
+        """
+        Group events by the subscriptions they concern
+
+        Zone subscriptions are looked up by zone number; bounding-box subscriptions
+        are checked per event.
+
+        Returns:
+            Matched events by subscription id
+        """
+        by_zone = {}
+        by_box = []
+        for subscription in subscriptions:
+            statuses = set(subscription.statuses.split(',')) if subscription.statuses else None
+            if subscription.zone_number:
+                by_zone.setdefault(subscription.zone_number, []).append((subscription.id, statuses))
+            else:
+                by_box.append((subscription.id, statuses, subscription.lat_min, subscription.lng_min,
+                               subscription.lat_max, subscription.lng_max))
+
+        matched = {}
+        for event in events:
+            for subscription_id, statuses in by_zone.get(event['zone_number'], ()):
+                if statuses is None or event['status'] in statuses:
+                    matched.setdefault(subscription_id, []).append(event)
+            for subscription_id, statuses, lat_min, lng_min, lat_max, lng_max in by_box:
+                if lat_min <= event['latitude'] <= lat_max and lng_min <= event['longitude'] <= lng_max and \
+                        (statuses is None or event['status'] in statuses):
+                    matched.setdefault(subscription_id, []).append(event)
+        return matched
+
+    @classmethod
+    def publish(cls, events: List[Dict]) -> Dict:
+        """
+        Queue the change events of one ingest cycle for delivery and return immediately
+
+        Args:
+            events: Events built with build_event
+
+        Returns:
+            Dictionary with the number of subscriptions notified and batches queued
+        """
+        if not events:
+            return {'subscriptions': 0, 'batches': 0}
+
+        subscriptions = WebhookSubscription.query.filter_by(active=True).all()
+        if not subscriptions:
+            return {'subscriptions': 0, 'batches': 0}
+
+        app = current_app._get_current_object()
+        state = cls._state()
+        targets = {subscription.id: subscription for subscription in subscriptions}
+        matched = cls.match(subscriptions, events)
+        sent_at = datetime.utcnow().isoformat()
+
+        batches = 0
+        for subscription_id, subscription_events in matched.items():
+            subscription = targets[subscription_id]
+            for start in range(0, len(subscription_events), cls.BATCH_SIZE):
+                batch_id = uuid.uuid4().hex
+                payload = {
+                    'batch_id': batch_id,
+                    'subscription_id': subscription_id,
+                    'sent_at': sent_at,
+                    'events': subscription_events[start:start + cls.BATCH_SIZE]
+                }
+                cls._enqueue(app, state, {
+                    'subscription_id': subscription_id,
+                    'url': subscription.callback_url,
+                    'secret': subscription.secret,
+                    'batch_id': batch_id,
+                    'body': json.dumps(payload).encode(),
+                    'attempts': 0
+                })
+                batches += 1
+
+        with _stats_lock:
+            state['published_events'] += sum(len(e) for e in matched.values())
+            state['batches'] += batches
+        if batches:
+            print(f"📨 Queued {batches} webhook batches for {len(matched)} subscriptions")
+        return {'subscriptions': len(matched), 'batches': batches}
+
+    @classmethod
+    def _enqueue(cls, app: Flask, state: Dict, job: Dict):
+        with _stats_lock:
+            full = state['pending'] >= cls.MAX_PENDING
+            if not full:
+                state['pending'] += 1
+        if full:
+            cls._dead_letter(app, state, job, 'Delivery queue full')
+            return
+        _delivery_pool.submit(cls._deliver, app, state, job)
+
+    @classmethod
+    def _headers(cls, job: Dict) -> Dict:
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'melbourne-parking-webhooks/1.0',
+            'X-Parking-Delivery': job['batch_id'],
+            'X-Parking-Attempt': str(job['attempts'])
+        }
+        if job['secret']:
+            digest = hmac.new(job['secret'].encode(), job['body'], hashlib.sha256).hexdigest()
+            headers['X-Parking-Signature'] = f'sha256={digest}'
+        return headers
+
+    @classmethod
+    def _deliver(cls, app: Flask, state: Dict, job: Dict):
+        """Worker task: one delivery attempt, then success, a scheduled retry or the dead-letter table"""
+        job['attempts'] += 1
+        retry_after = None
+        try:
+            refused, addresses = cls.resolve_callback_url(job['url'])
+            if refused:
+                raise ValueError(refused)
+            with requests.Session() as session:
+                if addresses:
+                    # Connect to the address just checked; a rebinding host could resolve inward on a second lookup
+                    adapter = PinnedAddressAdapter(urlparse(job['url']).hostname, addresses[0])
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                # Redirects are not followed, or a public URL could forward the batch inward
+                response = session.post(job['url'], data=job['body'], headers=cls._headers(job),
+                                        timeout=cls.TIMEOUT_SECONDS, allow_redirects=False)
+            if 200 <= response.status_code < 300:
+                with _stats_lock:
+                    state['pending'] -= 1
+                    state['delivered'] += 1
+                return
+            error = f'HTTP {response.status_code}'
+            retryable = response.status_code >= 500 or response.status_code in (408, 429)
+            if response.headers.get('Retry-After', '').isdigit():
+                retry_after = float(response.headers['Retry-After'])
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+            retryable = True
+        except Exception as e:
+            error = str(e)
+            retryable = False
+
+        if retryable and job['attempts'] < cls.MAX_ATTEMPTS:
+            # Exponential backoff with jitter so a recovering partner is not hit in lockstep
+            delay = min(cls.MAX_BACKOFF_SECONDS, cls.BACKOFF_SECONDS * 2 ** (job['attempts'] - 1))
+            delay = retry_after if retry_after is not None else delay * random.uniform(0.5, 1.0)
+            with _stats_lock:
+                state['retried'] += 1
+            timer = threading.Timer(delay, _delivery_pool.submit, args=(cls._deliver, app, state, job))
+            timer.daemon = True
+            timer.start()
+            return
+
+        with _stats_lock:
+            state['pending'] -= 1
+        cls._dead_letter(app, state, job, error)
+
+    @classmethod
+    def _dead_letter(cls, app: Flask, state: Dict, job: Dict, error: str):
+        with _stats_lock:
+            state['dead_lettered'] += 1
+            state['last_error'] = error
+        print(f"⚠️  Webhook batch {job['batch_id']} for subscription {job['subscription_id']} "
+              f"dead-lettered after {job['attempts']} attempts: {error}")
+        try:
+            with app.app_context():
+                db.session.add(WebhookDeadLetter(
+                    subscription_id=job['subscription_id'],
+                    batch_id=job['batch_id'],
+                    payload=job['body'].decode(),
+                    attempts=job['attempts'],
+                    last_error=error[:500],
+                    created_at=datetime.utcnow()
+                ))
+                db.session.commit()
+                db.session.remove()
+        except Exception as e:
+            print(f"❌ Failed to store dead-lettered webhook batch {job['batch_id']}: {e}")
+
+    @classmethod
+    def replay_dead_letter(cls, letter: WebhookDeadLetter) -> bool:
+        """
+        Queue a dead-lettered batch again with a fresh attempt budget
+
+        Returns:
+            False if its subscription no longer exists or is inactive
+        """
+        subscription = db.session.get(WebhookSubscription, letter.subscription_id)
+        if subscription is None or not subscription.active:
+            return False
+
+        job = {
+            'subscription_id': subscription.id,
+            'url': subscription.callback_url,
+            'secret': subscription.secret,
+            'batch_id': letter.batch_id,
+            'body': letter.payload.encode(),
+            'attempts': 0
+        }
+        db.session.delete(letter)
+        db.session.commit()
+        cls._enqueue(current_app._get_current_object(), cls._state(), job)
+        return True
+
+    @classmethod
+    def wait_idle(cls, timeout: float = 30.0) -> bool:
+        """Block until every queued batch is delivered or dead-lettered (for harnesses and shutdown)"""
+        state = cls._state()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with _stats_lock:
+                if state['pending'] == 0:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """Delivery counters for this worker"""
+        state = cls._state()
+        with _stats_lock:
+            return dict(state)
@@ -2,9 +2,14 @@
 Utility Functions for Melbourne Parking API
 """
 
+import base64
+import hashlib
+import json
 import re
-from typing import Tuple, Optional
-from datetime import datetime
+from typing import List, Tuple, Optional
+from datetime import datetime, timezone
+
+import numpy as np
 
 class LocationUtils:
     """Utilities for location-based operations"""
@@ -54,6 +59,169 @@ class LocationUtils:
         return (melbourne_bounds['lat_min'] <= lat <= melbourne_bounds['lat_max'] and
                 melbourne_bounds['lng_min'] <= lng <= melbourne_bounds['lng_max'])
 
+class GeohashUtils:
+    """
+    Geohash encoding and range covers for spatial queries on a plain B-tree index
+
+    Geohashes sort in Z-order, so the sensors inside a cell share a prefix and
+    form one contiguous key range. A box becomes a handful of range scans on the
+    indexed geohash column, on any database.
+    """
+
+    BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+    # Stored precision: 9 characters is a cell of roughly 4.8 m x 4.8 m
+    PRECISION = 9
+
+    # Most cells a box may be covered with; coarser cells are used beyond this
+    MAX_COVER_CELLS = 128
+
+    @staticmethod
+    def _cell_bits(precision: int) -> Tuple[int, int]:
+        """Longitude and latitude bits in a geohash of this length (longitude takes the extra bit)"""
+        bits = 5 * precision
+        return (bits + 1) // 2, bits // 2
+
+    @classmethod
+    def _cell_index(cls, lat: float, lng: float, precision: int) -> Tuple[int, int]:
+        """Column and row of the cell holding a point"""
+        lng_bits, lat_bits = cls._cell_bits(precision)
+        x = int((lng + 180.0) / 360.0 * (1 << lng_bits))
+        y = int((lat + 90.0) / 180.0 * (1 << lat_bits))
+        return min(max(x, 0), (1 << lng_bits) - 1), min(max(y, 0), (1 << lat_bits) - 1)
+
+    @classmethod
+    def _interleave(cls, x: int, y: int, precision: int) -> int:
+        """Z-order value of a cell, starting with the top longitude bit as geohash does"""
+        lng_bits, lat_bits = cls._cell_bits(precision)
+        code = 0
+        for i in range(5 * precision):
+            if i % 2 == 0:
+                lng_bits -= 1
+                code = (code << 1) | ((x >> lng_bits) & 1)
+            else:
+                lat_bits -= 1
+                code = (code << 1) | ((y >> lat_bits) & 1)
+        return code
+
+    @classmethod
+    def _to_string(cls, code: int, precision: int) -> str:
+        chars = []
+        for _ in range(precision):
+            chars.append(cls.BASE32[code & 31])
+            code >>= 5
+        return ''.join(reversed(chars))
+
+    @classmethod
+    def encode(cls, lat: float, lng: float, precision: int = None) -> str:
+        """
+        Geohash of a point
+
+        Args:
+            lat, lng: Coordinate pair
+            precision: Number of characters (default: PRECISION)
+
+        Returns:
+            Geohash string
+        """
+        precision = precision or cls.PRECISION
+        x, y = cls._cell_index(lat, lng, precision)
+        return cls._to_string(cls._interleave(x, y, precision), precision)
+
+    @classmethod
+    def encode_codes(cls, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """
+        Geohashes of many points at PRECISION, as integers
+
+        The integers sort in the same order as the geohash strings, so an in-memory
+        column of them can be range-scanned with the bounds from cover_code_ranges.
+
+        Args:
+            lats, lngs: Coordinate arrays
+
+        Returns:
+            int64 array of Z-order values
+        """
+        lng_bits, lat_bits = cls._cell_bits(cls.PRECISION)
+        x = np.clip(((lngs + 180.0) / 360.0 * (1 << lng_bits)).astype(np.int64), 0, (1 << lng_bits) - 1)
+        y = np.clip(((lats + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+        codes = np.zeros(len(x), dtype=np.int64)
+        for i in range(5 * cls.PRECISION):
+            if i % 2 == 0:
+                lng_bits -= 1
+                codes = (codes << 1) | ((x >> lng_bits) & 1)
+            else:
+                lat_bits -= 1
+                codes = (codes << 1) | ((y >> lat_bits) & 1)
+        return codes
+
+    @classmethod
+    def _cover(cls, lat_min: float, lng_min: float, lat_max: float, lng_max: float,
+               max_cells: int = None) -> Tuple[int, List[Tuple[int, int]]]:
+        """Precision of the covering cells, and runs of adjacent cells as (first, last + 1) codes"""
+        max_cells = max_cells or cls.MAX_COVER_CELLS
+        for precision in range(cls.PRECISION, 0, -1):
+            x0, y0 = cls._cell_index(lat_min, lng_min, precision)
+            x1, y1 = cls._cell_index(lat_max, lng_max, precision)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_cells or precision == 1:
+                break
+
+        codes = sorted(cls._interleave(x, y, precision)
+                       for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+        runs = []
+        start = previous = codes[0]
+        for code in codes[1:] + [None]:
+            if code is not None and code == previous + 1:
+                previous = code
+                continue
+            runs.append((start, previous + 1))
+            if code is not None:
+                start = previous = code
+        return precision, runs
+
+    @classmethod
+    def cover_ranges(cls, lat_min: float, lng_min: float, lat_max: float, lng_max: float,
+                     max_cells: int = None) -> List[Tuple[str, Optional[str]]]:
+        """
+        Key ranges of stored geohashes that together contain a bounding box
+
+        The box is covered with the finest cells that number at most max_cells;
+        cells that are adjacent in Z-order are merged into a single range.
+        Ranges contain everything in the covering cells, so callers still check
+        the exact shape they are querying.
+
+        Args:
+            lat_min, lng_min, lat_max, lng_max: Bounding box
+            max_cells: Cell budget (default: MAX_COVER_CELLS)
+
+        Returns:
+            List of (low, high) with low <= geohash < high; high is None for the last
+            range of the world. Bounds only use geohash characters, so they compare
+            the same under binary and case-insensitive collations.
+        """
+        precision, runs = cls._cover(lat_min, lng_min, lat_max, lng_max, max_cells)
+        end_of_world = 1 << (5 * precision)
+        return [(cls._to_string(start, precision),
+                 cls._to_string(end, precision) if end < end_of_world else None)
+                for start, end in runs]
+
+    @classmethod
+    def cover_code_ranges(cls, lat_min: float, lng_min: float, lat_max: float, lng_max: float,
+                          max_cells: int = None) -> List[Tuple[int, int]]:
+        """
+        The ranges of cover_ranges as encode_codes values: low <= code < high
+
+        Args:
+            lat_min, lng_min, lat_max, lng_max: Bounding box
+            max_cells: Cell budget (default: MAX_COVER_CELLS)
+
+        Returns:
+            List of (low, high) integer bounds at PRECISION
+        """
+        precision, runs = cls._cover(lat_min, lng_min, lat_max, lng_max, max_cells)
+        shift = 5 * (cls.PRECISION - precision)
+        return [(start << shift, end << shift) for start, end in runs]
+
 class ValidationUtils:
     """Utilities for data validation"""
 
@@ -117,6 +285,29 @@ class TimeUtils:
 
         return timestamp.strftime("%Y-%m-%d %H:%M:%S")
 
+    @staticmethod
+    def parse_iso_timestamp(value: str) -> Optional[datetime]:
+        """
+        Parse an ISO 8601 query parameter into a naive UTC datetime
+
+        Args:
+            value: Timestamp such as 2024-05-14T08:45:00+10:00 (naive values are taken as UTC)
+
+        Returns:
+            Naive UTC datetime, or None if the value cannot be parsed
+        """
+        if not value:
+            return None
+
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        except ValueError:
+            return None
+
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
     @staticmethod
     def get_time_ago(timestamp: datetime) -> str:
         """
@@ -189,3 +380,54 @@ class ResponseUtils:
             'timestamp': datetime.utcnow().isoformat()
         }
 
+class PaginationUtils:
+    """Utilities for opaque keyset pagination cursors"""
+
+    @staticmethod
+    def encode_cursor(payload: dict) -> str:
+        """
+        Encode a cursor payload as an opaque URL-safe token
+
+        Args:
+            payload: JSON-serialisable cursor state
+
+        Returns:
+            Cursor string
+        """
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Optional[dict]:
+        """
+        Decode a cursor produced by encode_cursor
+
+        Args:
+            cursor: Cursor string from a previous response
+
+        Returns:
+            Cursor payload, or None if the cursor is malformed
+        """
+        if not cursor:
+            return None
+
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            return None
+
+        return payload if isinstance(payload, dict) else None
+
+    @staticmethod
+    def fingerprint(*parts) -> str:
+        """
+        Short hash of the filters a cursor was issued for, so it cannot be replayed with others
+
+        Args:
+            parts: Filter values
+
+        Returns:
+            Hex digest prefix
+        """
+        return hashlib.sha1(repr(parts).encode()).hexdigest()[:12]
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Async entry point: the same Flask app served on a gevent event loop
+
+Sockets, DNS, threads and sleeps are patched before anything else is imported,
+so PyMySQL / pg8000 queries and the requests calls to the Melbourne API yield to
+the event loop instead of blocking. One worker then holds hundreds of slow
+clients, long polls and streaming exports instead of one.
+
+    gunicorn --worker-class gevent --worker-connections 1000 --workers 2 --bind 0.0.0.0:5001 async_app:app
+    python async_app.py
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import os
+from main import create_app, initialize_database
+
+# Create the Flask application instance
+app = create_app()
+
+if __name__ != "__main__":
+    # This runs when imported by Gunicorn
+    print("🚀 Initializing Melbourne Parking System (gevent)...")
+    try:
+        initialize_database(app)
+        print("✅ Production initialization completed!")
+    except Exception as e:
+        print(f"❌ Production initialization failed: {e}")
+
+if __name__ == "__main__":
+    from gevent.pywsgi import WSGIServer
+
+    initialize_database(app)
+    port = int(os.getenv('PORT', 5000))
+    print(f"🌐 Serving on the gevent event loop at port {port}...")
+    WSGIServer(('0.0.0.0', port), app).serve_forever()
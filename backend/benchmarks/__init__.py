@@ -0,0 +1,10 @@
+"""
+Benchmark Suite for Melbourne Parking API
+
+Reproducible performance benchmarks that run against synthetic sensor
+populations loaded into a local database, so they never touch the
+Melbourne Government API.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --sizes 1000 10000 100000
+"""
@@ -0,0 +1,146 @@
+"""
+Bitmap Filter Benchmark
+Times combined status, zone and freshness filters as SQL, column masks and bitsets
+
+For each population size a third of the sensors get a last_updated older than a
+week and a tenth one between 1 and 24 hours old. Each filter combination is then
+answered three ways, each returning the match count and the first /live page
+(--limit sensors in kerbside_id order):
+    - sql: COUNT plus a LIMIT query with the filters as WHERE clauses, as /live did
+    - mask: boolean masks over the SensorTable columns, then a gather
+    - bitmap: SensorBitmapIndex bitsets combined with &, a popcount and ranks()
+All three must agree. Building the index is timed separately.
+
+Usage (from the backend directory):
+    python -m benchmarks.bitmap_filters --sizes 10000 100000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import func, select
+
+from .run import measure
+
+
+def filter_cases(zones: List[str], rng: random.Random) -> Dict[str, Dict]:
+    """Filter combinations from broad to narrow"""
+    return {
+        'available_7d': {'status': 'Unoccupied', 'hours': 24 * 7, 'zones': None},
+        'occupied_24h': {'status': 'Occupied', 'hours': 24, 'zones': None},
+        'available_7d_20_zones': {'status': 'Unoccupied', 'hours': 24 * 7, 'zones': rng.sample(zones, 20)},
+        'occupied_1h_1_zone': {'status': 'Occupied', 'hours': 1, 'zones': rng.sample(zones, 1)}
+    }
+
+
+def run_size(size: int, limit: int, repeat: int, seed: int) -> Dict:
+    tmp_dir = tempfile.mkdtemp(prefix='parking-bitmap-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'bitmap.db')}"
+
+    from main import create_app
+    from api.models import db, ParkingSensor
+    from api.services.bitmap_index import SensorBitmapIndex
+    from api.services.sensor_table import SensorTable
+    from .datasets import SyntheticSensorGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        SyntheticSensorGenerator(size, seed=seed).load()
+        now = datetime.utcnow()
+        sensors = ParkingSensor.__table__
+        db.session.execute(sensors.update().where(sensors.c.id % 3 == 0).values(last_updated=now - timedelta(days=9)))
+        db.session.execute(sensors.update().where(sensors.c.id % 10 == 1).values(last_updated=now - timedelta(hours=6)))
+        db.session.commit()
+
+        table = SensorTable.load()
+        build = measure(lambda: SensorBitmapIndex(table), repeat)
+        index = SensorBitmapIndex(table)
+        zones = sorted(set(table.zones))
+        cases = filter_cases(zones, random.Random(seed))
+
+        results = {}
+        for name, case in cases.items():
+            since = now - timedelta(hours=case['hours'])
+            criteria = [sensors.c.status_description == case['status'], sensors.c.last_updated >= since]
+            if case['zones'] is not None:
+                criteria.append(sensors.c.zone_number.in_(case['zones']))
+
+            def by_sql():
+                count = db.session.execute(select(func.count()).select_from(sensors).where(*criteria)).scalar()
+                page = db.session.execute(select(sensors.c.kerbside_id).where(*criteria)
+                                          .order_by(sensors.c.kerbside_id).limit(limit)).scalars().all()
+                return count, page
+
+            def by_mask():
+                mask = table.status_mask(case['status']) & (table.updated_at >= np.datetime64(since, 'us'))
+                if case['zones'] is not None:
+                    codes = [code for code, zone in enumerate(table.zone_values) if zone in case['zones']]
+                    mask &= np.isin(table.zone_codes, codes)
+                ranked = mask[index.order]
+                page = index.order[np.flatnonzero(ranked)[:limit]]
+                return int(mask.sum()), [table.kerbside_ids[i] for i in page.tolist()]
+
+            def by_bitmap():
+                bits = index.statuses.get(case['status'], np.zeros(index.words, dtype=np.uint64)) & index.fresh(since)
+                if case['zones'] is not None:
+                    bits &= index.zones(case['zones'])
+                return index.count(bits), [index.sorted_kerbside_ids[r] for r in index.ranks(bits, 0, limit).tolist()]
+
+            expected = by_sql()
+            results[name] = {
+                'matches': expected[0],
+                'sql': measure(by_sql, repeat),
+                'mask': measure(by_mask, repeat),
+                'bitmap': measure(by_bitmap, repeat),
+                'identical': by_mask() == expected and by_bitmap() == expected
+            }
+
+        db.session.remove()
+        db.engine.dispose()
+
+    return {'build': build, 'cases': results}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare SQL, mask and bitmap answers to combined filters')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--limit', type=int, default=200, help='Page size, as /live')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per measurement')
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    report = {'meta': {'timestamp': datetime.utcnow().isoformat(), 'limit': args.limit, 'repeat': args.repeat},
+              'sizes': {}}
+    ok = True
+    for size in args.sizes:
+        result = run_size(size, args.limit, args.repeat, args.seed)
+        report['sizes'][str(size)] = result
+        print(f"📦 {size} sensors, index build {result['build']['median_ms']} ms")
+        for name, case in result['cases'].items():
+            ok = ok and case['identical']
+            print(f"   {name:<24} {case['matches']:>7} matches  sql {case['sql']['median_ms']:>9} ms  "
+                  f"mask {case['mask']['median_ms']:>8} ms  bitmap {case['bitmap']['median_ms']:>7} ms  "
+                  f"{'✅' if case['identical'] else '❌'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote bitmap filter report to {args.output}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Concurrent-Connection Capacity Benchmark
+Compares the sync gunicorn deployment (app:app) with the gevent entry point (async_app:app)
+
+For each server mode and each level of slow clients, the benchmark:
+    - opens N connections that dribble their request headers over --hold seconds,
+      the way slow mobile clients and long polls hold a connection open
+    - meanwhile sends /api/parking/live probes at a fixed --probe-rate (open loop, so a
+      stalled server shows up as queued probes rather than as fewer samples)
+    - reports probe latency, errors and how many slow clients were eventually served
+
+A sync worker is tied up by each slow connection, so probe latency climbs once N
+exceeds the worker count; the gevent worker should keep serving probes until its
+worker_connections limit. Capacity is the largest N whose probe p95 stays within
+--slo-p95-ms with no probe errors.
+
+gunicorn's async workers drop connections whose headers take longer than --keep-alive
+to arrive (a slowloris guard), so the gevent server is started with a keep-alive
+longer than --hold.
+
+Usage (from the backend directory):
+    python -m benchmarks.concurrency --size 10000 --slow-clients 0 4 16 64 256 --workers 2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+import requests
+
+from .loadgen import percentile
+from .opendata_emulator import EmulatorServer, create_emulator_app, synthetic_sources
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER_MODES = {
+    'sync': ('app:app', 'sync'),
+    'gevent': ('async_app:app', 'gevent')
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def prepare_database(database_url: str, size: int, seed: int):
+    """Load the synthetic sensor population the servers will read"""
+    os.environ['DATABASE_URL'] = database_url
+    from main import create_app
+    from api.models import db
+    from .datasets import SyntheticSensorGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    with app.app_context():
+        db.create_all()
+        SyntheticSensorGenerator(size, seed=seed).load()
+        db.session.remove()
+        db.engine.dispose()
+
+
+@contextlib.contextmanager
+def run_server(mode: str, workers: int, worker_connections: int, keep_alive: int, env: Dict):
+    """Start gunicorn in the given mode and wait until it answers health checks"""
+    module, worker_class = SERVER_MODES[mode]
+    port = free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn', module,
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--worker-class', worker_class,
+        '--worker-connections', str(worker_connections),
+        '--keep-alive', str(keep_alive),
+        '--timeout', '120',
+        '--backlog', '2048'
+    ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'{mode} server exited with code {process.returncode}')
+            try:
+                if requests.get(f'{base_url}/health', timeout=2).status_code == 200:
+                    break
+            except requests.exceptions.RequestException:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'{mode} server did not become ready')
+            time.sleep(0.25)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def slow_client(port: int, hold: float, timeout: float, results: List[bool], lock: threading.Lock):
+    """Send a request one header line at a time over `hold` seconds, then read the response"""
+    lines = [
+        b'GET /api/parking/live?limit=50 HTTP/1.1\r\n',
+        b'Host: 127.0.0.1\r\n',
+        b'User-Agent: parking-slow-client\r\n',
+        b'Accept: application/json\r\n',
+        b'Accept-Encoding: identity\r\n',
+        b'Connection: close\r\n',
+        b'\r\n'
+    ]
+    ok = False
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=timeout) as sock:
+            for i, line in enumerate(lines):
+                sock.sendall(line)
+                if i < len(lines) - 1:
+                    time.sleep(hold / (len(lines) - 1))
+            response = b''
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                response += chunk
+            ok = response.startswith(b'HTTP/1.1 200') or response.startswith(b'HTTP/1.0 200')
+    except OSError:
+        pass
+    with lock:
+        results.append(ok)
+
+
+def probe(base_url: str, timeout: float, scheduled: float, samples: List[float], errors: List[int],
+          lock: threading.Lock):
+    """One fast request; latency counts from when it was due, not when it was sent"""
+    ok = False
+    try:
+        ok = requests.get(f'{base_url}/api/parking/live', params={'limit': 50}, timeout=timeout).status_code == 200
+    except requests.exceptions.RequestException:
+        pass
+    latency = (time.monotonic() - scheduled) * 1000
+    with lock:
+        samples.append(latency)
+        if not ok:
+            errors[0] += 1
+
+
+def run_level(base_url: str, slow_clients: int, args) -> Dict:
+    port = int(base_url.rsplit(':', 1)[1])
+    lock = threading.Lock()
+    slow_results, samples, errors = [], [], [0]
+
+    slow_threads = [
+        threading.Thread(target=slow_client, args=(port, args.hold, args.hold + args.timeout, slow_results, lock),
+                         daemon=True)
+        for _ in range(slow_clients)
+    ]
+    for thread in slow_threads:
+        thread.start()
+    # Let the slow connections occupy the server before probing
+    time.sleep(min(1.0, args.hold / 4))
+
+    started = time.monotonic()
+    interval = 1.0 / args.probe_rate
+    probes = []
+    with ThreadPoolExecutor(max_workers=args.probe_concurrency) as pool:
+        scheduled = started
+        while scheduled < started + args.hold:
+            time.sleep(max(0.0, scheduled - time.monotonic()))
+            probes.append(pool.submit(probe, base_url, args.timeout, scheduled, samples, errors, lock))
+            scheduled += interval
+    elapsed = time.monotonic() - started
+    for thread in slow_threads:
+        thread.join(timeout=args.hold + args.timeout)
+
+    ordered = sorted(samples)
+    return {
+        'slow_clients': slow_clients,
+        'slow_served': sum(slow_results),
+        'probe_requests': len(ordered),
+        'probe_errors': errors[0],
+        'probe_rps': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'probe_p50_ms': round(percentile(ordered, 0.50), 2),
+        'probe_p95_ms': round(percentile(ordered, 0.95), 2),
+        'probe_p99_ms': round(percentile(ordered, 0.99), 2)
+    }
+
+
+def capacity(levels: List[Dict], slo_p95_ms: float) -> int:
+    """Largest slow-client level the server absorbed without hurting probes"""
+    best = 0
+    for level in levels:
+        if level['probe_errors'] == 0 and level['probe_p95_ms'] <= slo_p95_ms and \
+                level['slow_served'] == level['slow_clients']:
+            best = max(best, level['slow_clients'])
+        else:
+            break
+    return best
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare sync and gevent deployments under many slow connections')
+    parser.add_argument('--modes', nargs='+', choices=sorted(SERVER_MODES), default=['sync', 'gevent'])
+    parser.add_argument('--size', type=int, default=10000, help='Synthetic sensors in the database')
+    parser.add_argument('--slow-clients', type=int, nargs='+', default=[0, 4, 16, 64, 256])
+    parser.add_argument('--hold', type=float, default=5.0, help='Seconds each slow client takes to send its request')
+    parser.add_argument('--probe-rate', type=float, default=50.0, help='Fast probe requests per second')
+    parser.add_argument('--probe-concurrency', type=int, default=64, help='Probe requests allowed in flight')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers in both modes')
+    parser.add_argument('--worker-connections', type=int, default=1000, help='Connections per gevent worker')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Probe request timeout in seconds')
+    parser.add_argument('--slo-p95-ms', type=float, default=500.0)
+    parser.add_argument('--database-url', default=None, help='Use this database instead of a temporary SQLite file')
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp(prefix='parking-concurrency-')
+    database_url = args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'concurrency.db')}"
+    print(f"🗄️  Loading {args.size} synthetic sensors...")
+    prepare_database(database_url, args.size, args.seed)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'size': args.size,
+            'workers': args.workers,
+            'worker_connections': args.worker_connections,
+            'hold_s': args.hold,
+            'probe_rate': args.probe_rate,
+            'slo_p95_ms': args.slo_p95_ms
+        },
+        'modes': {}
+    }
+
+    # Servers ingest once at startup; point them at a local emulator instead of the live API
+    with EmulatorServer(create_emulator_app(synthetic_sources(min(args.size, 1000), seed=args.seed))) as emulator:
+        env = dict(os.environ, DATABASE_URL=database_url, MELBOURNE_API_BASE_URL=emulator.records_url(),
+                   FORECAST_STATE_PATH=os.path.join(tmp_dir, 'forecast_state.npz'),
+                   HISTORY_ARCHIVE_DIR=os.path.join(tmp_dir, 'history'),
+                   REFERENCE_DATA_DIR=os.path.join(tmp_dir, 'reference'))
+
+        for mode in args.modes:
+            print(f"🚦 {mode}: {args.workers} workers")
+            levels = []
+            keep_alive = int(args.hold) + 5
+            with run_server(mode, args.workers, args.worker_connections, keep_alive, env) as base_url:
+                for slow_clients in args.slow_clients:
+                    level = run_level(base_url, slow_clients, args)
+                    levels.append(level)
+                    print(f"   {slow_clients:>5} slow  served {level['slow_served']:>5}  "
+                          f"probe p50 {level['probe_p50_ms']:>8} ms  p95 {level['probe_p95_ms']:>8} ms  "
+                          f"{level['probe_rps']:>8} req/s  errors {level['probe_errors']}")
+            report['modes'][mode] = {
+                'levels': levels,
+                'capacity_slow_clients': capacity(levels, args.slo_p95_ms)
+            }
+            print(f"📈 {mode} capacity: {report['modes'][mode]['capacity_slow_clients']} slow clients")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote concurrency report to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
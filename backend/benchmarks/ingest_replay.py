@@ -0,0 +1,187 @@
+"""
+Ingest Replay Harness
+Replays recorded or synthetic API frames through the local emulator and measures ingest
+
+Usage (from the backend directory):
+    # Synthetic frames, one per simulated minute, replayed 120x faster
+    python -m benchmarks.ingest_replay --size 5000 --cycles 30 --speed 120
+
+    # Frames captured with `python -m benchmarks.opendata_emulator record`
+    python -m benchmarks.ingest_replay --frames frames.jsonl --speed 60 --output replay.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import func
+
+from .datasets import SyntheticSensorGenerator
+from .opendata_emulator import EmulatorServer, ReplaySource, create_emulator_app, load_frames
+
+
+def synthetic_frames(size: int, cycles: int, interval: float = 60.0, change_rate: float = 0.05,
+                     seed: int = 5120) -> List[Dict]:
+    """
+    Build replay frames from the synthetic generator, one API snapshot per cycle
+
+    Args:
+        size: Number of sensors
+        cycles: Number of frames
+        interval: Simulated seconds between frames
+        change_rate: Fraction of sensors that change status between frames
+    """
+    generator = SyntheticSensorGenerator(size, seed=seed)
+    rows = generator.generate_rows()
+    start = datetime.utcnow()
+    frames = []
+
+    for i in range(cycles):
+        records = generator.generate_api_records(rows, change_rate=change_rate if i else 0.0)
+        # Carry statuses forward so each frame builds on the previous one
+        for row, record in zip(rows, records):
+            row['status_description'] = record['status_description']
+        frames.append({'captured_at': (start + timedelta(seconds=interval * i)).isoformat(), 'records': records})
+
+    return frames
+
+
+def _table_sizes(db) -> Dict[str, int]:
+    """Row counts for every mapped table, so new history tables show up automatically"""
+    return {table.name: db.session.query(func.count()).select_from(table).scalar()
+            for table in db.metadata.sorted_tables}
+
+
+def replay(frames: List[Dict], speed: float, database_url: str = None, latency_ms: float = 0.0,
+           error_rate: float = 0.0) -> Dict:
+    """
+    Run update_database once per replayed frame and record throughput and storage growth
+
+    Returns:
+        Report dictionary with per-cycle measurements and a summary
+    """
+    tmp_dir = None
+    if not database_url:
+        tmp_dir = tempfile.mkdtemp(prefix='parking-replay-')
+        database_url = f"sqlite:///{os.path.join(tmp_dir, 'replay.db')}"
+    os.environ['DATABASE_URL'] = database_url
+
+    from main import create_app
+    from api.models import db
+    from api.services import MelbourneParkingService
+
+    source = ReplaySource(frames, speed=speed)
+    emulator = create_emulator_app(source, latency_ms=latency_ms, error_rate=error_rate)
+    stats = emulator.config['EMULATOR_STATS']
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    cycles = []
+    with EmulatorServer(emulator) as server, app.app_context():
+        db.create_all()
+        original_url = MelbourneParkingService.API_BASE_URL
+        MelbourneParkingService.API_BASE_URL = server.records_url()
+
+        try:
+            last_index = -1
+            while True:
+                index = source.frame_index()
+                if index == last_index:
+                    if source.finished():
+                        break
+                    time.sleep(0.01)
+                    continue
+                last_index = index
+
+                served_before = stats['records_served']
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    success = MelbourneParkingService.update_database()
+                    elapsed = time.perf_counter() - start
+
+                records = stats['records_served'] - served_before
+                db_path = database_url.replace('sqlite:///', '', 1) if database_url.startswith('sqlite') else None
+                cycles.append({
+                    'frame': index,
+                    'success': success,
+                    'ingest_ms': round(elapsed * 1000, 3),
+                    'records_fetched': records,
+                    'records_per_second': round(records / elapsed, 1) if elapsed > 0 else None,
+                    'table_rows': _table_sizes(db),
+                    'database_bytes': os.path.getsize(db_path) if db_path and os.path.exists(db_path) else None
+                })
+                print(f"🔁 Frame {index + 1}/{len(frames)}: {records} records in {elapsed * 1000:.1f} ms"
+                      f"{'' if success else ' (failed)'}")
+        finally:
+            MelbourneParkingService.API_BASE_URL = original_url
+            db.session.remove()
+            db.engine.dispose()
+
+    successful = [c for c in cycles if c['success']]
+    total_records = sum(c['records_fetched'] for c in successful)
+    total_seconds = sum(c['ingest_ms'] for c in successful) / 1000
+
+    return {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'frames': len(frames),
+            'speed': speed,
+            'latency_ms': latency_ms,
+            'error_rate': error_rate
+        },
+        'summary': {
+            'cycles': len(cycles),
+            'failed_cycles': len(cycles) - len(successful),
+            'records_ingested': total_records,
+            'records_per_second': round(total_records / total_seconds, 1) if total_seconds else None,
+            'emulator': dict(stats),
+            'final_table_rows': cycles[-1]['table_rows'] if cycles else {},
+            'database_bytes_growth': (cycles[-1]['database_bytes'] - cycles[0]['database_bytes'])
+            if cycles and cycles[0]['database_bytes'] is not None else None
+        },
+        'cycles': cycles
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay API frames through update_database')
+    parser.add_argument('--frames', default=None, help='Recorded JSONL frames (default: synthetic)')
+    parser.add_argument('--size', type=int, default=5000, help='Synthetic sensors per frame')
+    parser.add_argument('--cycles', type=int, default=20, help='Synthetic frames to generate')
+    parser.add_argument('--change-rate', type=float, default=0.05, help='Synthetic status change rate per frame')
+    parser.add_argument('--speed', type=float, default=60.0, help='Replay speed multiplier')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--output', default='benchmarks/ingest_replay.json')
+    args = parser.parse_args(argv)
+
+    if args.frames:
+        frames = load_frames(args.frames)
+    else:
+        frames = synthetic_frames(args.size, args.cycles, change_rate=args.change_rate)
+
+    report = replay(frames, args.speed, args.database_url, args.latency_ms, args.error_rate)
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    summary = report['summary']
+    print(f"✅ {summary['records_ingested']} records in {summary['cycles']} cycles "
+          f"({summary['records_per_second']} records/s); report written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""
+Closed-Loop Load Generator
+Simulates map clients with the same request mix as MelbourneParkingMap.vue
+
+Each virtual client mirrors the frontend (--mix dashboard, the default):
+    - on mount and on every refresh tick, GET /api/dashboard?bbox=&zoom= for its viewport
+    - between ticks, occasional user actions after a think time: a search
+      (/api/parking/search?q=...), a status filter change (/api/dashboard?status=...), or a
+      pan/zoom gesture. A gesture is a burst of moveend events; like the map's 300 ms
+      debounce, only a pause of --debounce-ms after a moveend triggers a refetch, with the
+      bbox rounded outward to three decimals
+--mix legacy replays the map before the dashboard endpoint: GET /api/parking/live and
+GET /api/stats in parallel on mount, tick and filter change, and nothing on pan or zoom.
+Running both mixes at the same settings compares requests per client-minute.
+
+A client waits for its responses before its next action (closed loop), so a slow
+server lowers the offered load instead of building an unbounded queue.
+
+Usage (from the backend directory, against a running server):
+    python -m benchmarks.loadgen --url http://localhost:5001 --clients 50 --duration 60
+    # Sweep client counts to find the saturation point of a gunicorn worker count
+    python -m benchmarks.loadgen --clients 10 25 50 100 200 --duration 30 --refresh-interval 5
+    # Keep an ingest running in the background (point the server at the emulator first)
+    python -m benchmarks.loadgen --clients 50 --ingest-interval 10
+    # Request volume of the map before the dashboard endpoint, for comparison
+    python -m benchmarks.loadgen --clients 50 --mix legacy
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+import requests
+
+SEARCH_TERMS = ['3000', '3053', '3006', 'Melbourne', 'Carlton', 'Docklands', 'Southbank', 'Collins']
+STATUS_FILTERS = ['available', 'occupied', 'all']
+MIXES = ('dashboard', 'legacy')
+
+# Map mount view and viewport of MelbourneParkingMap.vue
+MAP_CENTER = (-37.8136, 144.9631)
+MAP_ZOOM = 14
+MIN_ZOOM, MAX_ZOOM = 12, 18
+VIEWPORT_PX = (1280, 800)
+
+
+def percentile(sorted_samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+
+class LatencyRecorder:
+    """Thread-safe collection of per-endpoint latency samples"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.events = {}
+        self.ingest_active = threading.Event()
+
+    def record(self, endpoint: str, latency_ms: float, ok: bool):
+        # Samples taken while an ingest is running are also reported separately
+        labels = [endpoint, f'{endpoint}@ingest'] if self.ingest_active.is_set() else [endpoint]
+        with self.lock:
+            for label in labels:
+                self.samples.setdefault(label, []).append(latency_ms)
+                if not ok:
+                    self.errors[label] = self.errors.get(label, 0) + 1
+
+    def count(self, event: str):
+        """Count a client-side event that may or may not become a request, e.g. moveend"""
+        with self.lock:
+            self.events[event] = self.events.get(event, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict:
+        with self.lock:
+            report = {}
+            for endpoint, samples in sorted(self.samples.items()):
+                ordered = sorted(samples)
+                report[endpoint] = {
+                    'requests': len(ordered),
+                    'errors': self.errors.get(endpoint, 0),
+                    'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+                    'p50_ms': round(percentile(ordered, 0.50), 2),
+                    'p95_ms': round(percentile(ordered, 0.95), 2),
+                    'p99_ms': round(percentile(ordered, 0.99), 2),
+                    'max_ms': round(ordered[-1], 2)
+                }
+            return report
+
+
+class MapClient:
+    """One simulated browser tab running the parking map"""
+
+    def __init__(self, base_url: str, recorder: LatencyRecorder, pool: ThreadPoolExecutor, args, seed: int):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.pool = pool
+        self.args = args
+        self.rng = random.Random(seed)
+        # Browsers keep several connections per origin; the legacy parallel pair uses two
+        self.sessions = [requests.Session(), requests.Session()]
+        self.status_filter = 'all'
+        self.center = MAP_CENTER
+        self.zoom = MAP_ZOOM
+
+    def get(self, session: requests.Session, endpoint: str, path: str, params: Dict = None):
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = session.get(f'{self.base_url}{path}', params=params, timeout=self.args.timeout)
+            ok = response.status_code == 200
+        except requests.exceptions.RequestException:
+            pass
+        self.recorder.record(endpoint, (time.perf_counter() - start) * 1000, ok)
+
+    def live_params(self) -> Dict:
+        return {'status': self.status_filter} if self.status_filter != 'all' else {}
+
+    def viewport_bbox(self) -> str:
+        """The map's bbox for the current view, rounded outward to three decimals"""
+        lat, lng = self.center
+        lng_per_px = 360.0 / (256 * 2 ** self.zoom)
+        lat_per_px = lng_per_px * math.cos(math.radians(lat))
+        half_lng, half_lat = VIEWPORT_PX[0] / 2 * lng_per_px, VIEWPORT_PX[1] / 2 * lat_per_px
+        down = lambda value: f'{math.floor(value * 1000) / 1000:.3f}'
+        up = lambda value: f'{math.ceil(value * 1000) / 1000:.3f}'
+        return ','.join([down(lat - half_lat), down(lng - half_lng), up(lat + half_lat), up(lng + half_lng)])
+
+    def fetch_dashboard(self, endpoint: str):
+        """fetchDashboard(): viewport sensors or clusters plus stats in one request"""
+        params = dict(self.live_params(), bbox=self.viewport_bbox(), zoom=self.zoom)
+        self.get(self.sessions[0], endpoint, '/api/dashboard', params)
+
+    def refresh(self):
+        """One map load: the dashboard bundle, or the legacy /live and /stats pair issued together"""
+        if self.args.mix == 'dashboard':
+            self.fetch_dashboard('dashboard')
+            return
+        stats = self.pool.submit(self.get, self.sessions[1], 'stats', '/api/stats')
+        self.get(self.sessions[0], 'live', '/api/parking/live', self.live_params())
+        stats.result()
+
+    def gesture(self):
+        """
+        A pan or zoom gesture: a burst of moveend events with short gaps
+
+        Each moveend restarts the debounce timer, so only gaps of at least the debounce
+        (and the end of the burst) trigger a refetch. The legacy map never refetched.
+        """
+        moves = 1
+        while self.rng.random() < self.args.moveend_burst:
+            moves += 1
+        debounce = self.args.debounce_ms / 1000.0
+        for move in range(moves):
+            lat, lng = self.center
+            lng_span = VIEWPORT_PX[0] * 360.0 / (256 * 2 ** self.zoom)
+            self.center = (lat + self.rng.uniform(-0.5, 0.5) * lng_span * VIEWPORT_PX[1] / VIEWPORT_PX[0],
+                           lng + self.rng.uniform(-0.5, 0.5) * lng_span)
+            if self.rng.random() < 0.3:
+                self.zoom = min(MAX_ZOOM, max(MIN_ZOOM, self.zoom + self.rng.choice([-1, 1])))
+            self.recorder.count('moveend')
+
+            last = move == moves - 1
+            gap = math.inf if last else self.rng.expovariate(1.0 / self.args.moveend_gap)
+            time.sleep(min(gap, debounce))
+            if gap >= debounce:
+                if self.args.mix == 'dashboard':
+                    self.fetch_dashboard('dashboard_move')
+                if not last:
+                    time.sleep(gap - debounce)
+
+    def think(self, deadline: float) -> bool:
+        """Sleep for an exponentially distributed think time; False once the run is over"""
+        pause = self.rng.expovariate(1.0 / self.args.think_time) if self.args.think_time > 0 else 0.0
+        wake = min(deadline, time.monotonic() + pause)
+        time.sleep(max(0.0, wake - time.monotonic()))
+        return time.monotonic() < deadline
+
+    def run(self, deadline: float):
+        # Stagger mounts so clients do not all tick in lockstep
+        time.sleep(self.rng.uniform(0, min(self.args.refresh_interval, 2.0)))
+        self.refresh()
+        next_tick = time.monotonic() + self.args.refresh_interval
+
+        while time.monotonic() < deadline:
+            if time.monotonic() >= next_tick:
+                self.refresh()
+                next_tick += self.args.refresh_interval
+                continue
+
+            if self.rng.random() < self.args.action_rate:
+                if not self.think(min(deadline, next_tick)):
+                    break
+                choice = self.rng.random()
+                if choice < self.args.search_share:
+                    self.get(self.sessions[0], 'search', '/api/parking/search',
+                             {'q': self.rng.choice(SEARCH_TERMS)})
+                elif choice < self.args.search_share + self.args.pan_share:
+                    self.gesture()
+                else:
+                    self.status_filter = self.rng.choice(STATUS_FILTERS)
+                    if self.args.mix == 'dashboard':
+                        self.fetch_dashboard('dashboard_filter')
+                    else:
+                        self.get(self.sessions[0], 'live_filter', '/api/parking/live', self.live_params())
+            else:
+                time.sleep(max(0.0, min(deadline, next_tick) - time.monotonic()))
+
+
+def run_background_ingest(base_url: str, recorder: LatencyRecorder, interval: float, stop: threading.Event):
+    """POST /api/parking/update every interval seconds, flagging samples taken meanwhile"""
+    session = requests.Session()
+    while not stop.wait(interval):
+        recorder.ingest_active.set()
+        start = time.perf_counter()
+        ok = False
+        try:
+            ok = session.post(f'{base_url.rstrip("/")}/api/parking/update', timeout=300).status_code == 200
+        except requests.exceptions.RequestException:
+            pass
+        finally:
+            recorder.ingest_active.clear()
+        recorder.record('ingest', (time.perf_counter() - start) * 1000, ok)
+
+
+def run_level(clients: int, args) -> Dict:
+    """Run one load level and return its report"""
+    recorder = LatencyRecorder()
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=clients)
+    deadline = time.monotonic() + args.duration
+
+    ingest_thread = None
+    if args.ingest_interval:
+        ingest_thread = threading.Thread(
+            target=run_background_ingest, args=(args.url, recorder, args.ingest_interval, stop), daemon=True
+        )
+        ingest_thread.start()
+
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=MapClient(args.url, recorder, pool, args, args.seed + i).run,
+                         args=(deadline,), daemon=True)
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    stop.set()
+    if ingest_thread:
+        ingest_thread.join(timeout=args.timeout)
+    pool.shutdown()
+
+    endpoints = recorder.summary(elapsed)
+    total = sum(s['requests'] for name, s in endpoints.items() if '@' not in name and name != 'ingest')
+    return {
+        'clients': clients,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        # Comparable across mixes at the same settings; closed-loop throughput is not
+        'requests_per_client_minute': round(total / (clients * elapsed / 60.0), 2) if elapsed else 0.0,
+        'moveend_events': recorder.events.get('moveend', 0),
+        'endpoints': endpoints
+    }
+
+
+def find_saturation(levels: List[Dict], slo_p95_ms: float, endpoint: str = 'dashboard') -> Dict:
+    """
+    The last level before throughput stops growing or the map's main endpoint misses its p95 SLO
+    """
+    best = None
+    for previous, level in zip([None] + levels[:-1], levels):
+        p95 = level['endpoints'].get(endpoint, {}).get('p95_ms', 0.0)
+        flat = previous is not None and level['throughput_rps'] < previous['throughput_rps'] * 1.05
+        if p95 > slo_p95_ms or flat:
+            reason = 'p95 SLO exceeded' if p95 > slo_p95_ms else 'throughput plateaued'
+            return {'clients': best['clients'] if best else None, 'reason': f'{reason} at {level["clients"]} clients'}
+        best = level
+    return {'clients': None, 'reason': 'not reached'}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Closed-loop load generator for the parking map')
+    parser.add_argument('--url', default='http://localhost:5001', help='Backend base URL')
+    parser.add_argument('--clients', type=int, nargs='+', default=[20], help='Concurrent map clients (one or a sweep)')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds per load level')
+    parser.add_argument('--refresh-interval', type=float, default=60.0,
+                        help='Seconds between refresh ticks (the frontend uses 60)')
+    parser.add_argument('--think-time', type=float, default=5.0, help='Mean think time before a user action')
+    parser.add_argument('--action-rate', type=float, default=0.3,
+                        help='Chance a client performs a user action between ticks')
+    parser.add_argument('--mix', choices=MIXES, default='dashboard',
+                        help='Request mix of the current map or of the map before /api/dashboard')
+    parser.add_argument('--search-share', type=float, default=0.4, help='Share of user actions that are searches')
+    parser.add_argument('--pan-share', type=float, default=0.4,
+                        help='Share of user actions that are pan/zoom gestures (the rest change the filter)')
+    parser.add_argument('--moveend-burst', type=float, default=0.5,
+                        help='Chance a gesture continues with another moveend')
+    parser.add_argument('--moveend-gap', type=float, default=0.25, help='Mean seconds between moveends in a gesture')
+    parser.add_argument('--debounce-ms', type=float, default=300.0, help='Refetch debounce (the frontend uses 300)')
+    parser.add_argument('--ingest-interval', type=float, default=None,
+                        help='POST /api/parking/update every N seconds during the run')
+    parser.add_argument('--slo-p95-ms', type=float, default=500.0,
+                        help='p95 budget for /dashboard (or /live with --mix legacy) when sweeping')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    levels = []
+    for clients in args.clients:
+        print(f"🚦 Running {clients} clients for {args.duration:.0f}s...")
+        level = run_level(clients, args)
+        levels.append(level)
+        print(f"   {level['throughput_rps']} req/s overall, {level['requests_per_client_minute']} "
+              f"requests per client-minute, {level['moveend_events']} moveend events")
+        for endpoint, stats in level['endpoints'].items():
+            print(f"   {endpoint:<20} {stats['requests']:>6} req  {stats['throughput_rps']:>8} req/s  "
+                  f"p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  "
+                  f"errors {stats['errors']}")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'url': args.url,
+            'mix': args.mix,
+            'duration_s': args.duration,
+            'refresh_interval_s': args.refresh_interval,
+            'think_time_s': args.think_time,
+            'debounce_ms': args.debounce_ms,
+            'ingest_interval_s': args.ingest_interval
+        },
+        'levels': levels
+    }
+    if len(levels) > 1:
+        main_endpoint = 'dashboard' if args.mix == 'dashboard' else 'live'
+        report['saturation'] = find_saturation(levels, args.slo_p95_ms, main_endpoint)
+        print(f"📈 Saturation: {report['saturation']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote load report to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
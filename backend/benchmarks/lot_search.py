@@ -0,0 +1,162 @@
+"""
+Parking Lot Search Benchmark
+Times /api/parking/lots/search and bulk capacity updates against a scan of every lot
+
+For each lot count the harness loads synthetic lots and measures:
+    - scan: ParkingLot.query.all(), to_dict and a Python filter, which is what a search
+      on top of the old get_parking_lots_stats path costs
+    - search: /api/parking/lots/search with the same filters, served from ParkingLotIndex
+    - rebuild: building ParkingLotIndex from the table
+    - capacity: POST /api/parking/lots/capacity with --batch updates, which refreshes
+      the index in place
+Each search result is checked against the scan, before and after the capacity updates.
+
+Usage (from the backend directory):
+    python -m benchmarks.lot_search --lots 1000 10000 100000 --batch 500
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+from .run import measure
+
+SEARCHES = [
+    {'lat': -37.8136, 'lng': 144.9631, 'radius': 1.0, 'sort': 'distance'},
+    {'lat': -37.8136, 'lng': 144.9631, 'radius': 2.0, 'facilities': 'EV Charging', 'max_price': 12.0,
+     'sort': 'price'},
+    {'facilities': 'CCTV,Covered', 'min_available': 200, 'sort': 'available'},
+    {'max_price': 6.0, 'sort': 'price'}
+]
+
+
+def scan(search: Dict, limit: int) -> List[int]:
+    """Ids of the matching lots by loading and filtering every row"""
+    from api.models import ParkingLot
+    from api.services.spatial_service import haversine_km
+
+    wanted = [name.strip().lower() for name in search.get('facilities', '').split(',') if name.strip()]
+    matches = []
+    for lot in (lot.to_dict() for lot in ParkingLot.query.all()):
+        distance = None
+        if 'lat' in search:
+            distance = float(haversine_km(search['lat'], search['lng'], np.array([lot['coordinates'][0]]),
+                                          np.array([lot['coordinates'][1]]))[0])
+            if distance > search['radius']:
+                continue
+        offered = {name.strip().lower() for name in lot['facilities']}
+        if any(name not in offered for name in wanted):
+            continue
+        if lot['price_per_hour'] > search.get('max_price', float('inf')):
+            continue
+        if lot['available_spaces'] < search.get('min_available', 0):
+            continue
+        matches.append((lot, distance))
+
+    keys = {
+        'distance': lambda match: (match[1], match[0]['id']),
+        'price': lambda match: (match[0]['price_per_hour'], match[0]['id']),
+        'available': lambda match: (-match[0]['available_spaces'], match[0]['id'])
+    }
+    matches.sort(key=keys[search['sort']])
+    return [lot['id'] for lot, _ in matches[:limit]]
+
+
+def run_size(lots: int, batch: int, limit: int, repeat: int, seed: int) -> Dict:
+    tmp_dir = tempfile.mkdtemp(prefix='parking-lots-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'lots.db')}"
+
+    from main import create_app
+    from api.models import db, ParkingLot
+    from api.services.lot_service import ParkingLotIndex
+    from .datasets import SyntheticSensorGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    client = app.test_client()
+    rng = random.Random(seed)
+
+    with app.app_context():
+        db.create_all()
+        generator = SyntheticSensorGenerator(1000, seed=seed)
+        generator.load()
+        db.session.query(ParkingLot).delete()
+        db.session.bulk_insert_mappings(ParkingLot, generator.generate_lots(lots))
+        db.session.commit()
+        ids = [lot_id for (lot_id,) in db.session.query(ParkingLot.id).all()]
+
+        def url(search: Dict) -> str:
+            return '/api/parking/lots/search?' + '&'.join(f'{key}={value}' for key, value in search.items()) + \
+                f'&limit={limit}'
+
+        def check() -> bool:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return all([lot['id'] for lot in client.get(url(search)).get_json()['lots']] == scan(search, limit)
+                           for search in SEARCHES)
+
+        identical = check()
+        scan_timing = measure(lambda: [scan(search, limit) for search in SEARCHES], max(1, repeat // 5))
+        search_timing = measure(lambda: [client.get(url(search)).get_json() for search in SEARCHES], repeat)
+
+        table = ParkingLot.__table__
+        rows = db.session.execute(table.select().order_by(table.c.id)).all()
+        rebuild = measure(lambda: ParkingLotIndex(rows, (len(rows), sum(ids))), max(1, repeat // 5))
+
+        def update():
+            updates = [{'id': lot_id, 'available_spaces': rng.randint(0, 50)} for lot_id in rng.sample(ids, batch)]
+            response = client.post('/api/parking/lots/capacity', json={'updates': updates})
+            if response.status_code != 200:
+                raise RuntimeError(response.get_json()['error'])
+
+        capacity = measure(update, repeat)
+        identical = identical and check()
+
+        db.session.remove()
+        db.engine.dispose()
+
+    return {
+        'scan': scan_timing,
+        'search': search_timing,
+        'rebuild': rebuild,
+        'capacity': capacity,
+        'identical': identical
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Time parking lot search and bulk capacity updates')
+    parser.add_argument('--lots', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--batch', type=int, default=500, help='Lots per capacity update')
+    parser.add_argument('--limit', type=int, default=20, help='Lots per search, as the endpoint default')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per measurement')
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    report = {'meta': {'timestamp': datetime.utcnow().isoformat(), 'batch': args.batch, 'limit': args.limit,
+                       'searches': SEARCHES}, 'lots': {}}
+    for lots in args.lots:
+        result = run_size(lots, min(args.batch, lots), args.limit, args.repeat, args.seed)
+        report['lots'][str(lots)] = result
+        print(f"🅿️  {lots} lots: {len(SEARCHES)} searches {result['search']['median_ms']} ms vs scan "
+              f"{result['scan']['median_ms']} ms; capacity update {result['capacity']['median_ms']} ms vs rebuild "
+              f"{result['rebuild']['median_ms']} ms  {'✅' if result['identical'] else '❌'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote lot search report to {args.output}")
+    return 0 if all(result['identical'] for result in report['lots'].values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
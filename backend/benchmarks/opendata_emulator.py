@@ -0,0 +1,516 @@
+"""
+Local Melbourne Open Data API Emulator
+Serves the explore/v2.1 records and exports endpoints from synthetic or recorded payloads
+
+Usage (from the backend directory):
+    # Serve a synthetic population with 50 ms latency and 5% injected errors
+    python -m benchmarks.opendata_emulator serve --size 5000 --latency-ms 50 --error-rate 0.05
+
+    # Record real payloads every minute for an hour, then replay them 60x faster
+    python -m benchmarks.opendata_emulator record --output frames.jsonl --interval 60 --count 60
+    python -m benchmarks.opendata_emulator serve --replay frames.jsonl --speed 60
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import requests
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import make_server
+
+LIVE_API_ROOT = "https://data.melbourne.vic.gov.au/api/explore/v2.1"
+SENSOR_DATASET = 'on-street-parking-bay-sensors'
+BAY_DATASET = 'on-street-parking-bays'
+SIGN_PLATE_DATASET = 'sign-plates-located-in-each-parking-zone'
+
+
+class ODSQLError(ValueError):
+    """Raised for query parameters the emulator cannot parse, mirroring the API's 400s"""
+
+
+class ODSQL:
+    """Parser for the subset of ODSQL used by select, where and order_by"""
+
+    TOKEN_PATTERN = re.compile(
+        r"\s*(?:(?P<string>'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")"
+        r"|(?P<number>-?\d+(?:\.\d+)?)"
+        r"|(?P<op><=|>=|!=|<>|=|<|>)"
+        r"|(?P<punct>[(),])"
+        r"|(?P<word>[A-Za-z_][A-Za-z0-9_.]*))"
+    )
+
+    @staticmethod
+    def get_field(record: Dict, name: str):
+        """Read a field, following dotted paths such as location.lat"""
+        value = record
+        for part in name.split('.'):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+    @staticmethod
+    def sort_key(value) -> tuple:
+        """Sort key that orders numbers, then text, then nulls without comparing across types"""
+        if value is None:
+            return (2, 0)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return (0, value)
+        return (1, str(value))
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[tuple]:
+        tokens = []
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = cls.TOKEN_PATTERN.match(text, position)
+            if not match or match.end() == position:
+                raise ODSQLError(f"Unexpected character at position {position} in '{text}'")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'string':
+                value = value[1:-1].replace(value[0] * 2, value[0])
+            elif kind == 'number':
+                value = float(value) if '.' in value else int(value)
+            elif kind == 'word':
+                lowered = value.lower()
+                if lowered in ('and', 'or', 'not', 'in', 'is', 'null', 'true', 'false', 'asc', 'desc'):
+                    kind, value = 'keyword', lowered
+            tokens.append((kind, value))
+            position = match.end()
+        return tokens
+
+    @classmethod
+    def parse_select(cls, text: Optional[str]) -> Optional[List[str]]:
+        """Return the selected field names, or None for all fields"""
+        if not text or text.strip() == '*':
+            return None
+        return [field.strip() for field in text.split(',') if field.strip()]
+
+    @classmethod
+    def parse_order_by(cls, text: Optional[str]) -> List[tuple]:
+        """Return (field, descending) pairs"""
+        if not text:
+            return []
+        ordering = []
+        for part in text.split(','):
+            words = part.split()
+            if not words or len(words) > 2:
+                raise ODSQLError(f"Invalid order_by clause '{part.strip()}'")
+            direction = words[1].lower() if len(words) == 2 else 'asc'
+            if direction not in ('asc', 'desc'):
+                raise ODSQLError(f"Invalid order_by direction '{words[1]}'")
+            ordering.append((words[0], direction == 'desc'))
+        return ordering
+
+    @classmethod
+    def parse_where(cls, text: Optional[str]) -> Callable[[Dict], bool]:
+        """Compile a where clause into a record predicate"""
+        if not text or not text.strip():
+            return lambda record: True
+
+        tokens = cls.tokenize(text)
+        position = [0]
+
+        def peek():
+            return tokens[position[0]] if position[0] < len(tokens) else (None, None)
+
+        def take(kind=None, value=None):
+            token = peek()
+            if token[0] is None or (kind and token[0] != kind) or (value is not None and token[1] != value):
+                raise ODSQLError(f"Unexpected token {token[1]!r} in where clause '{text}'")
+            position[0] += 1
+            return token
+
+        def literal():
+            kind, value = take()
+            if kind in ('string', 'number'):
+                return value
+            if kind == 'keyword' and value in ('true', 'false'):
+                return value == 'true'
+            raise ODSQLError(f"Expected a literal, got {value!r}")
+
+        def comparison():
+            _, field = take('word')
+            kind, value = peek()
+            if kind == 'keyword' and value == 'is':
+                take()
+                negate = peek() == ('keyword', 'not')
+                if negate:
+                    take()
+                take('keyword', 'null')
+                return lambda r: (cls.get_field(r, field) is None) != negate
+            if kind == 'keyword' and value in ('in', 'not'):
+                negate = value == 'not'
+                if negate:
+                    take()
+                take('keyword', 'in')
+                take('punct', '(')
+                options = [literal()]
+                while peek() == ('punct', ','):
+                    take()
+                    options.append(literal())
+                take('punct', ')')
+                return lambda r: (cls._coerce(cls.get_field(r, field), options[0]) in options) != negate
+
+            _, op = take('op')
+            expected = literal()
+            compare = {
+                '=': lambda a, b: a == b,
+                '!=': lambda a, b: a != b,
+                '<>': lambda a, b: a != b,
+                '<': lambda a, b: a is not None and a < b,
+                '<=': lambda a, b: a is not None and a <= b,
+                '>': lambda a, b: a is not None and a > b,
+                '>=': lambda a, b: a is not None and a >= b,
+            }[op]
+            return lambda r: compare(cls._coerce(cls.get_field(r, field), expected), expected)
+
+        def primary():
+            if peek() == ('punct', '('):
+                take()
+                predicate = disjunction()
+                take('punct', ')')
+                return predicate
+            if peek() == ('keyword', 'not'):
+                take()
+                inner = primary()
+                return lambda r: not inner(r)
+            return comparison()
+
+        def conjunction():
+            predicates = [primary()]
+            while peek() == ('keyword', 'and'):
+                take()
+                predicates.append(primary())
+            return lambda r: all(p(r) for p in predicates)
+
+        def disjunction():
+            predicates = [conjunction()]
+            while peek() == ('keyword', 'or'):
+                take()
+                predicates.append(conjunction())
+            return lambda r: any(p(r) for p in predicates)
+
+        predicate = disjunction()
+        if position[0] != len(tokens):
+            raise ODSQLError(f"Unexpected trailing input in where clause '{text}'")
+        return predicate
+
+    @staticmethod
+    def _coerce(value, like):
+        """Compare numbers as numbers even when the dataset stores them as strings"""
+        if isinstance(like, (int, float)) and not isinstance(like, bool) and isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return value
+        if isinstance(like, str) and isinstance(value, (int, float)):
+            return str(value)
+        return value
+
+
+class StaticSource:
+    """Serves one fixed list of records"""
+
+    def __init__(self, records: List[Dict]):
+        self.records = records
+
+    def current(self) -> List[Dict]:
+        return self.records
+
+
+class ReplaySource:
+    """Serves recorded frames in sequence, advancing at an accelerated clock"""
+
+    def __init__(self, frames: List[Dict], speed: float = 1.0, loop: bool = False):
+        """
+        Args:
+            frames: Frames as written by record_payloads
+            speed: Replay speed multiplier (60 replays an hour in a minute)
+            loop: Start again from the first frame after the last one
+        """
+        if not frames:
+            raise ValueError('Replay needs at least one recorded frame')
+        self.frames = frames
+        self.speed = max(speed, 1e-6)
+        self.loop = loop
+        first = self._captured_at(frames[0])
+        self.offsets = [(self._captured_at(frame) - first) for frame in frames]
+        self.started = time.monotonic()
+
+    @staticmethod
+    def _captured_at(frame: Dict) -> float:
+        return datetime.fromisoformat(frame['captured_at']).timestamp()
+
+    def frame_index(self) -> int:
+        elapsed = (time.monotonic() - self.started) * self.speed
+        if self.loop and self.offsets[-1] > 0:
+            elapsed %= self.offsets[-1] + (self.offsets[-1] / max(1, len(self.offsets) - 1))
+        index = 0
+        for i, offset in enumerate(self.offsets):
+            if offset <= elapsed:
+                index = i
+        return index
+
+    def finished(self) -> bool:
+        return not self.loop and (time.monotonic() - self.started) * self.speed >= self.offsets[-1]
+
+    def current(self) -> List[Dict]:
+        return self.frames[self.frame_index()]['records']
+
+
+def create_emulator_app(source, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                        error_statuses: tuple = (500, 503), page_limit: int = 100, max_window: int = 10000,
+                        seed: int = 5120) -> Flask:
+    """
+    Build a Flask app that mimics the Open Data explore/v2.1 dataset endpoints
+
+    Args:
+        source: StaticSource or ReplaySource serving every dataset, or a dict of them keyed
+            by dataset id (other datasets then answer 404)
+        latency_ms: Fixed delay added to every response
+        jitter_ms: Uniform random delay added on top of latency_ms
+        error_rate: Probability of answering with an injected error
+        error_statuses: Status codes to pick injected errors from
+        page_limit: Maximum limit accepted by the records endpoint (the live API allows 100)
+        max_window: Maximum offset + limit accepted by the records endpoint
+
+    Returns:
+        Flask application
+    """
+    app = Flask(__name__)
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    app.config['EMULATOR_STATS'] = stats = {'requests': 0, 'errors_injected': 0, 'records_served': 0}
+
+    def error(message: str, status: int = 400):
+        return jsonify({'error_code': 'ODSQLError' if status == 400 else 'ServerError', 'message': message}), status
+
+    @app.before_request
+    def inject_latency_and_errors():
+        stats['requests'] += 1
+        with rng_lock:
+            delay = latency_ms + (rng.uniform(0, jitter_ms) if jitter_ms else 0.0)
+            fail = rng.random() < error_rate
+            status = rng.choice(error_statuses) if fail else None
+        if delay:
+            time.sleep(delay / 1000.0)
+        if fail:
+            stats['errors_injected'] += 1
+            return error('Injected failure', status)
+
+    def query_records(dataset: str, default_limit: Optional[int]):
+        """Apply where, order_by, offset, limit and select to the current records"""
+        dataset_source = source.get(dataset) if isinstance(source, dict) else source
+        if dataset_source is None:
+            return None, 0, error(f'Unknown dataset: {dataset}', 404)
+        try:
+            select = ODSQL.parse_select(request.args.get('select'))
+            predicate = ODSQL.parse_where(request.args.get('where'))
+            ordering = ODSQL.parse_order_by(request.args.get('order_by'))
+            limit = request.args.get('limit', default=default_limit, type=int)
+            offset = request.args.get('offset', default=0, type=int)
+        except ODSQLError as e:
+            return None, 0, error(str(e))
+
+        records = [record for record in dataset_source.current() if predicate(record)]
+        for field, descending in reversed(ordering):
+            records.sort(key=lambda r, f=field: ODSQL.sort_key(ODSQL.get_field(r, f)), reverse=descending)
+
+        total = len(records)
+        if limit is not None and limit >= 0:
+            records = records[offset:offset + limit]
+        else:
+            records = records[offset:]
+
+        if select is not None:
+            records = [{field: ODSQL.get_field(r, field) for field in select} for r in records]
+
+        stats['records_served'] += len(records)
+        return records, total, None
+
+    @app.route('/api/explore/v2.1/catalog/datasets/<dataset>/records', methods=['GET'])
+    def records_endpoint(dataset):
+        limit = request.args.get('limit', default=10, type=int)
+        offset = request.args.get('offset', default=0, type=int)
+        if limit > page_limit:
+            return error(f'Invalid value for limit API parameter: {limit} was found but -1 <= limit <= {page_limit} is expected.')
+        if offset + max(limit, 0) > max_window:
+            return error(f'Invalid value for offset API parameter: offset + limit must be lower than {max_window}.')
+
+        records, total, failure = query_records(dataset, default_limit=10)
+        if failure:
+            return failure
+        return jsonify({'total_count': total, 'results': records})
+
+    @app.route('/api/explore/v2.1/catalog/datasets/<dataset>/exports/<fmt>', methods=['GET'])
+    def exports_endpoint(dataset, fmt):
+        records, _, failure = query_records(dataset, default_limit=None)
+        if failure:
+            return failure
+
+        if fmt == 'json':
+            body, mimetype = json.dumps(records), 'application/json'
+        elif fmt == 'jsonl':
+            body, mimetype = ''.join(json.dumps(r) + '\n' for r in records), 'application/jsonl'
+        elif fmt == 'csv':
+            output = io.StringIO()
+            fields = sorted({key for record in records for key in record})
+            writer = csv.DictWriter(output, fieldnames=fields, delimiter=';')
+            writer.writeheader()
+            for record in records:
+                writer.writerow({k: json.dumps(v) if isinstance(v, dict) else v for k, v in record.items()})
+            body, mimetype = output.getvalue(), 'text/csv'
+        else:
+            return error(f'Unsupported export format: {fmt}')
+
+        # Exports support conditional requests like the live portal's CDN
+        etag = '"' + hashlib.sha1(body.encode()).hexdigest()[:20] + '"'
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=304, headers={'ETag': etag})
+        return Response(body, mimetype=mimetype, headers={'ETag': etag})
+
+    @app.route('/_emulator/stats', methods=['GET'])
+    def emulator_stats():
+        return jsonify(stats)
+
+    return app
+
+
+class EmulatorServer:
+    """Runs an emulator app on a background thread, for use as a context manager"""
+
+    def __init__(self, app: Flask, host: str = '127.0.0.1', port: int = 0, quiet: bool = True):
+        if quiet:
+            logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server(host, port, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.server.host}:{self.server.port}/api/explore/v2.1'
+
+    def records_url(self, dataset: str = SENSOR_DATASET) -> str:
+        return f'{self.base_url}/catalog/datasets/{dataset}/records'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join(timeout=5)
+
+
+def record_payloads(output: str, interval: float, count: int, dataset: str = SENSOR_DATASET,
+                    api_root: str = LIVE_API_ROOT) -> int:
+    """
+    Capture full dataset exports from the live API into a JSONL frame file
+
+    Args:
+        output: Path of the JSONL file to append frames to
+        interval: Seconds between captures
+        count: Number of frames to capture
+
+    Returns:
+        Number of frames written
+    """
+    url = f'{api_root}/catalog/datasets/{dataset}/exports/json'
+    written = 0
+    with open(output, 'a') as f:
+        for i in range(count):
+            started = time.monotonic()
+            try:
+                response = requests.get(url, timeout=60)
+                response.raise_for_status()
+                f.write(json.dumps({'captured_at': datetime.utcnow().isoformat(), 'records': response.json()}) + '\n')
+                f.flush()
+                written += 1
+                print(f"📥 Frame {i + 1}/{count}: {len(response.json())} records")
+            except requests.exceptions.RequestException as e:
+                print(f"❌ Capture {i + 1}/{count} failed: {e}")
+            if i < count - 1:
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    return written
+
+
+def load_frames(path: str) -> List[Dict]:
+    """Read frames written by record_payloads"""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_source(size: int, seed: int = 5120) -> StaticSource:
+    """A static source backed by the benchmark dataset generator"""
+    from .datasets import SyntheticSensorGenerator
+    generator = SyntheticSensorGenerator(size, seed=seed)
+    return StaticSource(generator.generate_api_records(generator.generate_rows(), change_rate=0.0))
+
+
+def synthetic_sources(size: int, seed: int = 5120) -> Dict[str, StaticSource]:
+    """Sensor, bay and sign-plate datasets for the same synthetic population"""
+    from .datasets import SyntheticSensorGenerator
+    generator = SyntheticSensorGenerator(size, seed=seed)
+    rows = generator.generate_rows()
+    return {
+        SENSOR_DATASET: StaticSource(generator.generate_api_records(rows, change_rate=0.0)),
+        BAY_DATASET: StaticSource(generator.generate_bay_records(rows)),
+        SIGN_PLATE_DATASET: StaticSource(generator.generate_sign_plate_records())
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Melbourne Open Data API emulator')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Serve the emulated API')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--size', type=int, default=5000, help='Synthetic sensors to serve')
+    serve.add_argument('--replay', default=None, help='Serve recorded frames instead of synthetic data')
+    serve.add_argument('--speed', type=float, default=1.0, help='Replay speed multiplier')
+    serve.add_argument('--loop', action='store_true', help='Loop the replay')
+    serve.add_argument('--latency-ms', type=float, default=0.0)
+    serve.add_argument('--jitter-ms', type=float, default=0.0)
+    serve.add_argument('--error-rate', type=float, default=0.0)
+    serve.add_argument('--page-limit', type=int, default=100)
+
+    record = commands.add_parser('record', help='Record live API payloads to disk')
+    record.add_argument('--output', required=True)
+    record.add_argument('--interval', type=float, default=60.0)
+    record.add_argument('--count', type=int, default=10)
+    record.add_argument('--dataset', default=SENSOR_DATASET)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        record_payloads(args.output, args.interval, args.count, args.dataset)
+        return
+
+    if args.replay:
+        source = {SENSOR_DATASET: ReplaySource(load_frames(args.replay), speed=args.speed, loop=args.loop)}
+    else:
+        source = synthetic_sources(args.size)
+
+    app = create_emulator_app(source, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                              error_rate=args.error_rate, page_limit=args.page_limit)
+    print(f"🧪 Open Data emulator on http://{args.host}:{args.port}/api/explore/v2.1")
+    print(f"   export MELBOURNE_API_BASE_URL=http://{args.host}:{args.port}/api/explore/v2.1"
+          f"/catalog/datasets/{SENSOR_DATASET}/records")
+    make_server(args.host, args.port, app, threaded=True).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
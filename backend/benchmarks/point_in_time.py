@@ -0,0 +1,236 @@
+"""
+Point-in-Time Benchmark
+Checks /api/parking/live?at= reconstructions against the true sensor state, and times them
+
+The harness loads synthetic sensors and runs --cycles ingest cycles on a simulated
+clock (--cycle-seconds apart, ending now) in which --change-rate of the bays change
+status at a random second of the interval. --late-rate of those changes reach the
+feed one cycle late, still carrying the time they happened, so some transitions are
+ingested after a checkpoint that is newer than them. Ingests write checkpoints every
+--interval-minutes, and afterwards every complete day of history is compacted into
+archives, so replays read both. At --queries random times it then checks:
+    - each sensor's status, zone and status_timestamp in CheckpointService.snapshot_at
+      against the generator's own log of transitions
+    - the kerbside_ids of every /live?at=&status=available page against the same log
+It times a reconstruction from the nearest checkpoint, one from the oldest checkpoint
+(the replay of all history a single checkpoint would need), and a cached /live?at= page.
+
+Usage (from the backend directory):
+    python -m benchmarks.point_in_time --size 10000 --cycles 192 --cycle-seconds 900
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from unittest import mock
+
+import numpy as np
+
+from .run import measure
+
+
+class SimulatedClock(datetime):
+    """datetime whose utcnow is the harness's simulated time"""
+
+    current = None
+
+    @classmethod
+    def utcnow(cls):
+        return cls.current
+
+
+def true_state(log: Dict[str, List[Tuple[datetime, str]]], at: datetime) -> Dict[str, Tuple[str, datetime]]:
+    """(status, status_timestamp) of every sensor at a time, from its last logged reading at or before it"""
+    state = {}
+    for kerbside_id, events in log.items():
+        for timestamp, status in reversed(events):
+            if timestamp <= at:
+                state[kerbside_id] = (status, timestamp)
+                break
+    return state
+
+
+def run(size: int, cycles: int, cycle_seconds: float, change_rate: float, late_rate: float,
+        interval_minutes: float, queries: int, repeat: int, seed: int = 5120) -> Dict:
+    tmp_dir = tempfile.mkdtemp(prefix='parking-point-in-time-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'point_in_time.db')}"
+    os.environ['FORECAST_STATE_PATH'] = os.path.join(tmp_dir, 'forecast_state.npz')
+    os.environ['TURNOVER_STATE_PATH'] = os.path.join(tmp_dir, 'turnover_state.npz')
+    os.environ['HISTORY_ARCHIVE_DIR'] = os.path.join(tmp_dir, 'history')
+    os.environ['CHECKPOINT_DIR'] = os.path.join(tmp_dir, 'checkpoints')
+
+    from main import create_app
+    from api.models import db, ParkingSensor
+    from api.services import (CheckpointService, HistoryService, MelbourneParkingService, ReferenceDataService,
+                              WebhookService)
+    from api.services import checkpoint_service, parking_service
+    from api.services.checkpoint_service import read_checkpoint
+    from .datasets import SyntheticSensorGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        rng = random.Random(seed)
+        end = datetime.utcnow().replace(microsecond=0) - timedelta(seconds=cycle_seconds)
+        start = end - timedelta(seconds=cycles * cycle_seconds)
+
+        print(f"🗄️  Loading {size} synthetic sensors...")
+        generator = SyntheticSensorGenerator(size, seed=seed)
+        rows = generator.generate_rows(start)
+        for row in rows:
+            # The feed carries whole seconds
+            row['status_timestamp'] = row['status_timestamp'].replace(microsecond=0)
+        db.session.query(ParkingSensor).delete()
+        db.session.bulk_insert_mappings(ParkingSensor, rows)
+        db.session.commit()
+        log = {row['kerbside_id']: [(row['status_timestamp'], row['status_description'])] for row in rows}
+        zone_of = {row['kerbside_id']: row['zone_number'] for row in rows}
+
+        with mock.patch.object(parking_service, 'datetime', SimulatedClock), \
+                mock.patch.object(checkpoint_service, 'datetime', SimulatedClock), \
+                mock.patch.object(CheckpointService, 'INTERVAL_MINUTES', interval_minutes), \
+                mock.patch.object(ReferenceDataService, 'start_refresh', return_value={}), \
+                mock.patch.object(WebhookService, 'publish'):
+            # Changes held back for the next cycle: row index -> (status_timestamp, status)
+            late = {}
+            for cycle in range(cycles):
+                now = start + timedelta(seconds=(cycle + 1) * cycle_seconds)
+                SimulatedClock.current = now
+                records = generator.generate_api_records(rows, change_rate=change_rate)
+                delivered, late = late, {}
+                for i, (row, record) in enumerate(zip(rows, records)):
+                    if i in delivered:
+                        row['status_timestamp'], record['status_description'] = delivered[i]
+                    elif record['status_description'] != row['status_description']:
+                        offset = rng.randint(0, int(cycle_seconds) - 1)
+                        timestamp = now - timedelta(seconds=offset)
+                        log[row['kerbside_id']].append((timestamp, record['status_description']))
+                        if rng.random() < late_rate:
+                            late[i] = (timestamp, record['status_description'])
+                            record['status_description'] = row['status_description']
+                        else:
+                            row['status_timestamp'] = timestamp
+                    record['status_timestamp'] = row['status_timestamp'].strftime('%Y-%m-%dT%H:%M:%S+00:00')
+                    row['status_description'] = record['status_description']
+                with mock.patch.object(MelbourneParkingService, 'fetch_live_parking_data', return_value=records), \
+                        contextlib.redirect_stdout(io.StringIO()):
+                    MelbourneParkingService.update_database()
+
+        # Changes of the last cycle that were still held back never reached an ingest
+        for i in late:
+            log[rows[i]['kerbside_id']].pop()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            compacted = HistoryService.compact(retention_days=0, now=end)
+        for events in log.values():
+            events.sort(key=lambda event: event[0])
+
+        checkpoints = CheckpointService.checkpoint_times()
+        at_times = [checkpoints[0] + timedelta(seconds=rng.randint(0, int((end - checkpoints[0]).total_seconds())))
+                    for _ in range(queries)]
+
+        def uncached(at: datetime):
+            app.extensions.pop('parking_point_in_time', None)
+            return CheckpointService.snapshot_at(at)
+
+        def from_oldest(at: datetime):
+            columns = read_checkpoint(CheckpointService.checkpoint_path(checkpoints[0]))
+            transitions = CheckpointService.replay_transitions(checkpoints[0], at)
+            return CheckpointService._replay(columns, transitions, np.datetime64(at, 'us'))
+
+        mismatches = 0
+        live_mismatches = 0
+        replayed = []
+        for at in at_times:
+            expected = true_state(log, at)
+            with contextlib.redirect_stdout(io.StringIO()):
+                snapshot = uncached(at)
+            replayed.append(snapshot.replayed)
+            statuses = snapshot.statuses
+            zones = snapshot.zones
+            status_at = snapshot.status_at.astype('datetime64[us]').tolist()
+            for i, kerbside_id in enumerate(snapshot.kerbside_ids):
+                if (statuses[i], status_at[i]) != expected.get(kerbside_id) or zones[i] != zone_of[kerbside_id]:
+                    mismatches += 1
+            mismatches += abs(len(expected) - len(snapshot))
+
+            seen, cursor = [], None
+            while True:
+                url = f'/api/parking/live?status=available&limit=1000&at={at.isoformat()}'
+                with contextlib.redirect_stdout(io.StringIO()):
+                    body = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+                seen.extend(item['kerbside_id'] for item in body['data'])
+                cursor = body['next_cursor']
+                if not cursor:
+                    break
+            available = sorted(kerbside_id for kerbside_id, (status, _) in expected.items() if status == 'Unoccupied')
+            live_mismatches += seen != available
+
+        at = at_times[0]
+        nearest = measure(lambda: uncached(at), repeat)
+        oldest = measure(lambda: from_oldest(at), max(1, repeat // 5))
+        cached = measure(lambda: client.get(f'/api/parking/live?status=available&at={at.isoformat()}').get_json(),
+                         repeat)
+
+        db.session.remove()
+        db.engine.dispose()
+
+    return {
+        'meta': {'timestamp': datetime.utcnow().isoformat(), 'size': size, 'cycles': cycles,
+                 'cycle_seconds': cycle_seconds, 'change_rate': change_rate, 'late_rate': late_rate,
+                 'interval_minutes': interval_minutes},
+        'checkpoints': len(checkpoints),
+        'archived_days': len(compacted['days']),
+        'replayed': {'median': int(np.median(replayed)), 'max': int(max(replayed))},
+        'nearest_checkpoint': nearest,
+        'oldest_checkpoint': oldest,
+        'cached_page': cached,
+        'mismatched_sensors': mismatches,
+        'mismatched_pages': live_mismatches,
+        'ok': not mismatches and not live_mismatches
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Check and time point-in-time /live reads')
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--cycles', type=int, default=192, help='Simulated ingest cycles')
+    parser.add_argument('--cycle-seconds', type=float, default=900)
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    parser.add_argument('--late-rate', type=float, default=0.1, help='Share of changes ingested one cycle late')
+    parser.add_argument('--interval-minutes', type=float, default=60, help='Checkpoint interval')
+    parser.add_argument('--queries', type=int, default=10, help='Random times checked')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per measurement')
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    report = run(args.size, args.cycles, args.cycle_seconds, args.change_rate, args.late_rate,
+                 args.interval_minutes, args.queries, args.repeat, args.seed)
+    print(f"🕰️  {report['checkpoints']} checkpoints, {report['archived_days']} archived days, "
+          f"{report['replayed']['median']} transitions replayed (max {report['replayed']['max']})")
+    print(f"   nearest checkpoint {report['nearest_checkpoint']['median_ms']} ms, "
+          f"oldest checkpoint {report['oldest_checkpoint']['median_ms']} ms, "
+          f"cached page {report['cached_page']['median_ms']} ms")
+    print(f"   {report['mismatched_sensors']} mismatched sensors, {report['mismatched_pages']} mismatched pages  "
+          f"{'✅' if report['ok'] else '❌'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote point-in-time report to {args.output}")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+Benchmark Runner for Melbourne Parking API
+Times ingest, read routes, statistics and serialization on synthetic datasets
+
+Usage (from the backend directory):
+    python -m benchmarks.run --sizes 1000 10000 100000 --output benchmarks/results.json
+    python -m benchmarks.run --sizes 1000 --baseline benchmarks/results.json --fail-on-regression
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+from .datasets import SyntheticSensorGenerator, CBD_CENTER
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), 'thresholds.json')
+
+
+def measure(fn: Callable, repeat: int, warmup: int = 1, setup: Callable = None) -> Dict:
+    """
+    Time a callable and summarise the samples in milliseconds
+
+    Args:
+        fn: Callable to time
+        repeat: Number of timed runs
+        warmup: Number of untimed runs first
+        setup: Optional untimed callable run before every call
+
+    Returns:
+        Dictionary of timing statistics
+    """
+    samples = []
+    for i in range(warmup + repeat):
+        if setup:
+            setup()
+        # Routes print debug output; keep it out of the report without skipping the cost
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            elapsed = (time.perf_counter() - start) * 1000
+        if i >= warmup:
+            samples.append(elapsed)
+
+    samples.sort()
+    p95_index = min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))
+    return {
+        'runs': len(samples),
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[p95_index], 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'max_ms': round(samples[-1], 3)
+    }
+
+
+def _get_json(client, url: str):
+    """Issue a GET through the Flask test client and fail loudly on errors"""
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} returned {response.status_code}: {response.data[:200]}')
+    return response
+
+
+def run_size(size: int, repeat: int, database_url: Optional[str], seed: int) -> Dict:
+    """
+    Run every benchmark against a synthetic population of the given size
+
+    Args:
+        size: Number of sensors
+        repeat: Timed runs per benchmark
+        database_url: Database to load into (default: a temporary SQLite file)
+        seed: Random seed for the dataset
+
+    Returns:
+        Dictionary of benchmark name to timing statistics
+    """
+    tmp_dir = None
+    if not database_url:
+        tmp_dir = tempfile.mkdtemp(prefix='parking-bench-')
+        database_url = f"sqlite:///{os.path.join(tmp_dir, f'bench_{size}.db')}"
+
+    os.environ['DATABASE_URL'] = database_url
+
+    # Imported late so DATABASE_URL is in place before the app is configured
+    from main import create_app
+    from api.models import db, ParkingSensor
+    from api.services import MelbourneParkingService, ReferenceDataService, StatsService
+    from api.services.sensor_table import SensorTable
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    results = {}
+    with app.app_context():
+        db.create_all()
+
+        generator = SyntheticSensorGenerator(size, seed=seed)
+        load_start = time.perf_counter()
+        rows = generator.load()
+        results['dataset_load'] = {'runs': 1, 'median_ms': round((time.perf_counter() - load_start) * 1000, 3)}
+
+        client = app.test_client()
+        lat, lng = CBD_CENTER
+
+        # Ingest: replay the whole population as one API cycle with 30% status changes
+        cycles = []
+
+        def next_cycle():
+            cycles.append(generator.generate_api_records(rows))
+
+        def ingest():
+            records = cycles.pop()
+            # Reference datasets are not part of the timed ingest; keep it offline
+            with mock.patch.object(MelbourneParkingService, 'fetch_live_parking_data', return_value=records), \
+                    mock.patch.object(ReferenceDataService, 'start_refresh', return_value={}):
+                if not MelbourneParkingService.update_database():
+                    raise RuntimeError('update_database reported failure')
+
+        results['update_database'] = measure(ingest, max(1, repeat // 5), warmup=0, setup=next_cycle)
+
+        # Routes behind ResponseCacheService: cold samples drop the cache first so they time the
+        # render, and the _cached rows time the stored-response path repeated polls get
+        def clear_response_cache():
+            app.extensions.pop('parking_response_cache', None)
+
+        routes = {
+            'live': '/api/parking/live',
+            'live_location': f'/api/parking/live?lat={lat}&lng={lng}&radius=0.5',
+            'live_available': '/api/parking/live?status=available',
+            'zones': '/api/parking/zones',
+            'dashboard': '/api/dashboard?zoom=17'
+        }
+        for name, url in routes.items():
+            results[name] = measure(lambda url=url: _get_json(client, url), repeat, setup=clear_response_cache)
+            results[f'{name}_cached'] = measure(lambda url=url: _get_json(client, url), repeat)
+
+        results['stats_overview'] = measure(StatsService.get_parking_overview, repeat)
+        results['stats_zones'] = measure(StatsService.get_zone_statistics, repeat)
+        results['stats_parking_lots'] = measure(StatsService.get_parking_lots_stats, repeat)
+        # City-wide 50 m grid; binning is cached per snapshot version, so this times the render
+        results['stats_heatmap'] = measure(lambda: StatsService.get_heatmap(None, 50.0), repeat)
+
+        # Serialization layer on its own: ORM load, to_dict and JSON encoding of every sensor
+        results['serialization_load'] = measure(lambda: ParkingSensor.query.all(), repeat)
+        sensors = ParkingSensor.query.all()
+        results['serialization_to_dict'] = measure(lambda: [s.to_dict() for s in sensors], repeat)
+        payload = [s.to_dict() for s in sensors]
+        results['serialization_json'] = measure(lambda: app.json.dumps(payload), repeat)
+
+        # The same through the column-array table the read routes use
+        results['serialization_table_load'] = measure(SensorTable.load, repeat)
+        table = SensorTable.load()
+        results['serialization_table_to_dicts'] = measure(table.to_dicts, repeat)
+
+        db.session.remove()
+        db.engine.dispose()
+
+    return results
+
+
+def check_regressions(results: Dict, thresholds: Dict, baseline: Optional[Dict]) -> List[Dict]:
+    """
+    Compare results against absolute budgets and, optionally, a previous run
+
+    Args:
+        results: Results keyed by size then benchmark name
+        thresholds: Contents of thresholds.json
+        baseline: Results section of a previous output file
+
+    Returns:
+        List of regression records
+    """
+    regressions = []
+    tolerance = thresholds.get('tolerance', 0.25)
+    budgets = thresholds.get('budgets_ms', {})
+
+    for size, benchmarks in results.items():
+        for name, stats in benchmarks.items():
+            median = stats['median_ms']
+
+            budget = budgets.get(size, {}).get(name)
+            if budget is not None and median > budget:
+                regressions.append({
+                    'size': size, 'benchmark': name, 'kind': 'budget',
+                    'median_ms': median, 'limit_ms': budget
+                })
+
+            previous = (baseline or {}).get(size, {}).get(name)
+            if previous and median > previous['median_ms'] * (1 + tolerance):
+                regressions.append({
+                    'size': size, 'benchmark': name, 'kind': 'baseline',
+                    'median_ms': median, 'limit_ms': round(previous['median_ms'] * (1 + tolerance), 3)
+                })
+
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    """Current commit hash, if the benchmark runs inside a checkout"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, cwd=os.path.dirname(__file__)
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Run the Melbourne Parking API benchmark suite')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Synthetic sensor population sizes')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per benchmark')
+    parser.add_argument('--seed', type=int, default=5120, help='Dataset random seed')
+    parser.add_argument('--database-url', default=None,
+                        help='Database to benchmark (default: temporary SQLite file per size)')
+    parser.add_argument('--output', default='benchmarks/results.json', help='Where to write the JSON report')
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH, help='Regression thresholds file')
+    parser.add_argument('--baseline', default=None, help='Previous JSON report to compare against')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='Exit with status 1 when any threshold is exceeded')
+    args = parser.parse_args(argv)
+
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get('results')
+
+    results = {}
+    for size in args.sizes:
+        print(f"📊 Benchmarking {size} sensors...")
+        results[str(size)] = run_size(size, args.repeat, args.database_url, args.seed)
+        for name, stats in results[str(size)].items():
+            print(f"   {name:<24} median {stats['median_ms']:>10.2f} ms")
+
+    regressions = check_regressions(results, thresholds, baseline)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'database': 'sqlite (temporary)' if not args.database_url else args.database_url.split('://')[0]
+        },
+        'results': results,
+        'regressions': regressions
+    }
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Wrote benchmark report to {args.output}")
+
+    for regression in regressions:
+        print(f"⚠️  Regression [{regression['kind']}] {regression['size']} {regression['benchmark']}: "
+              f"{regression['median_ms']} ms > {regression['limit_ms']} ms")
+
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Saved Area Benchmark
+Checks that incrementally maintained saved-area counts match a full recount, and times both
+
+The harness loads synthetic sensors and saves --areas circles around random sensors
+(spread over sessions of up to 50 areas). Each ingest cycle changes --change-rate of
+the sensors; after every cycle it records:
+    - apply: SavedAreaService.apply_changes, the per-ingest cost (cell index lookup
+      plus one relative UPDATE per touched area and the counts_version move)
+    - recount: re-evaluating every area from the snapshot, the cost without the index
+and finally compares every stored count with a fresh recount. GET /api/areas is
+timed for one full session, which reads stored counts only.
+
+Usage (from the backend directory):
+    python -m benchmarks.saved_areas --size 20000 --areas 20000 --cycles 5 --change-rate 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+from unittest import mock
+
+import numpy as np
+
+from .loadgen import percentile
+from .run import measure
+
+
+def run(size: int, areas: int, cycles: int, change_rate: float, seed: int = 5120) -> Dict:
+    tmp_dir = tempfile.mkdtemp(prefix='parking-areas-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'areas.db')}"
+    os.environ.setdefault('FORECAST_STATE_PATH', os.path.join(tmp_dir, 'forecast_state.npz'))
+
+    from main import create_app
+    from api.models import db, SavedArea, UserPreference
+    from api.services import MelbourneParkingService, ReferenceDataService, SavedAreaService, SpatialIndexService
+    from .datasets import SyntheticSensorGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        print(f"🗄️  Loading {size} synthetic sensors and {areas} saved areas...")
+        generator = SyntheticSensorGenerator(size, seed=seed)
+        rows = generator.load()
+
+        rng = random.Random(seed)
+        per_session = SavedAreaService.MAX_AREAS_PER_SESSION
+        sessions = [UserPreference(session_id=f'session-{i}') for i in range((areas + per_session - 1) // per_session)]
+        db.session.add_all(sessions)
+        db.session.flush()
+        db.session.bulk_save_objects([
+            SavedArea(preference_id=sessions[i // per_session].id, name=f'Area {i}',
+                      latitude=centre['latitude'], longitude=centre['longitude'],
+                      radius_km=rng.choice([0.1, 0.2, 0.3, 0.5]))
+            for i, centre in enumerate(rng.choices(rows, k=areas))
+        ])
+        db.session.commit()
+        with contextlib.redirect_stdout(io.StringIO()):
+            SavedAreaService.recount()
+
+        apply_ms, recount_ms, touched = [], [], []
+        for cycle in range(cycles):
+            records = generator.generate_api_records(rows, change_rate=change_rate)
+            for row, record in zip(rows, records):
+                row['status_description'] = record['status_description']
+            with mock.patch.object(MelbourneParkingService, 'fetch_live_parking_data', return_value=records), \
+                    mock.patch.object(ReferenceDataService, 'start_refresh', return_value={}), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                MelbourneParkingService.update_database()
+            stats = SavedAreaService.stats()
+            apply_ms.append(stats['last_apply_ms'])
+            touched.append(stats['updated_areas'] - sum(touched))
+
+            # Cost of the same refresh without the index: every area against the new snapshot
+            with contextlib.redirect_stdout(io.StringIO()):
+                snapshot = SpatialIndexService.get_snapshot()
+                geometry = np.array(db.session.query(SavedArea.latitude, SavedArea.longitude,
+                                                     SavedArea.radius_km).all())
+                start = time.perf_counter()
+                SavedAreaService.count_areas(snapshot, geometry[:, 0], geometry[:, 1], geometry[:, 2])
+                recount_ms.append((time.perf_counter() - start) * 1000)
+            print(f"🔁 Cycle {cycle + 1}/{cycles}: apply {apply_ms[-1]} ms ({touched[-1]} areas), "
+                  f"full recount {recount_ms[-1]:.1f} ms")
+
+        stored = db.session.query(SavedArea.id, SavedArea.latitude, SavedArea.longitude, SavedArea.radius_km,
+                                  SavedArea.total_count, SavedArea.available_count, SavedArea.occupied_count) \
+            .order_by(SavedArea.id).all()
+        values = np.array([area[1:] for area in stored], dtype=np.float64)
+        fresh = SavedAreaService.count_areas(SpatialIndexService.get_snapshot(),
+                                             values[:, 0], values[:, 1], values[:, 2])
+        mismatches = int((fresh != values[:, 3:].astype(np.int64)).any(axis=1).sum())
+
+        session_read = measure(lambda: client.get('/api/areas?session_id=session-0').get_json(), 50)
+
+        db.session.remove()
+        db.engine.dispose()
+
+    return {
+        'meta': {'timestamp': datetime.utcnow().isoformat(), 'size': size, 'areas': areas,
+                 'cycles': cycles, 'change_rate': change_rate},
+        'apply_ms': {'median': round(percentile(sorted(apply_ms), 0.5), 2), 'max': round(max(apply_ms), 2)},
+        'recount_ms': {'median': round(percentile(sorted(recount_ms), 0.5), 2)},
+        'areas_touched_mean': round(sum(touched) / len(touched), 1),
+        'session_read': session_read,
+        'mismatches': mismatches,
+        'ok': mismatches == 0
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Check incremental saved-area counts against a full recount')
+    parser.add_argument('--size', type=int, default=20000, help='Synthetic sensors')
+    parser.add_argument('--areas', type=int, default=20000, help='Saved areas')
+    parser.add_argument('--cycles', type=int, default=5, help='Ingest cycles')
+    parser.add_argument('--change-rate', type=float, default=0.05, help='Share of sensors changing per cycle')
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    report = run(args.size, args.areas, args.cycles, args.change_rate, args.seed)
+    print(f"📍 apply median {report['apply_ms']['median']} ms vs full recount {report['recount_ms']['median']} ms; "
+          f"session read median {report['session_read']['median_ms']} ms; mismatches {report['mismatches']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote saved area report to {args.output}")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
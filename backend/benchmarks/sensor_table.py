@@ -0,0 +1,130 @@
+"""
+Sensor Table Benchmark
+Compares the ORM read path with the array-backed SensorTable
+
+For each population size, both representations are loaded from the same database and
+measured on:
+    - load: ParkingSensor.query.all() versus one Core SELECT into column arrays
+    - memory: bytes per sensor retained after loading (tracemalloc), including the
+      session identity map for the ORM path
+    - filter: available sensors in a bounding box, in Python over objects versus one
+      mask over the columns
+    - serialize: to_dict for every sensor versus SensorTable.to_dicts
+
+Both serializations are checked to produce identical output.
+
+Usage (from the backend directory):
+    python -m benchmarks.sensor_table --sizes 1000 10000 100000
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from .run import measure
+
+# Inner CBD, roughly a quarter of the synthetic population
+FILTER_BBOX = (-37.818, 144.955, -37.808, 144.970)
+
+
+def retained_bytes(load: Callable) -> Tuple[object, int]:
+    """Call load and return its result with the bytes still allocated once it returns"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = load()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def run_size(size: int, repeat: int, seed: int) -> Dict:
+    tmp_dir = tempfile.mkdtemp(prefix='parking-table-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'table.db')}"
+
+    from main import create_app
+    from api.models import db, ParkingSensor
+    from api.services.sensor_table import SensorTable
+    from .datasets import SyntheticSensorGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        SyntheticSensorGenerator(size, seed=seed).load()
+        lat_min, lng_min, lat_max, lng_max = FILTER_BBOX
+
+        def load_orm():
+            db.session.expunge_all()
+            return ParkingSensor.query.order_by(ParkingSensor.id).all()
+
+        def filter_orm(sensors):
+            return [s for s in sensors if s.status_description == 'Unoccupied' and
+                    lat_min <= s.latitude <= lat_max and lng_min <= s.longitude <= lng_max]
+
+        orm_load = measure(load_orm, repeat)
+        sensors, orm_bytes = retained_bytes(load_orm)
+        orm_filter = measure(lambda: filter_orm(sensors), repeat)
+        orm_serialize = measure(lambda: [s.to_dict() for s in sensors], repeat)
+        orm_dicts = [s.to_dict() for s in sensors]
+        orm_matches = [s.id for s in filter_orm(sensors)]
+        del sensors
+        db.session.expunge_all()
+
+        table_load = measure(SensorTable.load, repeat)
+        table, table_bytes = retained_bytes(SensorTable.load)
+        table_filter = measure(lambda: table.mask('available', FILTER_BBOX).nonzero()[0], repeat)
+        table_serialize = measure(table.to_dicts, repeat)
+        identical = table.to_dicts() == orm_dicts and \
+            table.ids[table.mask('available', FILTER_BBOX)].tolist() == orm_matches
+
+        db.session.remove()
+        db.engine.dispose()
+
+    return {
+        'orm': {'load': orm_load, 'filter': orm_filter, 'serialize': orm_serialize,
+                'bytes_per_sensor': round(orm_bytes / size, 1)},
+        'table': {'load': table_load, 'filter': table_filter, 'serialize': table_serialize,
+                  'bytes_per_sensor': round(table_bytes / size, 1)},
+        'identical': identical
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare ORM and SensorTable read paths')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement')
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    report = {'meta': {'timestamp': datetime.utcnow().isoformat(), 'repeat': args.repeat}, 'sizes': {}}
+    for size in args.sizes:
+        result = run_size(size, args.repeat, args.seed)
+        report['sizes'][str(size)] = result
+        print(f"📦 {size} sensors")
+        for name in ('orm', 'table'):
+            stats = result[name]
+            print(f"   {name:<6} load {stats['load']['median_ms']:>9} ms  filter {stats['filter']['median_ms']:>8} ms  "
+                  f"serialize {stats['serialize']['median_ms']:>9} ms  {stats['bytes_per_sensor']:>7} B/sensor")
+        print(f"   identical output: {'✅' if result['identical'] else '❌'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote sensor table report to {args.output}")
+    return 0 if all(result['identical'] for result in report['sizes'].values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Spatial Query Benchmark
+Compares the old latitude/longitude `between` box with geohash prefix range scans
+
+For each radius, both plans fetch the first /search page (kerbside_id order) of
+the box reaching that far from the same query centres:
+    - between: latitude BETWEEN .. AND longitude BETWEEN .., the filter used before
+      the geohash column, with the (latitude, longitude) index from init.sql
+    - geohash: the key ranges covering the box on idx_sensor_geohash, refined
+      exactly in Python, which is what /search does
+A third plan, live, is the first /live radius page (nearest first): the same key
+ranges scanned over the sensor snapshot's geohash-sorted positions, refined by distance.
+
+The report has per-query latency, how many rows each SQL filter hands back
+(candidates), and the query plan the database chose for one sample query.
+The geohash page is also checked against a brute-force exact box search, and
+the live page against a brute-force radius search.
+
+Usage (from the backend directory):
+    python -m benchmarks.spatial_query --size 100000 --radii 0.25 0.5 1 2 --queries 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import Index, event, func, text
+
+from .datasets import SyntheticSensorGenerator
+from .loadgen import percentile
+
+
+@contextlib.contextmanager
+def capture_statements(engine):
+    """Collect the (SQL, parameters) pairs executed inside the block"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def explain(db, statement: str, parameters) -> List[str]:
+    """Query plan lines for an executed statement (SQLite, MySQL and PostgreSQL)"""
+    prefix = {'sqlite': 'EXPLAIN QUERY PLAN'}.get(db.engine.dialect.name, 'EXPLAIN')
+    rows = db.session.connection().exec_driver_sql(f'{prefix} {statement}', parameters).fetchall()
+    return [' | '.join(str(value) for value in row) for row in rows]
+
+
+def summarize(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        'median_ms': round(percentile(ordered, 0.50), 3),
+        'p95_ms': round(percentile(ordered, 0.95), 3),
+        'mean_ms': round(sum(ordered) / len(ordered), 3) if ordered else 0.0
+    }
+
+
+def run(size: int, radii: List[float], queries: int, limit: int, database_url: str = None,
+        seed: int = 5120, max_cells: int = None) -> Dict:
+    tmp_dir = None
+    if not database_url:
+        tmp_dir = tempfile.mkdtemp(prefix='parking-spatial-')
+        database_url = f"sqlite:///{os.path.join(tmp_dir, 'spatial.db')}"
+    os.environ['DATABASE_URL'] = database_url
+
+    from main import create_app
+    from api.models import db, ParkingSensor
+    from api.routes.parking_routes import _geohash_box_filter, _keyset_page, _radius_page, _within_box
+    from api.services import SpatialIndexService
+    from api.services.sensor_table import SensorTable
+    from api.services.spatial_service import KM_PER_DEGREE
+    from api.utils import GeohashUtils
+
+    if max_cells:
+        GeohashUtils.MAX_COVER_CELLS = max_cells
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'size': size,
+            'queries': queries,
+            'limit': limit,
+            'dialect': None,
+            'geohash_precision': GeohashUtils.PRECISION,
+            'max_cover_cells': GeohashUtils.MAX_COVER_CELLS
+        },
+        'radii': {}
+    }
+
+    with app.app_context():
+        report['meta']['dialect'] = db.engine.dialect.name
+        db.create_all()
+        print(f"🗄️  Loading {size} synthetic sensors...")
+        rows = SyntheticSensorGenerator(size, seed=seed).load()
+        # The baseline gets the composite index init.sql creates on MySQL
+        Index('idx_location', ParkingSensor.latitude, ParkingSensor.longitude).create(db.engine, checkfirst=True)
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(text('ANALYZE'))
+
+        rng = random.Random(seed)
+        centres = [(row['latitude'], row['longitude']) for row in rng.sample(rows, min(queries, len(rows)))]
+        positions = [(row['latitude'], row['longitude'], row['kerbside_id']) for row in rows]
+        snapshot = SpatialIndexService.get_snapshot()
+        everything = snapshot.bitmaps().match('all')
+        _radius_page(snapshot, everything, *centres[0], radii[0], None, limit)
+
+        for radius in radii:
+            timings = {'between': [], 'geohash': [], 'live': []}
+            candidates = {'between': [], 'geohash': []}
+            ranges = []
+            mismatches = 0
+            plans = {}
+
+            for index, (lat, lng) in enumerate(centres):
+                lat_span = radius / KM_PER_DEGREE
+                lng_span = radius / (KM_PER_DEGREE * math.cos(math.radians(lat)))
+                cover = (lat - lat_span, lng - lng_span, lat + lat_span, lng + lng_span)
+
+                # Old plan: the box as two range predicates
+                between_query = ParkingSensor.query.filter(
+                    ParkingSensor.latitude.between(cover[0], cover[2]),
+                    ParkingSensor.longitude.between(cover[1], cover[3])
+                )
+                with capture_statements(db.engine) as between_sql:
+                    start = time.perf_counter()
+                    between_query.with_entities(*SensorTable.COLUMNS) \
+                        .order_by(ParkingSensor.kerbside_id).limit(limit + 1).all()
+                    timings['between'].append((time.perf_counter() - start) * 1000)
+
+                # /search plan: geohash ranges, exact box check in Python
+                geohash_query = ParkingSensor.query.filter(_geohash_box_filter(*cover))
+                with capture_statements(db.engine) as geohash_sql:
+                    start = time.perf_counter()
+                    sensors, _ = _keyset_page(geohash_query, None, limit, _within_box(*cover))
+                    timings['geohash'].append((time.perf_counter() - start) * 1000)
+
+                candidates['between'].append(between_query.with_entities(func.count()).scalar())
+                candidates['geohash'].append(geohash_query.with_entities(func.count()).scalar())
+                ranges.append(len(GeohashUtils.cover_ranges(*cover)))
+
+                # Brute force: the first page of sensors inside the exact box
+                inside = sorted(kerbside_id for p_lat, p_lng, kerbside_id in positions
+                                if cover[0] <= p_lat <= cover[2] and cover[1] <= p_lng <= cover[3])
+                if inside[:limit] != [s.kerbside_id for s in sensors]:
+                    mismatches += 1
+
+                # /live plan: the same ranges over the snapshot, nearest first
+                start = time.perf_counter()
+                page, _ = _radius_page(snapshot, everything, lat, lng, radius, None, limit)
+                timings['live'].append((time.perf_counter() - start) * 1000)
+                distances = (snapshot.lat - lat) ** 2 + (snapshot.lng - lng) ** 2 * math.cos(math.radians(lat)) ** 2
+                nearest = np.lexsort((snapshot.ids, distances))
+                nearest = nearest[distances[nearest] <= (radius / KM_PER_DEGREE) ** 2][:limit]
+                if not np.array_equal(nearest, page):
+                    mismatches += 1
+
+                if index == 0:
+                    plans = {'between': explain(db, *between_sql[-1]), 'geohash': explain(db, *geohash_sql[-1])}
+
+            result = {
+                'between': dict(summarize(timings['between']),
+                                candidates_mean=round(sum(candidates['between']) / len(centres), 1)),
+                'geohash': dict(summarize(timings['geohash']),
+                                candidates_mean=round(sum(candidates['geohash']) / len(centres), 1),
+                                ranges_mean=round(sum(ranges) / len(ranges), 2)),
+                'live': summarize(timings['live']),
+                'speedup_median': round(percentile(sorted(timings['between']), 0.5) /
+                                        max(percentile(sorted(timings['geohash']), 0.5), 1e-9), 2),
+                'page_mismatches': mismatches,
+                'plans': plans
+            }
+            report['radii'][str(radius)] = result
+            print(f"📍 r={radius} km  between median {result['between']['median_ms']:>8} ms "
+                  f"({result['between']['candidates_mean']:>8} rows)  "
+                  f"geohash median {result['geohash']['median_ms']:>8} ms "
+                  f"({result['geohash']['candidates_mean']:>8} rows, {result['geohash']['ranges_mean']} ranges)  "
+                  f"x{result['speedup_median']}  live median {result['live']['median_ms']:>8} ms  "
+                  f"mismatches {mismatches}")
+
+        db.session.remove()
+        db.engine.dispose()
+
+    return report
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare between-box and geohash range spatial queries')
+    parser.add_argument('--size', type=int, default=100000, help='Synthetic sensors in the database')
+    parser.add_argument('--radii', type=float, nargs='+', default=[0.25, 0.5, 1.0, 2.0], help='Box half-widths in km')
+    parser.add_argument('--queries', type=int, default=200, help='Query centres per radius')
+    parser.add_argument('--limit', type=int, default=100, help='Page size, as /search')
+    parser.add_argument('--database-url', default=None, help='Use this database instead of a temporary SQLite file')
+    parser.add_argument('--max-cells', type=int, default=None, help='Override GeohashUtils.MAX_COVER_CELLS')
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    report = run(args.size, args.radii, args.queries, args.limit, args.database_url, args.seed, args.max_cells)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote spatial query report to {args.output}")
+    return 0 if all(r['page_mismatches'] == 0 for r in report['radii'].values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
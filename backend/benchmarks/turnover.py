@@ -0,0 +1,184 @@
+"""
+Turnover Benchmark
+Checks the incrementally maintained dwell and turnover aggregates against a history scan, and times both
+
+The harness loads synthetic sensors and sign plates, then runs --cycles ingest cycles
+on a simulated clock (--cycle-seconds apart, ending now) in which --change-rate of the
+bays change status. Afterwards every zone's figures from TurnoverService are compared
+with a recomputation from parking_status_history:
+    - stays, mean, max and overstays must match exactly
+    - p50/p90/p95 must be within the sketch's relative accuracy of the exact quantiles
+It also times the per-cycle update, /api/stats/zones/<zone>/turnover, and the
+history scan the endpoint avoids.
+
+Usage (from the backend directory):
+    python -m benchmarks.turnover --size 10000 --cycles 100 --change-rate 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+from unittest import mock
+
+import numpy as np
+
+from .loadgen import percentile
+from .run import measure
+
+
+def recompute(history: List[tuple], initial: Dict[str, str], zone_restrictions: Dict) -> Dict[str, List]:
+    """(dwell seconds, overstay or None) of every completed stay per zone, replaying history in order"""
+    from api.services.reference_service import ReferenceView
+
+    status = dict(initial)
+    since = {}
+    stays: Dict[str, List] = {}
+    for kerbside_id, zone, description, status_timestamp in history:
+        zone = zone or 'Unknown'
+        if status.get(kerbside_id) == 'Occupied' and description != 'Occupied' and kerbside_id in since:
+            seconds = (status_timestamp - since[kerbside_id]).total_seconds()
+            if seconds >= 0:
+                restriction = ReferenceView.active_restriction(zone_restrictions.get(zone, []), since[kerbside_id])
+                minutes = restriction['duration_minutes'] if restriction else None
+                stays.setdefault(zone, []).append((seconds, seconds > minutes * 60 if minutes else None))
+        status[kerbside_id] = description
+        since[kerbside_id] = status_timestamp
+    return stays
+
+
+def run(size: int, cycles: int, cycle_seconds: float, change_rate: float, seed: int = 5120) -> Dict:
+    tmp_dir = tempfile.mkdtemp(prefix='parking-turnover-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'turnover.db')}"
+    os.environ['FORECAST_STATE_PATH'] = os.path.join(tmp_dir, 'forecast_state.npz')
+    os.environ['TURNOVER_STATE_PATH'] = os.path.join(tmp_dir, 'turnover_state.npz')
+
+    from main import create_app
+    from api.models import db, ParkingStatusHistory
+    from api.services import MelbourneParkingService, ReferenceDataService, TurnoverService, WebhookService
+    from api.services.reference_service import ReferenceView
+    from api.services.turnover_service import SKETCH_ALPHA
+    from .datasets import SyntheticSensorGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        print(f"🗄️  Loading {size} synthetic sensors...")
+        generator = SyntheticSensorGenerator(size, seed=seed)
+        rows = generator.load()
+        initial = {row['kerbside_id']: row['status_description'] for row in rows}
+        view = ReferenceView()
+        view.load_restrictions(generator.generate_sign_plate_records())
+
+        rng = random.Random(seed)
+        start = datetime.utcnow() - timedelta(seconds=cycles * cycle_seconds)
+        observe_ms = []
+        observe = TurnoverService.observe
+
+        def timed_observe(events, when=None):
+            began = time.perf_counter()
+            result = observe(events, when)
+            observe_ms.append((time.perf_counter() - began) * 1000)
+            return result
+
+        with mock.patch.object(ReferenceDataService, 'start_refresh', return_value={}), \
+                mock.patch.object(ReferenceDataService, 'get_view', return_value=view), \
+                mock.patch.object(WebhookService, 'publish'), \
+                mock.patch.object(TurnoverService, 'observe', side_effect=timed_observe):
+            for cycle in range(cycles):
+                now = start + timedelta(seconds=(cycle + 1) * cycle_seconds)
+                records = generator.generate_api_records(rows, change_rate=change_rate)
+                for row, record in zip(rows, records):
+                    if record['status_description'] != row['status_description']:
+                        # Spread the transitions over the simulated interval
+                        row['status_timestamp'] = now - timedelta(seconds=rng.uniform(0, cycle_seconds))
+                        record['status_timestamp'] = row['status_timestamp'].strftime('%Y-%m-%dT%H:%M:%S+00:00')
+                    row['status_description'] = record['status_description']
+                with mock.patch.object(MelbourneParkingService, 'fetch_live_parking_data', return_value=records), \
+                        contextlib.redirect_stdout(io.StringIO()):
+                    MelbourneParkingService.update_database()
+
+            def scan():
+                history = db.session.query(ParkingStatusHistory.kerbside_id, ParkingStatusHistory.zone_number,
+                                           ParkingStatusHistory.status_description,
+                                           ParkingStatusHistory.status_timestamp) \
+                    .order_by(ParkingStatusHistory.id).all()
+                return recompute(history, initial, view.zone_restrictions)
+
+            expected = scan()
+            scan_timing = measure(scan, 3)
+
+            mismatches = []
+            worst_quantile_error = 0.0
+            for zone, stays in expected.items():
+                report = TurnoverService.zone_turnover(zone)
+                dwell = np.sort(np.array([seconds for seconds, _ in stays]))
+                restricted = [over for _, over in stays if over is not None]
+                figures = report['dwell_minutes']
+                if report['stays'] != len(dwell) or \
+                        abs(figures['mean'] - round(dwell.mean() / 60, 2)) > 0.011 or \
+                        abs(figures['max'] - round(dwell.max() / 60, 2)) > 0.011 or \
+                        report['overstays']['restricted_stays'] != len(restricted) or \
+                        report['overstays']['overstays'] != sum(restricted):
+                    mismatches.append(zone)
+                for q in (0.50, 0.90, 0.95):
+                    exact = max(dwell[int(q * (len(dwell) - 1))], 1.0) / 60
+                    error = abs(figures[f'p{int(q * 100)}'] - exact) / exact
+                    # Reported values are rounded to 0.01 minutes
+                    worst_quantile_error = max(worst_quantile_error, error - 0.005 / exact)
+
+            zones = list(expected)
+            route = measure(lambda: client.get(f'/api/stats/zones/{rng.choice(zones)}/turnover').get_json(), 50)
+
+        db.session.remove()
+        db.engine.dispose()
+
+    observe_ms.sort()
+    return {
+        'meta': {'timestamp': datetime.utcnow().isoformat(), 'size': size, 'cycles': cycles,
+                 'cycle_seconds': cycle_seconds, 'change_rate': change_rate},
+        'zones': len(expected),
+        'stays': sum(len(stays) for stays in expected.values()),
+        'observe_ms': {'median': round(percentile(observe_ms, 0.5), 2), 'max': round(observe_ms[-1], 2)},
+        'route': route,
+        'history_scan': scan_timing,
+        'mismatched_zones': len(mismatches),
+        'worst_quantile_error': round(float(worst_quantile_error), 5),
+        'ok': not mismatches and worst_quantile_error <= SKETCH_ALPHA
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Check incremental dwell and turnover statistics against history')
+    parser.add_argument('--size', type=int, default=10000, help='Synthetic sensors')
+    parser.add_argument('--cycles', type=int, default=100, help='Ingest cycles')
+    parser.add_argument('--cycle-seconds', type=float, default=300, help='Simulated time between cycles')
+    parser.add_argument('--change-rate', type=float, default=0.05, help='Share of sensors changing per cycle')
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    report = run(args.size, args.cycles, args.cycle_seconds, args.change_rate, args.seed)
+    print(f"⏱️  {report['stays']} stays in {report['zones']} zones; update median {report['observe_ms']['median']} ms, "
+          f"route median {report['route']['median_ms']} ms vs history scan {report['history_scan']['median_ms']} ms")
+    print(f"   mismatched zones {report['mismatched_zones']}, worst quantile error {report['worst_quantile_error']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote turnover report to {args.output}")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+Webhook Sink and Delivery Harness
+A local HTTP receiver for webhook batches, and a harness that drives ingest cycles against it
+
+The sink accepts POST /hooks/<name> and records every attempt. Query parameters on the
+callback URL script its behaviour per batch:
+    fail=N       answer the first N attempts of each batch with `status`
+    status=503   status used for failed attempts (5xx/429 are retried, other 4xx are not)
+    delay_ms=M   wait before answering, to show slow partners do not hold up ingest
+
+The harness loads synthetic sensors, registers zone and bounding-box subscriptions
+(some healthy, one flaky, one permanently down, one rejecting with 410), runs ingest
+cycles and then checks that every status change reached every matching subscriber:
+healthy and flaky hooks receive each change exactly once, and broken hooks end up in the
+dead-letter table. Ingest time is reported per cycle, so you can see it stays flat while
+partners are slow.
+
+Usage (from the backend directory):
+    python -m benchmarks.webhook_sink --size 2000 --cycles 5 --change-rate 0.2 --delay-ms 200
+    python -m benchmarks.webhook_sink serve --port 8090
+"""
+
+import argparse
+import contextlib
+import hashlib
+import hmac
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+from unittest import mock
+
+from flask import Flask, jsonify, request
+
+from .loadgen import percentile
+from .opendata_emulator import EmulatorServer
+
+SINK_SECRET = 'sink-secret'
+
+
+def create_sink_app(secret: str = SINK_SECRET) -> Flask:
+    """
+    Build the sink app
+
+    Args:
+        secret: Key used to check X-Parking-Signature when a batch is signed
+    """
+    app = Flask('webhook_sink')
+    lock = threading.Lock()
+    deliveries = []
+    attempts = {}
+
+    @app.route('/hooks/<name>', methods=['POST'])
+    def receive(name):
+        body = request.get_data()
+        batch_id = request.headers.get('X-Parking-Delivery')
+        delay_ms = request.args.get('delay_ms', default=0.0, type=float)
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+
+        with lock:
+            key = (name, batch_id)
+            attempts[key] = attempts.get(key, 0) + 1
+            attempt = attempts[key]
+        if attempt <= request.args.get('fail', default=0, type=int):
+            return jsonify({'error': 'scripted failure'}), request.args.get('status', default=503, type=int)
+
+        signature = request.headers.get('X-Parking-Signature')
+        expected = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        payload = json.loads(body)
+        with lock:
+            deliveries.append({
+                'hook': name,
+                'batch_id': batch_id,
+                'attempt': attempt,
+                'subscription_id': payload['subscription_id'],
+                'events': payload['events'],
+                'sent_at': payload['sent_at'],
+                'received_at': datetime.utcnow().isoformat(),
+                'signature': None if signature is None else hmac.compare_digest(signature, expected)
+            })
+        return jsonify({'received': len(payload['events'])})
+
+    @app.route('/_sink/deliveries', methods=['GET'])
+    def list_deliveries():
+        with lock:
+            return jsonify({'deliveries': list(deliveries), 'attempts': sum(attempts.values())})
+
+    app.config['SINK_DELIVERIES'] = deliveries
+    app.config['SINK_LOCK'] = lock
+    return app
+
+
+def run(size: int, cycles: int, change_rate: float, zone_subscriptions: int, delay_ms: float,
+        seed: int = 5120) -> Dict:
+    tmp_dir = tempfile.mkdtemp(prefix='parking-webhooks-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'webhooks.db')}"
+    # Fast retries so the harness finishes quickly; the backoff shape is unchanged
+    os.environ.setdefault('WEBHOOK_BACKOFF_SECONDS', '0.05')
+    os.environ.setdefault('WEBHOOK_MAX_ATTEMPTS', '4')
+    os.environ.setdefault('FORECAST_STATE_PATH', os.path.join(tmp_dir, 'forecast_state.npz'))
+    # The sink listens on loopback, which callback URLs may not use by default
+    os.environ['WEBHOOK_ALLOW_PRIVATE_URLS'] = '1'
+
+    from main import create_app
+    from api.models import db, ParkingSensor, ParkingStatusHistory, WebhookDeadLetter
+    from api.services import MelbourneParkingService, ReferenceDataService, WebhookService
+    from .datasets import SyntheticSensorGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    sink_app = create_sink_app()
+    client = app.test_client()
+
+    with EmulatorServer(sink_app) as sink, app.app_context():
+        hook_root = f'http://{sink.server.host}:{sink.server.port}/hooks'
+        db.create_all()
+        generator = SyntheticSensorGenerator(size, seed=seed)
+        rows = generator.load()
+        zones = sorted({row['zone_number'] for row in rows})
+
+        subscriptions = {}
+
+        def subscribe(name: str, url: str, **fields):
+            response = client.post('/api/webhooks/subscriptions', json=dict(callback_url=url, **fields))
+            subscriptions[response.get_json()['subscription']['id']] = name
+
+        for zone in zones[:zone_subscriptions]:
+            subscribe(f'zone-{zone}', f'{hook_root}/zone-{zone}?delay_ms={delay_ms}',
+                      zone_number=zone, secret=SINK_SECRET)
+        lats = sorted(row['latitude'] for row in rows)
+        lngs = sorted(row['longitude'] for row in rows)
+        centre_box = [lats[len(lats) // 4], lngs[len(lngs) // 4], lats[3 * len(lats) // 4], lngs[3 * len(lngs) // 4]]
+        subscribe('bbox', f'{hook_root}/bbox?delay_ms={delay_ms}', bbox=centre_box, secret=SINK_SECRET)
+        subscribe('bbox-available', f'{hook_root}/bbox-available', bbox=centre_box, statuses=['available'])
+        subscribe('flaky', f'{hook_root}/flaky?fail=2&status=503', bbox=centre_box)
+        subscribe('down', f'{hook_root}/down?fail=1000&status=500', zone_number=zones[0])
+        subscribe('gone', f'{hook_root}/gone?fail=1000&status=410', zone_number=zones[0])
+
+        run_started = datetime.utcnow()
+        ingest_ms = []
+        for cycle in range(cycles):
+            records = generator.generate_api_records(rows, change_rate=change_rate)
+            for row, record in zip(rows, records):
+                row['status_description'] = record['status_description']
+            with mock.patch.object(MelbourneParkingService, 'fetch_live_parking_data', return_value=records), \
+                    mock.patch.object(ReferenceDataService, 'start_refresh', return_value={}), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                MelbourneParkingService.update_database()
+                ingest_ms.append((time.perf_counter() - start) * 1000)
+            print(f"🔁 Cycle {cycle + 1}/{cycles}: ingest {ingest_ms[-1]:.1f} ms")
+
+        drained = WebhookService.wait_idle(timeout=120)
+        stats = WebhookService.stats()
+
+        # Expected deliveries come from the history table, independently of the matcher
+        changes = db.session.query(ParkingStatusHistory, ParkingSensor) \
+            .join(ParkingSensor, ParkingSensor.kerbside_id == ParkingStatusHistory.kerbside_id) \
+            .filter(ParkingStatusHistory.recorded_at >= run_started).all()
+        with sink_app.config['SINK_LOCK']:
+            deliveries = list(sink_app.config['SINK_DELIVERIES'])
+        dead_letters = WebhookDeadLetter.query.all()
+
+        report = {'meta': {'timestamp': datetime.utcnow().isoformat(), 'size': size, 'cycles': cycles,
+                           'change_rate': change_rate, 'delay_ms': delay_ms, 'drained': drained},
+                  'ingest': {'median_ms': round(percentile(sorted(ingest_ms), 0.5), 2),
+                             'max_ms': round(max(ingest_ms), 2)},
+                  'delivery': stats, 'subscriptions': {}}
+
+        latencies = []
+        for delivery in deliveries:
+            sent = datetime.fromisoformat(delivery['sent_at'])
+            latencies.append((datetime.fromisoformat(delivery['received_at']) - sent).total_seconds() * 1000)
+        report['latency_ms'] = {'p50': round(percentile(sorted(latencies), 0.5), 2),
+                                'p95': round(percentile(sorted(latencies), 0.95), 2)}
+
+        ok = drained
+        for response in client.get('/api/webhooks/subscriptions').get_json()['subscriptions']:
+            name = subscriptions[response['id']]
+            bbox, statuses = response['bbox'], set(response['statuses'])
+            expected = sorted(
+                (history.kerbside_id, history.status_description) for history, sensor in changes
+                if (response['zone_number'] is None or history.zone_number == response['zone_number']) and
+                (bbox is None or (bbox[0] <= sensor.latitude <= bbox[2] and bbox[1] <= sensor.longitude <= bbox[3])) and
+                (not statuses or history.status_description in statuses)
+            )
+            received = [d for d in deliveries if d['subscription_id'] == response['id']]
+            events = sorted((e['kerbside_id'], e['status']) for d in received for e in d['events'])
+            dead = [letter for letter in dead_letters if letter.subscription_id == response['id']]
+            dead_events = sum(len(json.loads(letter.payload)['events']) for letter in dead)
+            broken = name in ('down', 'gone')
+            correct = (dead_events == len(expected) and not events) if broken else \
+                (events == expected and not dead and all(d['signature'] is not False for d in received))
+            ok = ok and correct
+            report['subscriptions'][name] = {
+                'expected_events': len(expected),
+                'delivered_events': len(events),
+                'batches': len(received),
+                'dead_lettered_events': dead_events,
+                'max_attempts': max((d['attempt'] for d in received), default=max((l.attempts for l in dead), default=0)),
+                'correct': correct
+            }
+
+        db.session.remove()
+        db.engine.dispose()
+
+    report['ok'] = ok
+    return report
+
+
+def main(argv: List[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['serve']:
+        parser = argparse.ArgumentParser(description='Run the webhook sink on its own')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8090)
+        args = parser.parse_args(argv[1:])
+        print(f"🪝 Webhook sink on http://{args.host}:{args.port}/hooks/<name> (secret '{SINK_SECRET}')")
+        create_sink_app().run(host=args.host, port=args.port, threaded=True)
+        return 0
+
+    parser = argparse.ArgumentParser(description='Check webhook fan-out end to end against a local sink')
+    parser.add_argument('--size', type=int, default=2000, help='Synthetic sensors')
+    parser.add_argument('--cycles', type=int, default=5, help='Ingest cycles')
+    parser.add_argument('--change-rate', type=float, default=0.2, help='Share of sensors changing per cycle')
+    parser.add_argument('--zone-subscriptions', type=int, default=20, help='Zones with a subscriber')
+    parser.add_argument('--delay-ms', type=float, default=200.0, help='Response delay of the healthy hooks')
+    parser.add_argument('--seed', type=int, default=5120)
+    parser.add_argument('--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+
+    report = run(args.size, args.cycles, args.change_rate, args.zone_subscriptions, args.delay_ms, args.seed)
+    for name, result in report['subscriptions'].items():
+        print(f"   {name:<16} expected {result['expected_events']:>6}  delivered {result['delivered_events']:>6}  "
+              f"dead-lettered {result['dead_lettered_events']:>6}  {'✅' if result['correct'] else '❌'}")
+    print(f"📨 Ingest median {report['ingest']['median_ms']} ms, delivery p50 {report['latency_ms']['p50']} ms "
+          f"p95 {report['latency_ms']['p95']} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote webhook report to {args.output}")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,7 +8,7 @@ import sys
 # Import API modules
 from api.models import db, ParkingSensor
 from api.routes import register_routes
-from api.services import MelbourneParkingService
+from api.services import MelbourneParkingService, AdmissionControlService, SavedAreaService, SQLiteService
 
 # Load environment variables
 load_dotenv()
@@ -31,6 +31,10 @@ def create_app():
 
         app.config['SQLALCHEMY_DATABASE_URI'] = database_url
         print(f"🔗 Using PostgreSQL with pg8000 driver: {database_url.split('@')[0]}@***")
+    # Embedded single-node deployment (WAL, read pool, single ingest writer)
+    elif SQLiteService.is_sqlite(database_url):
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+        print(f"🔗 Using SQLite: {database_url}")
     # For local MySQL (development)
     else:
         app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
@@ -41,12 +45,29 @@ def create_app():
 
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Connection pool sizing; the gevent entry point runs far more concurrent requests per worker.
+    # SQLite gets a read pool sized by SQLITE_READ_POOL_SIZE (SQLITE_TUNING=off keeps the defaults)
+    sqlite_mode = SQLiteService.is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']) and SQLiteService.enabled()
+    if sqlite_mode:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = SQLiteService.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    elif os.getenv('DB_POOL_SIZE') and not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30'))
+        }
+
     # Initialize extensions
     db.init_app(app)
+    if sqlite_mode:
+        SQLiteService.init_app(app)
 
     # Register API routes
     register_routes(app)
 
+    # Concurrency limits, rate limits and load shedding (ADMISSION_CONFIG)
+    AdmissionControlService.init_app(app)
+
     return app
 
 def initialize_database(app):
@@ -66,6 +87,10 @@ def initialize_database(app):
                         raise
                     time.sleep(2)
 
+            # Older databases predate the geohash column used by spatial queries
+            MelbourneParkingService.ensure_geohash()
+            SavedAreaService.ensure_counts_version()
+
             # Initial data fetch from Melbourne Government API
             print("🔄 Fetching initial parking data from Melbourne Government API...")
             success = MelbourneParkingService.update_database()
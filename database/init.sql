@@ -19,14 +19,54 @@ CREATE TABLE IF NOT EXISTS parking_sensors (
     status_description VARCHAR(50) NOT NULL,
     latitude DECIMAL(10, 8) NOT NULL,
     longitude DECIMAL(11, 8) NOT NULL,
+    geohash VARCHAR(12),
     status_timestamp DATETIME,
     last_updated DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_kerbside_id (kerbside_id),
     INDEX idx_status (status_description),
     INDEX idx_location (latitude, longitude),
+    INDEX idx_sensor_geohash (geohash, latitude, longitude, status_description, last_updated),
     INDEX idx_updated (last_updated)
 ) ENGINE=InnoDB;
 
+-- Create status history table (one row per status transition, compacted into archives)
+CREATE TABLE IF NOT EXISTS parking_status_history (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kerbside_id VARCHAR(50) NOT NULL,
+    zone_number VARCHAR(20),
+    status_description VARCHAR(50) NOT NULL,
+    status_timestamp DATETIME NOT NULL,
+    recorded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_history_sensor_time (kerbside_id, status_timestamp),
+    INDEX idx_history_time (status_timestamp)
+) ENGINE=InnoDB;
+
+-- Create webhook subscription tables (status change notifications for partners)
+CREATE TABLE IF NOT EXISTS webhook_subscriptions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    callback_url VARCHAR(500) NOT NULL,
+    zone_number VARCHAR(20),
+    lat_min DOUBLE,
+    lng_min DOUBLE,
+    lat_max DOUBLE,
+    lng_max DOUBLE,
+    statuses VARCHAR(100),
+    secret VARCHAR(100),
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS webhook_dead_letters (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    subscription_id INT NOT NULL,
+    batch_id VARCHAR(64) NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    last_error VARCHAR(500),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_webhook_dead_letters_subscription_id (subscription_id)
+) ENGINE=InnoDB;
+
 -- Create user preferences table (for future features)
 CREATE TABLE IF NOT EXISTS user_preferences (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -37,6 +77,24 @@ CREATE TABLE IF NOT EXISTS user_preferences (
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) ENGINE=InnoDB;
 
+-- Saved areas: circles a user watches, with availability counts kept current by ingest
+CREATE TABLE IF NOT EXISTS saved_areas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    preference_id INT NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    latitude DOUBLE NOT NULL,
+    longitude DOUBLE NOT NULL,
+    radius_km DOUBLE NOT NULL,
+    total_count INT NOT NULL DEFAULT 0,
+    available_count INT NOT NULL DEFAULT 0,
+    occupied_count INT NOT NULL DEFAULT 0,
+    counts_version BIGINT,
+    counts_updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_saved_areas_preference_id (preference_id),
+    FOREIGN KEY (preference_id) REFERENCES user_preferences(id)
+) ENGINE=InnoDB;
+
 -- Create parking lots table (for demo data)
 CREATE TABLE IF NOT EXISTS parking_lots (
     id INT AUTO_INCREMENT PRIMARY KEY,